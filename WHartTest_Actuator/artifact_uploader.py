@@ -0,0 +1,389 @@
+"""
+UI自动化执行器 - 后台产物上传
+
+截图与 Trace 的上传不再阻塞用例结果的发送：
+
+- 全进程共用一个 keep-alive 的 httpx.AsyncClient
+- 上传任务进入有界队列，由固定数量的工作协程并发处理（队列满时提交方等待，形成背压）
+- 截图可选重新编码为 WebP/JPEG（需安装 Pillow，未安装时原样上传）
+- 按内容 SHA-256 去重：先询问服务端已有哪些哈希，只上传缺失的文件
+- 缺失的文件通过批量接口一次上传多个；服务端不支持批量接口时回退到单文件接口
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Hashable, Optional
+
+import httpx
+
+logger = logging.getLogger('actuator')
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 为可选依赖
+    Image = None
+
+SCREENSHOT = 'screenshot'
+TRACE = 'trace'
+
+# 图片重新编码格式 -> (Pillow 格式名, 扩展名, MIME)
+IMAGE_FORMATS = {
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+}
+
+MIME_BY_EXT = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.zip': 'application/zip',
+}
+
+# 旧版单文件上传接口
+LEGACY_UPLOAD_PATHS = {
+    SCREENSHOT: '/api/ui-automation/screenshots/upload/',
+    TRACE: '/api/ui-automation/traces/upload/',
+}
+CHECK_PATH = '/api/ui-automation/artifacts/check/'
+BATCH_UPLOAD_PATH = '/api/ui-automation/artifacts/upload/'
+
+
+@dataclass
+class Artifact:
+    """待上传的本地产物"""
+    key: Hashable          # 调用方用于回填的标识，如步骤序号、'trace'
+    path: str              # 本地文件路径
+    kind: str = SCREENSHOT
+
+
+@dataclass
+class _Prepared:
+    artifact: Artifact
+    filename: str
+    digest: str
+    size: int
+    data: Optional[bytes] = None   # 重新编码后的内容；为 None 时直接读取本地文件
+
+    @property
+    def mime(self) -> str:
+        return MIME_BY_EXT.get(os.path.splitext(self.filename)[1].lower(), 'application/octet-stream')
+
+    def content(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with open(self.artifact.path, 'rb') as f:
+            return f.read()
+
+
+def _abs_path(path: str) -> str:
+    return os.path.abspath(path) if path.startswith('./') else path
+
+
+def _sha256_file(path: str) -> tuple[str, int]:
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size
+
+
+def _server_value(kind: str, info: dict) -> Optional[str]:
+    """截图回填可访问 URL，Trace 回填相对路径（与原单文件接口一致）"""
+    if kind == TRACE:
+        return info.get('path')
+    return info.get('url')
+
+
+class ArtifactUploader:
+    """后台产物上传器
+
+    Args:
+        api_base_url: 服务端地址
+        token_provider: 获取 API Token 的协程函数 token_provider(refresh: bool)
+        concurrency: 并发上传的工作协程数
+        queue_size: 上传队列长度上限
+        batch_size: 单次批量上传的最大文件数
+        image_format: 截图重新编码格式 webp / jpeg，空或 png 表示原样上传
+        image_quality: 重新编码质量(1-100)
+        dedup: 是否按内容哈希去重
+        timeout: 单次请求超时(秒)
+        transport: 自定义 httpx 传输层（测试用）
+    """
+
+    def __init__(
+        self,
+        api_base_url: str,
+        token_provider: Callable[[bool], Awaitable[Optional[str]]],
+        concurrency: int = 4,
+        queue_size: int = 100,
+        batch_size: int = 10,
+        image_format: Optional[str] = 'webp',
+        image_quality: int = 80,
+        dedup: bool = True,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.api_base_url = api_base_url.rstrip('/')
+        self.token_provider = token_provider
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.image_quality = min(100, max(1, image_quality))
+        self.dedup = dedup
+        self.timeout = timeout
+        self.transport = transport
+
+        image_format = (image_format or '').lower()
+        if image_format in IMAGE_FORMATS and Image is None:
+            logger.warning("未安装 Pillow，截图将按原格式上传")
+            image_format = ''
+        self.image_format = image_format if image_format in IMAGE_FORMATS else ''
+
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: list[asyncio.Task] = []
+        self._batch_supported = True
+
+        # 统计
+        self.uploaded = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.bytes_original = 0
+        self.bytes_sent = 0
+
+    async def start(self) -> None:
+        """创建共享连接并启动工作协程"""
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=self.transport,
+            limits=httpx.Limits(
+                max_connections=self.concurrency * 2,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def submit(self, artifacts: list[Artifact]) -> asyncio.Future:
+        """提交一组产物，返回 Future，结果为 {key: 服务端地址或 None}
+
+        队列已满时等待，避免上传积压占满内存/磁盘。
+        """
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(artifacts), future))
+        return future
+
+    async def upload(self, artifacts: list[Artifact]) -> dict:
+        """提交并等待上传完成"""
+        return await (await self.submit(artifacts))
+
+    async def close(self) -> None:
+        """等待队列中的上传完成后关闭连接"""
+        if self._client is None:
+            return
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._client.aclose()
+        self._client = None
+        logger.info(f"产物上传器已关闭: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            'uploaded': self.uploaded,
+            'deduplicated': self.deduplicated,
+            'failed': self.failed,
+            'bytes_original': self.bytes_original,
+            'bytes_sent': self.bytes_sent,
+            'queued': self._queue.qsize(),
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            artifacts, future = await self._queue.get()
+            try:
+                result = await self._process(artifacts)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"产物上传异常: {e}", exc_info=True)
+                if not future.done():
+                    future.set_result({artifact.key: None for artifact in artifacts})
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, artifacts: list[Artifact]) -> dict:
+        result = {artifact.key: None for artifact in artifacts}
+        prepared = []
+        for artifact in artifacts:
+            path = _abs_path(artifact.path or '')
+            if not path or not os.path.exists(path):
+                logger.warning(f"产物文件不存在: {artifact.path}")
+                self.failed += 1
+                continue
+            try:
+                prepared.append(await asyncio.to_thread(self._prepare, Artifact(artifact.key, path, artifact.kind)))
+            except Exception as e:
+                logger.warning(f"产物预处理失败 {artifact.path}: {e}")
+                self.failed += 1
+
+        for kind in (SCREENSHOT, TRACE):
+            items = [item for item in prepared if item.artifact.kind == kind]
+            if not items:
+                continue
+            stored = await self._store(kind, items)
+            for item in items:
+                value = stored.get(item.digest)
+                result[item.artifact.key] = value
+                if value:
+                    self._remove_local(item.artifact.path)
+                else:
+                    self.failed += 1
+        return result
+
+    def _prepare(self, artifact: Artifact) -> _Prepared:
+        """计算哈希，截图按需重新编码（在线程中执行）"""
+        filename = os.path.basename(artifact.path)
+        original_size = os.path.getsize(artifact.path)
+        self.bytes_original += original_size
+        if artifact.kind == SCREENSHOT and self.image_format:
+            pil_format, ext, _ = IMAGE_FORMATS[self.image_format]
+            with Image.open(artifact.path) as image:
+                if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                buffer = io.BytesIO()
+                image.save(buffer, format=pil_format, quality=self.image_quality)
+            data = buffer.getvalue()
+            if len(data) < original_size:
+                return _Prepared(
+                    artifact=artifact,
+                    filename=os.path.splitext(filename)[0] + ext,
+                    digest=hashlib.sha256(data).hexdigest(),
+                    size=len(data),
+                    data=data,
+                )
+        digest, size = _sha256_file(artifact.path)
+        return _Prepared(artifact=artifact, filename=filename, digest=digest, size=size)
+
+    async def _store(self, kind: str, items: list[_Prepared]) -> dict:
+        """确保产物存在于服务端，返回 {digest: 服务端地址}"""
+        stored = {}
+        unique = list({item.digest: item for item in items}.values())
+
+        if self.dedup and self._batch_supported:
+            found = await self._check(kind, [item.digest for item in unique])
+            for digest, info in found.items():
+                stored[digest] = _server_value(kind, info)
+            self.deduplicated += sum(1 for item in items if item.digest in stored)
+
+        missing = [item for item in unique if item.digest not in stored]
+        for start in range(0, len(missing), self.batch_size):
+            chunk = missing[start:start + self.batch_size]
+            if self._batch_supported:
+                uploaded = await self._upload_batch(kind, chunk)
+                if uploaded is not None:
+                    stored.update(uploaded)
+                    continue
+            for item in chunk:
+                value = await self._upload_single(kind, item)
+                if value:
+                    stored[item.digest] = value
+        return stored
+
+    async def _request(self, method: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        """带认证的请求，Token 过期时刷新后重试一次"""
+        for refresh in (False, True):
+            token = await self.token_provider(refresh)
+            if not token:
+                logger.error("无法获取 API Token，跳过产物上传")
+                return None
+            response = await self._client.request(
+                method,
+                f"{self.api_base_url}{path}",
+                headers={"Authorization": f"Bearer {token}"},
+                **kwargs,
+            )
+            if response.status_code != 401:
+                return response
+        return response
+
+    async def _check(self, kind: str, digests: list[str]) -> dict:
+        try:
+            response = await self._request('POST', CHECK_PATH, json={'kind': kind, 'hashes': digests})
+        except Exception as e:
+            logger.warning(f"产物去重查询失败: {e}")
+            return {}
+        if response is None:
+            return {}
+        if response.status_code == 404:
+            self._batch_supported = False
+            logger.info("服务端不支持批量产物接口，改用单文件上传")
+            return {}
+        if response.status_code != 200:
+            logger.warning(f"产物去重查询失败: {response.status_code}")
+            return {}
+        data = response.json()
+        data = data.get('data', data)
+        return data.get('found') or {}
+
+    async def _upload_batch(self, kind: str, items: list[_Prepared]) -> Optional[dict]:
+        """批量上传，返回 {digest: 服务端地址}；接口不可用时返回 None"""
+        try:
+            files = [('files', (item.filename, item.content(), item.mime)) for item in items]
+            response = await self._request('POST', BATCH_UPLOAD_PATH, data={'kind': kind}, files=files)
+        except Exception as e:
+            logger.error(f"产物批量上传异常: {e}")
+            return {}
+        if response is None:
+            return {}
+        if response.status_code == 404:
+            self._batch_supported = False
+            logger.info("服务端不支持批量产物接口，改用单文件上传")
+            return None
+        if response.status_code != 201:
+            logger.error(f"产物批量上传失败: {response.status_code}")
+            return {}
+        data = response.json()
+        data = data.get('data', data)
+        uploaded = {}
+        for item, info in zip(items, data.get('files') or []):
+            uploaded[item.digest] = _server_value(kind, info)
+            self.uploaded += 1
+            self.bytes_sent += item.size
+        logger.debug(f"产物批量上传成功: {len(uploaded)} 个 {kind}")
+        return uploaded
+
+    async def _upload_single(self, kind: str, item: _Prepared) -> Optional[str]:
+        """旧版单文件上传接口"""
+        try:
+            files = {'file': (item.filename, item.content(), item.mime)}
+            response = await self._request('POST', LEGACY_UPLOAD_PATHS[kind], files=files)
+        except Exception as e:
+            logger.error(f"{kind} 上传异常: {e}")
+            return None
+        if response is None or response.status_code != 201:
+            logger.error(f"{kind} 上传失败: {response.status_code if response else '无 Token'}")
+            return None
+        data = response.json()
+        data = data.get('data', data)
+        self.uploaded += 1
+        self.bytes_sent += item.size
+        return _server_value(kind, data)
+
+    @staticmethod
+    def _remove_local(path: str) -> None:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            logger.warning(f"清理本地产物失败 {path}: {e}")
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+变量处理器微基准
+
+模拟批量执行时为每个用例构建配置的变量替换负载：每个用例若干页面步骤，
+每个步骤包含输入值、三个定位器与页面 URL，部分字符串包含 ${{变量名}}。
+
+对比:
+- regex: 编译前的实现，每次替换都重新匹配正则
+- compiled (cold): 预编译模板，每个用例清空渲染结果，只复用编译结果
+- compiled: 预编译模板 + 项目内共享的渲染结果（执行器实际使用方式）
+
+用法: python bench_data_processor.py [--cases 200 2000] [--repeat 3]
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+
+from data_processor import DataProcessor
+
+logging.getLogger('actuator').setLevel(logging.ERROR)
+
+
+class RegexDataProcessor(DataProcessor):
+    """编译前的替换实现，作为基线"""
+
+    def _replace_string(self, text, max_depth):
+        if not text or not isinstance(text, str):
+            return text
+        matches = list(self.VARIABLE_PATTERN.finditer(text))
+        if not matches:
+            return text
+        if len(matches) == 1 and matches[0].group(0) == text.strip():
+            var_name = matches[0].group(1).strip()
+            if var_name in self._cache:
+                value = self._cache[var_name]
+                if isinstance(value, str) and self.VARIABLE_PATTERN.search(value):
+                    return self._replace_string(value, max_depth - 1)
+                return value
+            return text
+        result = text
+        for match in reversed(matches):
+            var_name = match.group(1).strip()
+            if var_name in self._cache:
+                var_value = self._cache[var_name]
+                if isinstance(var_value, (dict, list)):
+                    replacement = json.dumps(var_value, ensure_ascii=False)
+                else:
+                    replacement = str(var_value)
+                result = result[:match.start()] + replacement + result[match.end():]
+        if self.VARIABLE_PATTERN.search(result) and max_depth > 1:
+            return self._replace_string(result, max_depth - 1)
+        return result
+
+
+def build_public_data(count: int = 30) -> list[dict]:
+    data = [{'key': f'var_{i}', 'value': f'value_{i}', 'type': 0} for i in range(count)]
+    data.append({'key': 'base_host', 'value': 'https://${{var_0}}.example.com', 'type': 0})
+    data.append({'key': 'account', 'value': '{"user": "admin", "roles": [1, 2]}', 'type': 3})
+    return data
+
+
+def build_page_steps(count: int = 20, details_per_step: int = 8, seed: int = 7) -> list[dict]:
+    """项目中的页面步骤（批量中的用例引用这些步骤）"""
+    rng = random.Random(seed)
+    steps = []
+    for step_index in range(count):
+        details = []
+        for detail_index in range(details_per_step):
+            if rng.random() < 0.3:
+                text = f'${{{{var_{rng.randrange(30)}}}}}'
+            elif rng.random() < 0.2:
+                text = f'账号 ${{{{var_{rng.randrange(30)}}}}} / ${{{{account}}}}'
+            else:
+                text = f'固定输入 {detail_index}'
+            details.append({
+                'input': text,
+                'locators': [
+                    f'//div[@id="form-{step_index}"]//input[@name="field-{detail_index}"]',
+                    f'[data-test="${{{{var_{rng.randrange(30)}}}}}"]' if rng.random() < 0.1 else '',
+                    '',
+                ],
+            })
+        steps.append({'page_url': '${{base_host}}/pages/' + str(step_index), 'details': details})
+    return steps
+
+
+def run_batch(processor: DataProcessor, cases: int, page_steps: list[dict], steps_per_case: int,
+              reset_each_case: bool = False) -> int:
+    """按用例构建配置的替换调用，返回处理的字符串数"""
+    processed = 0
+    for case_index in range(cases):
+        if reset_each_case:
+            processor._rendered.clear()
+        for offset in range(steps_per_case):
+            step = page_steps[(case_index + offset) % len(page_steps)]
+            processor.replace(step['page_url'])
+            processed += 1
+            for detail in step['details']:
+                processor.replace(detail['input'])
+                for locator in detail['locators']:
+                    processor.replace(locator)
+                processed += 4
+    return processed
+
+
+def bench(label: str, factory, cases: int, page_steps: list[dict], repeat: int, **kwargs) -> float:
+    best = float('inf')
+    processed = 0
+    for _ in range(repeat):
+        processor = factory()
+        processor.load_public_data(build_public_data())
+        start = time.perf_counter()
+        processed = run_batch(processor, cases, page_steps, steps_per_case=3, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<16} {best * 1000:9.1f} ms  {processed / best:12,.0f} 字符串/秒  {cases / best:10,.0f} 用例/秒")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='变量处理器微基准')
+    parser.add_argument('--cases', type=int, nargs='+', default=[200, 2000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    page_steps = build_page_steps()
+    for cases in args.cases:
+        print(f"批量 {cases} 个用例（每用例 3 个页面步骤，每步骤 8 个元素）:")
+        baseline = bench('regex', RegexDataProcessor, cases, page_steps, args.repeat)
+        cold = bench('compiled (cold)', DataProcessor, cases, page_steps, args.repeat, reset_each_case=True)
+        warm = bench('compiled', DataProcessor, cases, page_steps, args.repeat)
+        print(f"  加速比: cold {baseline / cold:.1f}x, compiled {baseline / warm:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+UI自动化执行器 - 常驻浏览器池
+
+执行器进程内保持若干个已启动的浏览器，每个用例只创建独立的 BrowserContext，
+避免短用例的大部分耗时花在浏览器启动上：
+
+- 启动时预热 size 个浏览器，后续按需补齐
+- 每个用例分配一个全新的 BrowserContext（可提前预创建 prewarm_contexts 个备用）
+- 浏览器累计服务 max_contexts_per_browser 个上下文后回收重启（等待进行中的用例结束后关闭）
+- 浏览器崩溃/断开连接时丢弃并重新启动
+- 记录浏览器启动耗时与上下文获取耗时，便于对比预热效果
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger('actuator')
+
+
+def _latency_summary(samples) -> dict:
+    """耗时样本(毫秒) -> 统计摘要"""
+    if not samples:
+        return {'count': 0, 'avg_ms': 0, 'p95_ms': 0, 'max_ms': 0, 'last_ms': 0}
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(len(ordered) * 0.95))
+    return {
+        'count': len(ordered),
+        'avg_ms': round(sum(ordered) / len(ordered), 1),
+        'p95_ms': round(ordered[p95_index], 1),
+        'max_ms': round(ordered[-1], 1),
+        'last_ms': round(samples[-1], 1),
+    }
+
+
+class PooledBrowser:
+    """池中的单个浏览器"""
+
+    def __init__(self, browser, index: int):
+        self.browser = browser
+        self.index = index
+        self.launched_at = time.monotonic()
+        self.contexts_served = 0   # 已分配出去的上下文数
+        self.active = 0            # 正在使用的上下文数
+        self.warm_contexts: list = []
+        self.retiring = False      # 已达到回收阈值，等待进行中的用例结束
+        self.crashed = False
+        self.refilling = False
+        browser.on('disconnected', self._on_disconnected)
+
+    def _on_disconnected(self, *_):
+        if not self.retiring:
+            self.crashed = True
+
+    @property
+    def healthy(self) -> bool:
+        return not self.crashed and self.browser.is_connected()
+
+
+class BrowserPool:
+    """常驻浏览器池
+
+    Args:
+        launcher: 启动一个浏览器的协程函数，返回 Playwright Browser
+        size: 常驻浏览器数量
+        max_contexts_per_browser: 单个浏览器累计分配多少个上下文后回收重启(0 = 不回收)
+        prewarm_contexts: 每个浏览器预创建的备用上下文数量(0 = 按需创建)
+        context_options: 创建 BrowserContext 时的参数
+    """
+
+    def __init__(
+        self,
+        launcher: Callable[[], Awaitable[Any]],
+        size: int = 1,
+        max_contexts_per_browser: int = 50,
+        prewarm_contexts: int = 0,
+        context_options: Optional[dict] = None,
+    ):
+        self.launcher = launcher
+        self.size = max(1, size)
+        self.max_contexts_per_browser = max(0, max_contexts_per_browser)
+        self.prewarm_contexts = max(0, prewarm_contexts)
+        self.context_options = context_options or {}
+
+        self._slots: list[PooledBrowser] = []
+        self._draining: list[PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._refill_tasks: set[asyncio.Task] = set()
+        self._next_index = 0
+        self._closed = False
+
+        # 统计
+        self._launch_ms: deque = deque(maxlen=200)
+        self._acquire_ms: deque = deque(maxlen=500)
+        self.launches = 0
+        self.recycles = 0
+        self.crashes = 0
+        self.contexts_served = 0
+        self.warm_hits = 0
+
+    async def start(self) -> None:
+        """预热浏览器"""
+        async with self._lock:
+            await self._ensure_slots()
+            slots = list(self._slots)
+        for slot in slots:
+            self._schedule_refill(slot)
+        logger.info(
+            f"浏览器池已就绪: {len(slots)} 个浏览器, 每个最多 {self.max_contexts_per_browser or '不限'} 个上下文, "
+            f"预创建上下文 {self.prewarm_contexts} 个"
+        )
+
+    async def acquire(self):
+        """获取一个全新的上下文，返回 (context, slot)，用完后必须调用 release"""
+        if self._closed:
+            raise RuntimeError("浏览器池已关闭")
+        start = time.perf_counter()
+        async with self._lock:
+            await self._ensure_slots()
+            slot = min(self._slots, key=lambda s: (s.active, s.contexts_served))
+            context = None
+            if slot.warm_contexts:
+                context = slot.warm_contexts.pop()
+                self.warm_hits += 1
+            slot.contexts_served += 1
+            slot.active += 1
+            self.contexts_served += 1
+            if self.max_contexts_per_browser and slot.contexts_served >= self.max_contexts_per_browser:
+                # 达到回收阈值：不再分配新上下文，进行中的用例结束后关闭
+                self._retire(slot)
+
+        try:
+            if context is None:
+                context = await slot.browser.new_context(**self.context_options)
+        except Exception:
+            slot.active -= 1
+            if not slot.browser.is_connected():
+                slot.crashed = True
+            await self._maybe_close_drained(slot)
+            raise
+
+        self._acquire_ms.append((time.perf_counter() - start) * 1000)
+        self._schedule_refill(slot)
+        return context, slot
+
+    async def release(self, context, slot: PooledBrowser) -> None:
+        """关闭上下文，并按需回收浏览器"""
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"关闭浏览器上下文失败(忽略): {e}")
+        slot.active -= 1
+        if not slot.healthy and slot in self._slots:
+            async with self._lock:
+                if slot in self._slots:
+                    self.crashes += 1
+                    slot.crashed = True
+                    logger.warning(f"浏览器 #{slot.index} 已断开，将重新启动")
+                    self._retire(slot)
+        await self._maybe_close_drained(slot)
+
+    @asynccontextmanager
+    async def context(self):
+        """上下文管理器形式的 acquire/release"""
+        context, slot = await self.acquire()
+        try:
+            yield context
+        finally:
+            await self.release(context, slot)
+
+    async def close(self) -> None:
+        """关闭池中所有浏览器"""
+        self._closed = True
+        for task in list(self._refill_tasks):
+            task.cancel()
+        async with self._lock:
+            slots = self._slots + self._draining
+            self._slots = []
+            self._draining = []
+        for slot in slots:
+            slot.retiring = True
+            await self._close_browser(slot)
+        if slots:
+            logger.info(f"浏览器池已关闭: {self.stats()}")
+
+    def stats(self) -> dict:
+        """浏览器启动/上下文获取耗时统计"""
+        return {
+            'browsers': len(self._slots),
+            'draining': len(self._draining),
+            'active_contexts': sum(s.active for s in self._slots + self._draining),
+            'launches': self.launches,
+            'recycles': self.recycles,
+            'crashes': self.crashes,
+            'contexts_served': self.contexts_served,
+            'warm_hits': self.warm_hits,
+            'launch': _latency_summary(self._launch_ms),
+            'acquire': _latency_summary(self._acquire_ms),
+        }
+
+    async def _ensure_slots(self) -> None:
+        """剔除已崩溃的浏览器并补齐到 size 个（需持有锁）"""
+        for slot in list(self._slots):
+            if not slot.healthy:
+                self.crashes += 1
+                slot.crashed = True
+                logger.warning(f"浏览器 #{slot.index} 健康检查失败，将重新启动")
+                self._retire(slot)
+                await self._maybe_close_drained(slot)
+        while len(self._slots) < self.size:
+            self._slots.append(await self._launch())
+
+    async def _launch(self) -> PooledBrowser:
+        start = time.perf_counter()
+        browser = await self.launcher()
+        elapsed = (time.perf_counter() - start) * 1000
+        self._launch_ms.append(elapsed)
+        self.launches += 1
+        self._next_index += 1
+        logger.info(f"浏览器 #{self._next_index} 已启动, 耗时 {elapsed:.0f}ms")
+        return PooledBrowser(browser, self._next_index)
+
+    def _retire(self, slot: PooledBrowser) -> None:
+        if slot in self._slots:
+            self._slots.remove(slot)
+            self._draining.append(slot)
+        slot.retiring = True
+
+    async def _maybe_close_drained(self, slot: PooledBrowser) -> None:
+        if slot.retiring and slot.active <= 0 and slot in self._draining:
+            self._draining.remove(slot)
+            if not slot.crashed:
+                self.recycles += 1
+                logger.info(f"浏览器 #{slot.index} 已服务 {slot.contexts_served} 个上下文，回收重启")
+            await self._close_browser(slot)
+
+    async def _close_browser(self, slot: PooledBrowser) -> None:
+        for context in slot.warm_contexts:
+            try:
+                await context.close()
+            except Exception:
+                pass
+        slot.warm_contexts = []
+        try:
+            await slot.browser.close()
+        except Exception as e:
+            logger.debug(f"关闭浏览器 #{slot.index} 失败(忽略): {e}")
+
+    def _schedule_refill(self, slot: PooledBrowser) -> None:
+        if not self.prewarm_contexts or self._closed or slot.refilling:
+            return
+        slot.refilling = True
+        task = asyncio.create_task(self._refill(slot))
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill(self, slot: PooledBrowser) -> None:
+        """为浏览器补齐预创建的上下文（不超过回收阈值）"""
+        try:
+            await self._fill_warm_contexts(slot)
+        finally:
+            slot.refilling = False
+
+    async def _fill_warm_contexts(self, slot: PooledBrowser) -> None:
+        while (
+            not self._closed
+            and not slot.retiring
+            and slot.healthy
+            and len(slot.warm_contexts) < self.prewarm_contexts
+            and (
+                not self.max_contexts_per_browser
+                or slot.contexts_served + len(slot.warm_contexts) < self.max_contexts_per_browser
+            )
+        ):
+            try:
+                context = await slot.browser.new_context(**self.context_options)
+            except Exception as e:
+                logger.debug(f"预创建浏览器上下文失败: {e}")
+                return
+            if slot.retiring or self._closed:
+                await context.close()
+                return
+            slot.warm_contexts.append(context)
@@ -3,9 +3,11 @@ UI自动化执行器 - 任务消费者
 """
 
 import asyncio
+import json
 import logging
 import os
 import time
+import uuid
 from typing import Optional, Any
 import httpx
 
@@ -17,13 +19,24 @@ from websocket_client import WebSocketClient
 from executor import (
     PlaywrightExecutor, StepConfig, PageStepConfig, TestCaseConfig
 )
-from data_processor import reset_data_processor, DataProcessor
+from data_processor import DataProcessor
+from artifact_uploader import ArtifactUploader, Artifact, SCREENSHOT, TRACE
+from task_lanes import (
+    LaneScheduler, INTERACTIVE, BATCH, current_cancel_token, current_task_user
+)
 
 logger = logging.getLogger('actuator')
 
 
 class TaskConsumer:
     """任务消费者 - 处理从服务器接收的执行任务"""
+
+    # 批量执行时每次拉取执行包的用例数
+    BUNDLE_CHUNK_SIZE = 50
+    # ETag 缓存的最大条目数
+    ETAG_CACHE_SIZE = 64
+    # 每次拉取定位统计的元素数
+    LOCATOR_STATS_CHUNK_SIZE = 500
     
     def __init__(self, ws_client: WebSocketClient, api_base_url: str, 
                  config: Any = None,
@@ -34,6 +47,10 @@ class TaskConsumer:
         self.api_password = api_password
         self._api_token: Optional[str] = None
         self.config = config
+        # 请求路径 -> (ETag, 数据)
+        self._etag_cache: dict[str, tuple[str, Any]] = {}
+        # 项目ID -> (公共数据指纹, 数据处理器)
+        self._data_processors: dict[Any, tuple[str, DataProcessor]] = {}
         
         # 从配置创建执行器
         executor_config = {}
@@ -59,11 +76,45 @@ class TaskConsumer:
                 'retry_count': getattr(config, 'retry_count', 0),
                 'step_interval': getattr(config, 'step_interval', 0),
                 'tail_wait_ms': getattr(config, 'tail_wait_ms', 1000),
+                # 浏览器池配置
+                'pool_enabled': getattr(config, 'pool_enabled', True),
+                'pool_size': getattr(config, 'pool_size', 1),
+                'pool_max_contexts': getattr(config, 'pool_max_contexts', 50),
+                'pool_prewarm_contexts': getattr(config, 'pool_prewarm_contexts', 1),
+                # 自适应等待配置
+                'adaptive_wait': getattr(config, 'wait_adaptive', True),
+                'wait_network_quiet_ms': getattr(config, 'wait_network_quiet_ms', 300),
+                'wait_dom_stable_ms': getattr(config, 'wait_dom_stable_ms', 150),
+                'wait_settle_timeout_ms': getattr(config, 'wait_settle_timeout_ms', 5000),
+                'wait_navigation_min_ms': getattr(config, 'wait_navigation_min_ms', 500),
+                'wait_navigation_max_ms': getattr(config, 'wait_navigation_max_ms', 10000),
+                'locator_probe_timeout_ms': getattr(config, 'locator_probe_timeout_ms', 2000),
             }
         self.executor = PlaywrightExecutor(**executor_config)
-        self.task_queue: asyncio.Queue[QueueModel] = asyncio.Queue()
+        # 分道调度：控制消息 / 交互式调试 / 批量执行互不阻塞
+        self.scheduler = LaneScheduler(
+            self._route_task,
+            lane_limits={
+                INTERACTIVE: getattr(config, 'interactive_concurrency', 1) if config else 1,
+                BATCH: getattr(config, 'batch_concurrency', 1) if config else 1,
+            },
+            on_change=self._report_capacity,
+        )
+        # 后台产物上传（共享连接、并发队列、压缩与去重）
+        self.uploader = ArtifactUploader(
+            self.api_base_url,
+            self._get_upload_token,
+            concurrency=getattr(config, 'upload_concurrency', 4) if config else 4,
+            batch_size=getattr(config, 'upload_batch_size', 10) if config else 10,
+            image_format=getattr(config, 'upload_image_format', 'webp') if config else 'webp',
+            image_quality=getattr(config, 'upload_image_quality', 80) if config else 80,
+            dedup=getattr(config, 'upload_dedup', True) if config else True,
+        )
+        self._artifact_tasks: set[asyncio.Task] = set()
+        # 批量分片进度：batch_id -> {'started': 已开始的用例, 'revoked': 已撤回的用例, 'shards': 执行中的分片数}
+        self._batch_progress: dict[Any, dict] = {}
+        self.ws_client.set_info_provider(lambda: {'capacity': self.scheduler.capacity()})
         self._stop_event = asyncio.Event()
-        self._current_user: Optional[str] = None
         self.is_open: bool = True
 
         # 启动时清理过期文件（超过7天）
@@ -75,7 +126,6 @@ class TaskConsumer:
 
     def _cleanup_expired_files(self, screenshot_dir: str, trace_dir: str, max_age_days: int = 7):
         """清理超过指定天数的本地临时文件"""
-        import os
         from pathlib import Path
 
         now = time.time()
@@ -155,9 +205,47 @@ class TaskConsumer:
             logger.error(f"API请求异常: {e}")
             return None
     
+    async def _api_get_cached(self, path: str) -> Optional[Any]:
+        """带 ETag 缓存的API GET请求，内容未变化时服务端返回 304，直接复用本地数据"""
+        token = await self._get_api_token()
+        if not token:
+            return None
+
+        headers = {"Authorization": f"Bearer {token}"}
+        cached = self._etag_cache.get(path)
+        if cached:
+            headers["If-None-Match"] = cached[0]
+
+        url = f"{self.api_base_url}{path}"
+        try:
+            async with httpx.AsyncClient() as client:
+                response = await client.get(url, headers=headers)
+            if response.status_code == 304 and cached:
+                logger.debug(f"API 内容未变化，使用缓存: {path}")
+                return cached[1]
+            if response.status_code == 200:
+                data = response.json()
+                if data.get('status') == 'success' and 'data' in data:
+                    data = data['data']
+                etag = response.headers.get('ETag')
+                if etag:
+                    self._etag_cache.pop(path, None)
+                    self._etag_cache[path] = (etag, data)
+                    while len(self._etag_cache) > self.ETAG_CACHE_SIZE:
+                        self._etag_cache.pop(next(iter(self._etag_cache)))
+                return data
+            if response.status_code == 401:
+                # Token过期，重新获取
+                self._api_token = None
+                return await self._api_get_cached(path)
+            logger.error(f"API请求失败: {response.status_code} - {path}")
+            return None
+        except Exception as e:
+            logger.error(f"API请求异常: {e}")
+            return None
+
     async def _encode_screenshot_base64(self, file_path: str) -> Optional[str]:
         """将截图文件编码为 Base64 数据 URL"""
-        import os
         import base64
         
         # 处理相对路径
@@ -177,113 +265,65 @@ class TaskConsumer:
             logger.warning(f"截图编码失败: {e}")
             return None
     
-    async def _upload_screenshot(self, local_path: str) -> Optional[str]:
-        """通过 HTTP 上传截图到服务端，返回服务端存储路径
-
-        替代 Base64 编码方式，减少数据传输量和内存占用
-        """
-        if not local_path or not os.path.exists(local_path):
-            logger.warning(f"截图文件不存在: {local_path}")
-            return None
-            
-        token = await self._get_api_token()
-        if not token:
-            logger.error("无法获取 API Token，跳过截图上传")
-            return None
-            
-        url = f"{self.api_base_url}/api/ui-automation/screenshots/upload/"
-        try:
-            async with httpx.AsyncClient() as client:
-                with open(local_path, 'rb') as f:
-                    files = {'file': f}
-                    response = await client.post(
-                        url,
-                        headers={"Authorization": f"Bearer {token}"},
-                        files=files,
-                        timeout=30.0
-                    )
-                    if response.status_code == 201:
-                        data = response.json()
-                        server_url = data.get('url')
-                        logger.debug(f"截图上传成功: {server_url}")
-                        return server_url
-                    else:
-                        logger.error(f"截图上传失败: {response.status_code}")
-                        return None
-        except Exception as e:
-            logger.error(f"截图上传异常: {e}")
-            return None
-    
-    async def _process_result_screenshots(self, result: CaseResultModel) -> CaseResultModel:
-        """处理结果中的截图，通过 HTTP 上传到服务端，返回存储路径"""
-        import os
-        for step in result.steps:
+    async def _get_upload_token(self, refresh: bool = False) -> Optional[str]:
+        """产物上传使用的 Token，refresh=True 时重新获取"""
+        if refresh:
+            self._api_token = None
+        return await self._get_api_token()
+
+    def _detach_artifacts(self, result: CaseResultModel) -> list[Artifact]:
+        """取出结果中的本地截图/Trace，结果先不带产物地址发送"""
+        artifacts = []
+        for index, step in enumerate(result.steps):
             if step.screenshot:
-                local_path = step.screenshot
-                server_url = await self._upload_screenshot(local_path)
-                if server_url:
-                    step.screenshot = server_url
-                    # 清理本地截图文件
-                    try:
-                        abs_path = os.path.abspath(local_path) if local_path.startswith('./') else local_path
-                        if os.path.exists(abs_path):
-                            os.remove(abs_path)
-                    except Exception:
-                        pass
-                else:
-                    step.screenshot = None
-        return result
-    
-    async def _upload_trace_file(self, trace_path: str) -> Optional[str]:
-        """上传 Trace 文件到服务器，成功后清理本地文件
-
-        Returns:
-            服务器返回的相对路径（用于存储到数据库）
-        """
-        import os
-
-        if not trace_path or not os.path.exists(trace_path):
-            logger.warning(f"Trace 文件不存在: {trace_path}")
-            return None
-
-        token = await self._get_api_token()
-        if not token:
-            logger.error("无法获取 API Token，跳过 Trace 上传")
-            return None
+                artifacts.append(Artifact(key=index, path=step.screenshot, kind=SCREENSHOT))
+                step.screenshot = None
+        if result.trace_path:
+            artifacts.append(Artifact(key='trace', path=result.trace_path, kind=TRACE))
+            result.trace_path = None
+        return artifacts
+
+    async def _send_case_result(self, result: CaseResultModel, extra: dict) -> None:
+        """立即发送用例结果，截图/Trace 在后台上传完成后再回填地址"""
+        result.result_id = uuid.uuid4().hex
+        artifacts = self._detach_artifacts(result)
+        result_data = result.model_dump()
+        result_data.update({key: value for key, value in extra.items() if value})
+        await self.ws_client.send_result(
+            UiSocketEnum.CASE_RESULT,
+            result_data,
+            self._current_user
+        )
+        if artifacts:
+            future = await self.uploader.submit(artifacts)
+            task = asyncio.create_task(self._patch_case_artifacts(result, future))
+            self._artifact_tasks.add(task)
+            task.add_done_callback(self._artifact_tasks.discard)
+
+    async def _patch_case_artifacts(self, result: CaseResultModel, future: asyncio.Future) -> None:
+        uploaded = await future
+        patch = {
+            'result_id': result.result_id,
+            'case_id': result.case_id,
+            'step_screenshots': {
+                str(key): url for key, url in uploaded.items() if key != 'trace' and url
+            },
+        }
+        if uploaded.get('trace'):
+            patch['trace_path'] = uploaded['trace']
+        if not patch['step_screenshots'] and 'trace_path' not in patch:
+            return
+        await self.ws_client.send_result(
+            UiSocketEnum.CASE_ARTIFACTS,
+            patch,
+            self._current_user
+        )
+        logger.debug(f"用例 {result.case_id} 产物地址已回填")
 
-        url = f"{self.api_base_url}/api/ui-automation/traces/upload/"
-        server_path = None
-        try:
-            async with httpx.AsyncClient() as client:
-                with open(trace_path, 'rb') as f:
-                    files = {'file': (os.path.basename(trace_path), f, 'application/zip')}
-                    response = await client.post(
-                        url,
-                        headers={"Authorization": f"Bearer {token}"},
-                        files=files,
-                        timeout=60.0  # Trace 文件可能较大
-                    )
-                    if response.status_code == 201:
-                        resp_data = response.json()
-                        inner_data = resp_data.get('data', resp_data)
-                        server_path = inner_data.get('path')
-                        logger.info(f"Trace 上传成功: {server_path}")
-                    else:
-                        logger.error(f"Trace 上传失败: {response.status_code}")
-                        return None
-        except Exception as e:
-            logger.error(f"Trace 上传异常: {e}")
-            return None
-        
-        # 上传成功后清理本地文件（必须在 with 块外面，确保文件句柄已关闭）
-        if server_path:
-            try:
-                os.remove(trace_path)
-                logger.debug(f"已清理本地 Trace: {trace_path}")
-            except Exception as e:
-                logger.warning(f"清理 Trace 失败: {e}")
-        
-        return server_path
+    @property
+    def _current_user(self) -> Optional[str]:
+        """当前任务的发起用户（各通道并发执行，按任务上下文区分）"""
+        return current_task_user()
 
     async def handle_message(self, socket_data: SocketDataModel):
         """处理接收到的消息"""
@@ -295,35 +335,25 @@ class TaskConsumer:
             logger.debug(f"收到通知消息: {socket_data.msg}")
             return
         
-        # 记录发起用户
-        self._current_user = socket_data.user
-        
-        # 添加到任务队列
-        await self.add_task(socket_data.data)
+        # 添加到任务队列（记录发起用户）
+        await self.add_task(socket_data.data, socket_data.user)
     
-    async def add_task(self, task: QueueModel):
-        """添加任务到队列"""
-        await self.task_queue.put(task)
-        logger.info(f"任务已入队: {task.func_name}")
+    async def add_task(self, task: QueueModel, user: Optional[str] = None):
+        """添加任务到对应执行通道"""
+        self.scheduler.submit(task, user)
+
+    async def _report_capacity(self):
+        """向服务端上报各执行通道的实时容量"""
+        if not self.ws_client.connected:
+            return
+        await self.ws_client.send_result(
+            UiSocketEnum.ACTUATOR_CAPACITY,
+            {'is_open': self.is_open, 'capacity': self.scheduler.capacity()}
+        )
     
     async def process_tasks(self):
-        """处理任务队列"""
-        while not self._stop_event.is_set():
-            try:
-                # 等待任务
-                task = await asyncio.wait_for(
-                    self.task_queue.get(),
-                    timeout=1.0
-                )
-                
-                # 路由任务到对应处理器
-                await self._route_task(task)
-                self.task_queue.task_done()
-                
-            except asyncio.TimeoutError:
-                continue
-            except Exception as e:
-                logger.error(f"处理任务错误: {e}", exc_info=True)
+        """处理任务队列（各通道独立分发，直到消费者停止）"""
+        await self.scheduler.run(self._stop_event)
     
     async def _route_task(self, task: QueueModel):
         """路由任务到对应处理器"""
@@ -332,6 +362,7 @@ class TaskConsumer:
             UiSocketEnum.TEST_CASE: self.execute_test_case,
             UiSocketEnum.TEST_CASE_BATCH: self.execute_batch,
             UiSocketEnum.STOP_EXECUTION: self.stop_execution,
+            UiSocketEnum.BATCH_REVOKE: self.handle_batch_revoke,
             UiSocketEnum.SET_ACTUATOR_STATE: self.handle_set_actuator_state,
         }
         
@@ -387,33 +418,30 @@ class TaskConsumer:
         
         # 构建配置，传入 base_url 和数据处理器
         config = self._build_page_step_config(page_step_data, base_url, data_processor)
+        await self._load_locator_stats([config])
         
         # 执行（使用同一浏览器会话）
         logger.info(f"开始执行页面步骤: {config.page_name}")
         
         start_time = time.time()
-        step_results = await self.executor.execute_page_step(config)
+        step_results = await self.executor.execute_page_step(
+            config, cancel_token=current_cancel_token()
+        )
         
         # 统计结果
         passed_steps = sum(1 for r in step_results if r.status == 'success')
         failed_steps = len(step_results) - passed_steps
         
-        # 处理截图（通过 HTTP 上传到服务端，返回存储路径，减少 WebSocket 数据量）
-        import os
-        for result in step_results:
-            if result.screenshot:
-                local_path = result.screenshot
-                server_url = await self._upload_screenshot(local_path)
-                if server_url:
-                    result.screenshot = server_url
-                    try:
-                        abs_path = os.path.abspath(local_path) if local_path.startswith('./') else local_path
-                        if os.path.exists(abs_path):
-                            os.remove(abs_path)
-                    except Exception:
-                        pass
-                else:
-                    result.screenshot = None
+        # 处理截图（通过 HTTP 并发上传到服务端，返回存储路径，减少 WebSocket 数据量）
+        artifacts = [
+            Artifact(key=index, path=result.screenshot)
+            for index, result in enumerate(step_results) if result.screenshot
+        ]
+        if artifacts:
+            uploaded = await self.uploader.upload(artifacts)
+            for index, result in enumerate(step_results):
+                if result.screenshot:
+                    result.screenshot = uploaded.get(index)
 
         # 发送页面步骤执行汇总结果（一次性发送，减少 WebSocket 往返）
         summary_result = {
@@ -473,38 +501,21 @@ class TaskConsumer:
 
         # 构建配置（传入数据处理器进行变量替换）
         config = self._build_test_case_config(case_data, env_config, data_processor)
+        await self._load_locator_stats([config])
 
         # 执行
         logger.info(f"开始执行用例: {config.case_name}")
-        result = await self.executor.execute_test_case(config)
-
-        # 上传截图并替换路径
-        result = await self._process_result_screenshots(result)
-
-        # 上传 Trace 文件并替换路径
-        if result.trace_path:
-            server_trace_path = await self._upload_trace_file(result.trace_path)
-            if server_trace_path:
-                result.trace_path = server_trace_path
-            else:
-                result.trace_path = None  # 上传失败则清空
-
-        # 发送用例结果（包含 batch_id 和执行人信息）
-        result_data = result.model_dump()
-        if batch_id:
-            result_data['batch_id'] = batch_id
-        # 添加执行人信息
-        if executor_id:
-            result_data['executor_id'] = executor_id
-        if executor_name:
-            result_data['executor_name'] = executor_name
-            
-        await self.ws_client.send_result(
-            UiSocketEnum.CASE_RESULT,
-            result_data,
-            self._current_user
+        result = await self.executor.execute_test_case(
+            config, cancel_token=current_cancel_token()
         )
 
+        # 发送用例结果（包含 batch_id 和执行人信息），截图/Trace 后台上传后回填
+        await self._send_case_result(result, {
+            'batch_id': batch_id,
+            'executor_id': executor_id,
+            'executor_name': executor_name,
+        })
+
         logger.info(f"用例执行完成: {result.status}")
     
     async def execute_batch(self, args: dict):
@@ -512,6 +523,7 @@ class TaskConsumer:
         case_ids = args.get('case_ids', [])
         env_config_id = args.get('env_config_id')
         batch_id = args.get('batch_id')
+        shard_id = args.get('shard_id')
         executor_id = args.get('executor_id')
         executor_name = args.get('executor_name')
         # 从配置获取并发数
@@ -522,12 +534,130 @@ class TaskConsumer:
 
         logger.info(f"开始批量执行 {len(case_ids)} 个用例, 并发数: {max_concurrent}")
 
-        # 预先获取所有用例数据并构建配置
-        configs = []
-        config_batch_map = {}  # case_id -> batch_id 映射
+        # 分段拉取执行包并构建配置，首段就绪即开始执行
+        cancel_token = current_cancel_token()
+        configs = self._prepare_batch_configs(case_ids, env_config_id, cancel_token)
+        progress = self._batch_progress_for(batch_id)
+        progress['shards'] += 1
+
+        def should_run(config) -> bool:
+            # 已被服务端撤回（转交其他执行器）的用例不再执行
+            if config.case_id in progress['revoked']:
+                logger.info(f"用例 {config.case_id} 已撤回，跳过")
+                return False
+            progress['started'].add(config.case_id)
+            return True
+
+        # 定义结果回调 - 每个用例完成后立即发送结果
+        async def on_result(result):
+            # 立即发送结果，截图/Trace 后台上传后回填
+            await self._send_case_result(result, {
+                'batch_id': batch_id,
+                'executor_id': executor_id,
+                'executor_name': executor_name,
+            })
+            logger.info(f"用例 {result.case_id} 执行完成: {result.status}")
+
+        # 并发执行
+        try:
+            results = await self.executor.execute_batch_concurrent(
+                configs,
+                max_concurrent=max_concurrent,
+                on_result=on_result,
+                cancel_token=cancel_token,
+                should_run=should_run
+            )
+        finally:
+            progress['shards'] -= 1
+            if progress['shards'] <= 0:
+                self._batch_progress.pop(batch_id, None)
+            if shard_id:
+                # 通知服务端分片结束，调度器据此回收未回报结果的用例并派发下一分片
+                await self.ws_client.send_result(
+                    UiSocketEnum.BATCH_SHARD_DONE,
+                    {'batch_id': batch_id, 'shard_id': shard_id},
+                    self._current_user
+                )
+
+        if not results:
+            logger.warning("没有可执行的用例")
+            return
+        logger.info("批量执行完成")
+
+    def _batch_progress_for(self, batch_id) -> dict:
+        return self._batch_progress.setdefault(batch_id, {'started': set(), 'revoked': set(), 'shards': 0})
+
+    async def handle_batch_revoke(self, args: dict):
+        """撤回分片中尚未开始的用例（服务端工作窃取），回应实际撤回的用例"""
+        batch_id = args.get('batch_id')
+        progress = self._batch_progress_for(batch_id)
+        revoked = [case_id for case_id in args.get('case_ids', []) if case_id not in progress['started']]
+        progress['revoked'].update(revoked)
+        logger.info(f"批次 {batch_id} 撤回 {len(revoked)} 个未开始的用例")
+        await self.ws_client.send_result(
+            UiSocketEnum.BATCH_REVOKED,
+            {'batch_id': batch_id, 'case_ids': revoked},
+            self._current_user
+        )
+
+    def _is_batch_stopped(self, cancel_token) -> bool:
+        return self._stop_event.is_set() or bool(cancel_token and cancel_token.is_set())
+
+    async def _prepare_batch_configs(self, case_ids: list, env_config_id, cancel_token):
+        """分段拉取执行包并逐个产出用例配置
 
+        每段用例的定义、环境配置与公共数据一次请求获取；当前段产出配置（执行）时已预取下一段。
+        服务端不支持执行包时回退为逐个用例获取。
+        """
+        chunks = [
+            case_ids[i:i + self.BUNDLE_CHUNK_SIZE]
+            for i in range(0, len(case_ids), self.BUNDLE_CHUNK_SIZE)
+        ]
+        next_fetch = asyncio.create_task(self._fetch_execution_bundle(chunks[0], env_config_id))
+        try:
+            for index, chunk in enumerate(chunks):
+                bundle = await next_fetch
+                next_fetch = None
+                if index + 1 < len(chunks):
+                    next_fetch = asyncio.create_task(
+                        self._fetch_execution_bundle(chunks[index + 1], env_config_id)
+                    )
+                if self._is_batch_stopped(cancel_token):
+                    logger.info("批量执行准备阶段被停止")
+                    return
+
+                if bundle is None:
+                    logger.warning("获取执行包失败，逐个获取用例数据")
+                    async for config in self._prepare_configs_individually(chunk, env_config_id, cancel_token):
+                        yield config
+                    continue
+
+                for case_id in bundle.get('missing', []):
+                    logger.warning(f"用例 {case_id} 不存在，跳过")
+                projects = bundle.get('projects') or {}
+                configs = []
+                for case_data in bundle.get('cases', []):
+                    project_id = case_data.get('project')
+                    project = projects.get(str(project_id)) or {}
+                    if env_config_id:
+                        env_config = bundle.get('env_config')
+                    else:
+                        env_config = project.get('default_env_config')
+                    data_processor = self._get_data_processor(project_id, project.get('public_data') or [])
+                    configs.append(self._build_test_case_config(case_data, env_config, data_processor))
+                await self._load_locator_stats(configs)
+                for config in configs:
+                    yield config
+        finally:
+            if next_fetch is not None and not next_fetch.done():
+                next_fetch.cancel()
+
+    async def _prepare_configs_individually(self, case_ids: list, env_config_id, cancel_token):
+        """逐个获取用例数据并产出配置（兼容未提供执行包接口的服务端）"""
+        env_configs = {}
+        data_processors = {}
         for case_id in case_ids:
-            if self._stop_event.is_set():
+            if self._is_batch_stopped(cancel_token):
                 logger.info("批量执行准备阶段被停止")
                 return
 
@@ -536,77 +666,62 @@ class TaskConsumer:
                 logger.warning(f"用例 {case_id} 数据获取失败，跳过")
                 continue
 
-            # 获取环境配置
-            env_config = None
+            # 获取环境配置（同一批次内按项目复用）
             project_id = case_data.get('project')
-            if env_config_id:
-                env_config = await self._fetch_env_config(env_config_id)
-            elif project_id:
-                env_config = await self._fetch_default_env_config(project_id)
-
-            # 初始化数据处理器
-            data_processor = await self._init_data_processor(project_id)
-
-            # 构建配置
-            config = self._build_test_case_config(case_data, env_config, data_processor)
-            configs.append(config)
-            config_batch_map[config.case_id] = batch_id
-
-        if not configs:
-            logger.warning("没有可执行的用例")
-            return
-
-        # 定义结果回调 - 每个用例完成后立即发送结果
-        async def on_result(result):
-            # 上传截图
-            result = await self._process_result_screenshots(result)
-
-            # 上传 Trace
-            if result.trace_path:
-                server_trace_path = await self._upload_trace_file(result.trace_path)
-                result.trace_path = server_trace_path if server_trace_path else None
-
-            # 发送结果
-            result_data = result.model_dump()
-            if batch_id:
-                result_data['batch_id'] = batch_id
-            # 添加执行人信息
-            if executor_id:
-                result_data['executor_id'] = executor_id
-            if executor_name:
-                result_data['executor_name'] = executor_name
-            await self.ws_client.send_result(
-                UiSocketEnum.CASE_RESULT,
-                result_data,
-                self._current_user
-            )
-            logger.info(f"用例 {result.case_id} 执行完成: {result.status}")
+            env_key = env_config_id or f"default_{project_id}"
+            if env_key not in env_configs:
+                if env_config_id:
+                    env_configs[env_key] = await self._fetch_env_config(env_config_id)
+                elif project_id:
+                    env_configs[env_key] = await self._fetch_default_env_config(project_id)
+                else:
+                    env_configs[env_key] = None
 
-        # 并发执行
-        await self.executor.execute_batch_concurrent(
-            configs,
-            max_concurrent=max_concurrent,
-            on_result=on_result
-        )
+            if project_id not in data_processors:
+                data_processors[project_id] = await self._init_data_processor(project_id)
 
-        logger.info("批量执行完成")
+            yield self._build_test_case_config(case_data, env_configs[env_key], data_processors[project_id])
     
     async def stop_execution(self, args: dict):
         """停止执行"""
         logger.info("收到停止执行请求")
-        self.executor.stop()
-        # 清空任务队列
-        while not self.task_queue.empty():
-            try:
-                self.task_queue.get_nowait()
-                self.task_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
+        # 取消调试与批量通道中运行/排队的任务，控制通道不受影响
+        self.scheduler.cancel(INTERACTIVE, BATCH)
+        self._batch_progress.clear()
     
     async def _fetch_page_step(self, page_step_id: int) -> Optional[dict]:
         """从API获取页面步骤详情（含元素定位信息，用于执行）"""
         return await self._api_get(f"/api/ui-automation/page-steps/{page_step_id}/execute-data/")
     
+    async def _fetch_execution_bundle(self, case_ids: list, env_config_id=None) -> Optional[dict]:
+        """从API批量获取用例执行数据、环境配置与公共数据"""
+        path = f"/api/ui-automation/testcases/execution-bundle/?ids={','.join(str(i) for i in case_ids)}"
+        if env_config_id:
+            path += f"&env_config_id={env_config_id}"
+        result = await self._api_get_cached(path)
+        if isinstance(result, dict) and 'cases' in result:
+            return result
+        return None
+
+    async def _load_locator_stats(self, configs: list) -> None:
+        """拉取配置中涉及元素的定位统计，执行器据此调整定位尝试顺序与探测超时"""
+        element_ids = sorted({
+            step.element_id
+            for config in configs
+            for page_step in (config.page_steps if isinstance(config, TestCaseConfig) else [config])
+            for step in page_step.steps
+            if step.element_id
+        })
+        for i in range(0, len(element_ids), self.LOCATOR_STATS_CHUNK_SIZE):
+            chunk = element_ids[i:i + self.LOCATOR_STATS_CHUNK_SIZE]
+            rows = await self._api_get(f"/api/ui-automation/elements/locator-stats/?ids={','.join(map(str, chunk))}")
+            if isinstance(rows, list):
+                self.executor.locator_stats.load(rows)
+            else:
+                # 服务端不支持定位统计时仅使用本地记录
+                logger.debug("获取元素定位统计失败，使用本地记录")
+                return
+
     async def _fetch_test_case(self, case_id: int) -> Optional[dict]:
         """从API获取测试用例详情（含完整步骤详情）"""
         return await self._api_get(f"/api/ui-automation/testcases/{case_id}/execute-data/")
@@ -656,17 +771,26 @@ class TaskConsumer:
 
     async def _init_data_processor(self, project_id: int) -> DataProcessor:
         """初始化数据处理器，加载项目公共变量"""
-        data_processor = reset_data_processor()
-        
-        if project_id:
-            public_data = await self._fetch_public_data(project_id)
-            logger.info(f"已加载 {len(public_data)} 个公共变量")
-            if public_data:
-                data_processor.load_public_data(public_data)
-                logger.debug(f"变量缓存: {data_processor.get_all()}")
-        else:
+        if not project_id:
             logger.warning("project_id 为空，无法加载公共变量")
-        
+            return DataProcessor()
+
+        public_data = await self._fetch_public_data(project_id)
+        logger.info(f"已加载 {len(public_data)} 个公共变量")
+        return self._get_data_processor(project_id, public_data)
+
+    def _get_data_processor(self, project_id, public_data: list[dict]) -> DataProcessor:
+        """按项目复用数据处理器，公共数据未变化时不重复加载"""
+        fingerprint = json.dumps(public_data, sort_keys=True, ensure_ascii=False, default=str)
+        cached = self._data_processors.get(project_id)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        data_processor = DataProcessor()
+        if public_data:
+            data_processor.load_public_data(public_data)
+            logger.debug(f"变量缓存: {data_processor.get_all()}")
+        self._data_processors[project_id] = (fingerprint, data_processor)
         return data_processor
 
     def _build_page_step_config(self, data: dict, base_url: str = '', data_processor: Optional[DataProcessor] = None) -> PageStepConfig:
@@ -749,6 +873,7 @@ class TaskConsumer:
                 input_value=input_value,  # 输入值
                 description=detail.get('element_name', ''),  # 元素名称作为描述
                 wait_time=detail.get('wait_time', 0),
+                element_id=detail.get('element') or 0,
             ))
         
         # 页面URL处理：支持相对路径与 base_url 拼接
@@ -815,10 +940,19 @@ class TaskConsumer:
         
         # 启动任务处理协程
         process_task = asyncio.create_task(self.process_tasks())
+        # 预热浏览器池，首个用例无需等待浏览器启动
+        warm_up_task = asyncio.create_task(self.executor.warm_up())
         
-        # 启动WebSocket客户端
-        await self.ws_client.run()
-        
-        # 停止任务处理
-        self.stop()
-        await process_task
+        try:
+            # 启动WebSocket客户端
+            await self.ws_client.run()
+        finally:
+            # 停止任务处理
+            self.stop()
+            await process_task
+            await warm_up_task
+            await self.executor.shutdown()
+            # 等待已提交的产物上传并回填完成
+            if self._artifact_tasks:
+                await asyncio.gather(*self._artifact_tasks, return_exceptions=True)
+            await self.uploader.close()
@@ -7,15 +7,53 @@
 - 公共数据变量替换: ${{变量名}}
 - 嵌套变量替换: ${{var1}} -> value 包含 ${{var2}}
 - JSON 类型自动转换
+
+模板字符串首次使用时编译为片段列表（进程内缓存，所有用例/项目共享），
+渲染只做片段拼接；不含变量的字符串直接返回。
 """
 
 import json
 import re
 import logging
-from typing import Any, Optional, Union
+from functools import lru_cache
+from typing import Any, NamedTuple, Optional, Union
 
 logger = logging.getLogger('actuator')
 
+# 变量起始标记，不含该标记的字符串无需匹配正则
+VARIABLE_MARK = '${{'
+
+
+class CompiledTemplate(NamedTuple):
+    """编译后的模板
+
+    parts: 片段列表，字符串为字面量，(变量名, 原始占位符) 元组为变量
+    whole_var: 整个字符串（去除首尾空白）就是单个变量时的变量名，渲染时保留值的原始类型
+    """
+    parts: tuple
+    whole_var: Optional[str]
+
+
+@lru_cache(maxsize=8192)
+def compile_template(text: str) -> Optional[CompiledTemplate]:
+    """将模板字符串编译为片段列表，不含变量时返回 None"""
+    if VARIABLE_MARK not in text:
+        return None
+    parts = []
+    position = 0
+    for match in DataProcessor.VARIABLE_PATTERN.finditer(text):
+        if match.start() > position:
+            parts.append(text[position:match.start()])
+        parts.append((match.group(1).strip(), match.group(0)))
+        position = match.end()
+    if not parts:
+        return None
+    if position < len(text):
+        parts.append(text[position:])
+    variables = [part for part in parts if isinstance(part, tuple)]
+    whole_var = variables[0][0] if len(variables) == 1 and variables[0][1] == text.strip() else None
+    return CompiledTemplate(tuple(parts), whole_var)
+
 
 class DataProcessor:
     """变量数据处理器"""
@@ -25,10 +63,13 @@ class DataProcessor:
     
     def __init__(self):
         self._cache: dict[str, Any] = {}
+        # 字符串渲染结果（变量不变时同一模板结果相同），变量变化时清空
+        self._rendered: dict[tuple[str, int], Any] = {}
     
     def set_cache(self, key: str, value: Any) -> None:
         """设置缓存变量"""
         self._cache[key] = value
+        self._rendered.clear()
         logger.debug(f"设置变量: {key} = {value}")
     
     def get_cache(self, key: str, default: Any = None) -> Any:
@@ -42,6 +83,7 @@ class DataProcessor:
     def clear(self) -> None:
         """清空缓存"""
         self._cache.clear()
+        self._rendered.clear()
         logger.debug("已清空所有变量缓存")
     
     def load_public_data(self, public_data_list: list[dict]) -> None:
@@ -118,52 +160,58 @@ class DataProcessor:
             替换后的值。如果整个字符串就是一个变量且值为非字符串类型，
             则返回该类型的值；否则返回替换后的字符串
         """
-        if not text or not isinstance(text, str):
-            return text
-        
-        # 查找所有变量
-        matches = list(self.VARIABLE_PATTERN.finditer(text))
-        if not matches:
+        if not text or not isinstance(text, str) or VARIABLE_MARK not in text:
             return text
-        
+        key = (text, max_depth)
+        if key in self._rendered:
+            return self._rendered[key]
+        compiled = compile_template(text)
+        result = text if compiled is None else self._render(text, compiled, max_depth)
+        self._rendered[key] = result
+        return result
+
+    def _render(self, text: str, compiled: CompiledTemplate, max_depth: int) -> Any:
+        """按编译结果拼接片段"""
         # 如果整个字符串就是一个变量，返回原始类型的值
-        if len(matches) == 1 and matches[0].group(0) == text.strip():
-            var_name = matches[0].group(1).strip()
-            if var_name in self._cache:
-                value = self._cache[var_name]
-                # 如果值中还包含变量，继续替换
-                if isinstance(value, str) and self.VARIABLE_PATTERN.search(value):
-                    return self._replace_string(value, max_depth - 1)
-                return value
-            else:
-                logger.warning(f"变量 {var_name} 未定义，保持原样")
+        if compiled.whole_var is not None:
+            if compiled.whole_var not in self._cache:
+                logger.warning(f"变量 {compiled.whole_var} 未定义，保持原样")
                 return text
-        
+            value = self._cache[compiled.whole_var]
+            # 如果值中还包含变量，继续替换
+            if isinstance(value, str) and VARIABLE_MARK in value and self.VARIABLE_PATTERN.search(value):
+                return self._replace_string(value, max_depth - 1)
+            return value
+
         # 多个变量或变量嵌入在字符串中，全部转为字符串拼接
-        result = text
-        for match in reversed(matches):  # 从后往前替换，避免索引偏移
-            var_name = match.group(1).strip()
+        pieces = []
+        for part in compiled.parts:
+            if isinstance(part, str):
+                pieces.append(part)
+                continue
+            var_name, placeholder = part
             if var_name in self._cache:
                 var_value = self._cache[var_name]
                 # 转为字符串
                 if isinstance(var_value, (dict, list)):
-                    replacement = json.dumps(var_value, ensure_ascii=False)
+                    pieces.append(json.dumps(var_value, ensure_ascii=False))
                 else:
-                    replacement = str(var_value)
-                result = result[:match.start()] + replacement + result[match.end():]
+                    pieces.append(str(var_value))
             else:
                 logger.warning(f"变量 {var_name} 未定义，保持原样")
-        
+                pieces.append(placeholder)
+        result = ''.join(pieces)
+
         # 检查替换后是否还有变量
-        if self.VARIABLE_PATTERN.search(result) and max_depth > 1:
+        if max_depth > 1 and VARIABLE_MARK in result and self.VARIABLE_PATTERN.search(result):
             return self._replace_string(result, max_depth - 1)
-        
+
         return result
     
     def has_variable(self, value: Any) -> bool:
         """检查值中是否包含变量"""
         if isinstance(value, str):
-            return bool(self.VARIABLE_PATTERN.search(value))
+            return compile_template(value) is not None
         
         if isinstance(value, dict):
             return any(self.has_variable(v) for v in value.values())
@@ -178,8 +226,9 @@ class DataProcessor:
         variables: set[str] = set()
         
         if isinstance(value, str):
-            for match in self.VARIABLE_PATTERN.finditer(value):
-                variables.add(match.group(1).strip())
+            compiled = compile_template(value)
+            if compiled is not None:
+                variables.update(part[0] for part in compiled.parts if isinstance(part, tuple))
         
         elif isinstance(value, dict):
             for v in value.values():
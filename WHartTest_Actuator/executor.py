@@ -8,13 +8,16 @@ import logging
 import time
 import traceback
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, Callable, Optional, Union
 from dataclasses import dataclass, field
 from contextlib import asynccontextmanager
 
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright, expect
 
 from models import StepResultModel, CaseResultModel
+from browser_pool import BrowserPool
+from wait_strategy import AdaptiveWaiter, PageActivity, WaitBudget
+from locator_stats import LocatorStats
 
 logger = logging.getLogger('actuator')
 
@@ -38,6 +41,7 @@ class StepConfig:
     input_value: str = ''
     description: str = ''
     wait_time: float = 0
+    element_id: int = 0      # 操作的元素(用于定位统计, 0 = 未知)
 
     # 步骤详情(公共步骤)
     details: list['StepConfig'] = field(default_factory=list)
@@ -52,6 +56,14 @@ class PageStepConfig:
     steps: list[StepConfig] = field(default_factory=list)
 
 
+@dataclass
+class BrowserSession:
+    """一次浏览器会话"""
+    context: BrowserContext
+    page: Page
+    trace_path: Optional[str] = None
+
+
 @dataclass
 class TestCaseConfig:
     """测试用例配置"""
@@ -61,6 +73,16 @@ class TestCaseConfig:
     env_config: Optional[dict] = None
 
 
+async def _iter_configs(configs):
+    """统一遍历列表或异步迭代器"""
+    if isinstance(configs, list):
+        for config in configs:
+            yield config
+    else:
+        async for config in configs:
+            yield config
+
+
 class PlaywrightExecutor:
     """Python原生Playwright执行器"""
     
@@ -84,6 +106,20 @@ class PlaywrightExecutor:
         step_interval: int = 0,
         # 用例结束后浏览器额外等待(毫秒), 用于 trace 补抓最后帧
         tail_wait_ms: int = 1000,
+        # 常驻浏览器池(仅非持久化模式生效)
+        pool_enabled: bool = True,
+        pool_size: int = 1,
+        pool_max_contexts: int = 50,
+        pool_prewarm_contexts: int = 1,
+        # 自适应等待(以网络空闲/DOM 稳定代替固定等待)
+        adaptive_wait: bool = True,
+        wait_network_quiet_ms: int = 300,
+        wait_dom_stable_ms: int = 150,
+        wait_settle_timeout_ms: int = 5000,
+        wait_navigation_min_ms: int = 500,
+        wait_navigation_max_ms: int = 10000,
+        # 不可靠定位(最近失败/失败率高)后面还有候选时的探测超时(毫秒)
+        locator_probe_timeout_ms: int = 2000,
     ):
         self.browser_type = browser_type
         self.headless = headless
@@ -103,6 +139,22 @@ class PlaywrightExecutor:
         self.retry_count = retry_count
         self.step_interval = step_interval
         self.tail_wait_ms = tail_wait_ms
+        # 浏览器池配置: 持久化模式下上下文绑定用户数据目录，无法共享浏览器
+        self.pool_enabled = pool_enabled and not persistent
+        self.pool_size = pool_size
+        self.pool_max_contexts = pool_max_contexts
+        self.pool_prewarm_contexts = pool_prewarm_contexts
+        # 等待策略: 跨用例学习各页面的跳转耗时
+        self.waiter = AdaptiveWaiter(WaitBudget(
+            adaptive=adaptive_wait,
+            network_quiet_ms=wait_network_quiet_ms,
+            dom_stable_ms=wait_dom_stable_ms,
+            settle_timeout_ms=wait_settle_timeout_ms,
+            navigation_min_ms=wait_navigation_min_ms,
+            navigation_max_ms=wait_navigation_max_ms,
+        ))
+        # 元素定位统计: 决定定位尝试顺序与探测超时
+        self.locator_stats = LocatorStats(probe_timeout_ms=locator_probe_timeout_ms)
         
         self._playwright: Optional[Playwright] = None
         self._browser: Optional[Browser] = None
@@ -110,6 +162,10 @@ class PlaywrightExecutor:
         self._page: Optional[Page] = None
         self._stop_requested = False
         self._current_trace_path: Optional[str] = None
+        self._pool: Optional[BrowserPool] = None
+        self._pool_lock = asyncio.Lock()
+        # 非浏览器池模式下 init_browser 的浏览器/上下文为共享状态，会话需串行
+        self._session_lock = asyncio.Lock()
         
         Path(self.user_data_dir).mkdir(parents=True, exist_ok=True)
         Path(self.screenshot_dir).mkdir(parents=True, exist_ok=True)
@@ -142,6 +198,43 @@ class PlaywrightExecutor:
         self._page.set_default_timeout(self.action_timeout)
         logger.info(f"浏览器已初始化: {self.browser_type}, headless={self.headless}")
     
+    async def _launch_browser(self) -> Browser:
+        """启动一个独立的浏览器（非持久化模式）"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        browser_launcher = getattr(self._playwright, self.browser_type)
+        return await browser_launcher.launch(
+            headless=self.headless,
+            timeout=self.launch_timeout,
+        )
+
+    async def get_browser_pool(self) -> Optional[BrowserPool]:
+        """获取常驻浏览器池（未启用时返回 None），首次调用时预热"""
+        if not self.pool_enabled:
+            return None
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = BrowserPool(
+                    self._launch_browser,
+                    size=self.pool_size,
+                    max_contexts_per_browser=self.pool_max_contexts,
+                    prewarm_contexts=self.pool_prewarm_contexts,
+                )
+                await pool.start()
+                self._pool = pool
+        return self._pool
+
+    async def warm_up(self) -> None:
+        """预热浏览器池，失败时推迟到首次执行再启动"""
+        try:
+            await self.get_browser_pool()
+        except Exception as e:
+            logger.warning(f"浏览器池预热失败，将在执行用例时重试: {e}")
+
+    def get_pool_stats(self) -> Optional[dict]:
+        """浏览器池启动/获取耗时统计"""
+        return self._pool.stats() if self._pool else None
+
     async def close(self) -> None:
         """关闭浏览器"""
         if self._context:
@@ -151,19 +244,96 @@ class PlaywrightExecutor:
         if self._browser:
             await self._browser.close()
             self._browser = None
-        if self._playwright:
+        # 浏览器池与独立会话共用 Playwright 实例，池存活时不停止（非池模式的批量执行使用自己的驱动）
+        if self._playwright and self._pool is None:
             await self._playwright.stop()
             self._playwright = None
         logger.info("浏览器已关闭")
+
+    async def shutdown(self) -> None:
+        """关闭浏览器池及 Playwright（执行器退出时调用）"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+        await self.close()
+
+    @asynccontextmanager
+    async def open_session(self, trace_name: Optional[str] = None):
+        """打开浏览器会话
+
+        启用浏览器池时从池中取全新上下文（会话状态均为局部变量，可并发）；
+        否则启动独立浏览器/持久化上下文，该状态为执行器共享，同一时间只允许一个会话。
+
+        Args:
+            trace_name: trace 文件名前缀，不为空且启用 Trace 时记录 Trace
+
+        Yields:
+            BrowserSession: 会话结束后 trace_path 为 Trace 文件路径
+        """
+        pool = await self.get_browser_pool()
+        lock = self._session_lock if pool is None else None
+        if lock is not None:
+            await lock.acquire()
+        lease = None
+        try:
+            if pool is None:
+                await self.init_browser()
+                session = BrowserSession(self._context, self._page)
+            else:
+                lease = await pool.acquire()
+                context = lease[0]
+                page = await context.new_page()
+                page.set_default_timeout(self.action_timeout)
+                session = BrowserSession(context, page)
+
+            tracing = bool(trace_name) and self.trace_enabled
+            if tracing:
+                await session.context.tracing.start(
+                    screenshots=self.trace_screenshots,
+                    snapshots=self.trace_snapshots,
+                    sources=self.trace_sources,
+                )
+                logger.debug(f"Trace 已启动: screenshots={self.trace_screenshots}, snapshots={self.trace_snapshots}")
+
+            try:
+                yield session
+            finally:
+                if tracing:
+                    session.trace_path = await self._stop_trace(session, trace_name)
+        finally:
+            if lease is not None:
+                await pool.release(*lease)
+                logger.debug(f"浏览器池统计: {pool.stats()}")
+            elif pool is None:
+                await self.close()
+            if lock is not None:
+                lock.release()
+
+    async def _stop_trace(self, session: 'BrowserSession', trace_name: str) -> Optional[str]:
+        """停止 Trace 并保存，返回文件路径"""
+        # 停止前等 1 秒, 让 trace 多抓最后一帧截图(避免最后 1-2 秒画面缺失)
+        try:
+            if session.page and not session.page.is_closed():
+                logger.debug(f"Trace 停止前等待 {self.tail_wait_ms}ms, 以抓取最后帧")
+                await session.page.wait_for_timeout(self.tail_wait_ms)
+        except Exception as e:
+            logger.warning(f"Trace 尾部等待失败(忽略): {e}")
+
+        try:
+            timestamp = int(time.time() * 1000)
+            trace_path = f"{self.trace_dir}/{trace_name}_{timestamp}.zip"
+            await session.context.tracing.stop(path=trace_path)
+            logger.info(f"Trace 已保存: {trace_path}")
+            return trace_path
+        except Exception as e:
+            logger.error(f"保存 Trace 失败: {e}")
+            return None
     
     @asynccontextmanager
     async def browser_session(self):
         """浏览器会话上下文管理器"""
-        await self.init_browser()
-        try:
-            yield self._page
-        finally:
-            await self.close()
+        async with self.open_session() as session:
+            yield session.page
     
     @asynccontextmanager
     async def browser_session_with_trace(self, trace_name: str = 'trace'):
@@ -178,50 +348,27 @@ class PlaywrightExecutor:
         Returns:
             trace 文件路径（通过 self._current_trace_path 获取）
         """
-        await self.init_browser()
         self._current_trace_path = None
-        
+        session = None
         try:
-            # 启动 Trace
-            if self.trace_enabled and self._context:
-                await self._context.tracing.start(
-                    screenshots=self.trace_screenshots,
-                    snapshots=self.trace_snapshots,
-                    sources=self.trace_sources,
-                )
-                logger.debug(f"Trace 已启动: screenshots={self.trace_screenshots}, snapshots={self.trace_snapshots}")
-            
-            yield self._page
-            
+            async with self.open_session(trace_name) as session:
+                yield session.page
         finally:
-            # 停止 Trace 并保存
-            # 停止前等 1 秒, 让 trace 多抓最后一帧截图(避免最后 1-2 秒画面缺失)
-            if self.trace_enabled and self._context:
-                try:
-                    if self._page and not self._page.is_closed():
-                        logger.debug(f"Trace 停止前等待 {self.tail_wait_ms}ms, 以抓取最后帧")
-                        await self._page.wait_for_timeout(self.tail_wait_ms)
-                except Exception as e:
-                    logger.warning(f"Trace 尾部等待失败(忽略): {e}")
-
-                try:
-                    timestamp = int(time.time() * 1000)
-                    trace_path = f"{self.trace_dir}/{trace_name}_{timestamp}.zip"
-                    await self._context.tracing.stop(path=trace_path)
-                    self._current_trace_path = trace_path
-                    logger.info(f"Trace 已保存: {trace_path}")
-                except Exception as e:
-                    logger.error(f"保存 Trace 失败: {e}")
-
-            await self.close()
+            self._current_trace_path = session.trace_path if session else None
     
     def get_current_trace_path(self) -> Optional[str]:
         """获取当前执行的 trace 文件路径"""
         return self._current_trace_path
 
     def stop(self):
-        """请求停止执行"""
+        """请求停止执行（未传入取消令牌的执行）"""
         self._stop_requested = True
+
+    def _is_cancelled(self, cancel_token: Optional[asyncio.Event]) -> bool:
+        """传入取消令牌时以令牌为准，否则使用执行器级别的停止标记"""
+        if cancel_token is not None:
+            return cancel_token.is_set()
+        return self._stop_requested
     
     def _get_locator(self, page: Page, locator_type: str, locator_value: str, locator_index: int = 0):
         """根据定位类型获取元素定位器
@@ -249,48 +396,94 @@ class PlaywrightExecutor:
             loc = loc.nth(locator_index)
         return loc
 
-    def _build_locator_chain(self, page: Page, step: StepConfig) -> list[tuple[str, object]]:
-        """构建定位器回退链: [(描述, locator), ...]
+    # 定位方式序号 -> 日志名称
+    LOCATOR_VARIANT_NAMES = {1: '主定位', 2: '备用1', 3: '备用2'}
+
+    def _build_locator_chain(self, page: Page, step: StepConfig) -> list[tuple[int, str, object]]:
+        """构建定位器回退链: [(定位方式序号, 描述, locator), ...]
         
-        按 主定位 → 备用1 → 备用2 的顺序构造。
-        备用定位只有在 type 和 value 都不为空时才会加入链。
+        配置顺序为 主定位(1) → 备用1(2) → 备用2(3)，备用定位只有在 type 和 value 都不为空时才会加入链；
+        有定位统计的元素按历史结果调整尝试顺序（优先最快的可用定位）。
         """
-        chain: list[tuple[str, object]] = []
-
-        if step.locator_value and step.locator_value.strip():
-            chain.append((
-                f"主定位[{step.locator_type}={step.locator_value}, index={step.locator_index}]",
-                self._get_locator(page, step.locator_type, step.locator_value, step.locator_index)
-            ))
-
-        if step.locator_type_2 and step.locator_value_2 and step.locator_value_2.strip():
-            chain.append((
-                f"备用1[{step.locator_type_2}={step.locator_value_2}, index={step.locator_index_2}]",
-                self._get_locator(page, step.locator_type_2, step.locator_value_2, step.locator_index_2 or 0)
-            ))
-
-        if step.locator_type_3 and step.locator_value_3 and step.locator_value_3.strip():
-            chain.append((
-                f"备用2[{step.locator_type_3}={step.locator_value_3}, index={step.locator_index_3}]",
-                self._get_locator(page, step.locator_type_3, step.locator_value_3, step.locator_index_3 or 0)
-            ))
-
-        return chain
+        variants = [
+            (1, step.locator_type, step.locator_value, step.locator_index),
+            (2, step.locator_type_2, step.locator_value_2, step.locator_index_2 or 0),
+            (3, step.locator_type_3, step.locator_value_3, step.locator_index_3 or 0),
+        ]
+        configured = {}
+        for variant, locator_type, locator_value, locator_index in variants:
+            if not locator_value or not locator_value.strip():
+                continue
+            if variant > 1 and not locator_type:
+                continue
+            configured[variant] = (
+                f"{self.LOCATOR_VARIANT_NAMES[variant]}[{locator_type}={locator_value}, index={locator_index}]",
+                self._get_locator(page, locator_type, locator_value, locator_index)
+            )
+
+        order = self.locator_stats.order(step.element_id, list(configured))
+        return [(variant, *configured[variant]) for variant in order]
+
+    async def _try_locators(
+        self,
+        step: StepConfig,
+        locator_chain: list[tuple[int, str, object]],
+        action: Callable,
+        attempts: Optional[list] = None
+    ) -> tuple[Optional[int], Optional[Exception]]:
+        """按回退链依次执行 action(locator, timeout)，返回 (成功的定位方式序号, 最后的错误)
+
+        不可靠的定位后面还有候选时使用探测超时；每次尝试的结果与耗时计入定位统计，
+        并追加到 attempts（随步骤结果上报服务端）。
+        """
+        last_error: Optional[Exception] = None
+        for position, (variant, desc, loc) in enumerate(locator_chain):
+            is_last = position + 1 == len(locator_chain)
+            timeout = self.locator_stats.probe_timeout(step.element_id, variant, is_last)
+            attempt_start = time.time()
+            try:
+                await action(loc, timeout)
+                ok = True
+            except Exception as e:
+                ok = False
+                last_error = e
+            elapsed_ms = round((time.time() - attempt_start) * 1000, 1)
+            self.locator_stats.record(step.element_id, variant, ok, elapsed_ms)
+            if attempts is not None:
+                attempts.append({'variant': variant, 'ok': ok, 'ms': elapsed_ms})
+            if ok:
+                return variant, None
+            if not is_last:
+                probe = f"(探测超时 {timeout}ms)" if timeout else ""
+                logger.warning(f"步骤 {step.step_id}: {desc} 失败{probe}: {last_error}, 尝试下一个定位器")
+        return None, last_error
     
-    async def _execute_step(self, page: Page, step: StepConfig) -> tuple[bool, str, str | None]:
+    async def _execute_step(
+        self,
+        page: Page,
+        step: StepConfig,
+        activity: Optional[PageActivity] = None,
+        attempts: Optional[list] = None
+    ) -> tuple[bool, str, str | None]:
         """执行单个步骤
+
+        Args:
+            activity: 页面事件跟踪，步骤内的等待计入其账目（不传则新建）
+            attempts: 收集定位尝试 {variant, ok, ms}（不传则不收集）
         
         Returns:
             tuple: (成功与否, 消息, 截图路径(可选))
         """
         operation = step.operation_type.lower()
         screenshot_path: str | None = None
+        if activity is None:
+            activity = self.waiter.watch(page)
         
         # 等待时间（仅当用户明确设置 > 0 时才等待，用于特殊场景）
-        # 注意：Playwright 自带 Auto-waiting，一般不需要手动等待
+        # 注意：Playwright 自带 Auto-waiting，一般不需要手动等待；用户显式设置的等待始终等满，不做自适应缩短
         if step.wait_time > 0:
             logger.debug(f"步骤 {step.step_id}: 强制等待 {step.wait_time}s（建议设为0让Playwright自动等待）")
-            await page.wait_for_timeout(int(step.wait_time * 1000))
+            await self.waiter.sleep(activity, step.wait_time * 1000)
         
         # 记录开始时间
         op_start = time.time()
@@ -336,22 +529,22 @@ class PlaywrightExecutor:
             return False, f"元素定位器为空，请在元素管理中配置定位表达式（步骤: {step.description or step.step_id}）", None
 
         locator_start = time.time()
-        chain_desc = " → ".join(desc for desc, _ in locator_chain)
+        chain_desc = " → ".join(desc for _, desc, _ in locator_chain)
         logger.debug(f"步骤 {step.step_id}: 定位器链 [{chain_desc}] 耗时 {time.time() - locator_start:.2f}s")
 
-        # 元素操作闭包: 给定一个 locator, 返回对应的 Playwright 异步操作
-        def _click_loc(loc):    return loc.click()
-        def _dblclick_loc(loc): return loc.dblclick()
-        def _fill_loc(loc):     return loc.fill(step.input_value)
-        def _type_loc(loc):     return loc.type(step.input_value)
-        def _clear_loc(loc):    return loc.fill("")
-        def _check_loc(loc):    return loc.check()
-        def _uncheck_loc(loc):  return loc.uncheck()
-        def _select_loc(loc):   return loc.select_option(step.input_value)
-        def _hover_loc(loc):    return loc.hover()
-        def _focus_loc(loc):    return loc.focus()
-        def _press_loc(loc):    return loc.press(step.input_value)
-        def _upload_loc(loc):   return loc.set_input_files(step.input_value)
+        # 元素操作闭包: 给定一个 locator 与超时(None = 默认操作超时), 返回对应的 Playwright 异步操作
+        def _click_loc(loc, timeout):    return loc.click(timeout=timeout)
+        def _dblclick_loc(loc, timeout): return loc.dblclick(timeout=timeout)
+        def _fill_loc(loc, timeout):     return loc.fill(step.input_value, timeout=timeout)
+        def _type_loc(loc, timeout):     return loc.type(step.input_value, timeout=timeout)
+        def _clear_loc(loc, timeout):    return loc.fill("", timeout=timeout)
+        def _check_loc(loc, timeout):    return loc.check(timeout=timeout)
+        def _uncheck_loc(loc, timeout):  return loc.uncheck(timeout=timeout)
+        def _select_loc(loc, timeout):   return loc.select_option(step.input_value, timeout=timeout)
+        def _hover_loc(loc, timeout):    return loc.hover(timeout=timeout)
+        def _focus_loc(loc, timeout):    return loc.focus(timeout=timeout)
+        def _press_loc(loc, timeout):    return loc.press(step.input_value, timeout=timeout)
+        def _upload_loc(loc, timeout):   return loc.set_input_files(step.input_value, timeout=timeout)
 
         element_op_map = {
             'click':    _click_loc,
@@ -375,24 +568,18 @@ class PlaywrightExecutor:
             total_attempts = max(1, self.retry_count + 1)
             last_error: Exception | None = None
             for attempt in range(1, total_attempts + 1):
-                for idx, (desc, loc) in enumerate(locator_chain):
-                    try:
-                        await op_fn(loc)
-                        action_time = time.time() - action_start
-                        used = "主定位" if idx == 0 else f"备用{idx}"
-                        logger.debug(f"步骤 {step.step_id}: {operation} 使用 {used} 成功 ({desc}) 第{attempt}/{total_attempts}次尝试 耗时 {action_time:.2f}s (总计 {time.time() - op_start:.2f}s)")
-                        # 成功后, 等待 step_interval 毫秒(给页面渲染留缓冲)
-                        if self.step_interval and self.step_interval > 0:
-                            await page.wait_for_timeout(self.step_interval)
-                        return True, f"元素操作 {operation} 执行成功", None
-                    except Exception as e:
-                        last_error = e
-                        if idx + 1 < len(locator_chain):
-                            logger.warning(f"步骤 {step.step_id}: {operation} 第{attempt}/{total_attempts}次: {desc} 失败: {e}, 尝试下一个定位器")
-                # 一轮回退链都失败, 如果还有重试次数则等 500ms 再来
+                variant, last_error = await self._try_locators(step, locator_chain, op_fn, attempts)
+                if variant is not None:
+                    action_time = time.time() - action_start
+                    logger.debug(f"步骤 {step.step_id}: {operation} 使用 {self.LOCATOR_VARIANT_NAMES[variant]} 成功 第{attempt}/{total_attempts}次尝试 耗时 {action_time:.2f}s (总计 {time.time() - op_start:.2f}s)")
+                    # 成功后, 最多等待 step_interval 毫秒(给页面渲染留缓冲, 页面稳定即继续)
+                    if self.step_interval and self.step_interval > 0:
+                        await self.waiter.pause(activity, self.step_interval)
+                    return True, f"元素操作 {operation} 执行成功", None
+                # 一轮回退链都失败, 如果还有重试次数则等页面稳定(最多 500ms)再来
                 if attempt < total_attempts:
-                    logger.warning(f"步骤 {step.step_id}: {operation} 第{attempt}轮所有定位器失败, 500ms 后重试")
-                    await page.wait_for_timeout(500)
+                    logger.warning(f"步骤 {step.step_id}: {operation} 第{attempt}轮所有定位器失败, 等待页面稳定后重试")
+                    await self.waiter.pause(activity, 500)
             logger.error(f"步骤 {step.step_id}: {operation} 重试{self.retry_count}次后仍失败, 最后错误: {last_error}")
             return False, f"元素操作 {operation} 失败(重试{self.retry_count}次): {last_error}", None
 
@@ -400,14 +587,14 @@ class PlaywrightExecutor:
         if operation.startswith('assert_'):
             assert_type = operation.replace('assert_', '')
             assert_op_map = {
-                'visible':       lambda loc: expect(loc).to_be_visible(),
-                'hidden':        lambda loc: expect(loc).to_be_hidden(),
-                'enabled':       lambda loc: expect(loc).to_be_enabled(),
-                'disabled':      lambda loc: expect(loc).to_be_disabled(),
-                'checked':       lambda loc: expect(loc).to_be_checked(),
-                'text':          lambda loc: expect(loc).to_have_text(step.input_value),
-                'value':         lambda loc: expect(loc).to_have_value(step.input_value),
-                'contain_text':  lambda loc: expect(loc).to_contain_text(step.input_value),
+                'visible':       lambda loc, timeout: expect(loc).to_be_visible(timeout=timeout),
+                'hidden':        lambda loc, timeout: expect(loc).to_be_hidden(timeout=timeout),
+                'enabled':       lambda loc, timeout: expect(loc).to_be_enabled(timeout=timeout),
+                'disabled':      lambda loc, timeout: expect(loc).to_be_disabled(timeout=timeout),
+                'checked':       lambda loc, timeout: expect(loc).to_be_checked(timeout=timeout),
+                'text':          lambda loc, timeout: expect(loc).to_have_text(step.input_value, timeout=timeout),
+                'value':         lambda loc, timeout: expect(loc).to_have_value(step.input_value, timeout=timeout),
+                'contain_text':  lambda loc, timeout: expect(loc).to_contain_text(step.input_value, timeout=timeout),
             }
             # url/title 是页面级断言, 不走回退
             page_assert_map = {
@@ -421,45 +608,48 @@ class PlaywrightExecutor:
                 return True, f"断言 {assert_type} 通过", None
 
             if assert_type in assert_op_map:
-                assert_fn = assert_op_map[assert_type]
-                last_error: Exception | None = None
-                for idx, (desc, loc) in enumerate(locator_chain):
-                    try:
-                        await assert_fn(loc)
-                        used = "主定位" if idx == 0 else f"备用{idx}"
-                        logger.debug(f"步骤 {step.step_id}: assert_{assert_type} 使用 {used} 成功 ({desc}) 耗时 {time.time() - op_start:.2f}s")
-                        return True, f"断言 {assert_type} 通过", None
-                    except Exception as e:
-                        last_error = e
-                        if idx + 1 < len(locator_chain):
-                            logger.warning(f"步骤 {step.step_id}: assert_{assert_type} 使用 {desc} 失败: {e}, 尝试下一个定位器")
-                        else:
-                            logger.error(f"步骤 {step.step_id}: assert_{assert_type} 全部定位器均失败, 最后错误: {e}")
+                variant, last_error = await self._try_locators(step, locator_chain, assert_op_map[assert_type], attempts)
+                if variant is not None:
+                    logger.debug(f"步骤 {step.step_id}: assert_{assert_type} 使用 {self.LOCATOR_VARIANT_NAMES[variant]} 成功 耗时 {time.time() - op_start:.2f}s")
+                    return True, f"断言 {assert_type} 通过", None
+                logger.error(f"步骤 {step.step_id}: assert_{assert_type} 全部定位器均失败, 最后错误: {last_error}")
                 return False, f"断言 {assert_type} 失败: {last_error}", None
 
         return False, f"未知操作类型: {operation}", None
     
+    @staticmethod
+    def _charge_wait(step_result: StepResultModel, activity: PageActivity) -> StepResultModel:
+        """把页面上累计的等待账目计入步骤结果"""
+        waited, saved = activity.take()
+        step_result.wait_duration = round(step_result.wait_duration + waited, 3)
+        step_result.wait_saved = round(step_result.wait_saved + saved, 3)
+        return step_result
+
     async def execute_step(self, step: StepConfig, page_url: str = '') -> StepResultModel:
         """执行单个步骤（独立浏览器会话）"""
         start_time = time.time()
+        attempts: list[dict] = []
         
         try:
             async with self.browser_session() as page:
+                activity = self.waiter.watch(page)
                 if page_url:
                     await page.goto(page_url)
                 
-                success, message, step_screenshot = await self._execute_step(page, step)
+                success, message, step_screenshot = await self._execute_step(page, step, activity, attempts)
                 duration = time.time() - start_time
                 
-                return StepResultModel(
+                return self._charge_wait(StepResultModel(
                     step_id=step.step_id,
                     status='success' if success else 'failed',
                     message=message,
                     description=step.description or step.operation_type,
                     duration=duration,
                     element_found=success,
+                    element_id=step.element_id or None,
+                    locator_attempts=attempts,
                     screenshot=step_screenshot
-                )
+                ), activity)
         except Exception as e:
             duration = time.time() - start_time
             logger.error(f"步骤执行失败: {e}\n{traceback.format_exc()}")
@@ -469,23 +659,38 @@ class PlaywrightExecutor:
                 message=str(e),
                 description=step.description or step.operation_type,
                 duration=duration,
-                element_found=False
+                element_found=False,
+                element_id=step.element_id or None,
+                locator_attempts=attempts
             )
     
-    async def execute_test_case(self, config: TestCaseConfig) -> CaseResultModel:
-        """执行测试用例（支持 Trace 记录）"""
+    async def execute_test_case(
+        self,
+        config: TestCaseConfig,
+        cancel_token: Optional[asyncio.Event] = None
+    ) -> CaseResultModel:
+        """执行测试用例（支持 Trace 记录）
+
+        Args:
+            config: 用例配置
+            cancel_token: 取消令牌，被设置时停止执行（不传则使用 stop()）
+        """
         start_time = time.time()
         step_results = []
         passed_steps = 0
         failed_steps = 0
         total_steps = sum(len(ps.steps) for ps in config.page_steps)
         
-        self._stop_requested = False
+        if cancel_token is None:
+            self._stop_requested = False
         trace_name = f"case_{config.case_id}"
+        session = None
         
         try:
             # 使用带 trace 的浏览器会话
-            async with self.browser_session_with_trace(trace_name) as page:
+            async with self.open_session(trace_name) as session:
+                page = session.page
+                activity = self.waiter.watch(page)
                 logger.info(f"开始执行用例: {config.case_name}")
 
                 # 浏览器启动后，立即导航到环境配置的 base_url
@@ -494,10 +699,10 @@ class PlaywrightExecutor:
                     base_url = config.env_config.get('base_url', '') or ''
                 if base_url:
                     logger.info(f"导航到环境 base_url: {base_url}")
-                    await page.goto(base_url, wait_until="networkidle")
+                    await self.waiter.goto(activity, base_url)
 
                 for page_step in config.page_steps:
-                    if self._stop_requested:
+                    if self._is_cancelled(cancel_token):
                         raise Exception("用例被手动停止")
 
                     logger.info(f"执行页面步骤: {page_step.page_name}")
@@ -507,27 +712,20 @@ class PlaywrightExecutor:
                         current_url = page.url
                         expected_url = page_step.page_url.rstrip('/')
                         
-                        # 只有当期望的 URL 与当前 URL 不同时，才等待跳转
+                        # 只有当期望的 URL 与当前 URL 不同时，才等待跳转（页面无网络活动时立即继续）
                         if expected_url not in current_url:
-                            try:
-                                # 短暂等待，检测是否有 URL 变化
-                                await page.wait_for_url(
-                                    lambda url: url != current_url,
-                                    timeout=2000
-                                )
+                            if await self.waiter.await_navigation(activity, page_step.page_url):
                                 logger.debug(f"检测到页面跳转: {current_url} -> {page.url}")
-                            except Exception:
-                                # 没有页面跳转是正常情况
-                                pass
                     
                     # 执行页面内的步骤
                     for step in page_step.steps:
-                        if self._stop_requested:
+                        if self._is_cancelled(cancel_token):
                             raise Exception("用例被手动停止")
                         
+                        attempts: list[dict] = []
                         step_start = time.time()
                         try:
-                            success, message, step_screenshot = await self._execute_step(page, step)
+                            success, message, step_screenshot = await self._execute_step(page, step, activity, attempts)
                             step_duration = time.time() - step_start
 
                             step_result = StepResultModel(
@@ -537,6 +735,8 @@ class PlaywrightExecutor:
                                 description=step.description or step.operation_type,
                                 duration=step_duration,
                                 element_found=success,
+                                element_id=step.element_id or None,
+                                locator_attempts=attempts,
                                 screenshot=step_screenshot  # 保存截图操作的路径
                             )
 
@@ -572,28 +772,28 @@ class PlaywrightExecutor:
                                 description=step.description or step.operation_type,
                                 duration=step_duration,
                                 element_found=False,
+                                element_id=step.element_id or None,
+                                locator_attempts=attempts,
                                 screenshot=screenshot_path
                             )
                         
-                        step_results.append(step_result)
+                        step_results.append(self._charge_wait(step_result, activity))
 
                     # 页面步骤执行完毕后，等待页面稳定（处理可能的页面跳转）
                     try:
-                        await page.wait_for_load_state("load", timeout=10000)
-                        await page.wait_for_load_state("networkidle", timeout=10000)
+                        await self.waiter.settle_page(activity)
                     except Exception:
                         logger.debug(f"页面步骤 {page_step.page_name} 执行后等待页面稳定超时，继续执行")
+                    if step_results:
+                        self._charge_wait(step_results[-1], activity)
 
                 duration = time.time() - start_time
                 status = 'success' if failed_steps == 0 else 'failed'
                 message = f"用例执行{'成功' if status == 'success' else '失败'}: 通过 {passed_steps}/{total_steps}"
                 logger.info(f"✅ {message}" if status == 'success' else f"❌ {message}")
                 
-                # 获取 trace 文件路径（会在 browser_session_with_trace 结束时设置）
-                trace_path = None
-            
             # 会话结束后获取 trace 路径
-            trace_path = self.get_current_trace_path()
+            trace_path = session.trace_path
             if trace_path:
                 logger.info(f"用例执行 Trace 已记录: {trace_path}")
             
@@ -615,7 +815,7 @@ class PlaywrightExecutor:
             logger.error(f"用例执行异常: {error_msg}\n{traceback.format_exc()}")
             
             # 尝试获取 trace 路径（可能已保存）
-            trace_path = self.get_current_trace_path()
+            trace_path = session.trace_path if session else None
             
             return CaseResultModel(
                 case_id=config.case_id,
@@ -629,12 +829,17 @@ class PlaywrightExecutor:
                 trace_path=trace_path
             )
 
-    async def execute_page_step(self, config: PageStepConfig) -> list[StepResultModel]:
+    async def execute_page_step(
+        self,
+        config: PageStepConfig,
+        cancel_token: Optional[asyncio.Event] = None
+    ) -> list[StepResultModel]:
         """执行单个页面步骤（包含多个操作）- 使用同一个浏览器会话"""
         step_results = []
         
         try:
             async with self.browser_session() as page:
+                activity = self.waiter.watch(page)
                 logger.info(f"开始执行页面步骤: {config.page_name}")
                 
                 # 导航到页面
@@ -646,9 +851,13 @@ class PlaywrightExecutor:
                 
                 # 执行页面内的所有步骤
                 for step in config.steps:
+                    if self._is_cancelled(cancel_token):
+                        logger.info(f"页面步骤 {config.page_name} 被手动停止")
+                        break
+                    attempts: list[dict] = []
                     step_start = time.time()
                     try:
-                        success, message, step_screenshot = await self._execute_step(page, step)
+                        success, message, step_screenshot = await self._execute_step(page, step, activity, attempts)
                         step_duration = time.time() - step_start
 
                         step_result = StepResultModel(
@@ -658,9 +867,11 @@ class PlaywrightExecutor:
                             description=step.description or step.operation_type,
                             duration=step_duration,
                             element_found=success,
+                            element_id=step.element_id or None,
+                            locator_attempts=attempts,
                             screenshot=step_screenshot
                         )
-                        step_results.append(step_result)
+                        step_results.append(self._charge_wait(step_result, activity))
 
                         if success:
                             logger.debug(f"  ✅ {step.description or step.operation_type}")
@@ -692,9 +903,11 @@ class PlaywrightExecutor:
                             description=step.description or step.operation_type,
                             duration=step_duration,
                             element_found=False,
+                            element_id=step.element_id or None,
+                            locator_attempts=attempts,
                             screenshot=screenshot_path
                         )
-                        step_results.append(step_result)
+                        step_results.append(self._charge_wait(step_result, activity))
                         break  # 步骤失败时停止执行后续步骤
                         
         except Exception as e:
@@ -715,7 +928,8 @@ class PlaywrightExecutor:
         self,
         context: BrowserContext,
         config: TestCaseConfig,
-        trace_enabled: bool = False
+        trace_enabled: bool = False,
+        cancel_token: Optional[asyncio.Event] = None
     ) -> CaseResultModel:
         """在独立上下文中执行用例（用于并发执行）"""
         start_time = time.time()
@@ -736,6 +950,7 @@ class PlaywrightExecutor:
 
             page = await context.new_page()
             page.set_default_timeout(self.action_timeout)
+            activity = self.waiter.watch(page)
 
             logger.info(f"[并发] 开始执行用例: {config.case_name}")
 
@@ -745,10 +960,10 @@ class PlaywrightExecutor:
                 base_url = config.env_config.get('base_url', '') or ''
             if base_url:
                 logger.info(f"[并发] 导航到环境 base_url: {base_url}")
-                await page.goto(base_url, wait_until="networkidle")
+                await self.waiter.goto(activity, base_url)
 
             for page_step in config.page_steps:
-                if self._stop_requested:
+                if self._is_cancelled(cancel_token):
                     raise Exception("用例被手动停止")
 
                 logger.info(f"[并发] 执行页面步骤: {page_step.page_name}")
@@ -758,27 +973,20 @@ class PlaywrightExecutor:
                     current_url = page.url
                     expected_url = page_step.page_url.rstrip('/')
 
-                    # 只有当期望的 URL 与当前 URL 不同时，才等待跳转
+                    # 只有当期望的 URL 与当前 URL 不同时，才等待跳转（页面无网络活动时立即继续）
                     if expected_url not in current_url:
-                        try:
-                            # 短暂等待，检测是否有 URL 变化
-                            await page.wait_for_url(
-                                lambda url: url != current_url,
-                                timeout=2000
-                            )
+                        if await self.waiter.await_navigation(activity, page_step.page_url):
                             logger.debug(f"[并发] 检测到页面跳转: {current_url} -> {page.url}")
-                        except Exception:
-                            # 没有页面跳转是正常情况
-                            pass
 
                 # 执行页面内的步骤
                 for step in page_step.steps:
-                    if self._stop_requested:
+                    if self._is_cancelled(cancel_token):
                         raise Exception("用例被手动停止")
 
+                    attempts: list[dict] = []
                     step_start = time.time()
                     try:
-                        success, message, step_screenshot = await self._execute_step(page, step)
+                        success, message, step_screenshot = await self._execute_step(page, step, activity, attempts)
                         step_duration = time.time() - step_start
 
                         step_result = StepResultModel(
@@ -788,6 +996,8 @@ class PlaywrightExecutor:
                             description=step.description or step.operation_type,
                             duration=step_duration,
                             element_found=success,
+                            element_id=step.element_id or None,
+                            locator_attempts=attempts,
                             screenshot=step_screenshot
                         )
 
@@ -818,17 +1028,20 @@ class PlaywrightExecutor:
                             description=step.description or step.operation_type,
                             duration=step_duration,
                             element_found=False,
+                            element_id=step.element_id or None,
+                            locator_attempts=attempts,
                             screenshot=screenshot_path
                         )
 
-                    step_results.append(step_result)
+                    step_results.append(self._charge_wait(step_result, activity))
 
                 # 页面步骤执行完毕后，等待页面稳定（处理可能的页面跳转）
                 try:
-                    await page.wait_for_load_state("load", timeout=10000)
-                    await page.wait_for_load_state("networkidle", timeout=10000)
+                    await self.waiter.settle_page(activity)
                 except Exception:
                     logger.debug(f"[并发] 页面步骤 {page_step.page_name} 执行后等待页面稳定超时，继续执行")
+                if step_results:
+                    self._charge_wait(step_results[-1], activity)
 
             duration = time.time() - start_time
             status = 'success' if failed_steps == 0 else 'failed'
@@ -882,66 +1095,105 @@ class PlaywrightExecutor:
 
     async def execute_batch_concurrent(
         self,
-        configs: list[TestCaseConfig],
+        configs: Union[list[TestCaseConfig], AsyncIterable[TestCaseConfig]],
         max_concurrent: int = 3,
-        on_result = None
+        on_result = None,
+        cancel_token: Optional[asyncio.Event] = None,
+        should_run: Optional[Callable[[TestCaseConfig], bool]] = None
     ) -> list[CaseResultModel]:
         """并发执行多个用例
 
         Args:
-            configs: 用例配置列表
+            configs: 用例配置列表，或异步产出用例配置的迭代器（边准备边执行，配置就绪即开始）
             max_concurrent: 最大并发数
             on_result: 单个用例完成时的回调函数 (可选)
+            cancel_token: 取消令牌，被设置后未开始的用例直接标记为停止
+            should_run: 用例即将开始时调用，返回 False 则跳过且不产生结果（如已被服务端撤回）
 
         Returns:
             用例执行结果列表
         """
-        if not configs:
+        if isinstance(configs, list) and not configs:
             return []
 
         semaphore = asyncio.Semaphore(max_concurrent)
 
-        # 确保浏览器已初始化（非持久化模式）
-        if self._playwright is None:
-            self._playwright = await async_playwright().start()
-
-        browser_launcher = getattr(self._playwright, self.browser_type)
-        browser = await browser_launcher.launch(
-            headless=self.headless,
-            timeout=self.launch_timeout,
-        )
+        # 优先使用常驻浏览器池；未启用时为本批次启动独立的 Playwright 驱动和浏览器（非持久化模式）。
+        # 批量通道与调试会话可同时运行，独立驱动保证调试会话结束时 close() 停止共享驱动不会波及本批次
+        pool = await self.get_browser_pool()
+        batch_playwright = None
+        browser = None
+        if pool is None:
+            batch_playwright = await async_playwright().start()
+            try:
+                browser = await getattr(batch_playwright, self.browser_type).launch(
+                    headless=self.headless,
+                    timeout=self.launch_timeout,
+                )
+            except BaseException:
+                await batch_playwright.stop()
+                raise
 
-        logger.info(f"[并发执行] 开始执行 {len(configs)} 个用例, 最大并发数: {max_concurrent}")
+        total = len(configs) if isinstance(configs, list) else '-'
+        logger.info(f"[并发执行] 开始执行 {total} 个用例, 最大并发数: {max_concurrent}")
 
         async def run_with_limit(config: TestCaseConfig):
             async with semaphore:
+                if self._is_cancelled(cancel_token):
+                    total_steps = sum(len(ps.steps) for ps in config.page_steps)
+                    result = CaseResultModel(
+                        case_id=config.case_id,
+                        status='failed',
+                        message="用例被手动停止",
+                        total_steps=total_steps,
+                        failed_steps=total_steps,
+                    )
+                    if on_result:
+                        await on_result(result)
+                    return result
+                if should_run is not None and not should_run(config):
+                    return None
+
                 # 每个用例独立的浏览器上下文
-                context = await browser.new_context()
+                if pool is not None:
+                    context, slot = await pool.acquire()
+                else:
+                    context, slot = await browser.new_context(), None
                 try:
                     result = await self._execute_case_on_context(
                         context,
                         config,
-                        trace_enabled=self.trace_enabled
+                        trace_enabled=self.trace_enabled,
+                        cancel_token=cancel_token
                     )
                     if on_result:
                         await on_result(result)
                     return result
                 finally:
-                    await context.close()
+                    if slot is not None:
+                        await pool.release(context, slot)
+                    else:
+                        await context.close()
 
         try:
-            # 并发执行所有用例
-            results = await asyncio.gather(
-                *[run_with_limit(c) for c in configs],
-                return_exceptions=True
-            )
+            # 并发执行所有用例（配置产出一个即提交一个）
+            started: list[TestCaseConfig] = []
+            tasks: list[asyncio.Task] = []
+            try:
+                async for config in _iter_configs(configs):
+                    started.append(config)
+                    tasks.append(asyncio.create_task(run_with_limit(config)))
+            finally:
+                results = await asyncio.gather(*tasks, return_exceptions=True)
 
             # 处理异常结果
             final_results = []
             for i, result in enumerate(results):
+                if result is None:
+                    continue
                 if isinstance(result, Exception):
                     final_results.append(CaseResultModel(
-                        case_id=configs[i].case_id,
+                        case_id=started[i].case_id,
                         status='failed',
                         message=str(result),
                         total_steps=0,
@@ -954,7 +1206,12 @@ class PlaywrightExecutor:
                     final_results.append(result)
 
             logger.info(f"[并发执行] 完成, 成功: {sum(1 for r in final_results if r.status == 'success')}/{len(final_results)}")
+            if pool is not None:
+                logger.info(f"[并发执行] 浏览器池统计: {pool.stats()}")
             return final_results
 
         finally:
-            await browser.close()
+            if browser is not None:
+                await browser.close()
+            if batch_playwright is not None:
+                await batch_playwright.stop()
@@ -0,0 +1,123 @@
+"""
+UI自动化执行器 - 元素定位统计
+
+原先每个步骤固定按 主定位 → 备用1 → 备用2 尝试，主定位失效后每一步都要先等满操作超时
+才回退到可用的备用定位。这里按元素记录各定位方式的解析结果与耗时（执行前从服务端拉取
+历史统计，执行中实时更新）：
+
+- 尝试顺序: 当前可用（最近一次成功）的按平均耗时升序 → 没有记录的按配置顺序 → 最近失败的按成功率降序
+- 探测超时: 最近失败或失败率高的定位如果后面还有候选，只用较短的探测超时，不等满操作超时
+- 每次尝试记录为 {variant, ok, ms}，随步骤结果上报，由服务端汇总
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class LocatorOutcome:
+    """单个元素单个定位方式的统计"""
+    success_count: int = 0
+    failure_count: int = 0
+    consecutive_failures: int = 0
+    avg_ms: float = 0
+
+    @property
+    def failure_rate(self) -> float:
+        total = self.success_count + self.failure_count
+        return self.failure_count / total if total else 0
+
+    @property
+    def success_rate(self) -> float:
+        total = self.success_count + self.failure_count
+        return self.success_count / total if total else 0
+
+
+class LocatorStats:
+    """按元素记录定位方式的解析统计，决定尝试顺序与探测超时
+
+    Args:
+        probe_timeout_ms: 不可靠定位的探测超时(毫秒)
+        flaky_failure_rate: 失败率达到该值视为不可靠
+        alpha: 平均耗时的滑动平均权重（与服务端一致）
+        max_elements: 最多保留的元素数，超出时淘汰最久未使用的
+    """
+
+    def __init__(self, probe_timeout_ms: int = 2000, flaky_failure_rate: float = 0.5,
+                 alpha: float = 0.3, max_elements: int = 5000):
+        self.probe_timeout_ms = probe_timeout_ms
+        self.flaky_failure_rate = flaky_failure_rate
+        self.alpha = alpha
+        self.max_elements = max_elements
+        self._elements: OrderedDict[int, dict[int, LocatorOutcome]] = OrderedDict()
+
+    def _outcomes(self, element_id: int) -> dict[int, LocatorOutcome]:
+        outcomes = self._elements.get(element_id)
+        if outcomes is None:
+            outcomes = self._elements[element_id] = {}
+            while len(self._elements) > self.max_elements:
+                self._elements.popitem(last=False)
+        else:
+            self._elements.move_to_end(element_id)
+        return outcomes
+
+    def get(self, element_id: int, variant: int) -> Optional[LocatorOutcome]:
+        return self._elements.get(element_id, {}).get(variant)
+
+    def load(self, rows: list[dict]) -> None:
+        """加载服务端统计（locator-stats 接口返回的行），覆盖本地记录"""
+        for row in rows:
+            try:
+                element_id, variant = int(row['element']), int(row['variant'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._outcomes(element_id)[variant] = LocatorOutcome(
+                success_count=row.get('success_count') or 0,
+                failure_count=row.get('failure_count') or 0,
+                consecutive_failures=row.get('consecutive_failures') or 0,
+                avg_ms=row.get('avg_ms') or 0,
+            )
+
+    def record(self, element_id: int, variant: int, ok: bool, ms: float) -> None:
+        """记录一次解析结果；平均耗时只统计成功的解析"""
+        if not element_id:
+            return
+        outcome = self._outcomes(element_id).setdefault(variant, LocatorOutcome())
+        if ok:
+            outcome.avg_ms = ms if not outcome.success_count else outcome.avg_ms + self.alpha * (ms - outcome.avg_ms)
+            outcome.success_count += 1
+            outcome.consecutive_failures = 0
+        else:
+            outcome.failure_count += 1
+            outcome.consecutive_failures += 1
+
+    def is_flaky(self, element_id: int, variant: int) -> bool:
+        outcome = self.get(element_id, variant)
+        if outcome is None:
+            return False
+        return outcome.consecutive_failures > 0 or outcome.failure_rate >= self.flaky_failure_rate
+
+    def order(self, element_id: int, variants: list[int]) -> list[int]:
+        """定位方式的尝试顺序"""
+        if not element_id or element_id not in self._elements:
+            return list(variants)
+
+        def rank(item):
+            position, variant = item
+            outcome = self.get(element_id, variant)
+            if outcome is None or not (outcome.success_count or outcome.failure_count):
+                return (1, position, 0)
+            if outcome.consecutive_failures == 0 and outcome.success_count:
+                return (0, outcome.avg_ms, position)
+            return (2, -outcome.success_rate, position)
+
+        return [variant for _, variant in sorted(enumerate(variants), key=rank)]
+
+    def probe_timeout(self, element_id: int, variant: int, is_last: bool) -> Optional[int]:
+        """该定位本次尝试的超时(毫秒)；None 表示使用默认操作超时"""
+        if is_last or not self.is_flaky(element_id, variant):
+            return None
+        outcome = self.get(element_id, variant)
+        # 偶尔成功的定位至少给到其历史耗时的 2 倍
+        return int(max(self.probe_timeout_ms, outcome.avg_ms * 2))
@@ -72,13 +72,36 @@ class Config:
         self.user_data_dir = "./data/browser"
         self.launch_timeout = 30
         self.action_timeout = 30
+        # 常驻浏览器池（仅 persistent=false 时生效）
+        self.pool_enabled = True
+        self.pool_size = 1
+        self.pool_max_contexts = 50
+        self.pool_prewarm_contexts = 1
         
         # 执行配置
         self.retry_count = 3
         self.step_interval = 500
         self.screenshot_dir = "./data/screenshots"
         self.max_concurrent = 3  # 批量执行最大并发数
+        self.interactive_concurrency = 1  # 调试/单用例通道并发任务数
+        self.batch_concurrency = 1  # 批量执行通道并发任务数
         self.tail_wait_ms = 1000  # 用例结束后浏览器额外等待(毫秒), 用于 trace 补抓最后帧
+        self.locator_probe_timeout_ms = 2000  # 不可靠定位后面还有候选时的探测超时(毫秒)
+        
+        # 产物上传配置
+        self.upload_concurrency = 4  # 并发上传数
+        self.upload_batch_size = 10  # 单次批量上传文件数
+        self.upload_image_format = "webp"  # 截图重新编码格式: webp / jpeg / png(原样)
+        self.upload_image_quality = 80
+        self.upload_dedup = True  # 按内容哈希去重
+        
+        # 自适应等待配置（毫秒）
+        self.wait_adaptive = True  # false = 固定等待
+        self.wait_network_quiet_ms = 300
+        self.wait_dom_stable_ms = 150
+        self.wait_settle_timeout_ms = 5000
+        self.wait_navigation_min_ms = 500
+        self.wait_navigation_max_ms = 10000
         
         # Trace 配置
         self.trace_enabled = True
@@ -128,6 +151,10 @@ class Config:
             self.user_data_dir = browser.get('user_data_dir', self.user_data_dir)
             self.launch_timeout = browser.get('launch_timeout', self.launch_timeout)
             self.action_timeout = browser.get('action_timeout', self.action_timeout)
+            self.pool_enabled = browser.get('pool_enabled', self.pool_enabled)
+            self.pool_size = browser.get('pool_size', self.pool_size)
+            self.pool_max_contexts = browser.get('pool_max_contexts', self.pool_max_contexts)
+            self.pool_prewarm_contexts = browser.get('pool_prewarm_contexts', self.pool_prewarm_contexts)
         
         # 执行配置
         if 'execution' in data:
@@ -136,6 +163,9 @@ class Config:
             self.step_interval = execution.get('step_interval', self.step_interval)
             self.screenshot_dir = execution.get('screenshot_dir', self.screenshot_dir)
             self.max_concurrent = execution.get('max_concurrent', self.max_concurrent)
+            self.interactive_concurrency = execution.get('interactive_concurrency', self.interactive_concurrency)
+            self.batch_concurrency = execution.get('batch_concurrency', self.batch_concurrency)
+            self.locator_probe_timeout_ms = execution.get('locator_probe_timeout_ms', self.locator_probe_timeout_ms)
             # tail_wait_ms (毫秒); 兼容旧配置 tail_wait_seconds (秒)
             _old = execution.get('tail_wait_seconds')
             _new = execution.get('tail_wait_ms')
@@ -144,6 +174,25 @@ class Config:
             if _new is not None:
                 self.tail_wait_ms = _new
         
+        # 产物上传配置
+        if 'upload' in data:
+            upload = data['upload']
+            self.upload_concurrency = upload.get('concurrency', self.upload_concurrency)
+            self.upload_batch_size = upload.get('batch_size', self.upload_batch_size)
+            self.upload_image_format = upload.get('image_format', self.upload_image_format)
+            self.upload_image_quality = upload.get('image_quality', self.upload_image_quality)
+            self.upload_dedup = upload.get('dedup', self.upload_dedup)
+        
+        # 自适应等待配置
+        if 'wait' in data:
+            wait = data['wait']
+            self.wait_adaptive = wait.get('adaptive', self.wait_adaptive)
+            self.wait_network_quiet_ms = wait.get('network_quiet_ms', self.wait_network_quiet_ms)
+            self.wait_dom_stable_ms = wait.get('dom_stable_ms', self.wait_dom_stable_ms)
+            self.wait_settle_timeout_ms = wait.get('settle_timeout_ms', self.wait_settle_timeout_ms)
+            self.wait_navigation_min_ms = wait.get('navigation_min_ms', self.wait_navigation_min_ms)
+            self.wait_navigation_max_ms = wait.get('navigation_max_ms', self.wait_navigation_max_ms)
+        
         # Trace 配置
         if 'trace' in data:
             trace = data['trace']
@@ -28,10 +28,15 @@ class UiSocketEnum:
     TEST_CASE = 'u_test_case'
     TEST_CASE_BATCH = 'u_test_case_batch'
     STOP_EXECUTION = 'u_stop_execution'
+    BATCH_SHARD_DONE = 'u_batch_shard_done'  # 批量分片执行完毕
+    BATCH_REVOKE = 'u_batch_revoke'  # 服务端撤回未开始的分片用例（工作窃取）
+    BATCH_REVOKED = 'u_batch_revoked'  # 回应实际撤回的用例
     STEP_RESULT = 'u_step_result'
     CASE_RESULT = 'u_case_result'
+    CASE_ARTIFACTS = 'u_case_artifacts'   # 用例产物（截图/Trace）上传完成后回填地址
     SET_ACTUATOR_INFO = 't_set_actuator_info'  # 设置执行器信息
     SET_ACTUATOR_STATE = 't_set_actuator_state'  # 切换执行器状态（is_open 等）
+    ACTUATOR_CAPACITY = 't_actuator_capacity'  # 上报执行器各通道实时容量
 
 
 class QueueModel(BaseModel):
@@ -58,6 +63,10 @@ class StepResultModel(BaseModel):
     screenshot: Optional[str] = None
     duration: float = 0
     element_found: bool = True
+    wait_duration: float = 0  # 步骤内等待耗时(秒, 含页面跳转/稳定等待)
+    wait_saved: float = 0  # 自适应等待相比固定等待节省的时间(秒)
+    element_id: Optional[int] = None  # 操作的元素
+    locator_attempts: list[dict] = []  # 定位尝试 [{variant, ok, ms}]，服务端汇总为元素定位统计
 
 
 class CaseResultModel(BaseModel):
@@ -71,3 +80,4 @@ class CaseResultModel(BaseModel):
     duration: float = 0
     steps: list[StepResultModel] = []
     trace_path: Optional[str] = None  # Playwright Trace 文件路径
+    result_id: Optional[str] = None  # 结果标识，产物上传完成后按此回填地址
@@ -0,0 +1,197 @@
+"""
+UI自动化执行器 - 分道任务调度
+
+服务端下发的任务按类型分到独立的执行通道，互不阻塞：
+
+- control: 停止执行、状态切换等控制消息，立即处理
+- interactive: 页面步骤调试、单用例执行等交互式任务
+- batch: 批量执行
+
+每个通道有独立的并发上限与取消令牌。停止执行时取消对应通道的令牌，
+正在运行的任务通过 current_cancel_token() 感知取消，排队中的任务直接丢弃。
+"""
+
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+from models import QueueModel, UiSocketEnum
+
+logger = logging.getLogger('actuator')
+
+CONTROL = 'control'
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+# 任务类型 -> 通道（未列出的任务走 control 通道，由处理器自行告警）
+LANE_BY_FUNC = {
+    UiSocketEnum.STOP_EXECUTION: CONTROL,
+    UiSocketEnum.SET_ACTUATOR_STATE: CONTROL,
+    UiSocketEnum.BATCH_REVOKE: CONTROL,
+    UiSocketEnum.PAGE_STEPS: INTERACTIVE,
+    UiSocketEnum.TEST_CASE: INTERACTIVE,
+    UiSocketEnum.TEST_CASE_BATCH: BATCH,
+}
+
+DEFAULT_LANE_LIMITS = {
+    CONTROL: 4,
+    INTERACTIVE: 1,
+    BATCH: 1,
+}
+
+_cancel_token: contextvars.ContextVar[Optional[asyncio.Event]] = contextvars.ContextVar(
+    'actuator_cancel_token', default=None
+)
+_task_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'actuator_task_user', default=None
+)
+
+
+def current_cancel_token() -> Optional[asyncio.Event]:
+    """当前任务所在通道的取消令牌（不在通道任务中时为 None）"""
+    return _cancel_token.get()
+
+
+def current_task_user() -> Optional[str]:
+    """当前任务的发起用户"""
+    return _task_user.get()
+
+
+class Lane:
+    """单个执行通道"""
+
+    def __init__(self, name: str, max_concurrent: int):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.cancel_token = asyncio.Event()
+        self.running: set[asyncio.Task] = set()
+        self.completed = 0
+        self.failed = 0
+
+    def cancel(self) -> int:
+        """取消运行中的任务并丢弃排队任务，返回丢弃的任务数"""
+        # 运行中的任务持有旧令牌；之后入队的任务使用新令牌，不受本次停止影响
+        self.cancel_token.set()
+        self.cancel_token = asyncio.Event()
+        dropped = 0
+        while not self.queue.empty():
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                dropped += 1
+            except asyncio.QueueEmpty:
+                break
+        return dropped
+
+    def snapshot(self) -> dict:
+        return {
+            'max_concurrent': self.max_concurrent,
+            'running': len(self.running),
+            'queued': self.queue.qsize(),
+            'available': max(0, self.max_concurrent - len(self.running)),
+            'completed': self.completed,
+            'failed': self.failed,
+        }
+
+
+class LaneScheduler:
+    """分道任务调度器
+
+    Args:
+        handler: 任务处理协程 handler(task)
+        lane_limits: 通道名 -> 并发上限
+        on_change: 通道容量变化（任务开始/结束）时回调，用于向服务端上报
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[QueueModel], Awaitable[Any]],
+        lane_limits: Optional[dict] = None,
+        on_change: Optional[Callable[[], Awaitable[Any]]] = None,
+    ):
+        self.handler = handler
+        self.on_change = on_change
+        limits = {**DEFAULT_LANE_LIMITS, **(lane_limits or {})}
+        self.lanes = {name: Lane(name, limit) for name, limit in limits.items()}
+        self._dispatchers: list[asyncio.Task] = []
+
+    def lane_for(self, func_name: str) -> Lane:
+        return self.lanes[LANE_BY_FUNC.get(func_name, CONTROL)]
+
+    def submit(self, task: QueueModel, user: Optional[str] = None) -> Lane:
+        """任务入队到对应通道"""
+        lane = self.lane_for(task.func_name)
+        # 入队时绑定令牌：排队期间发生的停止同样作用于该任务
+        lane.queue.put_nowait((task, user, lane.cancel_token))
+        logger.info(f"任务已入队: {task.func_name} -> {lane.name} 通道 (排队 {lane.queue.qsize()})")
+        return lane
+
+    def cancel(self, *lane_names: str) -> None:
+        """取消指定通道的运行中/排队任务"""
+        for name in lane_names:
+            lane = self.lanes.get(name)
+            if lane is None:
+                continue
+            dropped = lane.cancel()
+            logger.info(f"{name} 通道已取消: 运行中 {len(lane.running)} 个, 丢弃排队 {dropped} 个")
+
+    def capacity(self) -> dict:
+        """各通道的实时容量"""
+        return {name: lane.snapshot() for name, lane in self.lanes.items()}
+
+    def is_idle(self) -> bool:
+        return all(not lane.running and lane.queue.empty() for lane in self.lanes.values())
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """启动各通道的分发循环，直到 stop_event 被设置"""
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch(lane, stop_event)) for lane in self.lanes.values()
+        ]
+        try:
+            await stop_event.wait()
+        finally:
+            for dispatcher in self._dispatchers:
+                dispatcher.cancel()
+            await asyncio.gather(*self._dispatchers, return_exceptions=True)
+            running = [task for lane in self.lanes.values() for task in lane.running]
+            if running:
+                self.cancel(*self.lanes)
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _dispatch(self, lane: Lane, stop_event: asyncio.Event) -> None:
+        while not stop_event.is_set():
+            task, user, token = await lane.queue.get()
+            await lane.semaphore.acquire()
+            worker = asyncio.create_task(self._run_task(lane, task, user, token))
+            lane.running.add(worker)
+            worker.add_done_callback(lane.running.discard)
+            lane.queue.task_done()
+
+    async def _run_task(self, lane: Lane, task: QueueModel, user: Optional[str], token: asyncio.Event) -> None:
+        _cancel_token.set(token)
+        _task_user.set(user)
+        await self._notify()
+        try:
+            if token.is_set():
+                logger.info(f"任务已取消，跳过: {task.func_name}")
+                return
+            await self.handler(task)
+            lane.completed += 1
+        except Exception as e:
+            lane.failed += 1
+            logger.error(f"处理任务错误 [{lane.name}] {task.func_name}: {e}", exc_info=True)
+        finally:
+            lane.semaphore.release()
+            lane.running.discard(asyncio.current_task())
+            await self._notify()
+
+    async def _notify(self) -> None:
+        if self.on_change is None:
+            return
+        try:
+            await self.on_change()
+        except Exception as e:
+            logger.debug(f"上报执行器容量失败: {e}")
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+后台产物上传单元测试
+"""
+
+import asyncio
+import hashlib
+import json
+
+import httpx
+
+from artifact_uploader import ArtifactUploader, Artifact, SCREENSHOT, TRACE
+
+
+class FakeServer:
+    """模拟服务端产物接口，按内容哈希存储"""
+
+    def __init__(self, batch_supported=True):
+        self.batch_supported = batch_supported
+        self.stored = {}
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append(path)
+        if path.startswith('/api/ui-automation/artifacts/') and not self.batch_supported:
+            return httpx.Response(404)
+        if path == '/api/ui-automation/artifacts/check/':
+            body = json.loads(request.content)
+            found = {h: self._info(h) for h in body['hashes'] if h in self.stored}
+            return httpx.Response(200, json={'status': 'success', 'found': found})
+        if path == '/api/ui-automation/artifacts/upload/':
+            files = self._parse_files(request)
+            infos = []
+            for content in files:
+                digest = hashlib.sha256(content).hexdigest()
+                self.stored[digest] = content
+                infos.append(self._info(digest))
+            return httpx.Response(201, json={'status': 'success', 'files': infos})
+        if path == '/api/ui-automation/screenshots/upload/':
+            content = self._parse_files(request)[0]
+            digest = hashlib.sha256(content).hexdigest()
+            self.stored[digest] = content
+            return httpx.Response(201, json={'status': 'success', 'url': self._info(digest)['url']})
+        return httpx.Response(404)
+
+    @staticmethod
+    def _info(digest):
+        return {'hash': digest, 'path': f'ui/{digest}', 'url': f'/media/ui/{digest}'}
+
+    @staticmethod
+    def _parse_files(request):
+        boundary = request.headers['content-type'].split('boundary=')[1].encode()
+        contents = []
+        for part in request.content.split(b'--' + boundary):
+            if b'filename=' in part:
+                contents.append(part.split(b'\r\n\r\n', 1)[1].rsplit(b'\r\n', 1)[0])
+        return contents
+
+
+async def fake_token(refresh=False):
+    return 'token'
+
+
+def make_uploader(server, **kwargs):
+    return ArtifactUploader(
+        'http://server', fake_token, image_format='', transport=httpx.MockTransport(server.handler), **kwargs
+    )
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestArtifactUploader:
+    """ArtifactUploader 类测试"""
+
+    def test_batch_upload_and_dedup(self, tmp_path):
+        """测试批量上传、同批次重复内容只上传一次、服务端已有的内容跳过上传"""
+        first = tmp_path / 'a.png'
+        second = tmp_path / 'b.png'
+        trace = tmp_path / 't.zip'
+        first.write_bytes(b'same')
+        second.write_bytes(b'same')
+        trace.write_bytes(b'trace')
+
+        async def scenario():
+            server = FakeServer()
+            uploader = make_uploader(server)
+            result = await uploader.upload([
+                Artifact(0, str(first)), Artifact(1, str(second)), Artifact('trace', str(trace), TRACE),
+            ])
+            again = tmp_path / 'c.png'
+            again.write_bytes(b'same')
+            result_again = await uploader.upload([Artifact(0, str(again), SCREENSHOT)])
+            stats = uploader.stats()
+            await uploader.close()
+            return server, result, result_again, stats
+
+        server, result, result_again, stats = run(scenario())
+        digest = hashlib.sha256(b'same').hexdigest()
+        assert result[0] == result[1] == f'/media/ui/{digest}'
+        assert result['trace'] == f'ui/{hashlib.sha256(b"trace").hexdigest()}'
+        assert result_again[0] == result[0]
+        assert server.requests.count('/api/ui-automation/artifacts/upload/') == 2
+        assert stats['uploaded'] == 2
+        assert stats['deduplicated'] == 1
+        # 上传成功后清理本地文件
+        assert not first.exists() and not second.exists() and not trace.exists()
+
+    def test_fallback_to_single_upload(self, tmp_path):
+        """测试服务端不支持批量接口时回退到单文件上传"""
+        shot = tmp_path / 'a.png'
+        shot.write_bytes(b'png')
+
+        async def scenario():
+            server = FakeServer(batch_supported=False)
+            uploader = make_uploader(server)
+            result = await uploader.upload([Artifact(0, str(shot))])
+            await uploader.close()
+            return server, result
+
+        server, result = run(scenario())
+        assert result[0] == f'/media/ui/{hashlib.sha256(b"png").hexdigest()}'
+        assert '/api/ui-automation/screenshots/upload/' in server.requests
+
+    def test_missing_file(self, tmp_path):
+        """测试文件不存在时返回 None"""
+        async def scenario():
+            uploader = make_uploader(FakeServer())
+            result = await uploader.upload([Artifact(0, str(tmp_path / 'missing.png'))])
+            await uploader.close()
+            return result
+
+        assert run(scenario()) == {0: None}
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+浏览器池单元测试
+"""
+
+import asyncio
+
+from browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+        self._handlers = []
+
+    def on(self, event, handler):
+        if event == 'disconnected':
+            self._handlers.append(handler)
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+    def crash(self):
+        self.connected = False
+        for handler in self._handlers:
+            handler(self)
+
+
+class FakeLauncher:
+    def __init__(self):
+        self.browsers = []
+
+    async def __call__(self):
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestBrowserPool:
+    """BrowserPool 类测试"""
+
+    def test_reuses_warm_browser_with_fresh_contexts(self):
+        """测试多个用例复用同一浏览器，每个用例使用新的上下文"""
+        async def scenario():
+            launcher = FakeLauncher()
+            pool = BrowserPool(launcher, size=1, max_contexts_per_browser=0)
+            await pool.start()
+            contexts = []
+            for _ in range(3):
+                async with pool.context() as context:
+                    contexts.append(context)
+            stats = pool.stats()
+            await pool.close()
+            return launcher, contexts, stats
+
+        launcher, contexts, stats = run(scenario())
+        assert len(launcher.browsers) == 1
+        assert len({id(c) for c in contexts}) == 3
+        assert all(c.closed for c in contexts)
+        assert stats['launches'] == 1
+        assert stats['acquire']['count'] == 3
+        assert stats['launch']['count'] == 1
+        assert launcher.browsers[0].closed
+
+    def test_recycles_browser_after_max_contexts(self):
+        """测试达到上下文阈值后回收浏览器"""
+        async def scenario():
+            launcher = FakeLauncher()
+            pool = BrowserPool(launcher, size=1, max_contexts_per_browser=2)
+            await pool.start()
+            for _ in range(3):
+                async with pool.context():
+                    pass
+            stats = pool.stats()
+            await pool.close()
+            return launcher, stats
+
+        launcher, stats = run(scenario())
+        assert len(launcher.browsers) == 2
+        assert launcher.browsers[0].closed
+        assert stats['recycles'] == 1
+        assert stats['crashes'] == 0
+
+    def test_recycle_waits_for_active_contexts(self):
+        """测试回收时等待进行中的用例结束再关闭浏览器"""
+        async def scenario():
+            launcher = FakeLauncher()
+            pool = BrowserPool(launcher, size=1, max_contexts_per_browser=1)
+            await pool.start()
+            context, slot = await pool.acquire()
+            first = launcher.browsers[0]
+            closed_while_active = first.closed
+            async with pool.context() as second_context:
+                pass
+            await pool.release(context, slot)
+            await pool.close()
+            return first, closed_while_active, second_context
+
+        first, closed_while_active, second_context = run(scenario())
+        assert not closed_while_active
+        assert first.closed
+        assert second_context.browser is not first
+
+    def test_replaces_crashed_browser(self):
+        """测试浏览器崩溃后重新启动"""
+        async def scenario():
+            launcher = FakeLauncher()
+            pool = BrowserPool(launcher, size=1)
+            await pool.start()
+            launcher.browsers[0].crash()
+            async with pool.context() as context:
+                pass
+            stats = pool.stats()
+            await pool.close()
+            return launcher, context, stats
+
+        launcher, context, stats = run(scenario())
+        assert len(launcher.browsers) == 2
+        assert context.browser is launcher.browsers[1]
+        assert stats['crashes'] == 1
+        assert stats['recycles'] == 0
+
+    def test_prewarmed_contexts(self):
+        """测试预创建上下文被优先使用"""
+        async def scenario():
+            launcher = FakeLauncher()
+            pool = BrowserPool(launcher, size=1, prewarm_contexts=1)
+            await pool.start()
+            await asyncio.sleep(0)
+            warm = list(launcher.browsers[0].contexts)
+            async with pool.context() as context:
+                pass
+            stats = pool.stats()
+            await pool.close()
+            return warm, context, stats
+
+        warm, context, stats = run(scenario())
+        assert warm == [context]
+        assert stats['warm_hits'] == 1
+
+
+class FakePersistentContext(FakeContext):
+    def __init__(self):
+        super().__init__(None)
+        self.pages = []
+
+    async def new_page(self):
+        page = FakePage()
+        self.pages.append(page)
+        return page
+
+
+class FakePage:
+    def set_default_timeout(self, timeout):
+        pass
+
+
+class FakeBrowserType:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def launch(self, **kwargs):
+        browser = FakeBrowser()
+        browser.driver = self.driver
+        return browser
+
+    async def launch_persistent_context(self, user_data_dir, **kwargs):
+        return FakePersistentContext()
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeBrowserType(self)
+        self.stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+class FakePlaywrightFactory:
+    def __init__(self):
+        self.drivers = []
+
+    def __call__(self):
+        return self
+
+    async def start(self):
+        driver = FakePlaywright()
+        self.drivers.append(driver)
+        return driver
+
+
+class TestExecutorWithoutPool:
+    """未启用浏览器池时批量执行与调试会话的隔离"""
+
+    def test_interactive_session_close_does_not_stop_running_batch(self, tmp_path, monkeypatch):
+        """测试批量执行运行中时调试会话结束，不会停止批量执行使用的 Playwright 驱动"""
+        import executor as executor_module
+        from executor import PlaywrightExecutor, TestCaseConfig
+        from models import CaseResultModel
+
+        factory = FakePlaywrightFactory()
+        monkeypatch.setattr(executor_module, 'async_playwright', factory)
+
+        async def scenario():
+            executor = PlaywrightExecutor(
+                persistent=True,
+                pool_enabled=False,
+                user_data_dir=str(tmp_path / 'profile'),
+                screenshot_dir=str(tmp_path / 'screenshots'),
+                trace_enabled=False,
+            )
+            case_started = asyncio.Event()
+            session_closed = asyncio.Event()
+            driver_alive = []
+
+            async def fake_execute(context, config, trace_enabled=False, cancel_token=None):
+                case_started.set()
+                await session_closed.wait()
+                driver_alive.append(not context.browser.driver.stopped)
+                return CaseResultModel(case_id=config.case_id, status='success')
+
+            executor._execute_case_on_context = fake_execute
+            batch = asyncio.create_task(
+                executor.execute_batch_concurrent([TestCaseConfig(case_id=1, case_name='批量用例')])
+            )
+            await asyncio.wait_for(case_started.wait(), 1)
+            async with executor.open_session():
+                pass
+            session_closed.set()
+            results = await asyncio.wait_for(batch, 1)
+            return results, driver_alive
+
+        results, driver_alive = run(scenario())
+        assert [r.status for r in results] == ['success']
+        assert driver_alive == [True]
+        # 批量执行与调试会话各自使用独立驱动，结束后都已停止
+        assert len(factory.drivers) == 2
+        assert all(driver.stopped for driver in factory.drivers)
@@ -4,7 +4,7 @@
 """
 
 import pytest
-from data_processor import DataProcessor, get_data_processor, reset_data_processor
+from data_processor import DataProcessor, compile_template, get_data_processor, reset_data_processor
 
 
 class TestDataProcessor:
@@ -144,6 +144,25 @@ class TestDataProcessor:
         variables = self.dp.extract_variables(data)
         assert variables == {'token', 'item1', 'item2'}
 
+    def test_compile_template(self):
+        """测试模板编译：无变量快速返回，片段保留原始占位符"""
+        assert compile_template('plain text') is None
+        assert compile_template('${{ not closed') is None
+
+        compiled = compile_template('用户 ${{ username }} 已登录')
+        assert compiled.parts == ('用户 ', ('username', '${{ username }}'), ' 已登录')
+        assert compiled.whole_var is None
+        assert compile_template(' ${{token}} ').whole_var == 'token'
+        assert compile_template('用户 ${{ username }} 已登录') is compiled
+
+    def test_replace_after_variable_changed(self):
+        """测试变量更新后不使用旧的渲染结果"""
+        self.dp.set_cache('env', 'test')
+        assert self.dp.replace('http://${{env}}.example.com') == 'http://test.example.com'
+        self.dp.set_cache('env', 'prod')
+        assert self.dp.replace('http://${{env}}.example.com') == 'http://prod.example.com'
+        assert self.dp.replace('${{missing}}-${{env}}') == '${{missing}}-prod'
+
 
 class TestGlobalInstance:
     """全局实例测试"""
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+元素定位统计单元测试
+"""
+
+from locator_stats import LocatorStats
+
+
+def test_unknown_element_keeps_configured_order():
+    stats = LocatorStats()
+    assert stats.order(0, [1, 2, 3]) == [1, 2, 3]
+    assert stats.order(7, [1, 3]) == [1, 3]
+    assert stats.probe_timeout(7, 1, is_last=False) is None
+
+
+def test_stale_primary_moves_behind_working_fallback():
+    stats = LocatorStats(probe_timeout_ms=1500)
+    stats.record(7, 1, False, 30000)
+    stats.record(7, 2, True, 120)
+    assert stats.order(7, [1, 2, 3]) == [2, 3, 1]
+    # 最近失败的主定位排在最后时仍使用默认超时
+    assert stats.probe_timeout(7, 1, is_last=True) is None
+    assert stats.probe_timeout(7, 1, is_last=False) == 1500
+    assert stats.probe_timeout(7, 2, is_last=False) is None
+
+
+def test_fastest_working_variant_first():
+    stats = LocatorStats()
+    stats.record(7, 1, True, 800)
+    stats.record(7, 2, True, 100)
+    stats.record(7, 3, True, 300)
+    assert stats.order(7, [1, 2, 3]) == [2, 3, 1]
+    stats.record(7, 2, False, 30000)
+    assert stats.order(7, [1, 2, 3]) == [3, 1, 2]
+
+
+def test_flaky_variant_gets_probe_timeout():
+    stats = LocatorStats(probe_timeout_ms=1000, flaky_failure_rate=0.5)
+    for ok in (True, False, False, True):
+        stats.record(7, 1, ok, 1200)
+    assert stats.get(7, 1).consecutive_failures == 0
+    assert stats.is_flaky(7, 1)
+    # 偶尔成功的定位至少给到其历史耗时的 2 倍
+    assert stats.probe_timeout(7, 1, is_last=False) == 2400
+
+
+def test_load_server_rows_and_eviction():
+    stats = LocatorStats(max_elements=2)
+    stats.load([
+        {'element': 1, 'variant': 1, 'success_count': 0, 'failure_count': 3, 'consecutive_failures': 3, 'avg_ms': 0},
+        {'element': 1, 'variant': 2, 'success_count': 9, 'failure_count': 0, 'consecutive_failures': 0, 'avg_ms': 90.5},
+        {'element': 'bad', 'variant': 1},
+    ])
+    assert stats.order(1, [1, 2]) == [2, 1]
+    stats.record(2, 1, True, 10)
+    stats.record(3, 1, True, 10)
+    assert stats.get(1, 2) is None
+    assert stats.get(3, 1).avg_ms == 10
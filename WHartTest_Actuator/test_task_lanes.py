@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+分道任务调度单元测试
+"""
+
+import asyncio
+
+from models import QueueModel, UiSocketEnum
+from task_lanes import (
+    LaneScheduler, BATCH, CONTROL, INTERACTIVE, current_cancel_token, current_task_user
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class TestLaneScheduler:
+    """LaneScheduler 类测试"""
+
+    def test_control_and_interactive_not_blocked_by_batch(self):
+        """测试批量执行运行中时，调试任务与控制消息仍可立即处理"""
+        async def scenario():
+            batch_started = asyncio.Event()
+            release_batch = asyncio.Event()
+            handled = []
+
+            async def handler(task):
+                if task.func_name == UiSocketEnum.TEST_CASE_BATCH:
+                    batch_started.set()
+                    await release_batch.wait()
+                handled.append((task.func_name, current_task_user()))
+
+            stop = asyncio.Event()
+            scheduler = LaneScheduler(handler)
+            runner = asyncio.create_task(scheduler.run(stop))
+            scheduler.submit(QueueModel(func_name=UiSocketEnum.TEST_CASE_BATCH, func_args={}), 'alice')
+            await asyncio.wait_for(batch_started.wait(), 1)
+            scheduler.submit(QueueModel(func_name=UiSocketEnum.PAGE_STEPS, func_args={}), 'bob')
+            scheduler.submit(QueueModel(func_name=UiSocketEnum.SET_ACTUATOR_STATE, func_args={}), 'carol')
+            for _ in range(20):
+                if len(handled) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            capacity = scheduler.capacity()
+            release_batch.set()
+            await asyncio.sleep(0.01)
+            stop.set()
+            await runner
+            return handled, capacity
+
+        handled, capacity = run(scenario())
+        assert set(handled[:2]) == {(UiSocketEnum.PAGE_STEPS, 'bob'), (UiSocketEnum.SET_ACTUATOR_STATE, 'carol')}
+        assert handled[2] == (UiSocketEnum.TEST_CASE_BATCH, 'alice')
+        assert capacity[BATCH]['running'] == 1
+        assert capacity[BATCH]['available'] == 0
+        assert capacity[INTERACTIVE]['available'] == 1
+
+    def test_cancel_sets_running_token_and_drops_queued(self):
+        """测试取消通道：运行中的任务收到取消信号，排队任务被丢弃，之后的任务不受影响"""
+        async def scenario():
+            started = asyncio.Event()
+            tokens = []
+            handled = []
+
+            async def handler(task):
+                handled.append(task.func_args['n'])
+                token = current_cancel_token()
+                tokens.append(token)
+                if task.func_args['n'] == 1:
+                    started.set()
+                    await token.wait()
+
+            stop = asyncio.Event()
+            scheduler = LaneScheduler(handler)
+            runner = asyncio.create_task(scheduler.run(stop))
+            for n in (1, 2):
+                scheduler.submit(QueueModel(func_name=UiSocketEnum.TEST_CASE, func_args={'n': n}))
+            await asyncio.wait_for(started.wait(), 1)
+            scheduler.cancel(INTERACTIVE, BATCH)
+            scheduler.submit(QueueModel(func_name=UiSocketEnum.TEST_CASE, func_args={'n': 3}))
+            for _ in range(20):
+                if 3 in handled:
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await runner
+            return handled, tokens
+
+        handled, tokens = run(scenario())
+        assert handled == [1, 3]
+        assert tokens[0].is_set()
+        assert not tokens[1].is_set()
+
+    def test_capacity_reported_on_change(self):
+        """测试任务开始/结束时上报容量"""
+        async def scenario():
+            reports = []
+            scheduler = None
+
+            async def handler(task):
+                pass
+
+            async def on_change():
+                reports.append(scheduler.capacity()[CONTROL]['running'])
+
+            stop = asyncio.Event()
+            scheduler = LaneScheduler(handler, on_change=on_change)
+            runner = asyncio.create_task(scheduler.run(stop))
+            scheduler.submit(QueueModel(func_name=UiSocketEnum.STOP_EXECUTION, func_args={}))
+            for _ in range(20):
+                if len(reports) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            stop.set()
+            await runner
+            return reports
+
+        assert run(scenario()) == [1, 0]
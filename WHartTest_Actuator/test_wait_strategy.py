@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+自适应等待单元测试
+"""
+
+import asyncio
+import time
+
+from wait_strategy import AdaptiveWaiter, NavigationTimings, WaitBudget, page_key
+
+
+class FakeRequest:
+    def __init__(self, resource_type='xhr'):
+        self.resource_type = resource_type
+
+
+class FakePage:
+    def __init__(self):
+        self.main_frame = object()
+        self.url = 'http://example.com/login'
+        self.evaluated = 0
+        self._handlers = {}
+
+    def on(self, event, handler):
+        self._handlers.setdefault(event, []).append(handler)
+
+    def emit(self, event, arg):
+        for handler in self._handlers.get(event, []):
+            handler(arg)
+
+    async def evaluate(self, script, args):
+        self.evaluated += 1
+        await asyncio.sleep(args[0] / 1000)
+
+    async def wait_for_timeout(self, ms):
+        await asyncio.sleep(ms / 1000)
+
+
+def _budget(**kwargs):
+    params = dict(network_quiet_ms=50, dom_stable_ms=10, settle_timeout_ms=1000,
+                  navigation_min_ms=100, navigation_max_ms=2000, long_request_ms=300)
+    params.update(kwargs)
+    return WaitBudget(**params)
+
+
+def test_page_key():
+    assert page_key('http://example.com/orders/123/edit?tab=1#top') == 'example.com/orders/*/edit'
+    assert page_key('/users/550e8400-e29b-41d4-a716-446655440000/') == '/users/*'
+    assert page_key('http://example.com') == 'example.com/'
+    assert page_key('') == ''
+
+
+def test_navigation_timings():
+    timings = NavigationTimings(default_ms=2000, min_ms=500, max_ms=5000, factor=2.0, alpha=0.5)
+    assert timings.budget('a') == 2000
+    timings.record('a', 100)
+    assert timings.budget('a') == 500  # 不低于下界
+    timings.record('a', 1100)
+    assert timings.average('a') == 600
+    assert timings.budget('a') == 1200
+    timings.record('b', 9000)
+    assert timings.budget('b') == 5000  # 不超过上界
+
+
+def test_network_quiet_after_requests_finish():
+    async def run():
+        page = FakePage()
+        activity = AdaptiveWaiter(_budget()).watch(page)
+        request = FakeRequest()
+        page.emit('request', request)
+        asyncio.get_running_loop().call_later(0.1, page.emit, 'requestfinished', request)
+        start = time.monotonic()
+        assert await activity.wait_network_quiet(1000)
+        elapsed = time.monotonic() - start
+        assert 0.14 <= elapsed < 0.5  # 请求结束 + 空闲窗口
+
+    asyncio.run(run())
+
+
+def test_long_request_not_counted():
+    async def run():
+        page = FakePage()
+        activity = AdaptiveWaiter(_budget()).watch(page)
+        page.emit('request', FakeRequest())  # 一直不结束的轮询
+        page.emit('request', FakeRequest('websocket'))
+        assert activity.busy_count() == 1
+        start = time.monotonic()
+        assert await activity.wait_network_quiet(2000)
+        assert time.monotonic() - start < 1.0
+
+    asyncio.run(run())
+
+
+def test_await_navigation_returns_immediately_when_quiet():
+    async def run():
+        waiter = AdaptiveWaiter(_budget())
+        page = FakePage()
+        activity = waiter.watch(page)
+        await asyncio.sleep(0.06)
+        start = time.monotonic()
+        assert not await waiter.await_navigation(activity, '/home')
+        assert time.monotonic() - start < 0.05
+        waited, saved = activity.take()
+        assert waited < 0.05 and saved > 1.9  # 相比固定 2 秒探测
+        assert activity.take() == (0.0, 0.0)
+
+    asyncio.run(run())
+
+
+def test_await_navigation_detects_event_and_learns():
+    async def run():
+        waiter = AdaptiveWaiter(_budget())
+        page = FakePage()
+        activity = waiter.watch(page)
+        request = FakeRequest('document')
+        page.emit('request', request)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, page.emit, 'framenavigated', object())  # 子 frame 跳转不计
+        loop.call_later(0.1, page.emit, 'framenavigated', page.main_frame)
+        loop.call_later(0.12, page.emit, 'requestfinished', request)
+        assert await waiter.await_navigation(activity, 'http://example.com/home')
+        assert activity.navigations == 1
+        assert 80 <= waiter.timings.average('example.com/home') < 400
+        waited, saved = activity.take()
+        assert waited >= 0.1 and saved == 0
+
+    asyncio.run(run())
+
+
+def test_pause_adaptive_and_fixed():
+    async def run():
+        page = FakePage()
+        waiter = AdaptiveWaiter(_budget())
+        activity = waiter.watch(page)
+        await asyncio.sleep(0.06)
+        waited = await waiter.pause(activity, 500)
+        assert waited < 0.2 and page.evaluated == 1
+        assert activity.take()[1] > 0.3
+
+        fixed = AdaptiveWaiter(_budget(adaptive=False))
+        activity = fixed.watch(page)
+        assert await fixed.pause(activity, 100) == 0.1
+        assert activity.take() == (0.1, 0.0)
+
+    asyncio.run(run())
+
+
+def test_explicit_sleep_is_not_shortened():
+    async def run():
+        page = FakePage()
+        waiter = AdaptiveWaiter(_budget())
+        activity = waiter.watch(page)
+        await asyncio.sleep(0.06)
+        start = time.monotonic()
+        # 步骤显式配置的 wait_time 即使页面已稳定也等满
+        assert await waiter.sleep(activity, 200) == 0.2
+        assert time.monotonic() - start >= 0.19
+        assert page.evaluated == 0
+        assert activity.take() == (0.2, 0.0)
+
+    asyncio.run(run())
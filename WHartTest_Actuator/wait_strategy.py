@@ -0,0 +1,348 @@
+"""
+UI自动化执行器 - 自适应等待
+
+隐式的固定等待（步骤间隔、重试间隔、页面跳转 2 秒探测、networkidle）在页面早已稳定时
+也会空等满时长，用例越长累计的空等越多。这里改为按页面事件判断何时可以继续：
+
+- 网络空闲: 监听 request/requestfinished/requestfailed，进行中请求为 0 且持续 network_quiet_ms
+  视为空闲；长连接/轮询请求超过 long_request_ms 后不再计入，避免永远等不到空闲
+- DOM 稳定: 页面内 MutationObserver 在 dom_stable_ms 内没有变化视为稳定
+- 页面跳转: 监听主 frame 的 framenavigated 事件，页面无网络活动时立即判定没有跳转，
+  不再每个页面步骤固定探测 2 秒
+- 跳转耗时学习: 按页面（去掉查询参数、数字路径段归一）记录跳转耗时的滑动平均，
+  作为该页面跳转检测的等待上限
+
+步骤上显式配置的 wait_time 是用户要求的等待（如等待动画、定时任务），始终固定等待满时长（sleep）。
+所有等待都计入 PageActivity 的账目（实际等待/相比固定等待节省的时间），由执行器写入步骤结果。
+adaptive=false 时保持原有的固定等待行为。
+"""
+
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('actuator')
+
+# 不计入网络空闲判断的请求类型（长连接）
+_IGNORED_RESOURCE_TYPES = {'websocket', 'eventsource'}
+
+# Playwright networkidle 要求的无请求时长(毫秒)，作为固定等待的对照
+NETWORKIDLE_QUIET_MS = 500
+
+# 原页面跳转探测的固定时长(毫秒)
+LEGACY_NAVIGATION_PROBE_MS = 2000
+
+# 页面内等待 DOM 在 quietMs 内无变化，最长 maxMs；返回实际等待毫秒数
+DOM_STABLE_SCRIPT = """
+([quietMs, maxMs]) => new Promise((resolve) => {
+    const start = performance.now();
+    let timer = null;
+    let observer = null;
+    const done = () => {
+        if (observer) observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(limit);
+        resolve(performance.now() - start);
+    };
+    const limit = setTimeout(done, maxMs);
+    const root = document.documentElement || document;
+    observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(done, quietMs);
+    });
+    observer.observe(root, {subtree: true, childList: true, attributes: true, characterData: true});
+    timer = setTimeout(done, quietMs);
+})
+"""
+
+_NUMERIC_SEGMENT = re.compile(r'^\d+$|^[0-9a-fA-F-]{32,36}$')
+
+
+def page_key(url: str) -> str:
+    """页面归一化标识: 去掉查询参数与锚点，数字/UUID 路径段替换为 *"""
+    if not url:
+        return ''
+    parts = urlsplit(url)
+    segments = ['*' if _NUMERIC_SEGMENT.match(s) else s for s in parts.path.rstrip('/').split('/')]
+    path = '/'.join(segments) or '/'
+    return f"{parts.netloc}{path}" if parts.netloc else path
+
+
+@dataclass
+class WaitBudget:
+    """自适应等待配置(毫秒)"""
+    adaptive: bool = True
+    network_quiet_ms: int = 300       # 无请求持续多久视为网络空闲
+    dom_stable_ms: int = 150          # DOM 无变化持续多久视为稳定(0 = 不检查)
+    settle_timeout_ms: int = 5000     # 页面步骤结束后等待稳定的上限
+    navigation_min_ms: int = 500      # 跳转检测上限的下界
+    navigation_max_ms: int = 10000    # 跳转检测上限的上界
+    long_request_ms: int = 5000       # 超过该时长的进行中请求视为长连接，不再计入
+
+
+class NavigationTimings:
+    """按页面学习的跳转耗时(毫秒, 指数滑动平均)
+
+    Args:
+        default_ms: 没有历史时的跳转检测上限
+        min_ms / max_ms: 上限的取值范围
+        factor: 上限 = 平均耗时 * factor，给波动留余量
+        alpha: 滑动平均的新样本权重
+    """
+
+    def __init__(self, default_ms: int = LEGACY_NAVIGATION_PROBE_MS, min_ms: int = 500,
+                 max_ms: int = 10000, factor: float = 2.0, alpha: float = 0.3):
+        self.default_ms = default_ms
+        self.min_ms = min_ms
+        self.max_ms = max(min_ms, max_ms)
+        self.factor = factor
+        self.alpha = alpha
+        self._averages: dict[str, float] = {}
+
+    def record(self, key: str, elapsed_ms: float) -> None:
+        if not key or elapsed_ms < 0:
+            return
+        previous = self._averages.get(key)
+        self._averages[key] = elapsed_ms if previous is None else previous + self.alpha * (elapsed_ms - previous)
+
+    def average(self, key: str) -> Optional[float]:
+        return self._averages.get(key)
+
+    def budget(self, key: str) -> int:
+        """该页面跳转检测的等待上限"""
+        average = self._averages.get(key)
+        if average is None:
+            return min(max(self.default_ms, self.min_ms), self.max_ms)
+        return int(min(max(average * self.factor, self.min_ms), self.max_ms))
+
+    def stats(self) -> dict:
+        return {key: round(value, 1) for key, value in self._averages.items()}
+
+
+class PageActivity:
+    """单个页面的网络/跳转事件跟踪与等待账目"""
+
+    def __init__(self, page, budget: WaitBudget, clock: Callable[[], float] = time.monotonic):
+        self.page = page
+        self.budget = budget
+        self._clock = clock
+        self._inflight: dict[int, float] = {}   # id(request) -> 开始时间
+        self.last_activity = clock()
+        self.navigations = 0
+        self._changed = asyncio.Event()
+        # 等待账目(秒)
+        self.waited = 0.0
+        self.saved = 0.0
+        page.on('request', self._on_request)
+        page.on('requestfinished', self._on_request_done)
+        page.on('requestfailed', self._on_request_done)
+        page.on('framenavigated', self._on_frame_navigated)
+
+    # ---------- 事件 ----------
+
+    def _notify(self) -> None:
+        self.last_activity = self._clock()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _on_request(self, request) -> None:
+        if getattr(request, 'resource_type', None) in _IGNORED_RESOURCE_TYPES:
+            return
+        self._inflight[id(request)] = self._clock()
+        self._notify()
+
+    def _on_request_done(self, request) -> None:
+        if self._inflight.pop(id(request), None) is not None:
+            self._notify()
+
+    def _on_frame_navigated(self, frame) -> None:
+        main_frame = getattr(self.page, 'main_frame', None)
+        if main_frame is not None and frame is not main_frame:
+            return
+        self.navigations += 1
+        self._notify()
+
+    # ---------- 状态 ----------
+
+    def busy_count(self, now: Optional[float] = None) -> int:
+        """进行中的请求数（不含超过 long_request_ms 的长连接）"""
+        now = self._clock() if now is None else now
+        threshold = self.budget.long_request_ms / 1000
+        return sum(1 for started in self._inflight.values() if now - started < threshold)
+
+    def is_quiet(self, now: Optional[float] = None) -> bool:
+        now = self._clock() if now is None else now
+        return self.busy_count(now) == 0 and (now - self.last_activity) * 1000 >= self.budget.network_quiet_ms
+
+    async def _wait_change(self, timeout: float) -> None:
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _next_check(self, now: float, deadline: float) -> float:
+        """下一次需要重新判断的等待秒数: 空闲窗口满、长请求过期或到达上限"""
+        if self.busy_count(now) == 0:
+            wait = self.budget.network_quiet_ms / 1000 - (now - self.last_activity)
+        else:
+            threshold = self.budget.long_request_ms / 1000
+            active = [started for started in self._inflight.values() if now - started < threshold]
+            wait = min(active) + threshold - now
+        return max(0.0, min(wait, deadline - now))
+
+    # ---------- 等待 ----------
+
+    async def wait_network_quiet(self, timeout_ms: float) -> bool:
+        """等待网络空闲，超时返回 False"""
+        deadline = self._clock() + timeout_ms / 1000
+        while True:
+            now = self._clock()
+            if self.is_quiet(now):
+                return True
+            if now >= deadline:
+                return False
+            await self._wait_change(self._next_check(now, deadline))
+
+    async def wait_dom_stable(self, timeout_ms: float) -> bool:
+        """等待 DOM 稳定；页面跳转导致执行上下文销毁时返回 False"""
+        quiet_ms = self.budget.dom_stable_ms
+        if quiet_ms <= 0 or timeout_ms <= 0:
+            return True
+        try:
+            await self.page.evaluate(DOM_STABLE_SCRIPT, [quiet_ms, int(timeout_ms)])
+            return True
+        except Exception as e:
+            logger.debug(f"等待 DOM 稳定中断: {e}")
+            return False
+
+    async def settle(self, timeout_ms: float) -> float:
+        """等待网络空闲 + DOM 稳定，最长 timeout_ms；返回实际等待秒数"""
+        start = self._clock()
+        if timeout_ms <= 0:
+            return 0.0
+        if await self.wait_network_quiet(timeout_ms):
+            remaining = timeout_ms - (self._clock() - start) * 1000
+            await self.wait_dom_stable(remaining)
+        return self._clock() - start
+
+    async def wait_for_navigation(self, since: int, timeout_ms: float) -> bool:
+        """等待 since 计数之后的页面跳转
+
+        已跳转立即返回 True；页面没有网络活动（不会再发生跳转）立即返回 False；
+        否则等到跳转事件、网络空闲或超时。
+        """
+        deadline = self._clock() + timeout_ms / 1000
+        while True:
+            if self.navigations > since:
+                return True
+            now = self._clock()
+            if self.is_quiet(now) or now >= deadline:
+                return False
+            await self._wait_change(self._next_check(now, deadline))
+
+    # ---------- 账目 ----------
+
+    def charge(self, waited: float, baseline: Optional[float] = None) -> None:
+        """记录一次等待(秒)；baseline 为固定等待方式下的耗时，用于计算节省时间"""
+        self.waited += waited
+        if baseline is not None:
+            self.saved += max(0.0, baseline - waited)
+
+    def take(self) -> tuple[float, float]:
+        """取出并清零账目 (等待秒数, 节省秒数)"""
+        waited, saved = self.waited, self.saved
+        self.waited = self.saved = 0.0
+        return waited, saved
+
+
+class AdaptiveWaiter:
+    """执行器级别的等待策略，持有跨用例学习的页面跳转耗时"""
+
+    def __init__(self, budget: Optional[WaitBudget] = None):
+        self.budget = budget or WaitBudget()
+        self.timings = NavigationTimings(
+            min_ms=self.budget.navigation_min_ms,
+            max_ms=self.budget.navigation_max_ms,
+        )
+
+    def watch(self, page) -> PageActivity:
+        """开始跟踪页面事件"""
+        return PageActivity(page, self.budget)
+
+    async def sleep(self, activity: PageActivity, duration_ms: float) -> float:
+        """显式等待 duration_ms（步骤 wait_time）：任何模式下都等满时长"""
+        if duration_ms <= 0:
+            return 0.0
+        await activity.page.wait_for_timeout(int(duration_ms))
+        activity.charge(duration_ms / 1000)
+        return duration_ms / 1000
+
+    async def pause(self, activity: PageActivity, budget_ms: float) -> float:
+        """替代隐式的固定等待 budget_ms（步骤间隔、重试间隔）: 自适应模式下页面稳定即返回"""
+        if budget_ms <= 0:
+            return 0.0
+        if not self.budget.adaptive:
+            await activity.page.wait_for_timeout(int(budget_ms))
+            activity.charge(budget_ms / 1000)
+            return budget_ms / 1000
+        waited = await activity.settle(budget_ms)
+        activity.charge(waited, budget_ms / 1000)
+        return waited
+
+    async def goto(self, activity: PageActivity, url: str) -> None:
+        """打开页面并等待稳定（替代 wait_until="networkidle"）"""
+        if not self.budget.adaptive:
+            await activity.page.goto(url, wait_until="networkidle")
+            return
+        await activity.page.goto(url, wait_until="domcontentloaded")
+        waited = await activity.settle(self.budget.settle_timeout_ms)
+        activity.charge(waited, NETWORKIDLE_QUIET_MS / 1000)
+
+    async def settle_page(self, activity: PageActivity) -> float:
+        """页面步骤执行完毕后等待页面稳定（替代 load + networkidle）"""
+        if not self.budget.adaptive:
+            start = time.monotonic()
+            try:
+                await activity.page.wait_for_load_state("load", timeout=10000)
+                await activity.page.wait_for_load_state("networkidle", timeout=10000)
+            finally:
+                waited = time.monotonic() - start
+                activity.charge(waited)
+            return waited
+        waited = await activity.settle(self.budget.settle_timeout_ms)
+        activity.charge(waited, NETWORKIDLE_QUIET_MS / 1000)
+        return waited
+
+    async def await_navigation(self, activity: PageActivity, page_url: str) -> bool:
+        """页面步骤开始前检测跳转（替代固定 2 秒的 wait_for_url 探测）
+
+        Args:
+            page_url: 本页面步骤期望的 URL，用于学习该页面的跳转耗时
+        """
+        start = time.monotonic()
+        if not self.budget.adaptive:
+            current_url = activity.page.url
+            try:
+                await activity.page.wait_for_url(lambda url: url != current_url, timeout=LEGACY_NAVIGATION_PROBE_MS)
+                navigated = True
+            except Exception:
+                navigated = False
+            activity.charge(time.monotonic() - start)
+            return navigated
+
+        key = page_key(page_url)
+        navigated = await activity.wait_for_navigation(activity.navigations, self.timings.budget(key))
+        if navigated:
+            # 学习从开始检测到跳转发生的耗时，再等待新页面稳定
+            self.timings.record(key, (time.monotonic() - start) * 1000)
+            await activity.settle(self.budget.settle_timeout_ms)
+            activity.charge(time.monotonic() - start)
+        else:
+            activity.charge(time.monotonic() - start, LEGACY_NAVIGATION_PROBE_MS / 1000)
+        return navigated
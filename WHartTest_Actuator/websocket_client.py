@@ -72,12 +72,17 @@ class WebSocketClient:
         self.reconnect_interval = 5  # 重连间隔(秒)
         self.max_reconnect_attempts = 0  # 0表示无限重试
         self._message_handler: Optional[Callable] = None
+        self._info_provider: Optional[Callable[[], dict]] = None
         self._stop_event = asyncio.Event()
 
     def set_message_handler(self, handler: Callable[[SocketDataModel], Any]):
         """设置消息处理器"""
         self._message_handler = handler
 
+    def set_info_provider(self, provider: Callable[[], dict]):
+        """设置执行器信息补充项（如实时容量），每次连接/重连时随执行器信息上报"""
+        self._info_provider = provider
+
     async def connect(self) -> bool:
         """建立WebSocket连接"""
         try:
@@ -125,6 +130,12 @@ class WebSocketClient:
             actuator_info['browser_type'] = getattr(self.config, 'browser_type', 'chromium')
             actuator_info['headless'] = getattr(self.config, 'headless', False)
 
+        if self._info_provider:
+            try:
+                actuator_info.update(self._info_provider())
+            except Exception as e:
+                logger.warning(f"获取执行器补充信息失败: {e}")
+
         await self.send(SocketDataModel(
             code=ResponseCode.SUCCESS,
             msg='设置执行器信息',
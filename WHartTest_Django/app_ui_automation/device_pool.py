@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+"""APPUI 设备池调度
+
+批量执行原先在一个 Celery worker 里逐个同步执行脚本，只用到一台设备。设备池：
+
+- 设备租约：批次开始时占用同项目、同平台的设备（AppUiDevice 上的条件更新），调度线程定期续期，
+  持有者异常退出时租约到期自动释放；调试执行同样先占用设备，同一台设备不会被同时使用
+- 并行分发：每台设备一个执行槽，空闲设备领取下一个脚本；每个脚本在独立进程中执行，
+  使用各自的 airtest 日志目录（airtest 的设备连接与日志目录是进程级全局状态）
+- 设备级失败重试：设备连接失败或执行进程异常退出时，该次执行记录标记为取消，脚本换一台设备重试；
+  健康检查不通过的设备移出本批次并标记为离线
+- 实时统计：每个脚本完成即原子累加批次的成功/失败数
+
+数据库读写都在调度线程中进行，设备执行槽只等待执行进程（或测试中的假设备）结束。
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AppUiDevice, AppUiExecutionRecord, AppUiScript
+
+logger = logging.getLogger(__name__)
+
+# 执行进程因设备连接失败退出时的退出码（EX_TEMPFAIL）
+DEVICE_ERROR_EXIT_CODE = 75
+
+
+@dataclass
+class ScriptRun:
+    """一次脚本执行的结果
+
+    Attributes:
+        device_error: 设备级失败（脚本未能在该设备上执行完），可换设备重试
+        status: 执行器直接给出的记录状态；为 None 时以执行进程写入的记录为准
+        error: 失败原因
+    """
+    device_error: bool = False
+    status: Optional[int] = None
+    error: str = ''
+
+
+class AirtestProcessRunner:
+    """在独立进程中执行脚本（manage.py run_app_ui_script）
+
+    Args:
+        timeout: 单个脚本的最长执行时间（秒），超时后终止进程并记为失败
+    """
+
+    def __init__(self, timeout: int = 3600):
+        self.timeout = timeout
+        self._processes: set = set()
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def healthy(self, device) -> bool:
+        """设备健康检查：Android 设备通过 adb 确认处于 device 状态，其他平台交给连接阶段判断"""
+        if device is None or device.platform != 'android':
+            return True
+        serial = device.device_serial or urlparse(device.device_uri).path.lstrip('/')
+        if not serial:
+            return True
+        try:
+            from airtest.core.android.adb import ADB
+        except ImportError:
+            return True
+        try:
+            adb = ADB(serialno=serial)
+            if ':' in serial:
+                adb.connect()
+            return adb.get_status() == 'device'
+        except Exception as e:
+            logger.warning(f"设备健康检查失败 {device.name}: {e}")
+            return False
+
+    def run(self, record_id: int, device) -> ScriptRun:
+        cmd = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'run_app_ui_script', str(record_id)]
+        with self._lock:
+            if self._stopped:
+                return ScriptRun(device_error=True, error='批量执行已中止')
+            process = subprocess.Popen(
+                cmd, cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+            )
+            self._processes.add(process)
+        try:
+            _, stderr = process.communicate(timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            return ScriptRun(status=3, error=f'脚本执行超过 {self.timeout} 秒，进程已终止')
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+        if process.returncode == 0:
+            return ScriptRun()
+        tail = (stderr or '').strip()[-500:]
+        if process.returncode == DEVICE_ERROR_EXIT_CODE:
+            return ScriptRun(device_error=True, error=tail or '设备连接失败')
+        return ScriptRun(device_error=True, error=f'执行进程异常退出 (exit={process.returncode}): {tail}')
+
+    def stop(self) -> None:
+        """终止所有执行中的进程，之后不再启动新进程"""
+        with self._lock:
+            self._stopped = True
+            for process in self._processes:
+                process.kill()
+
+
+def wait_for_lease(device, owner: str, ttl: int, timeout: float = 0, interval: float = 5) -> bool:
+    """占用设备，设备被占用时最多等待 timeout 秒"""
+    deadline = time.monotonic() + timeout
+    while not device.acquire_lease(owner, ttl):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+@dataclass
+class _PendingScript:
+    script_id: int
+    platform: str
+    attempt: int = 1
+    tried: set = field(default_factory=set)
+
+
+class DeviceFarm:
+    """在设备池上并行执行批量脚本
+
+    Args:
+        batch: 批量执行记录
+        runner: 脚本执行器，提供 healthy(device)、run(record_id, device) -> ScriptRun、stop()
+        lease_ttl: 设备租约时长（秒）
+        max_attempts: 脚本遇到设备级失败时的最多执行次数
+        trigger_type: 执行记录的触发类型
+    """
+
+    def __init__(self, batch, runner, lease_ttl: int = 600, max_attempts: int = 2,
+                 trigger_type: str = 'scheduled'):
+        self.batch = batch
+        self.runner = runner
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max(1, max_attempts)
+        self.trigger_type = trigger_type
+        self.owner = f"batch-{batch.id}-{uuid.uuid4().hex[:8]}"
+        self.slots: list = []  # 本批次持有的设备（None 表示不指定设备，由 airtest 连接默认设备）
+        self.retried = 0
+        self._candidates: list = []
+        self._lost: set = set()
+
+    # ---------- 设备 ----------
+
+    @staticmethod
+    def _key(device) -> int:
+        return device.id if device is not None else 0
+
+    def select_devices(self, scripts: list, device_id: Optional[int] = None, farm: bool = True) -> list:
+        """候选设备：指定设备排在最前；启用设备池时加入同项目、同平台的其他在线设备（离线设备不参与）"""
+        anchor = AppUiDevice.objects.filter(id=device_id).first() if device_id else None
+        if not farm:
+            return [anchor]
+        project_ids = {script.project_id for script in scripts}
+        platforms = {script.platform for script in scripts}
+        devices = list(
+            AppUiDevice.objects.filter(project_id__in=project_ids, platform__in=platforms)
+            .exclude(id=device_id or 0).exclude(status='offline').order_by('-is_default', 'id')
+        )
+        if anchor is not None:
+            devices.insert(0, anchor)
+        return devices or [None]
+
+    def _acquire(self, devices: list) -> list:
+        """占用空闲设备并做健康检查，返回可用的设备"""
+        acquired = [device for device in devices if device is None or device.acquire_lease(self.owner, self.lease_ttl)]
+        if not acquired:
+            return []
+        with ThreadPoolExecutor(max_workers=len(acquired)) as pool:
+            health = list(pool.map(self.runner.healthy, acquired))
+        usable = []
+        for device, ok in zip(acquired, health):
+            if ok:
+                usable.append(device)
+            else:
+                logger.warning(f"设备 {device.name} 健康检查未通过，标记为离线")
+                device.release_lease(self.owner, status='offline')
+        return usable
+
+    def _renew(self, pending: deque) -> list:
+        """续期租约；仍有待执行脚本时尝试占用其他批次释放的候选设备，返回新加入的设备"""
+        for device in self.slots:
+            if device is not None and not device.renew_lease(self.owner, self.lease_ttl):
+                logger.warning(f"设备 {device.name} 租约已失效，当前脚本结束后不再使用")
+                self._lost.add(device.id)
+        if not pending:
+            return []
+        held = {self._key(device) for device in self.slots}
+        added = self._acquire([device for device in self._candidates if self._key(device) not in held])
+        self.slots.extend(added)
+        return added
+
+    def _drop(self, device, status: Optional[str] = None) -> None:
+        self.slots.remove(device)
+        if device is not None:
+            device.release_lease(self.owner, status=status)
+
+    # ---------- 脚本 ----------
+
+    def _accepts(self, device, item: _PendingScript) -> bool:
+        if self._key(device) in item.tried:
+            return False
+        return device is None or device.platform == item.platform
+
+    def _take(self, pending: deque, device) -> Optional[_PendingScript]:
+        for item in pending:
+            if self._accepts(device, item):
+                pending.remove(item)
+                return item
+        return None
+
+    def _create_record(self, item: _PendingScript, device, **fields):
+        return AppUiExecutionRecord.objects.create(
+            batch=self.batch, script_id=item.script_id, device=device,
+            trigger_type=self.trigger_type, executor=self.batch.executor, **fields,
+        )
+
+    def _fail(self, item: _PendingScript, error: str) -> None:
+        now = timezone.now()
+        self._create_record(item, None, status=3, error_message=error, start_time=now, end_time=now)
+        self.batch.count_result(False)
+
+    def _prune(self, pending: deque) -> None:
+        """没有任何设备能执行的脚本直接记为失败"""
+        for item in list(pending):
+            if not any(self._accepts(device, item) for device in self.slots):
+                pending.remove(item)
+                self._fail(item, f"没有可用的 {item.platform} 设备")
+
+    def _finish(self, run: ScriptRun, device, item: _PendingScript, record, pending: deque) -> bool:
+        """处理一次执行结果，返回设备是否可以继续领取脚本"""
+        if run.status is not None:
+            fields = {'status': run.status, 'end_time': timezone.now()}
+            if run.error:
+                fields['error_message'] = run.error
+            AppUiExecutionRecord.objects.filter(pk=record.pk).update(**fields)
+        record.refresh_from_db(fields=['status', 'error_message'])
+
+        device_error = run.device_error
+        if not device_error and record.status in (0, 1):
+            device_error, run.error = True, '执行进程已退出但未写入执行结果'
+        if not device_error:
+            if record.status in (2, 3):
+                self.batch.count_result(record.status == 2)
+            return self._key(device) not in self._lost
+
+        item.tried.add(self._key(device))
+        healthy = self.runner.healthy(device)
+        if not healthy:
+            logger.warning(f"设备 {device.name} 执行失败后健康检查未通过，移出批次 {self.batch.id}")
+            self._drop(device, status='offline')
+        retry = item.attempt < self.max_attempts and any(self._accepts(d, item) for d in self.slots)
+        if retry:
+            self.retried += 1
+            error = f"{run.error}；已转到其他设备重试"
+            pending.appendleft(_PendingScript(item.script_id, item.platform, item.attempt + 1, item.tried))
+        else:
+            error = run.error
+        AppUiExecutionRecord.objects.filter(pk=record.pk).update(
+            status=4 if retry else 3, error_message=error, end_time=timezone.now(),
+        )
+        if not retry:
+            self.batch.count_result(False)
+        return healthy and self._key(device) not in self._lost
+
+    # ---------- 调度 ----------
+
+    def run(self, script_ids: list[int], device_id: Optional[int] = None, farm: bool = True,
+            lease_wait: float = 0) -> dict:
+        """执行批量脚本，全部结束（或被中止）后返回"""
+        scripts = AppUiScript.objects.in_bulk(script_ids)
+        missing = [script_id for script_id in script_ids if script_id not in scripts]
+        if missing:
+            logger.warning(f"批次 {self.batch.id} 中的脚本不存在: {missing}")
+        pending = deque(
+            _PendingScript(script_id, scripts[script_id].platform)
+            for script_id in script_ids if script_id in scripts
+        )
+
+        self._candidates = self.select_devices(list(scripts.values()), device_id, farm)
+        deadline = time.monotonic() + lease_wait
+        self.slots = self._acquire(self._candidates)
+        while not self.slots and pending and time.monotonic() < deadline:
+            time.sleep(min(5, max(0, deadline - time.monotonic())))
+            self.slots = self._acquire(self._candidates)
+        logger.info(f"批次 {self.batch.id} 占用设备 {len(self.slots)}/{len(self._candidates)} 台, 脚本 {len(pending)} 个")
+
+        tick = max(1, min(self.lease_ttl / 3, 60))
+        executor = ThreadPoolExecutor(max_workers=len(self._candidates), thread_name_prefix=f'appui-batch-{self.batch.id}')
+        idle = list(self.slots)
+        inflight = {}
+        used = set()
+        next_renew = time.monotonic() + tick
+        try:
+            while pending or inflight:
+                self._prune(pending)
+                for device in list(idle):
+                    if self._key(device) in self._lost:
+                        idle.remove(device)
+                        self._drop(device)
+                        continue
+                    item = self._take(pending, device)
+                    if item is None:
+                        continue
+                    idle.remove(device)
+                    used.add(self._key(device))
+                    record = self._create_record(item, device, status=0)
+                    future = executor.submit(self._run_safely, record.id, device)
+                    inflight[future] = (device, item, record)
+                if not inflight:
+                    break
+
+                done, _ = wait(inflight, timeout=tick, return_when=FIRST_COMPLETED)
+                if time.monotonic() >= next_renew:
+                    idle.extend(self._renew(pending))
+                    next_renew = time.monotonic() + tick
+                for future in done:
+                    device, item, record = inflight.pop(future)
+                    if self._finish(future.result(), device, item, record, pending):
+                        idle.append(device)
+                    elif device in self.slots:
+                        self._drop(device)
+        finally:
+            if inflight:
+                self.runner.stop()
+                AppUiExecutionRecord.objects.filter(
+                    pk__in=[record.pk for _, _, record in inflight.values()], status__in=[0, 1],
+                ).update(status=3, error_message='批量执行已中止', end_time=timezone.now())
+            executor.shutdown(wait=False, cancel_futures=True)
+            for device in list(self.slots):
+                self._drop(device)
+
+        summary = {'devices': len(used), 'retried': self.retried}
+        logger.info(f"批次 {self.batch.id} 设备池执行结束: {summary}")
+        return summary
+
+    def _run_safely(self, record_id: int, device) -> ScriptRun:
+        try:
+            return self.runner.run(record_id, device)
+        except Exception as e:
+            logger.exception(f"执行记录 {record_id} 启动失败: {e}")
+            return ScriptRun(device_error=True, error=str(e))
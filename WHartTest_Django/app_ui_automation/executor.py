@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 """APPUI 脚本执行引擎
 
-三步管线:
-  STEP 1: airtest Python 库执行脚本 -> 写 log.txt
+管线:
+  STEP 1: airtest Python 库执行脚本 -> 写 log.txt，解析步骤统计并写入执行结果
+  报告后处理（render_app_ui_report 任务，可路由到独立队列，不占用设备）:
   STEP 2: AirtestIDE reporter 生成 HTML 报告 -> 用自定义模板
   STEP 3: pack_html() 打包 Standalone HTML -> 内联所有资源
+  STEP 4: 常驻浏览器截图 -> 内存中压缩到 18KB 以下（用于飞书通知）
 """
 
 import os
@@ -49,11 +51,21 @@ def _apply_poco_patch():
         pass
 
 
+class DeviceUnavailableError(RuntimeError):
+    """设备连接失败（脚本尚未开始执行），可换一台设备重试"""
+
+
 class AppUiScriptExecutor:
     """APPUI 脚本执行引擎"""
 
-    def execute(self, execution_record_id):
-        """执行脚本主入口"""
+    def execute(self, execution_record_id, raise_device_error=False):
+        """执行脚本主入口
+
+        Args:
+            execution_record_id: 执行记录 ID
+            raise_device_error: 设备连接失败时跳过报告生成并抛出 DeviceUnavailableError
+                （记录已标记失败），由设备池换设备重试
+        """
         record = AppUiExecutionRecord.objects.get(id=execution_record_id)
 
         # 如果记录已被取消（revoke 可能未阻止已排队的任务），跳过执行
@@ -74,8 +86,6 @@ class AppUiScriptExecutor:
         # 准备工作目录
         work_dir = self._prepare_work_dir(record)
         log_dir = work_dir / "log"
-        report_dir = work_dir / "report"
-        standalone_dir = work_dir / "standalone"
 
         try:
             # STEP 1: 用 airtest Python 库执行脚本
@@ -86,6 +96,10 @@ class AppUiScriptExecutor:
             try:
                 self._run_script_with_airtest(script, device, log_dir)
             except Exception as run_err:
+                if raise_device_error and isinstance(run_err, DeviceUnavailableError):
+                    record.status = 3
+                    record.error_message = str(run_err)
+                    raise
                 execution_error = run_err
                 import traceback as _tb
                 execution_traceback = _tb.format_exc()
@@ -93,21 +107,12 @@ class AppUiScriptExecutor:
                     f"脚本执行出错: {run_err}, 将基于已写入的日志继续生成测试报告"
                 )
 
-            # STEP 2: 用 AirtestIDE reporter 生成报告
-            html_dir = self._generate_report(script, log_dir, report_dir)
-
-            # STEP 3: 打包 Standalone HTML
-            standalone_path = self._pack_html(html_dir, standalone_dir)
-
-            # STEP 4: 生成报告截图（用于飞书通知）
-            self._generate_screenshot(standalone_path)
-
             # 解析日志统计
             stats = self._parse_log_stats(log_dir)
 
-            # 更新记录
-            record.report_path = str(standalone_path.relative_to(settings.MEDIA_ROOT))
+            # 更新记录；报告（STEP 2-4）由后处理任务生成，不占用设备
             record.log_dir = str(log_dir.relative_to(settings.MEDIA_ROOT))
+            record.report_status = 'pending'
             record.total_steps = stats['total']
             record.passed_steps = stats['passed']
             record.failed_steps = stats['failed']
@@ -120,8 +125,10 @@ class AppUiScriptExecutor:
             else:
                 record.status = 2 if stats['failed'] == 0 else 3
 
+        except DeviceUnavailableError:
+            raise
+
         except Exception as e:
-            # 报告生成阶段失败（脚本执行可能已成功，也可能已失败）
             record.status = 3
             record.error_message = str(e)
             import traceback
@@ -137,6 +144,52 @@ class AppUiScriptExecutor:
             script.status = 'success' if record.status == 2 else 'failed'
             script.save()
 
+        if record.report_status == 'pending':
+            self._schedule_report(record)
+
+    def _schedule_report(self, record):
+        """提交报告后处理任务；无法提交（如 broker 不可用）时同步生成"""
+        from .tasks import render_app_ui_report
+        try:
+            render_app_ui_report.delay(record.id)
+        except Exception as e:
+            logger.warning(f"报告生成任务提交失败, 改为同步生成: {e}")
+            self.render_report(record.id)
+
+    def render_report(self, execution_record_id):
+        """报告后处理: 生成 HTML 报告、打包 Standalone HTML、生成通知截图
+
+        只更新报告相关字段，执行结果在脚本结束时已经写入；报告生成失败不影响执行状态。
+        """
+        record = AppUiExecutionRecord.objects.select_related('script', 'script__project').get(id=execution_record_id)
+        if not record.log_dir:
+            return
+        records = AppUiExecutionRecord.objects.filter(pk=record.pk)
+        records.update(report_status='rendering')
+
+        work_dir = self._prepare_work_dir(record)
+        log_dir = Path(settings.MEDIA_ROOT) / record.log_dir
+        try:
+            # STEP 2: 用 AirtestIDE reporter 生成报告
+            html_dir = self._generate_report(record.script, log_dir, work_dir / "report")
+
+            # STEP 3: 打包 Standalone HTML
+            standalone_path = self._pack_html(html_dir, work_dir / "standalone")
+
+            # STEP 4: 生成报告截图（用于飞书通知）
+            self._generate_screenshot(standalone_path)
+        except Exception as e:
+            logger.warning(f"报告生成失败, record_id={record.id}: {e}")
+            import traceback
+            log = f"{record.execution_log}\n\n" if record.execution_log else ''
+            records.update(report_status='failed', execution_log=f"{log}报告生成失败:\n{traceback.format_exc()}")
+            return
+
+        records.update(
+            report_status='ready',
+            report_path=str(standalone_path.relative_to(settings.MEDIA_ROOT)),
+        )
+
     def _prepare_work_dir(self, record):
         """准备工作目录"""
         work_dir = Path(settings.MEDIA_ROOT) / 'app_ui_reports' / str(record.script.project.id) / str(record.id)
@@ -183,7 +236,10 @@ class AppUiScriptExecutor:
         # 连接设备
         if device:
             self._ensure_device_connected(device.device_uri)
-            connect_device(device.device_uri)
+            try:
+                connect_device(device.device_uri)
+            except Exception as e:
+                raise DeviceUnavailableError(f"设备连接失败 ({device.name}): {e}") from e
 
         # 执行脚本
         script_path = os.path.join(settings.MEDIA_ROOT, script.script_dir, script.script_entry)
@@ -310,45 +366,16 @@ class AppUiScriptExecutor:
         return out_path
 
     def _generate_screenshot(self, html_path):
-        """使用 Playwright 将报告 HTML 转为截图，并压缩到 18KB 以下"""
+        """使用常驻浏览器将报告 HTML 转为截图，并压缩到 18KB 以下"""
         screenshot_path = html_path.with_suffix('.jpg')
         try:
-            from playwright.sync_api import sync_playwright
+            from .report_renderer import compress_screenshot, get_report_browser
 
-            with sync_playwright() as p:
-                browser = p.chromium.launch()
-                page = browser.new_page(viewport={'width': 800, 'height': 600})
-                page.goto(f'file://{html_path}')
-                page.screenshot(path=str(screenshot_path), full_page=True)
-                browser.close()
-
-            self._compress_screenshot(screenshot_path)
+            screenshot_path.write_bytes(compress_screenshot(get_report_browser().screenshot(html_path)))
             logger.info(f"报告截图已生成: {screenshot_path}")
         except Exception as e:
             logger.warning(f"生成报告截图失败: {e}")
 
-    def _compress_screenshot(self, image_path, max_size=18 * 1024):
-        """将图片压缩到 max_size 字节以下"""
-        from PIL import Image
-
-        img = Image.open(image_path)
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-
-        for scale in [1.0, 0.75, 0.5, 0.35, 0.25]:
-            new_w = int(img.width * scale)
-            new_h = int(img.height * scale)
-            resized = img.resize((new_w, new_h), Image.LANCZOS)
-            for quality in [85, 70, 55, 40, 25]:
-                resized.save(str(image_path), 'JPEG', quality=quality)
-                if os.path.getsize(image_path) <= max_size:
-                    return
-
-        # 兜底：缩到 20% 并用最低质量
-        img.resize(
-            (int(img.width * 0.2), int(img.height * 0.2)), Image.LANCZOS
-        ).save(str(image_path), 'JPEG', quality=20)
-
     def _parse_log_stats(self, log_dir):
         """解析 log.txt 统计步骤数"""
         log_file = log_dir / "log.txt"
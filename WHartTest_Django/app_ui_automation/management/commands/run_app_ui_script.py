@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""在独立进程中执行单个 APPUI 脚本（设备池为每台设备启动一个进程）
+
+airtest 的设备连接、日志目录和全局配置都是进程级状态，多台设备并行执行时
+每个脚本必须运行在自己的进程里。设备连接失败时以 DEVICE_ERROR_EXIT_CODE 退出，
+由设备池换一台设备重试。
+"""
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from app_ui_automation.device_pool import DEVICE_ERROR_EXIT_CODE
+from app_ui_automation.executor import AppUiScriptExecutor, DeviceUnavailableError
+
+
+class Command(BaseCommand):
+    help = '执行单条 APPUI 执行记录（供设备池调用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('record_id', type=int, help='APPUI 执行记录 ID')
+
+    def handle(self, *args, **options):
+        try:
+            AppUiScriptExecutor().execute(options['record_id'], raise_device_error=True)
+        except DeviceUnavailableError as e:
+            self.stderr.write(str(e))
+            sys.exit(DEVICE_ERROR_EXIT_CODE)
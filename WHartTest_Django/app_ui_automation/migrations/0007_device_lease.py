@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_ui_automation', '0006_register_apk_cleanup_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appuidevice',
+            name='lease_owner',
+            field=models.CharField(blank=True, default='', help_text='批量执行时占用该设备的批次标识', max_length=100, verbose_name='占用者'),
+        ),
+        migrations.AddField(
+            model_name='appuidevice',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='占用到期时间'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_ui_automation', '0007_device_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appuiexecutionrecord',
+            name='report_status',
+            field=models.CharField(blank=True, choices=[('', '无'), ('pending', '待生成'), ('rendering', '生成中'), ('ready', '已生成'), ('failed', '生成失败')], default='', help_text='报告在脚本执行结束后由后处理任务生成', max_length=10, verbose_name='报告状态'),
+        ),
+    ]
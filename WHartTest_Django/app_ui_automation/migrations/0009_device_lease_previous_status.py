@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_ui_automation', '0008_execution_report_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appuidevice',
+            name='lease_previous_status',
+            field=models.CharField(blank=True, default='', help_text='释放租约时恢复的设备状态', max_length=10, verbose_name='占用前状态'),
+        ),
+    ]
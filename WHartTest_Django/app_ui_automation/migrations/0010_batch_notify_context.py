@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_ui_automation', '0009_device_lease_previous_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appuibatchexecutionrecord',
+            name='notify_context',
+            field=models.JSONField(blank=True, help_text='定时任务的通知参数，批次报告全部生成后发送通知并清空', null=True, verbose_name='待发送通知'),
+        ),
+    ]
@@ -2,6 +2,7 @@
 """APPUI 自动化数据模型"""
 
 import os
+from datetime import timedelta
 
 from django.conf import settings
 from django.db import models
@@ -133,6 +134,11 @@ class AppUiDevice(models.Model):
         choices=STATUS_CHOICES, default='offline')
     description = models.TextField(_('设备描述'), blank=True, null=True)
     is_default = models.BooleanField(_('是否默认'), default=False)
+    lease_owner = models.CharField(_('占用者'), max_length=100, blank=True, default='',
+        help_text=_('批量执行时占用该设备的批次标识'))
+    lease_expires_at = models.DateTimeField(_('占用到期时间'), null=True, blank=True)
+    lease_previous_status = models.CharField(_('占用前状态'), max_length=10, blank=True, default='',
+        help_text=_('释放租约时恢复的设备状态'))
     creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True,
         related_name='created_app_ui_devices', verbose_name=_('创建人'))
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
@@ -148,6 +154,56 @@ class AppUiDevice(models.Model):
     def __str__(self):
         return f"{self.project.name} - {self.name}"
 
+    @staticmethod
+    def _lease_free(now):
+        return models.Q(lease_owner='') | models.Q(lease_expires_at__isnull=True) | models.Q(lease_expires_at__lt=now)
+
+    def acquire_lease(self, owner, ttl):
+        """占用设备（条件更新，多个 worker 进程并发抢占时只有一个成功）
+
+        租约到期未续期视为持有者已退出，其他批次可以重新占用。
+        占用前的状态记入 lease_previous_status（接管过期租约时保留原记录），释放时恢复。
+        """
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=ttl)
+        acquired = AppUiDevice.objects.filter(pk=self.pk).filter(
+            self._lease_free(now) | models.Q(lease_owner=owner)
+        ).update(
+            lease_owner=owner, lease_expires_at=expires_at, status='busy',
+            lease_previous_status=models.Case(
+                models.When(status='busy', then=models.F('lease_previous_status')),
+                default=models.F('status'),
+            ),
+        )
+        if acquired:
+            self.refresh_from_db(fields=['lease_owner', 'lease_expires_at', 'status', 'lease_previous_status'])
+        return bool(acquired)
+
+    def renew_lease(self, owner, ttl):
+        """续期租约，返回是否仍由 owner 持有"""
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        renewed = AppUiDevice.objects.filter(pk=self.pk, lease_owner=owner).update(lease_expires_at=expires_at)
+        if renewed:
+            self.lease_expires_at = expires_at
+        return bool(renewed)
+
+    def release_lease(self, owner, status=None):
+        """释放租约（仅释放 owner 自己持有的）
+
+        Args:
+            status: 释放后的设备状态；为 None 时恢复占用前的状态（无记录时为 online）
+        """
+        if status is None:
+            status = models.Case(
+                models.When(lease_previous_status='', then=models.Value('online')),
+                default=models.F('lease_previous_status'),
+            )
+        released = AppUiDevice.objects.filter(pk=self.pk, lease_owner=owner).update(
+            lease_owner='', lease_expires_at=None, status=status, lease_previous_status='',
+        )
+        if released:
+            self.refresh_from_db(fields=['lease_owner', 'lease_expires_at', 'status', 'lease_previous_status'])
+
 
 class AppUiBatchExecutionRecord(models.Model):
     """APPUI 批量执行记录"""
@@ -169,6 +225,8 @@ class AppUiBatchExecutionRecord(models.Model):
     start_time = models.DateTimeField(_('开始时间'), null=True, blank=True)
     end_time = models.DateTimeField(_('结束时间'), null=True, blank=True)
     duration = models.FloatField(_('总时长（秒）'), null=True, blank=True)
+    notify_context = models.JSONField(_('待发送通知'), null=True, blank=True,
+        help_text='定时任务的通知参数，批次报告全部生成后发送通知并清空')
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
 
     class Meta:
@@ -180,6 +238,11 @@ class AppUiBatchExecutionRecord(models.Model):
     def __str__(self):
         return f"{self.name} ({self.passed_scripts}/{self.total_scripts})"
 
+    def count_result(self, passed):
+        """脚本完成时实时累加批次统计（原子更新，多台设备同时完成时互不覆盖）"""
+        field = 'passed_scripts' if passed else 'failed_scripts'
+        AppUiBatchExecutionRecord.objects.filter(pk=self.pk).update(**{field: models.F(field) + 1})
+
     def update_statistics(self):
         records = self.execution_records.all()
         self.passed_scripts = records.filter(status=2).count()
@@ -203,6 +266,10 @@ class AppUiExecutionRecord(models.Model):
     """APPUI 脚本执行记录"""
     STATUS_CHOICES = [(0, _('等待中')), (1, _('执行中')), (2, _('成功')), (3, _('失败')), (4, _('取消'))]
     TRIGGER_TYPE_CHOICES = [('manual', _('手动')), ('scheduled', _('定时')), ('api', _('API')), ('debug', _('调试'))]
+    REPORT_STATUS_CHOICES = [
+        ('', _('无')), ('pending', _('待生成')), ('rendering', _('生成中')),
+        ('ready', _('已生成')), ('failed', _('生成失败')),
+    ]
 
     batch = models.ForeignKey(AppUiBatchExecutionRecord, on_delete=models.CASCADE,
         null=True, blank=True, related_name='execution_records', verbose_name=_('所属批次'))
@@ -219,6 +286,8 @@ class AppUiExecutionRecord(models.Model):
     passed_steps = models.IntegerField(_('通过步骤数'), default=0)
     failed_steps = models.IntegerField(_('失败步骤数'), default=0)
     report_path = models.CharField(_('报告文件路径'), max_length=500, blank=True, default='')
+    report_status = models.CharField(_('报告状态'), max_length=10, choices=REPORT_STATUS_CHOICES,
+        blank=True, default='', help_text=_('报告在脚本执行结束后由后处理任务生成'))
     log_dir = models.CharField(_('日志目录路径'), max_length=500, blank=True, default='')
     execution_log = models.TextField(_('执行日志'), blank=True, null=True)
     error_message = models.TextField(_('错误信息'), null=True, blank=True)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""APPUI 报告截图
+
+报告后处理任务（render_app_ui_report）在独立队列中执行，这里提供它用到的两部分：
+
+- 常驻浏览器：每个线程首次截图时启动一个 Chromium，之后每张截图只新开一个页面，
+  不再为每份报告启动/关闭浏览器；浏览器断开后下次截图自动重启
+- 截图压缩：在内存中二分查找满足体积上限的缩放比例与 JPEG 质量，不写临时文件
+"""
+
+import atexit
+import io
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 飞书消息卡片图片的体积上限
+SCREENSHOT_MAX_BYTES = 18 * 1024
+SCREENSHOT_VIEWPORT = {'width': 800, 'height': 600}
+
+MIN_QUALITY = 25
+MAX_QUALITY = 85
+MIN_SCALE_PERCENT = 20
+SCALE_STEP_PERCENT = 5
+
+
+class ReportBrowser:
+    """常驻 Chromium（Playwright 同步 API 的对象只能在创建它的线程中使用）"""
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+
+    def _ensure_browser(self):
+        if self._browser is None or not self._browser.is_connected():
+            self.close()
+            from playwright.sync_api import sync_playwright
+
+            self._playwright = sync_playwright().start()
+            self._browser = self._playwright.chromium.launch()
+            logger.info("报告截图浏览器已启动")
+        return self._browser
+
+    def screenshot(self, html_path) -> bytes:
+        """整页截图，返回 PNG 数据"""
+        page = self._ensure_browser().new_page(viewport=SCREENSHOT_VIEWPORT)
+        try:
+            page.goto(Path(html_path).resolve().as_uri())
+            return page.screenshot(full_page=True)
+        finally:
+            page.close()
+
+    def close(self) -> None:
+        try:
+            if self._browser is not None:
+                self._browser.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception as e:
+            logger.debug(f"关闭报告截图浏览器失败: {e}")
+        self._browser = None
+        self._playwright = None
+
+
+_local = threading.local()
+
+
+def get_report_browser() -> ReportBrowser:
+    """获取当前线程的常驻浏览器（进程退出时关闭）"""
+    browser = getattr(_local, 'browser', None)
+    if browser is None:
+        browser = _local.browser = ReportBrowser()
+        atexit.register(browser.close)
+    return browser
+
+
+def _resize(image, percent: float):
+    if percent >= 100:
+        return image
+    from PIL import Image
+
+    size = (max(1, int(image.width * percent / 100)), max(1, int(image.height * percent / 100)))
+    return image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+
+class _ScaledImage:
+    """按百分比缩放；不超过 50% 时从缓存的半尺寸图（box 缩小，开销很小）开始缩放"""
+
+    def __init__(self, image):
+        self.image = image
+        self._half = None
+
+    def scaled(self, percent: int):
+        if percent > 50:
+            return _resize(self.image, percent)
+        if self._half is None:
+            self._half = self.image.reduce(2)
+        return _resize(self._half, percent * 2)
+
+
+def _encode(image, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+def _highest_fit(values: list, encode, max_size: int):
+    """在升序的 values 中二分查找 encode 结果不超过 max_size 的最大取值，返回 (取值, 数据) 或 None"""
+    best = None
+    low, high = 0, len(values) - 1
+    while low <= high:
+        middle = (low + high) // 2
+        data = encode(values[middle])
+        if len(data) <= max_size:
+            best = (values[middle], data)
+            low = middle + 1
+        else:
+            high = middle - 1
+    return best
+
+
+def compress_screenshot(data: bytes, max_size: int = SCREENSHOT_MAX_BYTES) -> bytes:
+    """把截图压缩为不超过 max_size 字节的 JPEG
+
+    JPEG 体积随缩放比例和质量单调增长：原尺寸下最低质量即可满足时只二分查找质量；
+    否则先按最低质量二分查找最大缩放比例（5% 步长，以 50% 为第一个分界），
+    再在该比例下二分查找最高质量。
+    最小比例仍超限时返回最小比例、最低质量的结果。
+    """
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    qualities = list(range(MIN_QUALITY + 1, MAX_QUALITY + 1))
+
+    smallest = _encode(image, MIN_QUALITY)
+    if len(smallest) <= max_size:
+        fit = _highest_fit(qualities, lambda quality: _encode(image, quality), max_size)
+        return fit[1] if fit else smallest
+
+    # 先试探 50%：长截图通常要缩到一半以下，之后的试探都从半尺寸图缩放
+    source = _ScaledImage(image)
+
+    def probe(percent):
+        return _encode(source.scaled(percent), MIN_QUALITY)
+
+    half = probe(50)
+    if len(half) <= max_size:
+        fit = _highest_fit(list(range(50 + SCALE_STEP_PERCENT, 100, SCALE_STEP_PERCENT)), probe, max_size) or (50, half)
+    else:
+        fit = _highest_fit(list(range(MIN_SCALE_PERCENT, 50, SCALE_STEP_PERCENT)), probe, max_size)
+    if fit is None:
+        return _encode(source.scaled(MIN_SCALE_PERCENT), MIN_QUALITY)
+    percent, data = fit
+    resized = source.scaled(percent)
+    better = _highest_fit(qualities, lambda quality: _encode(resized, quality), max_size)
+    return better[1] if better else data
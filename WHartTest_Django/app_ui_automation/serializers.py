@@ -57,7 +57,7 @@ class AppUiDeviceSerializer(serializers.ModelSerializer):
     class Meta:
         model = AppUiDevice
         fields = '__all__'
-        read_only_fields = ['creator', 'created_at', 'updated_at']
+        read_only_fields = ['creator', 'lease_owner', 'lease_expires_at', 'created_at', 'updated_at']
 
 
 class AppUiExecutionRecordSerializer(serializers.ModelSerializer):
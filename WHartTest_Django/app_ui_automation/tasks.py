@@ -9,16 +9,89 @@ from django.utils import timezone
 
 from .models import AppUiExecutionRecord, AppUiBatchExecutionRecord, AppUiScript, AppPackageVersion
 from .executor import AppUiScriptExecutor
+from .device_pool import AirtestProcessRunner, DeviceFarm, wait_for_lease
 
 logger = logging.getLogger(__name__)
 
 
+@shared_task(
+    soft_time_limit=10 * 60,
+    time_limit=10 * 60 + 30,
+)
+def render_app_ui_report(execution_record_id):
+    """报告后处理：生成 HTML 报告与通知截图（路由到 app_ui_report 队列，worker 进程内复用浏览器）
+
+    批次的最后一份报告生成后，由这里发送定时任务通知（通知需要带上报告截图）。
+    """
+    AppUiScriptExecutor().render_report(execution_record_id)
+    batch_id = AppUiExecutionRecord.objects.filter(id=execution_record_id).values_list('batch_id', flat=True).first()
+    if batch_id:
+        _notify_batch(batch_id)
+
+
+@shared_task
+def notify_app_ui_batch(batch_record_id):
+    """批次报告迟迟未生成完（报告 worker 积压或异常退出）时的兜底：不再等待，直接发送通知"""
+    _notify_batch(batch_record_id, force=True)
+
+
+def _notify_batch(batch_id, force=False):
+    """批次报告全部生成（或 force）后发送待发送的定时任务通知
+
+    批次结束与每份报告生成后都会调用；通知参数通过条件 UPDATE 领取，只有一个调用方发送。
+    """
+    if not force and AppUiExecutionRecord.objects.filter(
+        batch_id=batch_id, report_status__in=['pending', 'rendering'],
+    ).exists():
+        return False
+    context = AppUiBatchExecutionRecord.objects.filter(
+        pk=batch_id, notify_context__isnull=False,
+    ).values_list('notify_context', flat=True).first()
+    if not context:
+        return False
+    claimed = AppUiBatchExecutionRecord.objects.filter(
+        pk=batch_id, notify_context__isnull=False,
+    ).update(notify_context=None)
+    if not claimed:
+        return False
+    batch = AppUiBatchExecutionRecord.objects.get(pk=batch_id)
+    _finalize_scheduled_execution(context['scheduled_task_id'], context['execution_id'], batch)
+    return True
+
+
+def _farm_settings():
+    from django.conf import settings
+    return {
+        'farm': getattr(settings, 'APP_UI_DEVICE_FARM', True),
+        'lease_ttl': getattr(settings, 'APP_UI_DEVICE_LEASE_TTL', 600),
+        'lease_wait': getattr(settings, 'APP_UI_DEVICE_LEASE_WAIT', 300),
+        'max_attempts': getattr(settings, 'APP_UI_SCRIPT_MAX_ATTEMPTS', 2),
+        'script_timeout': getattr(settings, 'APP_UI_SCRIPT_TIMEOUT', 3600),
+    }
+
+
 @shared_task
 def execute_app_ui_script(execution_record_id):
-    """执行单个 APPUI 脚本"""
+    """执行单个 APPUI 脚本（执行期间占用设备，避免与批量执行同时使用同一台设备）"""
     logger.info(f"开始执行 APPUI 脚本, record_id={execution_record_id}")
-    executor = AppUiScriptExecutor()
-    executor.execute(execution_record_id)
+    record = AppUiExecutionRecord.objects.select_related('device').get(id=execution_record_id)
+    device = record.device
+    owner = f"record-{record.id}"
+    if device is not None:
+        options = _farm_settings()
+        if not wait_for_lease(device, owner, options['script_timeout'] + 300, options['lease_wait']):
+            now = timezone.now()
+            AppUiExecutionRecord.objects.filter(pk=record.pk).update(
+                status=3, error_message=f"设备 {device.name} 正在被其他任务占用",
+                start_time=now, end_time=now,
+            )
+            return
+    try:
+        executor = AppUiScriptExecutor()
+        executor.execute(execution_record_id)
+    finally:
+        if device is not None:
+            device.release_lease(owner)
 
 
 @shared_task(
@@ -27,7 +100,10 @@ def execute_app_ui_script(execution_record_id):
 )
 def execute_app_ui_batch(batch_record_id, script_ids, device_id=None,
                          scheduled_task_id=None, execution_id=None):
-    """串行执行多个脚本（定时任务）
+    """在设备池上并行执行多个脚本（定时任务）
+
+    指定的设备优先使用；启用 APP_UI_DEVICE_FARM 时同项目、同平台的其他空闲设备一起分担，
+    每个脚本在独立进程中执行，设备级失败换设备重试。
 
     Args:
         batch_record_id: 批量执行记录 ID
@@ -40,26 +116,17 @@ def execute_app_ui_batch(batch_record_id, script_ids, device_id=None,
     batch = AppUiBatchExecutionRecord.objects.get(id=batch_record_id)
     batch.status = 1
     batch.start_time = timezone.now()
+    batch.passed_scripts = batch.failed_scripts = 0
     batch.save()
 
-    executor = AppUiScriptExecutor()
+    options = _farm_settings()
+    device_farm = DeviceFarm(
+        batch, AirtestProcessRunner(timeout=options['script_timeout']),
+        lease_ttl=options['lease_ttl'], max_attempts=options['max_attempts'],
+    )
 
     try:
-        for script_id in script_ids:
-            try:
-                record = AppUiExecutionRecord.objects.create(
-                    batch=batch, script_id=script_id, device_id=device_id,
-                    trigger_type='scheduled', status=0,
-                )
-                # 同步执行（串行：前一个完成后再执行下一个）
-                executor.execute(record.id)
-            except Exception as e:
-                logger.error(f"脚本执行失败, script_id={script_id}: {e}")
-                AppUiExecutionRecord.objects.create(
-                    batch=batch, script_id=script_id, device_id=device_id,
-                    trigger_type='scheduled', status=3, error_message=str(e),
-                    start_time=timezone.now(), end_time=timezone.now(),
-                )
+        device_farm.run(script_ids, device_id, farm=options['farm'], lease_wait=options['lease_wait'])
     except SoftTimeLimitExceeded:
         logger.warning(f"批量执行超时, batch_id={batch_record_id}")
     except Exception as e:
@@ -74,9 +141,26 @@ def execute_app_ui_batch(batch_record_id, script_ids, device_id=None,
 
         logger.info(f"批量执行完成, batch_id={batch_record_id}")
 
-        # 定时任务触发时，更新执行记录并发送 webhook 通知
+        # 定时任务触发时，更新执行记录并发送 webhook 通知；
+        # 报告尚未生成完时由最后一个报告任务发送，不在这里等待（避免占用 worker）
         if scheduled_task_id and execution_id:
-            _finalize_scheduled_execution(scheduled_task_id, execution_id, batch)
+            _schedule_batch_notification(batch, scheduled_task_id, execution_id)
+
+
+def _schedule_batch_notification(batch, scheduled_task_id, execution_id):
+    """登记批次的待发送通知，报告已全部生成时立即发送，否则超时后兜底发送"""
+    from django.conf import settings
+
+    AppUiBatchExecutionRecord.objects.filter(pk=batch.pk).update(notify_context={
+        'scheduled_task_id': scheduled_task_id, 'execution_id': execution_id,
+    })
+    if _notify_batch(batch.pk):
+        return
+    try:
+        notify_app_ui_batch.apply_async((batch.pk,), countdown=getattr(settings, 'APP_UI_REPORT_WAIT', 300))
+    except Exception as e:
+        logger.warning(f"通知兜底任务提交失败, 立即发送通知, batch_id={batch.pk}: {e}")
+        _notify_batch(batch.pk, force=True)
 
 
 def _finalize_scheduled_execution(scheduled_task_id, execution_id, batch):
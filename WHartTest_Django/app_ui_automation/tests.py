@@ -111,3 +111,275 @@ class AppUiExecutionRecordModelTest(TestCase):
         self.assertEqual(batch.passed_scripts, 1)
         self.assertEqual(batch.failed_scripts, 1)
         self.assertEqual(batch.status, 3)
+
+
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+from app_ui_automation.device_pool import DeviceFarm, ScriptRun
+
+
+class FakeDeviceRunner:
+    """进程内假设备：按设备名模拟执行耗时与设备故障"""
+
+    def __init__(self, delay=0.2, broken=()):
+        self.delay = delay
+        self.broken = set(broken)
+        self.offline = set()
+        self.runs = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def healthy(self, device):
+        return device is None or device.name not in self.offline
+
+    def run(self, record_id, device):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+            self.runs.append((record_id, device.name))
+        if device.name in self.broken:
+            self.offline.add(device.name)
+            return ScriptRun(device_error=True, error='adb: device offline')
+        return ScriptRun(status=2)
+
+    def stop(self):
+        pass
+
+
+class DeviceFarmTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='farmuser', password='testpass')
+        self.project = Project.objects.create(name='Farm Project', creator=self.user)
+        self.module = AppUiModule.objects.create(project=self.project, name='M', creator=self.user)
+        self.scripts = [
+            AppUiScript.objects.create(
+                project=self.project, module=self.module, name=f'S{i}',
+                script_file=SimpleUploadedFile('t.zip', b'fake', content_type='application/zip'),
+                creator=self.user,
+            )
+            for i in range(6)
+        ]
+        self.devices = [
+            AppUiDevice.objects.create(
+                project=self.project, name=name, device_uri=f'android://127.0.0.1:5037/{name}',
+                status='online', creator=self.user,
+            )
+            for name in ('d1', 'd2', 'd3')
+        ]
+        self.batch = AppUiBatchExecutionRecord.objects.create(
+            name='B', total_scripts=len(self.scripts), executor=self.user, status=1,
+        )
+        self.script_ids = [script.id for script in self.scripts]
+
+    def test_scripts_fan_out_across_devices(self):
+        runner = FakeDeviceRunner(delay=0.2)
+        start = time.monotonic()
+        summary = DeviceFarm(self.batch, runner).run(self.script_ids, self.devices[0].id)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(summary['devices'], 3)
+        self.assertEqual(runner.max_running, 3)
+        self.assertLess(elapsed, 0.9)  # 串行需要 1.2 秒
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.passed_scripts, 6)  # 执行过程中实时累加
+        records = self.batch.execution_records.all()
+        self.assertEqual({record.status for record in records}, {2})
+        self.assertEqual(len({record.device_id for record in records}), 3)
+        for device in AppUiDevice.objects.all():
+            self.assertEqual((device.lease_owner, device.status), ('', 'online'))
+
+    def test_device_failure_retried_on_another_device(self):
+        runner = FakeDeviceRunner(delay=0.05, broken={'d2'})
+        summary = DeviceFarm(self.batch, runner).run(self.script_ids)
+
+        self.assertEqual(summary['retried'], 1)
+        retried = self.batch.execution_records.get(status=4)
+        self.assertEqual(retried.device.name, 'd2')
+        self.assertIn('已转到其他设备重试', retried.error_message)
+        passed = self.batch.execution_records.filter(status=2)
+        self.assertEqual(passed.count(), 6)
+        self.assertNotIn('d2', {record.device.name for record in passed})
+        self.assertEqual(AppUiDevice.objects.get(name='d2').status, 'offline')
+        self.batch.update_statistics()
+        self.assertEqual((self.batch.status, self.batch.passed_scripts), (2, 6))
+
+    def test_offline_devices_are_not_selected(self):
+        AppUiDevice.objects.filter(name='d3').update(status='offline')
+        devices = DeviceFarm(self.batch, FakeDeviceRunner()).select_devices(self.scripts)
+        self.assertEqual([device.name for device in devices], ['d1', 'd2'])
+
+    def test_release_restores_status_before_lease(self):
+        device = self.devices[0]
+        AppUiDevice.objects.filter(pk=device.pk).update(status='offline')
+        device.refresh_from_db()
+        self.assertTrue(device.acquire_lease('mine', ttl=60))
+        self.assertEqual(device.status, 'busy')
+        # 同一持有者重复占用时保留最初记录的状态
+        self.assertTrue(device.acquire_lease('mine', ttl=60))
+        device.release_lease('mine')
+        self.assertEqual(AppUiDevice.objects.get(pk=device.pk).status, 'offline')
+
+        # 健康检查失败等显式指定的状态优先
+        self.assertTrue(device.acquire_lease('mine', ttl=60))
+        device.release_lease('mine', status='online')
+        self.assertEqual(AppUiDevice.objects.get(pk=device.pk).status, 'online')
+
+    def test_leased_devices_are_skipped(self):
+        busy, free = self.devices[0], self.devices[1]
+        self.assertTrue(busy.acquire_lease('other-batch', ttl=60))
+        self.assertFalse(AppUiDevice.objects.get(pk=busy.pk).acquire_lease('mine', ttl=60))
+        AppUiDevice.objects.filter(pk=self.devices[2].pk).update(
+            lease_owner='crashed-batch', lease_expires_at=timezone.now() - timedelta(seconds=1),
+        )
+
+        runner = FakeDeviceRunner(delay=0.01)
+        DeviceFarm(self.batch, runner).run(self.script_ids, busy.id)
+        self.assertEqual({name for _, name in runner.runs}, {free.name, self.devices[2].name})
+        self.assertEqual(AppUiDevice.objects.get(pk=busy.pk).lease_owner, 'other-batch')
+
+        # 只允许使用被占用的指定设备时，脚本直接记为失败
+        batch = AppUiBatchExecutionRecord.objects.create(name='B2', total_scripts=6, executor=self.user)
+        DeviceFarm(batch, runner).run(self.script_ids, busy.id, farm=False)
+        self.assertEqual(batch.execution_records.filter(status=3).count(), 6)
+        batch.refresh_from_db()
+        self.assertEqual(batch.failed_scripts, 6)
+
+
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from app_ui_automation.executor import AppUiScriptExecutor
+from app_ui_automation.report_renderer import SCREENSHOT_MAX_BYTES, compress_screenshot
+
+
+class ScreenshotCompressionTest(SimpleTestCase):
+    def _png(self, size, sigma):
+        buf = io.BytesIO()
+        Image.effect_noise(size, sigma).convert('RGB').save(buf, 'PNG')
+        return buf.getvalue()
+
+    def test_long_screenshot_scaled_under_limit(self):
+        data = compress_screenshot(self._png((800, 3000), 20))
+        self.assertLessEqual(len(data), SCREENSHOT_MAX_BYTES)
+        image = Image.open(io.BytesIO(data))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertLess(image.width, 800)
+        # 二分查找得到的是能满足上限的最大比例，不会缩得过小
+        self.assertGreaterEqual(image.width, 160)
+
+    def test_small_screenshot_keeps_size(self):
+        data = compress_screenshot(self._png((200, 150), 10))
+        self.assertLessEqual(len(data), SCREENSHOT_MAX_BYTES)
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (200, 150))
+
+
+class ReportRenderTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.user = User.objects.create_user(username='reportuser', password='testpass')
+        project = Project.objects.create(name='Report Project', creator=self.user)
+        module = AppUiModule.objects.create(project=project, name='M', creator=self.user)
+        script = AppUiScript.objects.create(
+            project=project, module=module, name='S',
+            script_file=SimpleUploadedFile('t.zip', b'fake', content_type='application/zip'),
+            creator=self.user,
+        )
+        self.record = AppUiExecutionRecord.objects.create(
+            script=script, status=2, report_status='pending', log_dir='app_ui_reports/1/1/log',
+        )
+
+    def test_render_report_updates_report_fields_only(self):
+        standalone = Path(self.media.name) / 'app_ui_reports' / 'standalone' / 'r.html'
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                mock.patch.object(AppUiScriptExecutor, '_generate_report', return_value=Path(self.media.name)), \
+                mock.patch.object(AppUiScriptExecutor, '_pack_html', return_value=standalone), \
+                mock.patch.object(AppUiScriptExecutor, '_generate_screenshot') as screenshot:
+            AppUiScriptExecutor().render_report(self.record.id)
+        screenshot.assert_called_once_with(standalone)
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.report_status, 'ready')
+        self.assertEqual(self.record.report_path, 'app_ui_reports/standalone/r.html')
+        self.assertEqual(self.record.status, 2)
+
+    def test_render_failure_keeps_execution_status(self):
+        with override_settings(MEDIA_ROOT=self.media.name), \
+                mock.patch.object(AppUiScriptExecutor, '_generate_report', side_effect=RuntimeError('reporter failed')):
+            AppUiScriptExecutor().render_report(self.record.id)
+        self.record.refresh_from_db()
+        self.assertEqual((self.record.report_status, self.record.status), ('failed', 2))
+        self.assertIn('reporter failed', self.record.execution_log)
+
+
+from app_ui_automation import tasks as app_ui_tasks
+
+
+class BatchNotificationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='notifyuser', password='testpass')
+        project = Project.objects.create(name='Notify Project', creator=self.user)
+        module = AppUiModule.objects.create(project=project, name='M', creator=self.user)
+        script = AppUiScript.objects.create(
+            project=project, module=module, name='S',
+            script_file=SimpleUploadedFile('t.zip', b'fake', content_type='application/zip'),
+            creator=self.user,
+        )
+        self.batch = AppUiBatchExecutionRecord.objects.create(
+            name='B', total_scripts=2, executor=self.user, status=2,
+        )
+        self.records = [
+            AppUiExecutionRecord.objects.create(
+                script=script, batch=self.batch, status=2, report_status='pending', log_dir='log',
+            )
+            for _ in range(2)
+        ]
+        finalize = mock.patch.object(app_ui_tasks, '_finalize_scheduled_execution')
+        self.finalize = finalize.start()
+        self.addCleanup(finalize.stop)
+
+    def _render(self, record):
+        def render(executor, record_id):
+            AppUiExecutionRecord.objects.filter(pk=record_id).update(report_status='ready')
+
+        with mock.patch.object(AppUiScriptExecutor, 'render_report', render):
+            app_ui_tasks.render_app_ui_report(record.id)
+
+    def test_last_report_sends_notification_without_blocking_batch(self):
+        with mock.patch.object(app_ui_tasks.notify_app_ui_batch, 'apply_async') as fallback:
+            app_ui_tasks._schedule_batch_notification(self.batch, 7, 8)
+        fallback.assert_called_once()
+        self.finalize.assert_not_called()
+
+        self._render(self.records[0])
+        self.finalize.assert_not_called()
+        self._render(self.records[1])
+        self.finalize.assert_called_once_with(7, 8, mock.ANY)
+
+        # 兜底任务到期时通知已发送，不再重复发送
+        app_ui_tasks.notify_app_ui_batch(self.batch.id)
+        self.assertEqual(self.finalize.call_count, 1)
+        self.batch.refresh_from_db()
+        self.assertIsNone(self.batch.notify_context)
+
+    def test_ready_reports_notify_immediately(self):
+        AppUiExecutionRecord.objects.filter(batch=self.batch).update(report_status='ready')
+        with mock.patch.object(app_ui_tasks.notify_app_ui_batch, 'apply_async') as fallback:
+            app_ui_tasks._schedule_batch_notification(self.batch, 7, 8)
+        fallback.assert_not_called()
+        self.finalize.assert_called_once_with(7, 8, mock.ANY)
+
+    def test_fallback_sends_when_reports_are_stuck(self):
+        with mock.patch.object(app_ui_tasks.notify_app_ui_batch, 'apply_async'):
+            app_ui_tasks._schedule_batch_notification(self.batch, 7, 8)
+        app_ui_tasks.notify_app_ui_batch(self.batch.id)
+        self.finalize.assert_called_once_with(7, 8, mock.ANY)
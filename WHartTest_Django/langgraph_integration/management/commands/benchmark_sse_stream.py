@@ -0,0 +1,97 @@
+import asyncio
+import json
+import os
+import time
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.http import StreamingHttpResponse
+
+from langgraph_integration.sse import coalesce_sse_events
+
+# 典型的中文 token 片段（1~3 个字符）
+_TOKENS = ["测试", "用例", "，", "点击", "登录", "按钮", "后", "应", "跳转", "到", "首页", "。", "\n"]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks SSE encoding CPU per 1k tokens: one JSON frame per token (legacy) '
+        'vs coalesced frames with the fast encoder.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--streams', type=int, default=50, help='Concurrent streams (default: 50)')
+        parser.add_argument('--tokens', type=int, default=2000, help='Tokens per stream (default: 2000)')
+        parser.add_argument(
+            '--token-interval-ms',
+            type=float,
+            default=2.0,
+            help='Simulated model inter-token delay in ms (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        streams = max(1, options['streams'])
+        tokens = max(1, options['tokens'])
+        interval = max(0.0, options['token_interval_ms']) / 1000
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"SSE streaming: {streams} streams x {tokens} tokens, token interval {interval * 1000:.1f}ms"
+            )
+        )
+        baseline = asyncio.run(self._run(streams, tokens, interval, coalesced=False))
+        coalesced = asyncio.run(self._run(streams, tokens, interval, coalesced=True))
+
+        total_k = streams * tokens / 1000
+        for label, (cpu, frames, payload) in (('per-token', baseline), ('coalesced', coalesced)):
+            self.stdout.write(
+                f"  {label:<10} cpu/1k tokens={cpu / total_k * 1000:7.2f}ms "
+                f"frames={frames:<8} bytes={payload}"
+            )
+        if coalesced[0] > 0:
+            self.stdout.write(self.style.SUCCESS(f"  CPU reduction: {baseline[0] / coalesced[0]:.1f}x"))
+
+    async def _events(self, tokens, interval):
+        yield {"type": "start", "session_id": "bench"}
+        for index in range(tokens):
+            yield {"type": "stream", "data": _TOKENS[index % len(_TOKENS)]}
+            # 模型按小批次吐 token：每 8 个 token 让出一次事件循环
+            if index % 8 == 7:
+                await asyncio.sleep(interval * 8)
+        yield {"type": "complete"}
+
+    async def _legacy_frames(self, tokens, interval):
+        async for event in self._events(tokens, interval):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    async def _consume(self, frames, handler, devnull):
+        """经 Django ASGIHandler.send_response 发送，send 端把 body 写入 /dev/null（模拟 socket 写）"""
+        stats = {"frames": 0, "bytes": 0}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                stats["frames"] += 1
+                stats["bytes"] += os.write(devnull, message["body"])
+            await asyncio.sleep(0)
+
+        response = StreamingHttpResponse(frames, content_type="text/event-stream; charset=utf-8")
+        await handler.send_response(response, send)
+        return stats["frames"], stats["bytes"]
+
+    async def _run(self, streams, tokens, interval, coalesced):
+        def make_stream():
+            if coalesced:
+                return coalesce_sse_events(self._events(tokens, interval))
+            return self._legacy_frames(tokens, interval)
+
+        handler = ASGIHandler()
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        try:
+            started = time.process_time()
+            results = await asyncio.gather(
+                *(self._consume(make_stream(), handler, devnull) for _ in range(streams))
+            )
+            cpu = time.process_time() - started
+        finally:
+            os.close(devnull)
+        return cpu, sum(r[0] for r in results), sum(r[1] for r in results)
@@ -0,0 +1,171 @@
+"""
+SSE 流式输出工具
+
+- encode_sse_event：把事件字典编码为 SSE 帧，优先使用 orjson
+- coalesce_sse_events：把逐 token 的流式事件在短时间/大小窗口内合并为一帧，
+  并通过有界队列对上游施加背压（客户端读得慢时，Agent 流会在队列满时暂停）
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+from django.conf import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装 orjson 时使用标准库 json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SSEItem = Union[Dict[str, Any], str]
+
+_END = object()
+
+
+def encode_sse_event(data_dict: Dict[str, Any]) -> str:
+    """
+    创建SSE格式的数据，确保中文字符正确编码
+
+    orjson 输出即为 UTF-8（不转义中文），与 json.dumps(ensure_ascii=False) 等价；
+    遇到 orjson 不支持的类型（如超长整数、非字符串键）时回退到标准库。
+    """
+    if orjson is not None:
+        try:
+            return f"data: {orjson.dumps(data_dict).decode('utf-8')}\n\n"
+        except TypeError:
+            pass
+    return f"data: {json.dumps(data_dict, ensure_ascii=False)}\n\n"
+
+
+async def _get_with_timeout(queue: asyncio.Queue, timeout: float):
+    if hasattr(asyncio, "timeout"):
+        # Python 3.11+：asyncio.timeout 不会为每次等待额外创建 Task
+        async with asyncio.timeout(timeout):
+            return await queue.get()
+    return await asyncio.wait_for(queue.get(), timeout)
+
+
+def _is_coalescible(item: SSEItem, coalesce_types: Iterable[str]) -> bool:
+    """只合并仅含 type/data 且 data 为字符串的事件，避免丢失附加字段"""
+    return (
+        isinstance(item, dict)
+        and item.get("type") in coalesce_types
+        and isinstance(item.get("data"), str)
+        and len(item) == 2
+    )
+
+
+async def coalesce_sse_events(
+    events: AsyncIterator[SSEItem],
+    *,
+    window_ms: Optional[float] = None,
+    max_bytes: Optional[int] = None,
+    coalesce_types: Iterable[str] = ("stream",),
+    queue_size: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    把事件流编码为 SSE 文本，合并相邻的 token 事件
+
+    Args:
+        events: 事件字典或已编码 SSE 帧（字符串原样透传）组成的异步迭代器
+        window_ms: 合并窗口（毫秒），首个 token 进入缓冲后最多等待这么久即发送
+        max_bytes: 缓冲的 token 文本达到该 UTF-8 字节数时立即发送
+        coalesce_types: 可合并的事件类型，合并后 data 为各 token 文本拼接
+        queue_size: 上游与发送端之间的队列容量，满时上游生产者阻塞（背压）
+
+    非 token 事件（工具结果、中断、完成等）到达时会先发送已缓冲的 token，保证事件顺序不变。
+    """
+    window = (
+        window_ms if window_ms is not None else getattr(settings, "SSE_COALESCE_WINDOW_MS", 30)
+    ) / 1000
+    max_bytes = max_bytes if max_bytes is not None else getattr(settings, "SSE_COALESCE_MAX_BYTES", 512)
+    queue_size = queue_size if queue_size is not None else getattr(settings, "SSE_STREAM_QUEUE_SIZE", 64)
+    coalesce_types = tuple(coalesce_types)
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+
+    async def _produce():
+        try:
+            try:
+                async for item in events:
+                    await queue.put(item)
+            finally:
+                aclose = getattr(events, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            # 异常也通过 _END 通知消费端；异常本身由 producer.result() 抛出
+            await queue.put(_END)
+            raise
+        await queue.put(_END)
+
+    producer = asyncio.ensure_future(_produce())
+
+    pending_type: Optional[str] = None
+    pending_parts: List[str] = []
+    pending_bytes = 0
+    deadline = 0.0
+
+    def _flush() -> str:
+        nonlocal pending_type, pending_parts, pending_bytes
+        if not pending_parts:
+            return ""
+        frame = encode_sse_event({"type": pending_type, "data": "".join(pending_parts)})
+        pending_type, pending_parts, pending_bytes = None, [], 0
+        return frame
+
+    try:
+        while True:
+            if pending_parts and time.monotonic() >= deadline:
+                yield _flush()
+                continue
+
+            if not queue.empty():
+                # 上游已积压时批量取出，不再逐个等待
+                item = queue.get_nowait()
+            elif pending_parts:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = await _get_with_timeout(queue, timeout)
+                except asyncio.TimeoutError:
+                    yield _flush()
+                    continue
+            else:
+                item = await queue.get()
+
+            if item is _END:
+                break
+
+            if _is_coalescible(item, coalesce_types):
+                if pending_parts and item["type"] != pending_type:
+                    yield _flush()
+                if not pending_parts:
+                    pending_type = item["type"]
+                    deadline = time.monotonic() + window
+                pending_parts.append(item["data"])
+                pending_bytes += len(item["data"].encode("utf-8"))
+                if pending_bytes >= max_bytes:
+                    yield _flush()
+                continue
+
+            frame = item if isinstance(item, str) else encode_sse_event(item)
+            yield _flush() + frame
+
+        tail = _flush()
+        if tail:
+            yield tail
+        # 上游异常在发送完已缓冲内容后再抛出
+        producer.result()
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except (asyncio.CancelledError, Exception):
+                pass
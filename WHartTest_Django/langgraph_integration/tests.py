@@ -1,11 +1,16 @@
+import asyncio
+import json
 from unittest.mock import Mock, patch
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
 from django.urls import reverse
 from langchain_core.messages import AIMessage, HumanMessage
 from rest_framework.test import APIClient
 
+from .sse import coalesce_sse_events
+
 
 class LLMConfigDeepSeekTests(TestCase):
 	def setUp(self):
@@ -76,3 +81,92 @@ class LLMConfigDeepSeekTests(TestCase):
 			payload["messages"][1]["reasoning_content"],
 			"这是推理内容",
 		)
+
+
+def _frames_to_events(frames):
+	events = []
+	for frame in frames:
+		for line in frame.split("\n"):
+			if line.startswith("data: ") and line != "data: [DONE]":
+				events.append(json.loads(line[len("data: "):]))
+	return events
+
+
+class CoalescedSSEStreamTests(SimpleTestCase):
+	def _collect(self, events, **kwargs):
+		async def collect():
+			return [frame async for frame in coalesce_sse_events(events, **kwargs)]
+
+		return async_to_sync(collect)()
+
+	def test_tokens_are_merged_without_reordering_other_events(self):
+		async def events():
+			yield {"type": "start"}
+			for token in ["你", "好", "，", "世界"]:
+				yield {"type": "stream", "data": token}
+			yield {"type": "tool_result", "tool_output": "ok"}
+			yield {"type": "stream", "data": "完成"}
+			yield "data: [DONE]\n\n"
+
+		frames = self._collect(events(), window_ms=1000, max_bytes=4096)
+
+		self.assertEqual(
+			_frames_to_events(frames),
+			[
+				{"type": "start"},
+				{"type": "stream", "data": "你好，世界"},
+				{"type": "tool_result", "tool_output": "ok"},
+				{"type": "stream", "data": "完成"},
+			],
+		)
+		self.assertEqual(frames[-1][-len("data: [DONE]\n\n"):], "data: [DONE]\n\n")
+
+	def test_flushes_on_size_and_time_window(self):
+		async def events():
+			yield {"type": "stream", "data": "a" * 6}
+			yield {"type": "stream", "data": "b" * 6}
+			yield {"type": "stream", "data": "c"}
+			await asyncio.sleep(0.05)
+			yield {"type": "stream", "data": "d"}
+
+		frames = self._collect(events(), window_ms=10, max_bytes=10)
+
+		self.assertEqual(
+			[event["data"] for event in _frames_to_events(frames)],
+			["a" * 6 + "b" * 6, "c", "d"],
+		)
+
+	def test_slow_consumer_applies_backpressure_to_producer(self):
+		produced = []
+
+		async def events():
+			for index in range(100):
+				produced.append(index)
+				yield {"type": "tool_result", "index": index}
+
+		async def consume_one():
+			stream = coalesce_sse_events(events(), queue_size=2)
+			first = await stream.__anext__()
+			await asyncio.sleep(0.05)
+			await stream.aclose()
+			return first
+
+		first = async_to_sync(consume_one)()
+
+		self.assertIn('"index":0', first)
+		self.assertLess(len(produced), 10)
+
+	def test_upstream_errors_propagate_after_buffered_tokens(self):
+		async def events():
+			yield {"type": "stream", "data": "部分"}
+			raise RuntimeError("boom")
+
+		frames = []
+
+		async def collect():
+			async for frame in coalesce_sse_events(events(), window_ms=1000):
+				frames.append(frame)
+
+		with self.assertRaises(RuntimeError):
+			async_to_sync(collect)()
+		self.assertEqual(_frames_to_events(frames), [{"type": "stream", "data": "部分"}])
@@ -105,11 +105,9 @@ from wharttest_django.checkpointer import (
     get_thread_ids_by_prefix,
     rollback_checkpoints_to_count,
 )
-import json  # For JSON serialization in streaming
-import asyncio  # For async operations
-
 # Django 流式响应
 from django.http import StreamingHttpResponse
+from .sse import coalesce_sse_events, encode_sse_event
 
 from mcp_tools.models import RemoteMCPConfig  # To load remote MCP server configs
 from langchain_mcp_adapters.client import (
@@ -233,8 +231,7 @@ def create_sse_data(data_dict):
     """
     创建SSE格式的数据，确保中文字符正确编码
     """
-    json_str = json.dumps(data_dict, ensure_ascii=False)
-    return f"data: {json_str}\n\n"
+    return encode_sse_event(data_dict)
 
 
 _REQ_DOC_ID_RE = re.compile(r"需求文档ID[:：]\s*([0-9a-fA-F-]{36})")
@@ -994,6 +991,7 @@ class ChatAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        mcp_lease = None
         try:
             # 使用新的LLM工厂函数，支持多供应商
             llm = create_llm_instance(active_config, temperature=0.7)
@@ -1035,6 +1033,9 @@ class ChatAPIView(APIView):
                                 f"ChatAPIView: Initializing persistent MCP client with config: {client_mcp_config}"
                             )
                             # 使用持久化MCP会话管理器，传递用户、项目和会话信息以支持跨对话轮次的状态保持
+                            mcp_lease = mcp_session_manager.acquire_session(
+                                str(request.user.id), str(project_id), session_id
+                            )
                             mcp_tools_list = await mcp_session_manager.get_tools_for_config(
                                 client_mcp_config,
                                 user_id=str(request.user.id),
@@ -1591,6 +1592,9 @@ class ChatAPIView(APIView):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+        finally:
+            if mcp_lease:
+                mcp_session_manager.release_session(mcp_lease)
 
 
 class ChatHistoryAPIView(APIView):
@@ -2606,6 +2610,7 @@ class ChatResumeAPIView(View):
             )
             return
 
+        mcp_lease = None
         try:
             llm = create_llm_instance(active_config, temperature=0.7)
 
@@ -2632,6 +2637,9 @@ class ChatResumeAPIView(View):
                                 )
 
                         if client_mcp_config:
+                            mcp_lease = mcp_session_manager.acquire_session(
+                                str(request.user.id), str(project_id), session_id
+                            )
                             mcp_tools_list = (
                                 await mcp_session_manager.get_tools_for_config(
                                     client_mcp_config,
@@ -2704,7 +2712,10 @@ class ChatResumeAPIView(View):
                             if isinstance(chunk, dict) and "__interrupt__" in chunk:
                                 interrupt_info = chunk["__interrupt__"]
                                 logger.info(
-                                    f"ChatResumeAPIView: HITL interrupt detected in stream: {interrupt_info}"
+                                    "ChatResumeAPIView: HITL interrupt detected in stream"
+                                )
+                                logger.debug(
+                                    "ChatResumeAPIView: interrupt_info=%r", interrupt_info
                                 )
 
                                 # 解析中断信息
@@ -2792,7 +2803,20 @@ class ChatResumeAPIView(View):
                             # 跳过普通 updates，只用于检测 interrupt（节省 token 和带宽）
                             continue
                         elif stream_mode == "messages":
-                            if hasattr(chunk, "content") and chunk.content:
+                            # messages 模式返回元组 (token, metadata)
+                            token = (
+                                chunk[0]
+                                if isinstance(chunk, tuple) and chunk
+                                else chunk
+                            )
+                            if (
+                                "AIMessage" in type(token).__name__
+                                and isinstance(token.content, str)
+                            ):
+                                # 纯文本 token 交给 coalesce_sse_events 合并发送
+                                if token.content:
+                                    yield {"type": "message", "data": token.content}
+                            elif hasattr(chunk, "content") and chunk.content:
                                 yield create_sse_data(
                                     {"type": "message", "data": chunk.content}
                                 )
@@ -2801,8 +2825,6 @@ class ChatResumeAPIView(View):
                                     {"type": "message", "data": str(chunk)}
                                 )
 
-                        await asyncio.sleep(0.01)
-
                 except Exception as e:
                     logger.error(
                         f"ChatResumeAPIView: Error during resume streaming: {e}",
@@ -2928,6 +2950,9 @@ class ChatResumeAPIView(View):
                 yield create_sse_data(
                     {"type": "error", "message": f"Resume error: {str(e)}"}
                 )
+        finally:
+            if mcp_lease:
+                mcp_session_manager.release_session(mcp_lease)
 
     async def post(self, request, *args, **kwargs):
         """处理 HITL 恢复请求"""
@@ -2986,8 +3011,11 @@ class ChatResumeAPIView(View):
         thread_id = f"{request.user.id}_{project_id}_{session_id}"
 
         async def async_generator():
-            async for chunk in self._create_resume_generator(
-                request, thread_id, decision_type, session_id, project_id
+            async for chunk in coalesce_sse_events(
+                self._create_resume_generator(
+                    request, thread_id, decision_type, session_id, project_id
+                ),
+                coalesce_types=("message",),
             ):
                 yield chunk
 
@@ -3,9 +3,14 @@
 解决LangChain MCP适配器每次工具调用都创建新会话的问题
 """
 import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
 from typing import Dict, Any, Optional, List
+from django.conf import settings
 from langchain_mcp_adapters.client import MultiServerMCPClient
-from langchain_mcp_adapters.tools import load_mcp_tools
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
 from langchain_core.tools import BaseTool
 import logging
 import atexit
@@ -28,6 +33,25 @@ def _is_connection_error(exc: BaseException) -> bool:
     return False
 
 
+def _server_config_hash(server_config: Dict[str, Any]) -> str:
+    """计算单个 MCP 服务器配置的稳定哈希，用于跨会话共享工具 schema"""
+    payload = json.dumps(server_config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def _list_server_tools(session) -> list:
+    """分页列出 MCP 服务器的全部工具定义"""
+    cursor = None
+    all_tools = []
+    while True:
+        page = await session.list_tools(cursor=cursor)
+        if page.tools:
+            all_tools.extend(page.tools)
+        if not page.nextCursor:
+            return all_tools
+        cursor = page.nextCursor
+
+
 class _PersistentSessionEntry:
     """管理长寿命MCP会话，在单独任务中处理上下文进入/退出。"""
 
@@ -116,6 +140,17 @@ class _PersistentSessionEntry:
                     name=f"mcp-keepalive[{self.server_name}]",
                 )
 
+    def is_healthy(self) -> bool:
+        """会话是否仍可用（未出错、未关闭，且绑定的事件循环仍是当前循环）"""
+        if self._error is not None or self._closed_event.is_set():
+            return False
+        if self.loop.is_closed():
+            return False
+        try:
+            return asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            return False
+
     async def get_session(self):
         await self._ready_event.wait()
         if self._error is not None:
@@ -175,8 +210,16 @@ class PersistentMCPClient:
     """
     持久化MCP客户端，维持长连接会话
     解决PlaywrightMCP等有状态工具的会话问题
+
+    工具 schema（list_tools 结果）按服务器配置哈希在所有客户端间共享，
+    新会话只需建立连接并绑定工具，无需再次拉取工具列表。
     """
 
+    # server_config_hash -> MCP 工具定义列表（跨会话共享）
+    _schema_cache: Dict[str, list] = {}
+    schema_cache_hits = 0
+    schema_cache_misses = 0
+
     def __init__(self, server_configs: Dict[str, Any]):
         self.server_configs = server_configs
         self.client = MultiServerMCPClient(server_configs)
@@ -240,7 +283,7 @@ class PersistentMCPClient:
             async with session_entry.load_lock:
                 if server_name not in self.tools_cache:
                     try:
-                        tools = await load_mcp_tools(session)
+                        tools = await self._load_session_tools(server_name, session)
                     except Exception as exc:
                         logger.error(
                             f"Failed to load tools for {server_name}: {exc}",
@@ -259,6 +302,33 @@ class PersistentMCPClient:
 
         return self.tools_cache.get(server_name, [])
 
+    async def _load_session_tools(self, server_name: str, session) -> List[BaseTool]:
+        """将工具绑定到当前会话；工具 schema 优先复用共享缓存"""
+        config_hash = _server_config_hash(self.server_configs.get(server_name, {}))
+        mcp_tools = PersistentMCPClient._schema_cache.get(config_hash)
+        if mcp_tools is None:
+            PersistentMCPClient.schema_cache_misses += 1
+            mcp_tools = await _list_server_tools(session)
+            PersistentMCPClient._schema_cache[config_hash] = mcp_tools
+        else:
+            PersistentMCPClient.schema_cache_hits += 1
+            logger.debug(f"Reusing shared tool schemas for {server_name}")
+        return [convert_mcp_tool_to_langchain_tool(session, tool) for tool in mcp_tools]
+
+    @classmethod
+    def invalidate_schema_cache(cls, server_config: Optional[Dict[str, Any]] = None):
+        """清除共享的工具 schema 缓存（不传参数时清除全部）"""
+        if server_config is None:
+            cls._schema_cache.clear()
+        else:
+            cls._schema_cache.pop(_server_config_hash(server_config), None)
+
+    def is_healthy(self) -> bool:
+        """客户端是否可复用：未关闭，且所有已建立的会话都健康"""
+        if self._closed:
+            return False
+        return all(entry.is_healthy() for entry in self.sessions.values())
+
     async def get_all_persistent_tools(self) -> List[BaseTool]:
         """获取所有服务器的持久工具"""
         all_tools = []
@@ -287,6 +357,7 @@ class PersistentMCPClient:
         """刷新指定服务器的会话（用于错误恢复）"""
         logger.info(f"Refreshing session for server: {server_name}")
         await self._close_single_session(server_name)
+        self.invalidate_schema_cache(self.server_configs.get(server_name, {}))
         return await self.get_persistent_tools(server_name)
 
     async def _close_single_session(self, server_name: str):
@@ -358,6 +429,14 @@ class GlobalMCPSessionManager:
     全局MCP会话管理器
     在Django应用中管理所有MCP会话
     支持跨对话轮次的浏览器状态保持
+
+    会话客户端以有界池的方式管理：
+    - 每个会话键（用户_项目_会话）一个独立客户端，承载有状态会话（如浏览器）
+    - 池大小上限 MCP_SESSION_POOL_MAX_SIZE，超出时按 LRU 淘汰
+    - 空闲超过 MCP_SESSION_IDLE_TTL 秒的会话在下次访问池时被淘汰
+    - 请求通过 acquire_session/release_session 租用会话，租用中的会话不会被空闲/LRU 淘汰
+    - 复用缓存前做健康检查，失效的会话会被淘汰并重建
+    - 工具 schema 由 PersistentMCPClient 按服务器配置哈希共享
     """
     _instance = None
     _lock = asyncio.Lock()
@@ -371,11 +450,108 @@ class GlobalMCPSessionManager:
     def __init__(self):
         if not self._initialized:
             self.clients = {}  # config_hash -> PersistentMCPClient (旧的共享模式)
-            self.session_clients = {}  # session_key -> PersistentMCPClient (独立客户端)
+            # session_key -> PersistentMCPClient (独立客户端，按最近使用排序)
+            self.session_clients: "OrderedDict[str, PersistentMCPClient]" = OrderedDict()
             self.session_contexts = {}  # session_key -> session_context
             self.tools_cache = {}  # session_key -> tools (按session_id缓存工具)
+            self.leases: Dict[str, int] = {}  # session_key -> 正在使用该会话的请求数
+            self.eviction_counts = {"idle": 0, "lru": 0, "unhealthy": 0}
             self._initialized = True
 
+    @property
+    def max_pool_size(self) -> int:
+        return getattr(settings, "MCP_SESSION_POOL_MAX_SIZE", 50)
+
+    @property
+    def idle_ttl(self) -> float:
+        return getattr(settings, "MCP_SESSION_IDLE_TTL", 1800)
+
+    @staticmethod
+    def _build_session_key(user_id: str, project_id: str, session_id: str = None) -> str:
+        if session_id:
+            return f"{user_id}_{project_id}_{session_id}"
+        return f"{user_id}_{project_id}"
+
+    def _touch(self, session_key: str):
+        """标记会话最近被使用"""
+        if session_key in self.session_clients:
+            self.session_clients.move_to_end(session_key)
+        context = self.session_contexts.get(session_key)
+        if context is not None:
+            context['last_used'] = time.monotonic()
+
+    def acquire_session(self, user_id: str, project_id: str, session_id: str = None) -> str:
+        """租用会话（在加载工具前调用），返回会话键；请求结束时必须调用 release_session"""
+        session_key = self._build_session_key(user_id, project_id, session_id)
+        self.leases[session_key] = self.leases.get(session_key, 0) + 1
+        return session_key
+
+    def release_session(self, session_key: str):
+        """释放 acquire_session 取得的租约，空闲计时从此刻开始"""
+        remaining = self.leases.get(session_key, 0) - 1
+        if remaining > 0:
+            self.leases[session_key] = remaining
+        else:
+            self.leases.pop(session_key, None)
+        self._touch(session_key)
+
+    def _is_leased(self, session_key: str) -> bool:
+        return self.leases.get(session_key, 0) > 0
+
+    async def _evict_session(self, session_key: str, reason: str):
+        """从池中移除会话并关闭其客户端"""
+        self.tools_cache.pop(session_key, None)
+        self.session_contexts.pop(session_key, None)
+        client = self.session_clients.pop(session_key, None)
+        self.eviction_counts[reason] = self.eviction_counts.get(reason, 0) + 1
+        logger.info(
+            f"Evicted MCP session ({reason}): {session_key}. "
+            f"Remaining session clients: {len(self.session_clients)}"
+        )
+        if client:
+            try:
+                await client.close_sessions()
+            except Exception as exc:
+                logger.error(f"Error closing evicted MCP client {session_key}: {exc}", exc_info=True)
+
+    async def _enforce_pool_limits(self, reserve: int = 0):
+        """淘汰空闲超时的会话，并按 LRU 将池大小控制在上限内（为新会话预留 reserve 个位置）
+
+        只淘汰未被租用的会话；全部会话都在使用中时允许暂时超出上限。
+        """
+        now = time.monotonic()
+        idle_keys = [
+            key for key in list(self.session_clients.keys())
+            if not self._is_leased(key)
+            and now - self.session_contexts.get(key, {}).get('last_used', now) > self.idle_ttl
+        ]
+        for key in idle_keys:
+            await self._evict_session(key, "idle")
+
+        while len(self.session_clients) + reserve > self.max_pool_size:
+            oldest_key = next((key for key in self.session_clients if not self._is_leased(key)), None)
+            if oldest_key is None:
+                logger.warning(
+                    f"MCP session pool exceeds max size ({self.max_pool_size}): "
+                    f"all {len(self.session_clients)} sessions are in use"
+                )
+                break
+            await self._evict_session(oldest_key, "lru")
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """会话池指标（当前进程）"""
+        return {
+            "live_sessions": len(self.session_clients),
+            "leased_sessions": sum(1 for key in self.session_clients if self._is_leased(key)),
+            "max_pool_size": self.max_pool_size,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": dict(self.eviction_counts),
+            "evictions_total": sum(self.eviction_counts.values()),
+            "shared_schema_entries": len(PersistentMCPClient._schema_cache),
+            "schema_cache_hits": PersistentMCPClient.schema_cache_hits,
+            "schema_cache_misses": PersistentMCPClient.schema_cache_misses,
+        }
+
     async def get_persistent_client(self, server_configs: Dict[str, Any]) -> PersistentMCPClient:
         """获取或创建持久化客户端"""
         config_hash = hash(str(sorted(server_configs.items())))
@@ -409,20 +585,22 @@ class GlobalMCPSessionManager:
             工具列表
         """
         # 构建会话键：包含用户、项目和对话会话ID
-        if session_id:
-            session_key = f"{user_id}_{project_id}_{session_id}"
-        else:
-            session_key = f"{user_id}_{project_id}"
+        session_key = self._build_session_key(user_id, project_id, session_id)
         
-        # 检查是否已有缓存的工具
+        # 检查是否已有缓存的工具（复用前做健康检查）
         if session_key in self.tools_cache:
-            logger.info(f"Reusing cached tools for session: {session_key}")
-            return self.tools_cache[session_key]
+            client = self.session_clients.get(session_key)
+            if client is not None and client.is_healthy():
+                self._touch(session_key)
+                logger.info(f"Reusing cached tools for session: {session_key}")
+                return self.tools_cache[session_key]
+            await self._evict_session(session_key, "unhealthy")
         
         # 为每个session_key创建独立的MCP客户端
         # 这样每个并发测试用例都有自己的浏览器实例
         async with self._lock:
             if session_key not in self.session_clients:
+                await self._enforce_pool_limits(reserve=1)
                 logger.info(f"Creating independent MCP client for session: {session_key}")
                 client = PersistentMCPClient(server_configs)
                 self.session_clients[session_key] = client
@@ -441,11 +619,12 @@ class GlobalMCPSessionManager:
         # 记录会话上下文
         self.session_contexts[session_key] = {
             'client': client,
-            'last_used': asyncio.get_event_loop().time(),
+            'last_used': time.monotonic(),
             'user_id': user_id,
             'project_id': project_id,
             'session_id': session_id
         }
+        self._touch(session_key)
         
         return tools
 
@@ -477,7 +656,7 @@ class GlobalMCPSessionManager:
 
     async def get_session_context(self, user_id: str, project_id: str) -> Optional[Dict[str, Any]]:
         """获取用户项目的会话上下文"""
-        session_key = f"{user_id}_{project_id}"
+        session_key = self._build_session_key(user_id, project_id)
         return self.session_contexts.get(session_key)
 
     async def cleanup_all(self):
@@ -503,6 +682,7 @@ class GlobalMCPSessionManager:
         self.session_clients.clear()
         self.session_contexts.clear()
         self.tools_cache.clear()
+        PersistentMCPClient.invalidate_schema_cache()
         logger.info("All MCP clients and session contexts cleaned up")
 
     async def cleanup_user_session(self, user_id: str, project_id: str, session_id: str = None):
@@ -514,10 +694,7 @@ class GlobalMCPSessionManager:
             project_id: 项目ID
             session_id: 对话会话ID（可选）
         """
-        if session_id:
-            session_key = f"{user_id}_{project_id}_{session_id}"
-        else:
-            session_key = f"{user_id}_{project_id}"
+        session_key = self._build_session_key(user_id, project_id, session_id)
         
         # 清理工具缓存
         self.tools_cache.pop(session_key, None)
@@ -563,10 +740,7 @@ class GlobalMCPSessionManager:
         Returns:
             刷新后的工具列表
         """
-        if session_id:
-            session_key = f"{user_id}_{project_id}_{session_id}"
-        else:
-            session_key = f"{user_id}_{project_id}"
+        session_key = self._build_session_key(user_id, project_id, session_id)
 
         logger.info(f"Refreshing MCP tools for session: {session_key}")
 
@@ -580,7 +754,13 @@ class GlobalMCPSessionManager:
             except Exception as exc:
                 logger.error(f"Error closing old MCP client for {session_key}: {exc}", exc_info=True)
 
+        # 会话失效也可能是服务端工具发生变化，重新拉取工具 schema
+        for server_config in server_configs.values():
+            PersistentMCPClient.invalidate_schema_cache(server_config)
+
         async with self._lock:
+            if session_key not in self.session_clients:
+                await self._enforce_pool_limits(reserve=1)
             client = PersistentMCPClient(server_configs)
             self.session_clients[session_key] = client
             logger.info(f"Created new MCP client for session: {session_key}")
@@ -599,11 +779,12 @@ class GlobalMCPSessionManager:
 
         self.session_contexts[session_key] = {
             'client': client,
-            'last_used': asyncio.get_event_loop().time(),
+            'last_used': time.monotonic(),
             'user_id': user_id,
             'project_id': project_id,
             'session_id': session_id
         }
+        self._touch(session_key)
 
         return tools
 
@@ -1,3 +1,97 @@
-from django.test import TestCase
+import asyncio
+from unittest.mock import patch
 
-# 在此编写测试。
+from django.test import SimpleTestCase, override_settings
+
+from .persistent_client import GlobalMCPSessionManager
+
+
+class _FakeClient:
+    """替代 PersistentMCPClient 的轻量客户端，记录关闭次数与健康状态"""
+
+    _schema_cache = {}
+    schema_cache_hits = 0
+    schema_cache_misses = 0
+
+    def __init__(self, server_configs):
+        self.server_configs = server_configs
+        self.healthy = True
+        self.closed = 0
+
+    def is_healthy(self):
+        return self.healthy
+
+    async def get_all_persistent_tools(self):
+        return ["tool"]
+
+    async def close_sessions(self):
+        self.closed += 1
+
+
+class MCPSessionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.manager = object.__new__(GlobalMCPSessionManager)
+        self.manager._initialized = False
+        GlobalMCPSessionManager.__init__(self.manager)
+        client_patcher = patch("mcp_tools.persistent_client.PersistentMCPClient", _FakeClient)
+        client_patcher.start()
+        self.addCleanup(client_patcher.stop)
+
+    def _get(self, session_id):
+        return asyncio.run(
+            self.manager.get_tools_for_session({}, "1", "1", session_id=session_id)
+        )
+
+    @override_settings(MCP_SESSION_POOL_MAX_SIZE=2, MCP_SESSION_IDLE_TTL=3600)
+    def test_evicts_least_recently_used_session_when_full(self):
+        self._get("a")
+        self._get("b")
+        first = self.manager.session_clients["1_1_a"]
+        self._get("a")  # 命中缓存，a 成为最近使用
+        self._get("c")
+
+        self.assertEqual(list(self.manager.session_clients), ["1_1_a", "1_1_c"])
+        self.assertIs(self.manager.session_clients["1_1_a"], first)
+        self.assertEqual(self.manager.eviction_counts["lru"], 1)
+        self.assertNotIn("1_1_b", self.manager.tools_cache)
+
+    @override_settings(MCP_SESSION_POOL_MAX_SIZE=10, MCP_SESSION_IDLE_TTL=60)
+    def test_evicts_idle_and_unhealthy_sessions(self):
+        self._get("idle")
+        idle_client = self.manager.session_clients["1_1_idle"]
+        self.manager.session_contexts["1_1_idle"]["last_used"] -= 120
+        self._get("fresh")
+
+        self.assertNotIn("1_1_idle", self.manager.session_clients)
+        self.assertEqual(idle_client.closed, 1)
+
+        fresh_client = self.manager.session_clients["1_1_fresh"]
+        fresh_client.healthy = False
+        self._get("fresh")
+
+        self.assertIsNot(self.manager.session_clients["1_1_fresh"], fresh_client)
+        self.assertEqual(fresh_client.closed, 1)
+
+        stats = self.manager.get_pool_stats()
+        self.assertEqual(stats["live_sessions"], 1)
+        self.assertEqual(stats["evictions"], {"idle": 1, "lru": 0, "unhealthy": 1})
+        self.assertEqual(stats["evictions_total"], 2)
+
+    @override_settings(MCP_SESSION_POOL_MAX_SIZE=1, MCP_SESSION_IDLE_TTL=60)
+    def test_leased_sessions_are_not_evicted(self):
+        lease = self.manager.acquire_session("1", "1", "busy")
+        self._get("busy")
+        busy_client = self.manager.session_clients["1_1_busy"]
+        self.manager.session_contexts["1_1_busy"]["last_used"] -= 120
+
+        self._get("other")
+
+        self.assertEqual(busy_client.closed, 0)
+        self.assertEqual(list(self.manager.session_clients), ["1_1_busy", "1_1_other"])
+        self.assertEqual(self.manager.get_pool_stats()["leased_sessions"], 1)
+
+        self.manager.release_session(lease)
+        self._get("third")
+
+        self.assertEqual(busy_client.closed, 1)
+        self.assertNotIn("1_1_busy", self.manager.session_clients)
@@ -16,6 +16,12 @@ urlpatterns = [
         views.RemoteMCPConfigPingView.as_view(),
         name="remote-mcp-config-ping",
     ),
+    # MCP 会话池运行指标
+    path(
+        "session-pool/stats/",
+        views.MCPSessionPoolStatsView.as_view(),
+        name="mcp-session-pool-stats",
+    ),
     # 直接引入 RemoteMCPConfigViewSet 的 router 路由
     path("", include(router.urls)),
     # 新增通用端点：调用任意已注册 MCP 工具
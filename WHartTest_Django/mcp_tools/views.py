@@ -165,6 +165,42 @@ from rest_framework.decorators import action
 from asgiref.sync import async_to_sync
 
 
+class MCPSessionPoolStatsView(APIView):
+    """
+    查看当前进程 MCP 会话池的运行指标：存活会话数、各类淘汰次数、共享工具 schema 缓存命中情况。
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.has_perm("mcp_tools.view_remotemcpconfig"):
+            return Response(
+                {
+                    "status": "error",
+                    "code": status.HTTP_403_FORBIDDEN,
+                    "message": "You do not have permission to view MCP session pool stats.",
+                    "data": {},
+                    "errors": {
+                        "permission": ["mcp_tools.view_remotemcpconfig required"]
+                    },
+                },
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        from .persistent_client import mcp_session_manager
+
+        return Response(
+            {
+                "status": "success",
+                "code": status.HTTP_200_OK,
+                "message": "MCP session pool stats retrieved successfully.",
+                "data": mcp_session_manager.get_pool_stats(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
 class RemoteMCPConfigPingView(APIView):
     """
     用于检查远程 MCP 配置连通状态的 API 端点。
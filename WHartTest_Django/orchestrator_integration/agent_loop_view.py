@@ -42,24 +42,28 @@ from langchain_core.messages import (
 from langchain.agents import create_agent
 from wharttest_django.checkpointer import get_async_checkpointer
 
+from .assembly_cache import (
+    get_cached_builtin_tools,
+    get_cached_mcp_client_config,
+    get_cached_system_prompt,
+)
 from .middleware_config import (
     get_middleware_from_config,
     get_user_tool_approvals,
     get_user_friendly_llm_error,
 )
 from .playwright_instructions import PLAYWRIGHT_SCRIPT_INSTRUCTION
-from .stop_signal import should_stop, clear_stop_signal
+from .stop_signal import StopSignalWatcher, aclear_stop_signal
 from langgraph_integration.models import ChatSession, LLMConfig
+from langgraph_integration.sse import coalesce_sse_events
 from langgraph_integration.views import (
     _extract_requirement_doc_images_for_message,
     create_llm_instance,
     create_sse_data,
-    get_effective_system_prompt_async,
     check_project_permission,
 )
 from projects.models import Project
 from prompts.models import UserPrompt
-from mcp_tools.models import RemoteMCPConfig
 from mcp_tools.persistent_client import mcp_session_manager
 from requirements.context_limits import (
     MODEL_CONTEXT_LIMITS,
@@ -766,703 +770,717 @@ def resolve_runtime_context_limit(
     return 128000
 
 
-@method_decorator(csrf_exempt, name="dispatch")
-class AgentLoopStreamAPIView(View):
-    """
-    Agent Loop 聊天 API (LangChain v1 重构版)
+# ============== Agent Loop 服务层 ==============
 
-    核心特性：
-    - 使用 create_agent() 统一创建 Agent
-    - SummarizationMiddleware 自动上下文压缩
-    - HumanInTheLoopMiddleware 处理 HITL 审批
-    - 在流处理层检测工具调用生成步骤事件
-    - 支持 stream 参数：
-      - stream=true (默认)：返回 SSE 流式响应
-      - stream=false：返回普通 JSON 响应
-    """
 
-    # 最大步骤数（用于前端显示）
-    MAX_STEPS = 500
+def _update_session_token_usage(
+    session_id: str, input_tokens: int, output_tokens: int,
+    cache_read_tokens: int = 0, user_id=None, project_id=None,
+):
+    """更新会话的 Token 使用统计，同时写入独立的 TokenUsageRecord"""
+    try:
+        from django.db.models import F
+        from django.utils import timezone
+
+        ChatSession.objects.filter(session_id=session_id).update(
+            total_input_tokens=F("total_input_tokens") + input_tokens,
+            total_output_tokens=F("total_output_tokens") + output_tokens,
+            total_tokens=F("total_tokens") + input_tokens + output_tokens,
+            total_cache_read_tokens=F("total_cache_read_tokens") + cache_read_tokens,
+            request_count=F("request_count") + 1,
+            updated_at=timezone.now(),
+        )
+    except Exception as e:
+        logger.warning(f"Failed to update session token usage: {e}")
 
-    def _update_session_token_usage(
-        self, session_id: str, input_tokens: int, output_tokens: int,
-        cache_read_tokens: int = 0, user_id=None, project_id=None,
-    ):
-        """更新会话的 Token 使用统计，同时写入独立的 TokenUsageRecord"""
-        try:
-            from django.db.models import F
-            from django.utils import timezone
-
-            ChatSession.objects.filter(session_id=session_id).update(
-                total_input_tokens=F("total_input_tokens") + input_tokens,
-                total_output_tokens=F("total_output_tokens") + output_tokens,
-                total_tokens=F("total_tokens") + input_tokens + output_tokens,
-                total_cache_read_tokens=F("total_cache_read_tokens") + cache_read_tokens,
-                request_count=F("request_count") + 1,
-                updated_at=timezone.now(),
-            )
-        except Exception as e:
-            logger.warning(f"Failed to update session token usage: {e}")
+    # 写入独立记录（不随会话删除而丢失）
+    try:
+        from langgraph_integration.models import TokenUsageRecord
+
+        TokenUsageRecord.objects.create(
+            user_id=user_id,
+            project_id=project_id,
+            session_id=session_id,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+            cache_read_tokens=cache_read_tokens,
+        )
+    except Exception as e:
+        logger.warning(f"Failed to create TokenUsageRecord: {e}")
 
-        # 写入独立记录（不随会话删除而丢失）
-        try:
-            from langgraph_integration.models import TokenUsageRecord
 
-            TokenUsageRecord.objects.create(
-                user_id=user_id,
-                project_id=project_id,
-                session_id=session_id,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                total_tokens=input_tokens + output_tokens,
-                cache_read_tokens=cache_read_tokens,
-            )
-        except Exception as e:
-            logger.warning(f"Failed to create TokenUsageRecord: {e}")
+async def stream_agent_loop_events(
+    user,
+    user_message: str,
+    session_id: str,
+    project_id: str,
+    project: Project,
+    knowledge_base_id: Optional[int] = None,
+    use_knowledge_base: bool = True,
+    prompt_id: Optional[int] = None,
+    uploaded_images_base64: Optional[List[str]] = None,
+    generate_playwright_script: bool = False,
+    test_case_id: Optional[int] = None,
+    use_pytest: bool = True,
+):
+    """
+    Agent Loop 进程内服务（LangChain v1 重构版）
 
-    async def authenticate_request(self, request):
-        """JWT 认证"""
-        auth_header = request.META.get("HTTP_AUTHORIZATION")
-        if not auth_header or not auth_header.startswith("Bearer "):
-            raise AuthenticationFailed("Authentication credentials were not provided.")
+    使用 create_agent + astream 模式，替代旧的 AgentOrchestrator 循环。
+    通过检测 updates 流中的工具调用来生成 step_start/step_complete 事件。
 
-        token = auth_header.split(" ")[1]
-        jwt_auth = JWTAuthentication()
+    以 dict 形式逐个产出事件（与 SSE 事件格式一致），不做序列化：
+    - HTTP 接口通过 AgentLoopStreamAPIView 将事件编码为 SSE 帧
+    - Celery 任务等内部调用方直接消费事件，无需自调用 HTTP 接口
 
-        try:
-            validated_token = await sync_to_async(jwt_auth.get_validated_token)(token)
-            user = await sync_to_async(jwt_auth.get_user)(validated_token)
-            return user
-        except Exception as e:
-            raise AuthenticationFailed(f"Invalid token: {str(e)}")
+    调用方需自行完成认证和项目权限校验。
+    """
+    thread_id = f"{user.id}_{project_id}_{session_id}"
 
-    async def _create_stream_generator(
-        self,
-        request,
-        user_message: str,
-        session_id: str,
-        project_id: str,
-        project: Project,
-        knowledge_base_id: Optional[int] = None,
-        use_knowledge_base: bool = True,
-        prompt_id: Optional[int] = None,
-        uploaded_images_base64: Optional[List[str]] = None,
-        generate_playwright_script: bool = False,
-        test_case_id: Optional[int] = None,
-        use_pytest: bool = True,
-    ):
-        """
-        创建 SSE 流式生成器（LangChain v1 重构版）
+    # 1. 获取 LLM 配置
+    try:
+        active_config = await sync_to_async(LLMConfig.objects.get)(is_active=True)
+        logger.info(f"AgentLoopStreamAPI: Using LLM config: {active_config.name}")
+        context_limit = active_config.context_limit or 128000
+        model_name = active_config.name or "gpt-4o"
+    except LLMConfig.DoesNotExist:
+        yield {"type": "error", "message": "No active LLM configuration found"}
+        return
+
+    # 2. 验证多模态支持
+    if uploaded_images_base64 and not active_config.supports_vision:
+        yield {
+            "type": "error",
+            "message": f"模型 {active_config.name} 不支持图片输入",
+        }
+        return
 
-        使用 create_agent + astream 模式，替代旧的 AgentOrchestrator 循环。
-        通过检测 updates 流中的工具调用来生成 step_start/step_complete 事件。
-        """
-        thread_id = f"{request.user.id}_{project_id}_{session_id}"
+    mcp_lease = None
+    try:
+        # 3. 初始化 LLM
+        llm = await sync_to_async(create_llm_instance)(
+            active_config, temperature=0.7
+        )
+        context_limit = resolve_runtime_context_limit(
+            active_config.context_limit, llm, model_name
+        )
 
-        # 1. 获取 LLM 配置
+        # 4. 加载 MCP 工具
+        tools: List[Any] = []
         try:
-            active_config = await sync_to_async(LLMConfig.objects.get)(is_active=True)
-            logger.info(f"AgentLoopStreamAPI: Using LLM config: {active_config.name}")
-            context_limit = active_config.context_limit or 128000
-            model_name = active_config.name or "gpt-4o"
-        except LLMConfig.DoesNotExist:
-            yield create_sse_data(
-                {"type": "error", "message": "No active LLM configuration found"}
-            )
-            return
-
-        # 2. 验证多模态支持
-        if uploaded_images_base64 and not active_config.supports_vision:
-            yield create_sse_data(
-                {
-                    "type": "error",
-                    "message": f"模型 {active_config.name} 不支持图片输入",
+            client_config = await sync_to_async(get_cached_mcp_client_config)()
+            if client_config:
+                mcp_lease = mcp_session_manager.acquire_session(
+                    str(user.id), str(project_id), session_id
+                )
+                mcp_tools = await mcp_session_manager.get_tools_for_config(
+                    client_config,
+                    user_id=str(user.id),
+                    project_id=str(project_id),
+                    session_id=session_id,
+                )
+                tools.extend(mcp_tools)
+                logger.info(
+                    f"AgentLoopStreamAPI: Loaded {len(mcp_tools)} MCP tools"
+                )
+                yield {
+                    "type": "info",
+                    "message": f"已加载 {len(mcp_tools)} 个工具",
                 }
+        except Exception as e:
+            logger.error(
+                f"AgentLoopStreamAPI: MCP tools loading failed: {e}", exc_info=True
             )
-            return
-
-        try:
-            # 3. 初始化 LLM
-            llm = await sync_to_async(create_llm_instance)(
-                active_config, temperature=0.7
-            )
-            context_limit = resolve_runtime_context_limit(
-                active_config.context_limit, llm, model_name
-            )
+            yield {"type": "warning", "message": f"MCP 工具加载失败: {str(e)}"}
 
-            # 4. 加载 MCP 工具
-            tools: List[Any] = []
+        # 5. 添加知识库工具
+        logger.info(
+            f"AgentLoopStreamAPI: 检查知识库工具 - knowledge_base_id={knowledge_base_id}, use_knowledge_base={use_knowledge_base}"
+        )
+        if knowledge_base_id and use_knowledge_base:
             try:
-                active_mcp_configs = await sync_to_async(list)(
-                    RemoteMCPConfig.objects.filter(is_active=True)
-                )
-                if active_mcp_configs:
-                    client_config = {}
-                    for cfg in active_mcp_configs:
-                        key = cfg.name or f"remote_{cfg.id}"
-                        client_config[key] = {
-                            "url": cfg.url,
-                            "transport": (cfg.transport or "streamable_http").replace(
-                                "-", "_"
-                            ),
-                        }
-                        if cfg.headers:
-                            client_config[key]["headers"] = cfg.headers
+                from knowledge.langgraph_integration import create_knowledge_tool
 
-                    if client_config:
-                        mcp_tools = await mcp_session_manager.get_tools_for_config(
-                            client_config,
-                            user_id=str(request.user.id),
-                            project_id=str(project_id),
-                            session_id=session_id,
-                        )
-                        tools.extend(mcp_tools)
-                        logger.info(
-                            f"AgentLoopStreamAPI: Loaded {len(mcp_tools)} MCP tools"
-                        )
-                        yield create_sse_data(
-                            {
-                                "type": "info",
-                                "message": f"已加载 {len(mcp_tools)} 个工具",
-                            }
-                        )
-            except Exception as e:
-                logger.error(
-                    f"AgentLoopStreamAPI: MCP tools loading failed: {e}", exc_info=True
+                logger.info(f"AgentLoopStreamAPI: 正在创建知识库工具...")
+                kb_tool = await sync_to_async(create_knowledge_tool)(
+                    knowledge_base_id=knowledge_base_id, user=user
                 )
-                yield create_sse_data(
-                    {"type": "warning", "message": f"MCP 工具加载失败: {str(e)}"}
+                tools.append(kb_tool)
+                logger.info(
+                    f"AgentLoopStreamAPI: ✅ 知识库工具已添加: {kb_tool.name}"
                 )
-
-            # 5. 添加知识库工具
+            except Exception as e:
+                logger.warning(
+                    f"AgentLoopStreamAPI: ❌ Knowledge tool creation failed: {e}",
+                    exc_info=True,
+                )
+        else:
             logger.info(
-                f"AgentLoopStreamAPI: 检查知识库工具 - knowledge_base_id={knowledge_base_id}, use_knowledge_base={use_knowledge_base}"
+                f"AgentLoopStreamAPI: ⚠️ 跳过知识库工具 (knowledge_base_id={knowledge_base_id}, use_knowledge_base={use_knowledge_base})"
             )
-            if knowledge_base_id and use_knowledge_base:
-                try:
-                    from knowledge.langgraph_integration import create_knowledge_tool
 
-                    logger.info(f"AgentLoopStreamAPI: 正在创建知识库工具...")
-                    kb_tool = await sync_to_async(create_knowledge_tool)(
-                        knowledge_base_id=knowledge_base_id, user=request.user
-                    )
-                    tools.append(kb_tool)
-                    logger.info(
-                        f"AgentLoopStreamAPI: ✅ 知识库工具已添加: {kb_tool.name}"
-                    )
-                except Exception as e:
-                    logger.warning(
-                        f"AgentLoopStreamAPI: ❌ Knowledge tool creation failed: {e}",
-                        exc_info=True,
-                    )
-            else:
-                logger.info(
-                    f"AgentLoopStreamAPI: ⚠️ 跳过知识库工具 (knowledge_base_id={knowledge_base_id}, use_knowledge_base={use_knowledge_base})"
+        # 6. 添加内置工具（Playwright 脚本管理等）
+        builtin_tools = get_cached_builtin_tools(
+            user_id=user.id,
+            project_id=int(project_id),
+            test_case_id=test_case_id,
+            chat_session_id=session_id,
+        )
+        tools.extend(builtin_tools)
+        logger.info(f"AgentLoopStreamAPI: Added {len(builtin_tools)} builtin tools")
+
+        # 7. 获取或创建 ChatSession（使用 get_or_create 避免竞态条件）
+        prompt_obj = None
+        if prompt_id:
+            try:
+                prompt_obj = await sync_to_async(UserPrompt.objects.get)(
+                    id=prompt_id, user=user, is_active=True
                 )
+            except UserPrompt.DoesNotExist:
+                pass
+
+        chat_session, created = await sync_to_async(
+            ChatSession.objects.get_or_create
+        )(
+            session_id=session_id,
+            defaults={
+                "user": user,
+                "project": project,
+                "prompt": prompt_obj,
+                "title": f"新对话 - {user_message[:30]}",
+            },
+        )
+        if created:
+            logger.info(
+                f"AgentLoopStreamAPI: Created new ChatSession: {session_id}"
+            )
 
-            # 6. 添加内置工具（Playwright 脚本管理等）
-            from orchestrator_integration.builtin_tools import get_builtin_tools
+        # 8. 获取系统提示词
+        effective_prompt, prompt_source = await get_cached_system_prompt(
+            user, prompt_id, project
+        )
 
-            builtin_tools = get_builtin_tools(
-                user_id=request.user.id,
-                project_id=int(project_id),
-                test_case_id=test_case_id,
-                chat_session_id=session_id,
-            )
-            tools.extend(builtin_tools)
-            logger.info(f"AgentLoopStreamAPI: Added {len(builtin_tools)} builtin tools")
+        # 8.1 如果需要生成脚本，追加脚本生成指令
+        if generate_playwright_script:
+            effective_prompt = (
+                effective_prompt or ""
+            ) + PLAYWRIGHT_SCRIPT_INSTRUCTION
+            logger.info(f"AgentLoopStreamAPI: 已追加脚本生成指令")
+
+        # 9. 构建用户消息（支持多模态：上传图片 + HTTP(S) 图片 + 需求文档图片）
+        (
+            human_message_content,
+            human_message_kwargs,
+            display_user_message,
+        ) = await _prepare_agent_loop_human_message(
+            user_message,
+            project=project,
+            supports_vision=active_config.supports_vision,
+            uploaded_images_base64=uploaded_images_base64,
+        )
+        user_msg = HumanMessage(
+            content=human_message_content,
+            additional_kwargs=human_message_kwargs,
+        )
 
-            # 7. 获取或创建 ChatSession（使用 get_or_create 避免竞态条件）
-            prompt_obj = None
-            if prompt_id:
-                try:
-                    prompt_obj = await sync_to_async(UserPrompt.objects.get)(
-                        id=prompt_id, user=request.user, is_active=True
-                    )
-                except UserPrompt.DoesNotExist:
-                    pass
+        # 10. 获取工具名列表用于 HITL
+        tool_names = [t.name for t in tools] if tools else None
+
+        # 11. 发送开始信号
+        yield {
+            "type": "start",
+            "session_id": session_id,
+            "thread_id": thread_id,
+            "project_id": project_id,
+            "display_message": display_user_message,
+            "mode": "agent_loop",
+            "created_at": chat_session.created_at.isoformat()
+            if chat_session and chat_session.created_at
+            else None,
+        }
 
-            chat_session, created = await sync_to_async(
-                ChatSession.objects.get_or_create
-            )(
+        # 12. 创建 Agent（LangChain v1 统一路径）
+        async with get_async_checkpointer() as checkpointer:
+            # 获取中间件（需要同步到异步，因为内部有 ORM 查询）
+            middleware = await sync_to_async(get_middleware_from_config)(
+                active_config,
+                llm,
+                user=user,
                 session_id=session_id,
-                defaults={
-                    "user": request.user,
-                    "project": project,
-                    "prompt": prompt_obj,
-                    "title": f"新对话 - {user_message[:30]}",
-                },
-            )
-            if created:
-                logger.info(
-                    f"AgentLoopStreamAPI: Created new ChatSession: {session_id}"
-                )
-
-            # 8. 获取系统提示词
-            effective_prompt, prompt_source = await get_effective_system_prompt_async(
-                request.user, prompt_id, project
+                all_tool_names=tool_names,
+                tools=tools,
+                system_prompt=effective_prompt,
             )
 
-            # 8.1 如果需要生成脚本，追加脚本生成指令
-            if generate_playwright_script:
-                effective_prompt = (
-                    effective_prompt or ""
-                ) + PLAYWRIGHT_SCRIPT_INSTRUCTION
-                logger.info(f"AgentLoopStreamAPI: 已追加脚本生成指令")
-
-            # 9. 构建用户消息（支持多模态：上传图片 + HTTP(S) 图片 + 需求文档图片）
-            (
-                human_message_content,
-                human_message_kwargs,
-                display_user_message,
-            ) = await _prepare_agent_loop_human_message(
-                user_message,
-                project=project,
-                supports_vision=active_config.supports_vision,
-                uploaded_images_base64=uploaded_images_base64,
+            agent = create_agent(
+                llm,
+                tools,
+                system_prompt=effective_prompt,
+                checkpointer=checkpointer,
+                middleware=middleware,
             )
-            user_msg = HumanMessage(
-                content=human_message_content,
-                additional_kwargs=human_message_kwargs,
+            logger.info(
+                f"AgentLoopStreamAPI: Agent created with {len(tools)} tools"
             )
 
-            # 10. 获取工具名列表用于 HITL
-            tool_names = [t.name for t in tools] if tools else None
+            # 13. 配置调用参数
+            invoke_config = {
+                "configurable": {"thread_id": thread_id},
+                "recursion_limit": 1000,  # 支持约500次工具调用
+            }
+            input_messages = {"messages": [user_msg]}
 
-            # 11. 发送开始信号
-            yield create_sse_data(
-                {
-                    "type": "start",
-                    "session_id": session_id,
-                    "thread_id": thread_id,
-                    "project_id": project_id,
-                    "display_message": display_user_message,
-                    "mode": "agent_loop",
-                    "created_at": chat_session.created_at.isoformat()
-                    if chat_session and chat_session.created_at
-                    else None,
-                }
+            # 13.1 发送前修复历史消息（配对错误 + 风险工具输出）
+            await _sanitize_history_before_model_call(
+                agent=agent,
+                invoke_config=invoke_config,
+                log_prefix="AgentLoopStreamAPI",
             )
 
-            # 12. 创建 Agent（LangChain v1 统一路径）
-            async with get_async_checkpointer() as checkpointer:
-                # 获取中间件（需要同步到异步，因为内部有 ORM 查询）
-                middleware = await sync_to_async(get_middleware_from_config)(
-                    active_config,
-                    llm,
-                    user=request.user,
-                    session_id=session_id,
-                    all_tool_names=tool_names,
-                    tools=tools,
-                    system_prompt=effective_prompt,
-                )
+            # 14. 步骤跟踪状态
+            step_count = 0
+            current_tool_calls = []
+            interrupt_detected = False
+            user_stopped = False
 
-                agent = create_agent(
-                    llm,
-                    tools,
-                    system_prompt=effective_prompt,
-                    checkpointer=checkpointer,
-                    middleware=middleware,
-                )
-                logger.info(
-                    f"AgentLoopStreamAPI: Agent created with {len(tools)} tools"
-                )
-
-                # 13. 配置调用参数
-                invoke_config = {
-                    "configurable": {"thread_id": thread_id},
-                    "recursion_limit": 1000,  # 支持约500次工具调用
-                }
-                input_messages = {"messages": [user_msg]}
-
-                # 13.1 发送前修复历史消息（配对错误 + 风险工具输出）
-                await _sanitize_history_before_model_call(
-                    agent=agent,
-                    invoke_config=invoke_config,
-                    log_prefix="AgentLoopStreamAPI",
-                )
-
-                # 14. 步骤跟踪状态
-                step_count = 0
-                current_tool_calls = []
-                interrupt_detected = False
-                user_stopped = False
+            # 15. 流式执行
+            stream_modes = ["updates", "messages"]
 
-                # 15. 流式执行
-                stream_modes = ["updates", "messages"]
+            # 订阅停止信号：收到信号后立即取消进行中的模型/工具调用
+            stop_watcher = StopSignalWatcher(session_id)
 
-                try:
-                    async for stream_mode, chunk in agent.astream(
+            try:
+                async for stream_mode, chunk in stop_watcher.iterate(
+                    agent.astream(
                         input_messages, config=invoke_config, stream_mode=stream_modes
-                    ):
-                        # 检查用户停止信号
-                        if should_stop(session_id):
-                            user_stopped = True
-                            clear_stop_signal(session_id)
-                            logger.info(
-                                f"AgentLoopStreamAPI: Stop signal received at step {step_count}"
-                            )
-                            yield create_sse_data(
-                                {
-                                    "type": "stopped",
-                                    "message": "已停止生成",
-                                    "step": step_count,
-                                }
+                    )
+                ):
+                    if stream_mode == "updates":
+                        # 检查中断事件 (HITL)
+                        if isinstance(chunk, dict) and "__interrupt__" in chunk:
+                            interrupt_info = chunk["__interrupt__"]
+                            logger.info("AgentLoopStreamAPI: HITL interrupt detected")
+                            logger.debug(
+                                "AgentLoopStreamAPI: interrupt_info=%r", interrupt_info
                             )
-                            break
 
-                        if stream_mode == "updates":
-                            # 检查中断事件 (HITL)
-                            if isinstance(chunk, dict) and "__interrupt__" in chunk:
-                                interrupt_info = chunk["__interrupt__"]
-                                logger.info(
-                                    f"AgentLoopStreamAPI: HITL interrupt detected: {interrupt_info}"
-                                )
-                                logger.info(
-                                    f"AgentLoopStreamAPI: interrupt_info type: {type(interrupt_info)}"
+                            action_requests = []
+                            interrupt_id = None
+                            # 处理 tuple、list 或单个 Interrupt 对象
+                            if isinstance(interrupt_info, (list, tuple)):
+                                interrupts_list = list(interrupt_info)
+                            else:
+                                interrupts_list = [interrupt_info]
+
+                            for intr in interrupts_list:
+                                logger.debug(
+                                    "AgentLoopStreamAPI: Processing interrupt: type=%s, repr=%r",
+                                    type(intr),
+                                    intr,
                                 )
 
-                                action_requests = []
-                                interrupt_id = None
-                                # 处理 tuple、list 或单个 Interrupt 对象
-                                if isinstance(interrupt_info, (list, tuple)):
-                                    interrupts_list = list(interrupt_info)
-                                else:
-                                    interrupts_list = [interrupt_info]
-
-                                for intr in interrupts_list:
-                                    logger.info(
-                                        f"AgentLoopStreamAPI: Processing interrupt: type={type(intr)}, dir={dir(intr)}"
-                                    )
-                                    logger.info(
-                                        f"AgentLoopStreamAPI: interrupt repr: {repr(intr)}"
-                                    )
-
-                                    if hasattr(intr, "id"):
-                                        interrupt_id = intr.id
-                                        logger.info(
-                                            f"AgentLoopStreamAPI: interrupt_id from attr: {interrupt_id}"
-                                        )
-                                    elif isinstance(intr, dict) and "id" in intr:
-                                        interrupt_id = intr["id"]
-                                        logger.info(
-                                            f"AgentLoopStreamAPI: interrupt_id from dict: {interrupt_id}"
-                                        )
-
-                                    intr_value = (
-                                        getattr(intr, "value", intr)
-                                        if hasattr(intr, "value")
-                                        else intr
+                                if hasattr(intr, "id"):
+                                    interrupt_id = intr.id
+                                    logger.debug(
+                                        "AgentLoopStreamAPI: interrupt_id from attr: %s",
+                                        interrupt_id,
                                     )
-                                    logger.info(
-                                        f"AgentLoopStreamAPI: intr_value type={type(intr_value)}, value={intr_value}"
+                                elif isinstance(intr, dict) and "id" in intr:
+                                    interrupt_id = intr["id"]
+                                    logger.debug(
+                                        "AgentLoopStreamAPI: interrupt_id from dict: %s",
+                                        interrupt_id,
                                     )
 
-                                    # 尝试多种方式获取 action_requests
-                                    ars = []
-                                    if isinstance(intr_value, dict):
-                                        ars = intr_value.get("action_requests", [])
-                                        logger.info(
-                                            f"AgentLoopStreamAPI: action_requests from dict: {ars}"
-                                        )
-                                    elif hasattr(intr_value, "action_requests"):
-                                        ars = intr_value.action_requests
-                                        logger.info(
-                                            f"AgentLoopStreamAPI: action_requests from attr: {ars}"
-                                        )
-
-                                    # 如果还是空的，尝试从 intr 本身获取
-                                    if not ars and hasattr(intr, "action_requests"):
-                                        ars = intr.action_requests
-                                        logger.info(
-                                            f"AgentLoopStreamAPI: action_requests from intr attr: {ars}"
-                                        )
-
-                                    logger.info(
-                                        f"AgentLoopStreamAPI: Found {len(ars)} action_requests: {ars}"
-                                    )
-
-                                    for ar in ars:
-                                        if isinstance(ar, dict):
-                                            action_requests.append(
-                                                {
-                                                    "name": ar.get(
-                                                        "name",
-                                                        ar.get(
-                                                            "action_name", "unknown"
-                                                        ),
-                                                    ),
-                                                    "args": ar.get(
-                                                        "arguments", ar.get("args", {})
-                                                    ),
-                                                    "description": ar.get(
-                                                        "description", ""
-                                                    ),
-                                                }
-                                            )
-                                        else:
-                                            action_requests.append(
-                                                {
-                                                    "name": getattr(
-                                                        ar, "name", "unknown"
-                                                    ),
-                                                    "args": getattr(
-                                                        ar,
-                                                        "arguments",
-                                                        getattr(ar, "args", {}),
-                                                    ),
-                                                    "description": getattr(
-                                                        ar, "description", ""
-                                                    ),
-                                                }
-                                            )
-
-                                if action_requests:
-                                    # 获取用户工具偏好，为 always_reject 的工具添加 auto_reject 标记
-                                    user_approvals = await sync_to_async(
-                                        get_user_tool_approvals
-                                    )(request.user, session_id)
-                                    for ar in action_requests:
-                                        tool_name = ar.get("name", "")
-                                        if (
-                                            user_approvals.get(tool_name)
-                                            == "always_reject"
-                                        ):
-                                            ar["auto_reject"] = True
-                                            logger.info(
-                                                f"AgentLoopStreamAPI: Tool {tool_name} marked as auto_reject"
-                                            )
-
-                                    interrupt_detected = True
-                                    yield create_sse_data(
-                                        {
-                                            "type": "interrupt",
-                                            "interrupt_id": interrupt_id
-                                            or str(id(interrupt_info)),
-                                            "action_requests": action_requests,
-                                            "session_id": session_id,
-                                            "thread_id": thread_id,
-                                        }
-                                    )
-                                    logger.info(
-                                        f"AgentLoopStreamAPI: Sent interrupt with {len(action_requests)} actions"
-                                    )
-
-                            # 检测工具调用开始（用于生成 step_start 事件）
-                            elif isinstance(chunk, dict):
-                                for node_name, node_output in chunk.items():
-                                    if node_name == "agent" and isinstance(
-                                        node_output, dict
-                                    ):
-                                        messages = node_output.get("messages", [])
-                                        for msg in messages:
-                                            if (
-                                                hasattr(msg, "tool_calls")
-                                                and msg.tool_calls
-                                            ):
-                                                # 新的工具调用 -> 新步骤开始
-                                                step_count += 1
-                                                current_tool_calls = msg.tool_calls
-                                                tool_names_in_step = [
-                                                    tc.get("name", "unknown")
-                                                    if isinstance(tc, dict)
-                                                    else getattr(tc, "name", "unknown")
-                                                    for tc in current_tool_calls
-                                                ]
-                                                yield create_sse_data(
-                                                    {
-                                                        "type": "step_start",
-                                                        "step": step_count,
-                                                        "max_steps": self.MAX_STEPS,
-                                                        "tools": tool_names_in_step,
-                                                    }
-                                                )
-                                                logger.info(
-                                                    f"AgentLoopStreamAPI: Step {step_count} started with tools: {tool_names_in_step}"
-                                                )
-
-                                    elif node_name == "tools" and isinstance(
-                                        node_output, dict
-                                    ):
-                                        # 工具执行完成
-                                        tool_messages = node_output.get("messages", [])
-                                        for tool_msg in tool_messages:
-                                            if hasattr(tool_msg, "content"):
-                                                content = tool_msg.content
-                                                tool_name = getattr(
-                                                    tool_msg, "name", None
-                                                ) or getattr(
-                                                    tool_msg, "tool_name", "unknown"
-                                                )
-
-                                                # 使用辅助函数处理 MCP 工具输出
-                                                content, summary = (
-                                                    process_mcp_tool_output(content)
-                                                )
-
-                                                yield create_sse_data(
-                                                    {
-                                                        "type": "tool_result",
-                                                        "tool_name": tool_name,
-                                                        "tool_output": content,
-                                                        "summary": summary,
-                                                        "step": step_count,
-                                                    }
-                                                )
-                                        # 步骤完成
-                                        if step_count > 0:
-                                            yield create_sse_data(
-                                                {
-                                                    "type": "step_complete",
-                                                    "step": step_count,
-                                                }
-                                            )
-
-                        elif stream_mode == "messages":
-                            # LLM Token 流式输出
-                            # messages 模式返回元组 (token, metadata)
-                            if isinstance(chunk, tuple) and len(chunk) >= 1:
-                                token = chunk[0]
-                                # 只发送 AI 消息，过滤掉 ToolMessage（工具结果已通过 tool_result 事件发送）
-                                if hasattr(token, "content") and token.content:
-                                    # 检查是否是 ToolMessage（通过类名或 type 属性）
-                                    token_type = type(token).__name__
-                                    if "ToolMessage" not in token_type:
-                                        yield create_sse_data(
-                                            {"type": "stream", "data": token.content}
-                                        )
-                            elif hasattr(chunk, "content") and chunk.content:
-                                # 兼容旧版本可能直接返回 message 的情况
-                                # 同样过滤掉 ToolMessage
-                                chunk_type = type(chunk).__name__
-                                if "ToolMessage" not in chunk_type:
-                                    yield create_sse_data(
-                                        {"type": "stream", "data": chunk.content}
+                                intr_value = (
+                                    getattr(intr, "value", intr)
+                                    if hasattr(intr, "value")
+                                    else intr
+                                )
+                                logger.debug(
+                                    "AgentLoopStreamAPI: intr_value type=%s, value=%r",
+                                    type(intr_value),
+                                    intr_value,
+                                )
+
+                                # 尝试多种方式获取 action_requests
+                                ars = []
+                                if isinstance(intr_value, dict):
+                                    ars = intr_value.get("action_requests", [])
+                                    logger.debug(
+                                        "AgentLoopStreamAPI: action_requests from dict: %r",
+                                        ars,
+                                    )
+                                elif hasattr(intr_value, "action_requests"):
+                                    ars = intr_value.action_requests
+                                    logger.debug(
+                                        "AgentLoopStreamAPI: action_requests from attr: %r",
+                                        ars,
                                     )
 
-                except Exception as e:
-                    friendly_error = get_user_friendly_llm_error(e)
-                    if friendly_error:
-                        logger.warning(
-                            "AgentLoopStreamAPI: Friendly model error. session_id=%s, error_code=%s, message=%s",
-                            session_id,
-                            friendly_error.get("error_code"),
-                            friendly_error.get("message"),
-                        )
-                        yield create_sse_data(_build_sse_error_event(e))
-                    else:
-                        logger.error(
-                            "AgentLoopStreamAPI: Streaming error. session_id=%s, thread_id=%s, "
-                            "model=%s, error_type=%s, error=%s",
-                            session_id,
-                            thread_id,
-                            model_name,
-                            type(e).__name__,
-                            e,
-                            exc_info=True,
-                        )
-                        yield create_sse_data(
-                            {"type": "error", "message": f"Streaming error: {str(e)}"}
-                        )
+                                # 如果还是空的，尝试从 intr 本身获取
+                                if not ars and hasattr(intr, "action_requests"):
+                                    ars = intr.action_requests
+                                    logger.debug(
+                                        "AgentLoopStreamAPI: action_requests from intr attr: %r",
+                                        ars,
+                                    )
 
-                # 16. 处理结束状态
-                # 无论是否发生 interrupt，都需要计算和发送 context_update
-                try:
-                    current_state = await agent.aget_state(invoke_config)
-                    all_messages = (
-                        current_state.values.get("messages", [])
-                        if current_state.values
-                        else []
-                    )
+                                logger.info(
+                                    "AgentLoopStreamAPI: Found %d action_requests", len(ars)
+                                )
 
-                    # 获取当前上下文 token 使用量（优先 usage_metadata，回退估算）
-                    input_tokens, output_tokens, total_tokens = (
-                        calculate_context_tokens(
-                            all_messages, model_name,
-                            tools=tools, system_prompt=effective_prompt,
-                        )
-                    )
+                                for ar in ars:
+                                    if isinstance(ar, dict):
+                                        action_requests.append(
+                                            {
+                                                "name": ar.get(
+                                                    "name",
+                                                    ar.get(
+                                                        "action_name", "unknown"
+                                                    ),
+                                                ),
+                                                "args": ar.get(
+                                                    "arguments", ar.get("args", {})
+                                                ),
+                                                "description": ar.get(
+                                                    "description", ""
+                                                ),
+                                            }
+                                        )
+                                    else:
+                                        action_requests.append(
+                                            {
+                                                "name": getattr(
+                                                    ar, "name", "unknown"
+                                                ),
+                                                "args": getattr(
+                                                    ar,
+                                                    "arguments",
+                                                    getattr(ar, "args", {}),
+                                                ),
+                                                "description": getattr(
+                                                    ar, "description", ""
+                                                ),
+                                            }
+                                        )
 
-                    yield create_sse_data(
-                        {
-                            "type": "context_update",
-                            "context_token_count": total_tokens,
-                            "context_limit": context_limit,
-                        }
-                    )
+                            if action_requests:
+                                # 获取用户工具偏好，为 always_reject 的工具添加 auto_reject 标记
+                                user_approvals = await sync_to_async(
+                                    get_user_tool_approvals
+                                )(user, session_id)
+                                for ar in action_requests:
+                                    tool_name = ar.get("name", "")
+                                    if (
+                                        user_approvals.get(tool_name)
+                                        == "always_reject"
+                                    ):
+                                        ar["auto_reject"] = True
+                                        logger.info(
+                                            f"AgentLoopStreamAPI: Tool {tool_name} marked as auto_reject"
+                                        )
 
-                    # 记录 Token 使用量到 ChatSession + TokenUsageRecord
-                    if input_tokens > 0 or output_tokens > 0:
-                        # 提取缓存命中信息
-                        cache_read_tokens = 0
-                        for msg in reversed(all_messages):
-                            if hasattr(msg, "usage_metadata") and msg.usage_metadata:
-                                cache_info = msg.usage_metadata.get("input_token_details", {})
-                                cache_read_tokens = cache_info.get("cache_read", 0) or 0
+                                interrupt_detected = True
+                                yield {
+                                    "type": "interrupt",
+                                    "interrupt_id": interrupt_id
+                                    or str(id(interrupt_info)),
+                                    "action_requests": action_requests,
+                                    "session_id": session_id,
+                                    "thread_id": thread_id,
+                                }
                                 logger.info(
-                                    "AgentLoopStreamAPI: Token usage - input=%d, output=%d, cache_read=%d, cache_info=%s",
-                                    input_tokens, output_tokens, cache_read_tokens, cache_info,
+                                    f"AgentLoopStreamAPI: Sent interrupt with {len(action_requests)} actions"
                                 )
-                                break
-                        else:
-                            logger.info(
-                                f"AgentLoopStreamAPI: Token usage recorded - input={input_tokens}, output={output_tokens}"
-                            )
 
-                        await sync_to_async(self._update_session_token_usage)(
-                            session_id, input_tokens, output_tokens,
-                            cache_read_tokens=cache_read_tokens,
-                            user_id=request.user.id,
-                            project_id=int(project_id) if project_id else None,
-                        )
-                except Exception as e:
-                    logger.warning(
-                        f"AgentLoopStreamAPI: Failed to calculate token count: {e}"
-                    )
+                        # 检测工具调用开始（用于生成 step_start 事件）
+                        elif isinstance(chunk, dict):
+                            for node_name, node_output in chunk.items():
+                                if node_name == "agent" and isinstance(
+                                    node_output, dict
+                                ):
+                                    messages = node_output.get("messages", [])
+                                    for msg in messages:
+                                        if (
+                                            hasattr(msg, "tool_calls")
+                                            and msg.tool_calls
+                                        ):
+                                            # 新的工具调用 -> 新步骤开始
+                                            step_count += 1
+                                            current_tool_calls = msg.tool_calls
+                                            tool_names_in_step = [
+                                                tc.get("name", "unknown")
+                                                if isinstance(tc, dict)
+                                                else getattr(tc, "name", "unknown")
+                                                for tc in current_tool_calls
+                                            ]
+                                            yield {
+                                                "type": "step_start",
+                                                "step": step_count,
+                                                "max_steps": AgentLoopStreamAPIView.MAX_STEPS,
+                                                "tools": tool_names_in_step,
+                                            }
+                                            logger.info(
+                                                f"AgentLoopStreamAPI: Step {step_count} started with tools: {tool_names_in_step}"
+                                            )
 
-                if user_stopped:
-                    yield create_sse_data(
-                        {"type": "complete", "status": "stopped", "steps": step_count}
-                    )
-                elif interrupt_detected:
+                                elif node_name == "tools" and isinstance(
+                                    node_output, dict
+                                ):
+                                    # 工具执行完成
+                                    tool_messages = node_output.get("messages", [])
+                                    for tool_msg in tool_messages:
+                                        if hasattr(tool_msg, "content"):
+                                            content = tool_msg.content
+                                            tool_name = getattr(
+                                                tool_msg, "name", None
+                                            ) or getattr(
+                                                tool_msg, "tool_name", "unknown"
+                                            )
+
+                                            # 使用辅助函数处理 MCP 工具输出
+                                            content, summary = (
+                                                process_mcp_tool_output(content)
+                                            )
+
+                                            yield {
+                                                "type": "tool_result",
+                                                "tool_name": tool_name,
+                                                "tool_output": content,
+                                                "summary": summary,
+                                                "step": step_count,
+                                            }
+                                    # 步骤完成
+                                    if step_count > 0:
+                                        yield {
+                                            "type": "step_complete",
+                                            "step": step_count,
+                                        }
+
+                    elif stream_mode == "messages":
+                        # LLM Token 流式输出
+                        # messages 模式返回元组 (token, metadata)
+                        if isinstance(chunk, tuple) and len(chunk) >= 1:
+                            token = chunk[0]
+                            # 只发送 AI 消息，过滤掉 ToolMessage（工具结果已通过 tool_result 事件发送）
+                            if hasattr(token, "content") and token.content:
+                                # 检查是否是 ToolMessage（通过类名或 type 属性）
+                                token_type = type(token).__name__
+                                if "ToolMessage" not in token_type:
+                                    yield {"type": "stream", "data": token.content}
+                        elif hasattr(chunk, "content") and chunk.content:
+                            # 兼容旧版本可能直接返回 message 的情况
+                            # 同样过滤掉 ToolMessage
+                            chunk_type = type(chunk).__name__
+                            if "ToolMessage" not in chunk_type:
+                                yield {"type": "stream", "data": chunk.content}
+
+                if stop_watcher.stopped:
+                    user_stopped = True
+                    await aclear_stop_signal(session_id)
                     logger.info(
-                        "AgentLoopStreamAPI: Interrupt detected, returning early"
+                        f"AgentLoopStreamAPI: Stop signal received at step {step_count}"
+                    )
+                    yield {
+                        "type": "stopped",
+                        "message": "已停止生成",
+                        "step": step_count,
+                    }
+
+            except Exception as e:
+                friendly_error = get_user_friendly_llm_error(e)
+                if friendly_error:
+                    logger.warning(
+                        "AgentLoopStreamAPI: Friendly model error. session_id=%s, error_code=%s, message=%s",
+                        session_id,
+                        friendly_error.get("error_code"),
+                        friendly_error.get("message"),
                     )
+                    yield _build_sse_error_event(e)
                 else:
-                    complete_data = {"type": "complete", "total_steps": step_count}
-                    if generate_playwright_script:
-                        complete_data["script_generation"] = {
-                            "enabled": True,
-                            "message": "脚本管理工具已启用",
-                        }
-                    yield create_sse_data(complete_data)
+                    logger.error(
+                        "AgentLoopStreamAPI: Streaming error. session_id=%s, thread_id=%s, "
+                        "model=%s, error_type=%s, error=%s",
+                        session_id,
+                        thread_id,
+                        model_name,
+                        type(e).__name__,
+                        e,
+                        exc_info=True,
+                    )
+                    yield {"type": "error", "message": f"Streaming error: {str(e)}"}
 
-                yield "data: [DONE]\n\n"
+            # 16. 处理结束状态
+            # 无论是否发生 interrupt，都需要计算和发送 context_update
+            try:
+                current_state = await agent.aget_state(invoke_config)
+                all_messages = (
+                    current_state.values.get("messages", [])
+                    if current_state.values
+                    else []
+                )
 
-        except Exception as e:
-            friendly_error = get_user_friendly_llm_error(e)
-            if friendly_error:
-                logger.warning(
-                    "AgentLoopStreamAPI: Friendly model error. session_id=%s, error_code=%s, message=%s",
-                    session_id,
-                    friendly_error.get("error_code"),
-                    friendly_error.get("message"),
+                # 获取当前上下文 token 使用量（优先 usage_metadata，回退估算）
+                input_tokens, output_tokens, total_tokens = (
+                    calculate_context_tokens(
+                        all_messages, model_name,
+                        tools=tools, system_prompt=effective_prompt,
+                    )
                 )
-                yield create_sse_data(_build_sse_error_event(e))
-            else:
-                logger.error(
-                    "AgentLoopStreamAPI: Error. session_id=%s, thread_id=%s, model=%s, "
-                    "error_type=%s, error=%s",
-                    session_id,
-                    thread_id,
-                    model_name if "model_name" in locals() else "unknown",
-                    type(e).__name__,
-                    e,
-                    exc_info=True,
+
+                yield {
+                    "type": "context_update",
+                    "context_token_count": total_tokens,
+                    "context_limit": context_limit,
+                }
+
+                # 记录 Token 使用量到 ChatSession + TokenUsageRecord
+                if input_tokens > 0 or output_tokens > 0:
+                    # 提取缓存命中信息
+                    cache_read_tokens = 0
+                    for msg in reversed(all_messages):
+                        if hasattr(msg, "usage_metadata") and msg.usage_metadata:
+                            cache_info = msg.usage_metadata.get("input_token_details", {})
+                            cache_read_tokens = cache_info.get("cache_read", 0) or 0
+                            logger.info(
+                                "AgentLoopStreamAPI: Token usage - input=%d, output=%d, cache_read=%d, cache_info=%s",
+                                input_tokens, output_tokens, cache_read_tokens, cache_info,
+                            )
+                            break
+                    else:
+                        logger.info(
+                            f"AgentLoopStreamAPI: Token usage recorded - input={input_tokens}, output={output_tokens}"
+                        )
+
+                    await sync_to_async(_update_session_token_usage)(
+                        session_id, input_tokens, output_tokens,
+                        cache_read_tokens=cache_read_tokens,
+                        user_id=user.id,
+                        project_id=int(project_id) if project_id else None,
+                    )
+            except Exception as e:
+                logger.warning(
+                    f"AgentLoopStreamAPI: Failed to calculate token count: {e}"
                 )
-                yield create_sse_data(
-                    {"type": "error", "message": f"执行错误: {str(e)}"}
+
+            if user_stopped:
+                yield {"type": "complete", "status": "stopped", "steps": step_count}
+            elif interrupt_detected:
+                logger.info(
+                    "AgentLoopStreamAPI: Interrupt detected, returning early"
                 )
+            else:
+                complete_data = {"type": "complete", "total_steps": step_count}
+                if generate_playwright_script:
+                    complete_data["script_generation"] = {
+                        "enabled": True,
+                        "message": "脚本管理工具已启用",
+                    }
+                yield complete_data
+
+    except Exception as e:
+        friendly_error = get_user_friendly_llm_error(e)
+        if friendly_error:
+            logger.warning(
+                "AgentLoopStreamAPI: Friendly model error. session_id=%s, error_code=%s, message=%s",
+                session_id,
+                friendly_error.get("error_code"),
+                friendly_error.get("message"),
+            )
+            yield _build_sse_error_event(e)
+        else:
+            logger.error(
+                "AgentLoopStreamAPI: Error. session_id=%s, thread_id=%s, model=%s, "
+                "error_type=%s, error=%s",
+                session_id,
+                thread_id,
+                model_name if "model_name" in locals() else "unknown",
+                type(e).__name__,
+                e,
+                exc_info=True,
+            )
+            yield {"type": "error", "message": f"执行错误: {str(e)}"}
+    finally:
+        if mcp_lease:
+            mcp_session_manager.release_session(mcp_lease)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AgentLoopStreamAPIView(View):
+    """
+    Agent Loop 聊天 API (LangChain v1 重构版)
+
+    核心特性：
+    - 使用 create_agent() 统一创建 Agent
+    - SummarizationMiddleware 自动上下文压缩
+    - HumanInTheLoopMiddleware 处理 HITL 审批
+    - 在流处理层检测工具调用生成步骤事件
+    - 支持 stream 参数：
+      - stream=true (默认)：返回 SSE 流式响应
+      - stream=false：返回普通 JSON 响应
+    """
+
+    # 最大步骤数（用于前端显示）
+    MAX_STEPS = 500
+
+    async def authenticate_request(self, request):
+        """JWT 认证"""
+        auth_header = request.META.get("HTTP_AUTHORIZATION")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            raise AuthenticationFailed("Authentication credentials were not provided.")
+
+        token = auth_header.split(" ")[1]
+        jwt_auth = JWTAuthentication()
+
+        try:
+            validated_token = await sync_to_async(jwt_auth.get_validated_token)(token)
+            user = await sync_to_async(jwt_auth.get_user)(validated_token)
+            return user
+        except Exception as e:
+            raise AuthenticationFailed(f"Invalid token: {str(e)}")
+
+    async def _create_stream_generator(
+        self,
+        request,
+        user_message: str,
+        session_id: str,
+        project_id: str,
+        project: Project,
+        knowledge_base_id: Optional[int] = None,
+        use_knowledge_base: bool = True,
+        prompt_id: Optional[int] = None,
+        uploaded_images_base64: Optional[List[str]] = None,
+        generate_playwright_script: bool = False,
+        test_case_id: Optional[int] = None,
+        use_pytest: bool = True,
+    ):
+        """
+        创建 SSE 流式生成器
+
+        HTTP 适配层：将 stream_agent_loop_events 产出的事件编码为 SSE 帧，
+        token 事件按时间/大小窗口合并发送。
+        """
+        async for frame in coalesce_sse_events(
+            stream_agent_loop_events(
+                request.user,
+                user_message,
+                session_id,
+                project_id,
+                project,
+                knowledge_base_id,
+                use_knowledge_base,
+                prompt_id,
+                uploaded_images_base64,
+                generate_playwright_script,
+                test_case_id,
+                use_pytest,
+            )
+        ):
+            yield frame
+
+        yield "data: [DONE]\n\n"
 
     async def post(self, request, *args, **kwargs):
         """
@@ -1547,7 +1565,7 @@ class AgentLoopStreamAPIView(View):
 
         # 5.1 清理陈旧停止信号，避免上一次"停止"残留影响本轮首次发送
         # 场景：前端先断开 SSE，再调用 stop API，可能导致信号留存到下一次请求
-        if clear_stop_signal(session_id):
+        if await aclear_stop_signal(session_id):
             logger.info(
                 f"AgentLoopStreamAPI: Cleared stale stop signal for session {session_id}"
             )
@@ -1611,7 +1629,7 @@ class AgentLoopStreamAPIView(View):
         use_pytest: bool = True,
     ) -> JsonResponse:
         """
-        处理非流式请求，收集所有流式事件后返回统一 JSON 响应
+        处理非流式请求，直接消费 Agent Loop 事件后返回统一 JSON 响应
         """
         final_content = ""
         final_session_id = session_id
@@ -1626,8 +1644,8 @@ class AgentLoopStreamAPIView(View):
         script_generation = None
 
         try:
-            async for chunk in self._create_stream_generator(
-                request,
+            async for event in stream_agent_loop_events(
+                request.user,
                 user_message,
                 session_id,
                 project_id,
@@ -1640,48 +1658,39 @@ class AgentLoopStreamAPIView(View):
                 test_case_id,
                 use_pytest,
             ):
-                # 解析 SSE 数据
-                if isinstance(chunk, str) and chunk.startswith("data: "):
-                    data_str = chunk[6:].strip()
-                    if data_str == "[DONE]":
-                        continue
-                    try:
-                        event = json.loads(data_str)
-                        event_type = event.get("type")
-
-                        if event_type == "start":
-                            final_session_id = event.get("session_id", session_id)
-                        elif event_type == "stream":
-                            # 累积流式内容
-                            final_content += event.get("data", "")
-                        elif event_type == "tool_result":
-                            tool_results.append(
-                                {
-                                    "summary": event.get("summary", ""),
-                                    "tool_output": event.get("tool_output"),
-                                    "tool_name": event.get("tool_name"),
-                                    "step": event.get("step", 0),
-                                }
-                            )
-                        elif event_type == "step_complete":
-                            total_steps = max(total_steps, event.get("step", 0))
-                        elif event_type == "context_update":
-                            context_token_count = event.get("context_token_count", 0)
-                            context_limit = event.get("context_limit", 128000)
-                        elif event_type == "error":
-                            error_message = event.get("message", "Unknown error")
-                            error_status_code = event.get("code", 500)
-                            error_details = event.get("errors")
-                        elif event_type == "interrupt":
-                            interrupt_info = {
-                                "interrupt_id": event.get("interrupt_id"),
-                                "action_requests": event.get("action_requests", []),
-                            }
-                        elif event_type == "complete":
-                            if event.get("script_generation"):
-                                script_generation = event.get("script_generation")
-                    except json.JSONDecodeError:
-                        continue
+                event_type = event.get("type")
+
+                if event_type == "start":
+                    final_session_id = event.get("session_id", session_id)
+                elif event_type == "stream":
+                    # 累积流式内容
+                    final_content += event.get("data", "")
+                elif event_type == "tool_result":
+                    tool_results.append(
+                        {
+                            "summary": event.get("summary", ""),
+                            "tool_output": event.get("tool_output"),
+                            "tool_name": event.get("tool_name"),
+                            "step": event.get("step", 0),
+                        }
+                    )
+                elif event_type == "step_complete":
+                    total_steps = max(total_steps, event.get("step", 0))
+                elif event_type == "context_update":
+                    context_token_count = event.get("context_token_count", 0)
+                    context_limit = event.get("context_limit", 128000)
+                elif event_type == "error":
+                    error_message = event.get("message", "Unknown error")
+                    error_status_code = event.get("code", 500)
+                    error_details = event.get("errors")
+                elif event_type == "interrupt":
+                    interrupt_info = {
+                        "interrupt_id": event.get("interrupt_id"),
+                        "action_requests": event.get("action_requests", []),
+                    }
+                elif event_type == "complete":
+                    if event.get("script_generation"):
+                        script_generation = event.get("script_generation")
 
             # 构建响应
             if error_message:
@@ -1752,7 +1761,7 @@ class AgentLoopStopAPIView(View):
 
     async def post(self, request, *args, **kwargs):
         """处理停止请求"""
-        from .stop_signal import set_stop_signal
+        from .stop_signal import aset_stop_signal
 
         # 1. 认证
         try:
@@ -1772,7 +1781,7 @@ class AgentLoopStopAPIView(View):
             return api_error_response("session_id is required", 400)
 
         # 3. 设置停止信号
-        success = set_stop_signal(session_id)
+        success = await aset_stop_signal(session_id)
 
         logger.info(
             f"AgentLoopStopAPI: Stop signal set for session {session_id} by user {user.id}"
@@ -1858,6 +1867,7 @@ class AgentLoopResumeAPIView(View):
             }
         )
 
+        mcp_lease = None
         try:
             async with get_async_checkpointer() as checkpointer:
                 # 3. 获取 LLM 配置
@@ -1883,33 +1893,21 @@ class AgentLoopResumeAPIView(View):
 
                 # 加载 MCP 工具
                 try:
-                    active_mcp_configs = await sync_to_async(list)(
-                        RemoteMCPConfig.objects.filter(is_active=True)
-                    )
-                    if active_mcp_configs:
-                        client_config = {}
-                        for cfg in active_mcp_configs:
-                            key = cfg.name or f"remote_{cfg.id}"
-                            client_config[key] = {
-                                "url": cfg.url,
-                                "transport": (
-                                    cfg.transport or "streamable_http"
-                                ).replace("-", "_"),
-                            }
-                            if cfg.headers:
-                                client_config[key]["headers"] = cfg.headers
-
-                        if client_config:
-                            mcp_tools = await mcp_session_manager.get_tools_for_config(
-                                client_config,
-                                user_id=str(user.id),
-                                project_id=str(project_id) if project_id else "0",
-                                session_id=session_id,
-                            )
-                            tools.extend(mcp_tools)
-                            logger.info(
-                                f"AgentLoopResumeAPI: Loaded {len(mcp_tools)} MCP tools"
-                            )
+                    client_config = await sync_to_async(get_cached_mcp_client_config)()
+                    if client_config:
+                        mcp_lease = mcp_session_manager.acquire_session(
+                            str(user.id), str(project_id) if project_id else "0", session_id
+                        )
+                        mcp_tools = await mcp_session_manager.get_tools_for_config(
+                            client_config,
+                            user_id=str(user.id),
+                            project_id=str(project_id) if project_id else "0",
+                            session_id=session_id,
+                        )
+                        tools.extend(mcp_tools)
+                        logger.info(
+                            f"AgentLoopResumeAPI: Loaded {len(mcp_tools)} MCP tools"
+                        )
                 except Exception as e:
                     logger.warning(f"AgentLoopResumeAPI: MCP tools loading failed: {e}")
 
@@ -1934,9 +1932,7 @@ class AgentLoopResumeAPIView(View):
 
                 # 加载内置工具
                 try:
-                    from orchestrator_integration.builtin_tools import get_builtin_tools
-
-                    builtin_tools = get_builtin_tools(
+                    builtin_tools = get_cached_builtin_tools(
                         user_id=user.id,
                         project_id=int(project_id) if project_id else 0,
                         test_case_id=None,
@@ -2003,18 +1999,25 @@ class AgentLoopResumeAPIView(View):
                 # 8. 步骤跟踪状态
                 step_count = 0
                 interrupt_detected = False
+                user_stopped = False
+                stop_watcher = StopSignalWatcher(session_id)
 
                 # 9. 流式执行
                 try:
-                    async for stream_mode, chunk in agent.astream(
-                        command, config=config, stream_mode=["updates", "messages"]
+                    async for stream_mode, chunk in stop_watcher.iterate(
+                        agent.astream(
+                            command, config=config, stream_mode=["updates", "messages"]
+                        )
                     ):
                         if stream_mode == "updates":
                             # 检查中断事件 (HITL) - resume 后可能又触发新的中断
                             if isinstance(chunk, dict) and "__interrupt__" in chunk:
                                 interrupt_info = chunk["__interrupt__"]
                                 logger.info(
-                                    f"AgentLoopResumeAPI: HITL interrupt detected after resume: {interrupt_info}"
+                                    "AgentLoopResumeAPI: HITL interrupt detected after resume"
+                                )
+                                logger.debug(
+                                    "AgentLoopResumeAPI: interrupt_info=%r", interrupt_info
                                 )
 
                                 action_requests = []
@@ -2179,17 +2182,27 @@ class AgentLoopResumeAPIView(View):
                                     # 检查是否是 ToolMessage（通过类名或 type 属性）
                                     token_type = type(token).__name__
                                     if "ToolMessage" not in token_type:
-                                        yield create_sse_data(
-                                            {"type": "stream", "data": token.content}
-                                        )
+                                        yield {"type": "stream", "data": token.content}
                             elif hasattr(chunk, "content") and chunk.content:
                                 # 兼容旧版本可能直接返回 message 的情况
                                 # 同样过滤掉 ToolMessage
                                 chunk_type = type(chunk).__name__
                                 if "ToolMessage" not in chunk_type:
-                                    yield create_sse_data(
-                                        {"type": "stream", "data": chunk.content}
-                                    )
+                                    yield {"type": "stream", "data": chunk.content}
+
+                    if stop_watcher.stopped:
+                        user_stopped = True
+                        await aclear_stop_signal(session_id)
+                        logger.info(
+                            f"AgentLoopResumeAPI: Stop signal received at step {step_count}"
+                        )
+                        yield create_sse_data(
+                            {
+                                "type": "stopped",
+                                "message": "已停止生成",
+                                "step": step_count,
+                            }
+                        )
 
                 except Exception as e:
                     friendly_error = get_user_friendly_llm_error(e)
@@ -2245,9 +2258,7 @@ class AgentLoopResumeAPIView(View):
                                 cache_read_tokens = cache_info.get("cache_read", 0) or 0
                                 break
 
-                        await sync_to_async(
-                            AgentLoopStreamAPIView()._update_session_token_usage
-                        )(
+                        await sync_to_async(_update_session_token_usage)(
                             session_id, input_tokens, output_tokens,
                             cache_read_tokens=cache_read_tokens,
                             user_id=user.id,
@@ -2262,7 +2273,11 @@ class AgentLoopResumeAPIView(View):
                         f"AgentLoopResumeAPI: Failed to calculate token count: {e}"
                     )
 
-                if interrupt_detected:
+                if user_stopped:
+                    yield create_sse_data(
+                        {"type": "complete", "status": "stopped", "steps": step_count}
+                    )
+                elif interrupt_detected:
                     logger.info(
                         "AgentLoopResumeAPI: New interrupt detected after resume"
                     )
@@ -2293,6 +2308,9 @@ class AgentLoopResumeAPIView(View):
                     session_id,
                 )
                 yield create_sse_data({"type": "error", "message": str(e)})
+        finally:
+            if mcp_lease:
+                mcp_session_manager.release_session(mcp_lease)
 
     async def post(self, request, *args, **kwargs):
         """处理 HITL resume 请求 - 返回 SSE 流式响应"""
@@ -2374,15 +2392,23 @@ class AgentLoopResumeAPIView(View):
             f"AgentLoopResumeAPI: Resume request for session {session_id}, knowledge_base_id={knowledge_base_id}"
         )
 
+        # 清理陈旧停止信号，避免上一轮"停止"残留导致恢复后立即中断
+        if await aclear_stop_signal(session_id):
+            logger.info(
+                f"AgentLoopResumeAPI: Cleared stale stop signal for session {session_id}"
+            )
+
         # 3. 返回 SSE 流式响应
         async def async_generator():
-            async for chunk in self._create_resume_stream_generator(
-                user,
-                session_id,
-                project_id,
-                resume_data,
-                knowledge_base_id,
-                use_knowledge_base,
+            async for chunk in coalesce_sse_events(
+                self._create_resume_stream_generator(
+                    user,
+                    session_id,
+                    project_id,
+                    resume_data,
+                    knowledge_base_id,
+                    use_knowledge_base,
+                )
             ):
                 yield chunk
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class OrchestratorIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orchestrator_integration'
+
+    def ready(self):
+        import orchestrator_integration.signals  # noqa: F401
@@ -0,0 +1,258 @@
+"""
+Agent 装配缓存
+
+Agent Loop 每一轮在调用模型之前都要从数据库重新装配：系统提示词（含项目凭据、Skills 元数据）、
+MCP 配置、HITL 审批配置、用户审批偏好、内置工具等。这些数据在会话的多轮对话之间几乎不变，
+把它们缓存起来可以显著缩短热会话的首 token 时间。
+
+缓存条目按作用域打版本：
+- global：LLMConfig / RemoteMCPConfig / Skill
+- user:<id>：UserPrompt / UserToolApproval
+- project:<id>：Project / ProjectCredential
+
+模型变更时由 signals 递增对应作用域的版本号，条目在读取时比对版本，不一致即视为失效。
+版本号存放在共享缓存（SHARED_STATE_REDIS_URL 指向的 Redis）中，任一进程中的变更对
+uvicorn/Celery 各进程立即生效；未配置共享 Redis 时缓存默认关闭（AGENT_ASSEMBLY_CACHE_ENABLED）。
+条目本身保存在进程内（包含工具对象等不可序列化的值），并带有 TTL 兜底。
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger("orchestrator_integration")
+
+SCOPE_GLOBAL = "global"
+VERSION_KEY_PREFIX = "wharttest:agent_assembly:version:"
+
+
+def user_scope(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def project_scope(project_id) -> str:
+    return f"project:{project_id}"
+
+
+class AgentAssemblyCache:
+    """进程内版本化缓存，按 LRU 限制条目数，条目带 TTL"""
+
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[int, ...], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self) -> int:
+        if self._max_entries is not None:
+            return self._max_entries
+        return getattr(settings, "AGENT_ASSEMBLY_CACHE_MAX_ENTRIES", 512)
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is not None:
+            return self._ttl
+        return getattr(settings, "AGENT_ASSEMBLY_CACHE_TTL", 300)
+
+    # ---------- 版本 ----------
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, "AGENT_ASSEMBLY_CACHE_ENABLED", False)
+
+    @staticmethod
+    def _version_store():
+        return caches[getattr(settings, "SHARED_STATE_CACHE_ALIAS", "default")]
+
+    @classmethod
+    def _versions(cls, scopes: Iterable[str]) -> Tuple[int, ...]:
+        if not cls.enabled():
+            # 缓存关闭：返回无效版本，读写均跳过
+            return (-1,)
+        scopes = tuple(scopes)
+        if not scopes:
+            return ()
+        keys = [f"{VERSION_KEY_PREFIX}{scope}" for scope in scopes]
+        try:
+            # 版本号读取只是一次共享缓存查询，异步路径中也直接同步调用
+            stored = cls._version_store().get_many(keys)
+        except Exception as exc:
+            logger.warning("读取 Agent 装配缓存版本失败，跳过缓存: %s", exc)
+            return tuple(-1 for _ in keys)
+        return tuple(int(stored.get(key, 0)) for key in keys)
+
+    @classmethod
+    def bump(cls, *scopes: str):
+        """递增作用域版本号，使该作用域下的缓存条目失效"""
+        if not cls.enabled():
+            return
+        store = cls._version_store()
+        for scope in scopes:
+            key = f"{VERSION_KEY_PREFIX}{scope}"
+            try:
+                # add 只在键不存在时写入，避免并发首次递增时互相覆盖
+                store.add(key, 0, None)
+                store.incr(key)
+            except Exception as exc:
+                logger.warning("递增 Agent 装配缓存版本失败 (%s): %s", scope, exc)
+
+    # ---------- 读写 ----------
+
+    def _lookup(self, key: Hashable, versions: Tuple[int, ...]) -> Tuple[bool, Any]:
+        if -1 in versions:
+            return False, None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, entry_versions, value = entry
+                if expires_at > now and entry_versions == versions:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._entries.pop(key, None)
+            self.misses += 1
+        return False, None
+
+    def _store(self, key: Hashable, versions: Tuple[int, ...], value: Any):
+        if -1 in versions:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, versions, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: Hashable, scopes: Iterable[str] = ()) -> Tuple[bool, Any]:
+        return self._lookup(key, self._versions(scopes))
+
+    def set(self, key: Hashable, value: Any, scopes: Iterable[str] = ()):
+        self._store(key, self._versions(scopes), value)
+
+    def get_or_build(self, key: Hashable, scopes: Iterable[str], builder: Callable[[], Any]) -> Any:
+        # 条目记录构建前读取的版本号，构建期间发生的变更会使该条目在下次读取时失效
+        versions = self._versions(scopes)
+        hit, value = self._lookup(key, versions)
+        if hit:
+            return value
+        value = builder()
+        self._store(key, versions, value)
+        return value
+
+    async def aget_or_build(
+        self, key: Hashable, scopes: Iterable[str], builder: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        versions = self._versions(scopes)
+        hit, value = self._lookup(key, versions)
+        if hit:
+            return value
+        value = await builder()
+        self._store(key, versions, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled(),
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+assembly_cache = AgentAssemblyCache()
+
+
+def invalidate_assembly_cache(*scopes: str):
+    """使指定作用域的装配缓存失效"""
+    AgentAssemblyCache.bump(*scopes)
+
+
+# ============== 装配步骤的缓存封装 ==============
+
+
+async def get_cached_system_prompt(user, prompt_id=None, project=None):
+    """带缓存的 get_effective_system_prompt_async，返回 (prompt_content, prompt_source)"""
+    from langgraph_integration.views import get_effective_system_prompt_async
+
+    project_id = getattr(project, "id", None)
+    scopes = [SCOPE_GLOBAL, user_scope(user.id)]
+    if project_id is not None:
+        scopes.append(project_scope(project_id))
+
+    return await assembly_cache.aget_or_build(
+        ("system_prompt", user.id, project_id, str(prompt_id or "")),
+        scopes,
+        lambda: get_effective_system_prompt_async(user, prompt_id, project),
+    )
+
+
+def get_cached_mcp_client_config() -> Dict[str, Any]:
+    """带缓存的活跃 MCP 服务器连接配置（server_name -> 连接参数）"""
+    from mcp_tools.models import RemoteMCPConfig
+
+    def _build():
+        client_config = {}
+        for cfg in RemoteMCPConfig.objects.filter(is_active=True):
+            key = cfg.name or f"remote_{cfg.id}"
+            client_config[key] = {
+                "url": cfg.url,
+                "transport": (cfg.transport or "streamable_http").replace("-", "_"),
+            }
+            if cfg.headers:
+                client_config[key]["headers"] = cfg.headers
+        return client_config
+
+    return copy.deepcopy(
+        assembly_cache.get_or_build(("mcp_client_config",), [SCOPE_GLOBAL], _build)
+    )
+
+
+def get_cached_builtin_tools(
+    user_id: int,
+    project_id: int,
+    test_case_id: int = None,
+    chat_session_id: str = None,
+) -> List[Any]:
+    """
+    带缓存的内置工具列表
+
+    内置工具是绑定了用户/项目/会话 ID 的闭包，执行时才读数据库，
+    同一会话的多轮对话可以直接复用，省去每轮重新生成工具 schema 的开销。
+    """
+    from orchestrator_integration.builtin_tools import get_builtin_tools
+
+    tools = assembly_cache.get_or_build(
+        ("builtin_tools", user_id, project_id, test_case_id, chat_session_id),
+        [SCOPE_GLOBAL],
+        lambda: get_builtin_tools(
+            user_id=user_id,
+            project_id=project_id,
+            test_case_id=test_case_id,
+            chat_session_id=chat_session_id,
+        ),
+    )
+    return list(tools)
+
+
+def content_digest(text: Optional[str]) -> str:
+    """文本内容摘要，用于把大段文本放进缓存键"""
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
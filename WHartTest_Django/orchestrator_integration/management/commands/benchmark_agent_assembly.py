@@ -0,0 +1,150 @@
+import statistics
+import time
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from langgraph_integration.models import LLMConfig
+from langgraph_integration.views import create_llm_instance
+from orchestrator_integration.assembly_cache import (
+    assembly_cache,
+    get_cached_builtin_tools,
+    get_cached_mcp_client_config,
+    get_cached_system_prompt,
+)
+from orchestrator_integration.middleware_config import get_middleware_from_config
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks agent-loop assembly before the first model call (cold vs warm cache). '
+        'With --live, measures real time-to-first-token through the agent loop service.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, help='User ID')
+        parser.add_argument('--project', type=int, required=True, help='Project ID')
+        parser.add_argument('--prompt', type=int, help='UserPrompt ID (optional)')
+        parser.add_argument('--iterations', type=int, default=20, help='Turns per scenario (default: 20)')
+        parser.add_argument(
+            '--live',
+            action='store_true',
+            help='Stream real agent-loop turns and measure time to the first token (calls the active LLM)',
+        )
+        parser.add_argument('--message', default='你好', help='User message for --live turns')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(id=options['user'])
+            project = Project.objects.get(id=options['project'])
+        except (get_user_model().DoesNotExist, Project.DoesNotExist) as exc:
+            raise CommandError(str(exc))
+        if not LLMConfig.objects.filter(is_active=True).exists():
+            raise CommandError('No active LLM configuration found')
+
+        iterations = max(1, options['iterations'])
+        session_id = f"bench-{uuid.uuid4().hex[:8]}"
+
+        if options['live']:
+            cold = self._run_live(user, project, options, session_id, iterations, warm=False)
+            warm = self._run_live(user, project, options, session_id, iterations, warm=True)
+            self._report('Time to first token', cold, warm)
+            return
+
+        cold = self._run_assembly(user, project, options['prompt'], session_id, iterations, warm=False)
+        warm = self._run_assembly(user, project, options['prompt'], session_id, iterations, warm=True)
+        self._report('Agent assembly (pre-model)', cold, warm)
+        self.stdout.write(f"Assembly cache: {assembly_cache.stats()}")
+
+    # ---------- 场景 ----------
+
+    def _run_assembly(self, user, project, prompt_id, session_id, iterations, warm):
+        samples = []
+        if warm:
+            async_to_sync(self._assemble)(user, project, prompt_id, session_id)
+        for _ in range(iterations):
+            if not warm:
+                assembly_cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                async_to_sync(self._assemble)(user, project, prompt_id, session_id)
+                elapsed = time.perf_counter() - started
+            samples.append((elapsed, len(queries)))
+        return samples
+
+    async def _assemble(self, user, project, prompt_id, session_id):
+        """复现 stream_agent_loop_events 在首次调用模型前的装配步骤（不含 MCP 网络连接）"""
+        active_config = await sync_to_async(LLMConfig.objects.get)(is_active=True)
+        llm = await sync_to_async(create_llm_instance)(active_config, temperature=0.7)
+        await sync_to_async(get_cached_mcp_client_config)()
+        tools = get_cached_builtin_tools(
+            user_id=user.id,
+            project_id=project.id,
+            chat_session_id=session_id,
+        )
+        effective_prompt, _source = await get_cached_system_prompt(user, prompt_id, project)
+        await sync_to_async(get_middleware_from_config)(
+            active_config,
+            llm,
+            user=user,
+            session_id=session_id,
+            all_tool_names=[t.name for t in tools],
+            tools=tools,
+            system_prompt=effective_prompt,
+        )
+
+    def _run_live(self, user, project, options, session_id, iterations, warm):
+        samples = []
+        for index in range(iterations):
+            if not warm:
+                assembly_cache.clear()
+            turn_session = session_id if warm else f"{session_id}-cold-{index}"
+            samples.append((async_to_sync(self._first_token)(user, project, options, turn_session), 0))
+        return samples
+
+    async def _first_token(self, user, project, options, session_id):
+        from contextlib import aclosing
+
+        from orchestrator_integration.agent_loop_view import stream_agent_loop_events
+
+        started = time.perf_counter()
+        first_token = None
+        async with aclosing(
+            stream_agent_loop_events(
+                user,
+                options['message'],
+                session_id,
+                str(project.id),
+                project,
+                prompt_id=options['prompt'],
+                use_knowledge_base=False,
+            )
+        ) as events:
+            async for event in events:
+                if event.get('type') == 'stream' and first_token is None:
+                    first_token = time.perf_counter() - started
+                if event.get('type') == 'error':
+                    raise CommandError(event.get('message'))
+        return first_token if first_token is not None else time.perf_counter() - started
+
+    # ---------- 输出 ----------
+
+    def _report(self, title, cold, warm):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for label, samples in (('cold', cold), ('warm', warm)):
+            latencies = sorted(elapsed * 1000 for elapsed, _ in samples)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            queries = statistics.mean(count for _, count in samples)
+            self.stdout.write(
+                f"  {label:<5} n={len(latencies):<4} mean={statistics.mean(latencies):8.2f}ms "
+                f"p50={statistics.median(latencies):8.2f}ms p95={p95:8.2f}ms queries={queries:.1f}"
+            )
+        cold_p50 = statistics.median(elapsed for elapsed, _ in cold)
+        warm_p50 = statistics.median(elapsed for elapsed, _ in warm)
+        if warm_p50 > 0:
+            self.stdout.write(self.style.SUCCESS(f"  warm speedup (p50): {cold_p50 / warm_p50:.1f}x"))
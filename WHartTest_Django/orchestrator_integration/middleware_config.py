@@ -11,6 +11,7 @@ LangChain v1 中间件配置模块
 """
 
 import ast
+import copy
 import logging
 import re
 from typing import Callable, List, Optional, Dict, Any, Iterable
@@ -466,6 +467,29 @@ def _calculate_overhead_tokens(
     return overhead
 
 
+def _cached_overhead_tokens(
+    model_name: str,
+    tools: Optional[list] = None,
+    system_prompt: Optional[str] = None,
+) -> int:
+    """
+    带缓存的 _calculate_overhead_tokens
+
+    以模型名、系统提示词摘要和工具名/描述为键，同一会话的多轮对话不再重复做 tiktoken 计数。
+    """
+    from .assembly_cache import assembly_cache, content_digest
+
+    tool_signature = tuple(
+        (getattr(tool, "name", "") or "", content_digest(getattr(tool, "description", "") or ""))
+        for tool in (tools or [])
+    )
+    return assembly_cache.get_or_build(
+        ("overhead_tokens", model_name, content_digest(system_prompt), tool_signature),
+        [],
+        lambda: _calculate_overhead_tokens(model_name, tools, system_prompt),
+    )
+
+
 def _create_token_counter(model_name: str) -> Callable[[Iterable], int]:
     """
     创建纯消息内容的 Token 计数器
@@ -749,7 +773,7 @@ def get_summarization_middleware(
         return None
 
     # 计算系统提示词 + 工具定义的真实 token 开销
-    overhead = _calculate_overhead_tokens(model_name, tools, system_prompt)
+    overhead = _cached_overhead_tokens(model_name, tools, system_prompt)
     logger.info(
         "SummarizationMiddleware overhead: %d tokens (tools=%d, has_prompt=%s)",
         overhead,
@@ -825,11 +849,20 @@ DEFAULT_HIGH_RISK_TOOLS = {
 
 def get_mcp_hitl_tools() -> Dict[str, Any]:
     """
-    从 RemoteMCPConfig 动态加载需要 HITL 审批的工具
+    从 RemoteMCPConfig 动态加载需要 HITL 审批的工具（经装配缓存，MCP 配置变更时失效）
 
     Returns:
         Dict[tool_name, config]: 需要审批的工具配置
     """
+    from .assembly_cache import SCOPE_GLOBAL, assembly_cache
+
+    return copy.deepcopy(
+        assembly_cache.get_or_build(("mcp_hitl_tools",), [SCOPE_GLOBAL], _load_mcp_hitl_tools)
+    )
+
+
+def _load_mcp_hitl_tools() -> Dict[str, Any]:
+    """从数据库加载需要 HITL 审批的 MCP 工具"""
     from mcp_tools.models import RemoteMCPConfig
 
     hitl_tools = {}
@@ -873,6 +906,19 @@ def get_user_tool_approvals(user, session_id: Optional[str] = None) -> Dict[str,
         Dict[tool_name, policy]: 工具名到审批策略的映射
         例如: {"execute_script": "always_allow", "run_playwright": "ask_every_time"}
     """
+    from .assembly_cache import assembly_cache, user_scope
+
+    return dict(
+        assembly_cache.get_or_build(
+            ("tool_approvals", user.pk, session_id or ""),
+            [user_scope(user.pk)],
+            lambda: _load_user_tool_approvals(user, session_id),
+        )
+    )
+
+
+def _load_user_tool_approvals(user, session_id: Optional[str] = None) -> Dict[str, str]:
+    """从数据库加载用户的工具审批偏好"""
     from langgraph_integration.models import UserToolApproval
 
     approvals = {}
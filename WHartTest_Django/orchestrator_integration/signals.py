@@ -0,0 +1,31 @@
+"""
+Agent 装配缓存失效信号
+提示词、审批偏好、MCP/LLM 配置、Skills、项目凭据变更时递增对应作用域的缓存版本
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .assembly_cache import SCOPE_GLOBAL, invalidate_assembly_cache, project_scope, user_scope
+
+
+@receiver([post_save, post_delete], sender='langgraph_integration.LLMConfig')
+@receiver([post_save, post_delete], sender='mcp_tools.RemoteMCPConfig')
+@receiver([post_save, post_delete], sender='skills.Skill')
+def invalidate_global_assembly(sender, instance, **kwargs):
+    invalidate_assembly_cache(SCOPE_GLOBAL)
+
+
+@receiver([post_save, post_delete], sender='prompts.UserPrompt')
+@receiver([post_save, post_delete], sender='langgraph_integration.UserToolApproval')
+def invalidate_user_assembly(sender, instance, **kwargs):
+    invalidate_assembly_cache(user_scope(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender='projects.Project')
+def invalidate_project_assembly(sender, instance, **kwargs):
+    invalidate_assembly_cache(project_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender='projects.ProjectCredential')
+def invalidate_project_credential_assembly(sender, instance, **kwargs):
+    invalidate_assembly_cache(project_scope(instance.project_id))
@@ -1,24 +1,47 @@
 """
 Agent Loop 停止信号管理
 
-提供线程安全的停止信号存储，用于中断正在执行的 Agent Loop。
+提供停止信号存储与广播，用于中断正在执行的 Agent Loop。
 
 使用场景：
 - 用户点击"停止"按钮时，调用 set_stop_signal(session_id)
-- Agent Loop 在每步检查 should_stop(session_id)
+- Agent Loop 通过 StopSignalWatcher 订阅停止信号，收到信号后立即取消
+  正在进行的模型/工具调用，而不是等待下一个流式 chunk
 - 任务结束后调用 clear_stop_signal(session_id) 清理
+
+多 worker 部署：
+- 配置 STOP_SIGNAL_REDIS_URL 后使用 RedisStopSignalManager，信号写入 Redis
+  并通过 pub/sub 广播，停止请求落到任意 worker 都能中断正在运行的会话
+- 未配置或 Redis 不可用时回退到进程内存（仅单进程有效）
+
+信号分组：
+- link_session(group_id, session_id) 将会话挂到一个分组下（例如一次测试执行）
+- 对分组调用 set_stop_signal(group_id) 会同时向分组内所有会话发送停止信号
+
+异步代码中使用 aset_stop_signal / ashould_stop / aclear_stop_signal / alink_session，
+Redis 实现的同步调用在线程池中执行，不阻塞事件循环
 """
+import asyncio
 import threading
 import time
-from typing import Dict, Optional
+from contextlib import suppress
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
 import logging
 
+from asgiref.sync import sync_to_async
+
 logger = logging.getLogger(__name__)
 
+# 流结束标记
+_STREAM_END = object()
+
 
 class StopSignalManager:
     """停止信号管理器（线程安全的内存存储）"""
 
+    # 同步方法是否会阻塞（访问网络），为 True 时异步调用在线程池中执行
+    blocking = False
+
     def __init__(self, signal_ttl: int = 300):
         """
         初始化停止信号管理器
@@ -27,6 +50,9 @@ class StopSignalManager:
             signal_ttl: 信号过期时间（秒），防止信号永不清理
         """
         self._signals: Dict[str, float] = {}  # session_id -> timestamp
+        self._groups: Dict[str, Set[str]] = {}  # group_id -> session_ids
+        # session_id -> [(loop, event)]，用于唤醒等待停止信号的协程
+        self._waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
         self._lock = threading.Lock()
         self._signal_ttl = signal_ttl
 
@@ -34,16 +60,24 @@ class StopSignalManager:
         """
         设置停止信号
 
+        如果 session_id 是一个分组，分组内的所有会话也会收到停止信号。
+
         Args:
-            session_id: 会话 ID
+            session_id: 会话 ID 或分组 ID
 
         Returns:
             是否设置成功
         """
         with self._lock:
-            self._signals[session_id] = time.time()
+            now = time.time()
+            targets = [session_id, *self._groups.get(session_id, ())]
+            for target in targets:
+                self._signals[target] = now
             logger.info(f"[StopSignal] Set stop signal for session: {session_id}")
-            return True
+
+        for target in targets:
+            self._notify_local(target)
+        return True
 
     def should_stop(self, session_id: str) -> bool:
         """
@@ -71,7 +105,7 @@ class StopSignalManager:
 
     def clear_stop_signal(self, session_id: str) -> bool:
         """
-        清除停止信号
+        清除停止信号（同时清除以该 ID 为名的分组关系）
 
         Args:
             session_id: 会话 ID
@@ -80,12 +114,24 @@ class StopSignalManager:
             是否清除成功（信号是否存在）
         """
         with self._lock:
+            self._groups.pop(session_id, None)
             if session_id in self._signals:
                 del self._signals[session_id]
                 logger.info(f"[StopSignal] Cleared stop signal for session: {session_id}")
                 return True
             return False
 
+    def link_session(self, group_id: str, session_id: str) -> None:
+        """
+        将会话挂到分组下，分组收到停止信号时会话一并停止
+
+        Args:
+            group_id: 分组 ID（例如测试执行 ID）
+            session_id: 会话 ID
+        """
+        with self._lock:
+            self._groups.setdefault(group_id, set()).add(session_id)
+
     def cleanup_expired(self) -> int:
         """
         清理所有过期的信号
@@ -111,6 +157,280 @@ class StopSignalManager:
         with self._lock:
             return dict(self._signals)
 
+    async def wait_for_stop(self, session_id: str) -> None:
+        """
+        等待停止信号（协程），收到信号后返回
+
+        Args:
+            session_id: 会话 ID
+        """
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        waiter = (loop, event)
+        with self._lock:
+            self._waiters.setdefault(session_id, []).append(waiter)
+        try:
+            # 只检查本进程的信号；Redis 中的信号由子类在事件循环中异步检查
+            if StopSignalManager.should_stop(self, session_id):
+                return
+            await event.wait()
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(session_id, [])
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    self._waiters.pop(session_id, None)
+
+    async def call(self, method: str, *args):
+        """在异步代码中调用同步方法；阻塞的实现（Redis）在线程池中执行"""
+        func = getattr(self, method)
+        if not self.blocking:
+            return func(*args)
+        return await sync_to_async(func, thread_sensitive=False)(*args)
+
+    def _notify_local(self, session_id: str) -> None:
+        """唤醒本进程内等待该会话停止信号的协程（可跨线程调用）"""
+        with self._lock:
+            waiters = list(self._waiters.get(session_id, ()))
+        for loop, event in waiters:
+            with suppress(RuntimeError):  # 事件循环已关闭
+                loop.call_soon_threadsafe(event.set)
+
+
+class RedisStopSignalManager(StopSignalManager):
+    """
+    基于 Redis 的停止信号管理器
+
+    - 信号写入 Redis key（带 TTL），任意进程都能通过 should_stop 查询
+    - 设置信号时在会话频道上 publish，等待中的协程通过 pub/sub 立即被唤醒
+    - 分组关系保存在 Redis set 中，分组信号会扇出到所有成员会话
+    - Redis 不可用时回退到本进程内存，并在冷却期内不再重试连接
+    - 同步方法使用同步客户端，异步代码通过 call() 在线程池中调用；wait_for_stop 使用 redis.asyncio
+    """
+
+    blocking = True
+
+    KEY_PREFIX = "wharttest:stop_signal:"
+    GROUP_PREFIX = "wharttest:stop_group:"
+    CHANNEL_PREFIX = "wharttest:stop_channel:"
+
+    # Redis 连接失败后的重试冷却时间（秒）
+    RETRY_COOLDOWN = 30
+
+    def __init__(self, redis_url: str, signal_ttl: int = 300):
+        super().__init__(signal_ttl=signal_ttl)
+        self._redis_url = redis_url
+        self._client = None
+        self._unavailable_until = 0.0
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.KEY_PREFIX}{session_id}"
+
+    def _group_key(self, group_id: str) -> str:
+        return f"{self.GROUP_PREFIX}{group_id}"
+
+    def _channel(self, session_id: str) -> str:
+        return f"{self.CHANNEL_PREFIX}{session_id}"
+
+    def _get_client(self):
+        """获取同步 Redis 客户端，处于冷却期时返回 None"""
+        if time.time() < self._unavailable_until:
+            return None
+        if self._client is None:
+            import redis
+
+            self._client = redis.Redis.from_url(
+                self._redis_url,
+                decode_responses=True,
+                socket_connect_timeout=1,
+                socket_timeout=2,
+            )
+        return self._client
+
+    def _mark_unavailable(self, exc: Exception) -> None:
+        self._unavailable_until = time.time() + self.RETRY_COOLDOWN
+        logger.warning(
+            f"[StopSignal] Redis unavailable, falling back to in-process signals "
+            f"for {self.RETRY_COOLDOWN}s: {exc}"
+        )
+
+    def set_stop_signal(self, session_id: str) -> bool:
+        super().set_stop_signal(session_id)
+
+        client = self._get_client()
+        if client is None:
+            return True
+        try:
+            members = client.smembers(self._group_key(session_id))
+            targets = [session_id, *members]
+            pipe = client.pipeline()
+            for target in targets:
+                pipe.set(self._key(target), time.time(), ex=self._signal_ttl)
+                pipe.publish(self._channel(target), "stop")
+            pipe.execute()
+        except Exception as e:
+            self._mark_unavailable(e)
+        return True
+
+    def should_stop(self, session_id: str) -> bool:
+        if super().should_stop(session_id):
+            return True
+
+        client = self._get_client()
+        if client is None:
+            return False
+        try:
+            return bool(client.exists(self._key(session_id)))
+        except Exception as e:
+            self._mark_unavailable(e)
+            return False
+
+    def clear_stop_signal(self, session_id: str) -> bool:
+        cleared = super().clear_stop_signal(session_id)
+
+        client = self._get_client()
+        if client is None:
+            return cleared
+        try:
+            pipe = client.pipeline()
+            pipe.delete(self._key(session_id))
+            pipe.delete(self._group_key(session_id))
+            deleted, _ = pipe.execute()
+            return cleared or bool(deleted)
+        except Exception as e:
+            self._mark_unavailable(e)
+            return cleared
+
+    def link_session(self, group_id: str, session_id: str) -> None:
+        super().link_session(group_id, session_id)
+
+        client = self._get_client()
+        if client is None:
+            return
+        try:
+            group_key = self._group_key(group_id)
+            pipe = client.pipeline()
+            pipe.sadd(group_key, session_id)
+            # 分组保留时间与长任务相当，避免异常退出后遗留
+            pipe.expire(group_key, max(self._signal_ttl, 24 * 3600))
+            pipe.execute()
+        except Exception as e:
+            self._mark_unavailable(e)
+
+    async def _wait_redis(self, session_id: str) -> None:
+        """订阅会话频道，收到 publish 或 key 已存在时返回"""
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis.from_url(
+            self._redis_url, decode_responses=True, socket_connect_timeout=1
+        )
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(self._channel(session_id))
+            # 订阅后再检查一次 key，避免订阅前已发出的信号被漏掉
+            if await client.exists(self._key(session_id)):
+                return
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    return
+        finally:
+            with suppress(Exception):
+                await pubsub.aclose()
+            with suppress(Exception):
+                await client.aclose()
+
+    async def wait_for_stop(self, session_id: str) -> None:
+        pending = {asyncio.ensure_future(super().wait_for_stop(session_id))}
+        if time.time() >= self._unavailable_until:
+            pending.add(asyncio.ensure_future(self._wait_redis(session_id)))
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        return
+                    # Redis 订阅失败时继续等待本进程信号
+                    self._mark_unavailable(exc)
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+
+
+class StopSignalWatcher:
+    """
+    停止信号监听器
+
+    包装一个异步流，在后台任务中消费该流，同时等待停止信号。
+    一旦收到信号，立即取消消费任务（从而中断正在进行的模型/工具调用），
+    并结束迭代；调用方通过 stopped 属性判断是否是被停止的。
+
+    用法：
+        watcher = StopSignalWatcher(session_id)
+        async for item in watcher.iterate(agent.astream(...)):
+            ...
+        if watcher.stopped:
+            ...
+    """
+
+    def __init__(self, session_id: str, manager: Optional[StopSignalManager] = None):
+        self.session_id = session_id
+        self.stopped = False
+        self._manager = manager or get_stop_signal_manager()
+
+    async def iterate(self, stream: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """迭代 stream，直到流结束或收到停止信号"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        async def _produce():
+            try:
+                async for item in stream:
+                    await queue.put((item, None))
+            except Exception as e:
+                await queue.put((None, e))
+                return
+            await queue.put((_STREAM_END, None))
+
+        # 整个流在同一个任务中消费，保证 contextvars 等执行上下文一致
+        producer = asyncio.ensure_future(_produce())
+        stop_waiter = asyncio.ensure_future(
+            self._manager.wait_for_stop(self.session_id)
+        )
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, stop_waiter}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if getter not in done:
+                    getter.cancel()
+                    self.stopped = True
+                    logger.info(
+                        f"[StopSignal] Cancelling in-flight stream for session: {self.session_id}"
+                    )
+                    return
+
+                item, error = getter.result()
+                if error is not None:
+                    raise error
+                if item is _STREAM_END:
+                    return
+                yield item
+        finally:
+            for task in (producer, stop_waiter):
+                if not task.done():
+                    task.cancel()
+            for task in (producer, stop_waiter):
+                with suppress(asyncio.CancelledError, Exception):
+                    await task
+
 
 # 全局单例
 _stop_signal_manager: Optional[StopSignalManager] = None
@@ -118,12 +438,18 @@ _manager_lock = threading.Lock()
 
 
 def get_stop_signal_manager() -> StopSignalManager:
-    """获取全局停止信号管理器单例"""
+    """获取全局停止信号管理器单例（配置了 Redis 时使用 Redis 实现）"""
     global _stop_signal_manager
     if _stop_signal_manager is None:
         with _manager_lock:
             if _stop_signal_manager is None:
-                _stop_signal_manager = StopSignalManager()
+                from django.conf import settings
+
+                redis_url = getattr(settings, "STOP_SIGNAL_REDIS_URL", "")
+                if redis_url:
+                    _stop_signal_manager = RedisStopSignalManager(redis_url)
+                else:
+                    _stop_signal_manager = StopSignalManager()
     return _stop_signal_manager
 
 
@@ -141,3 +467,33 @@ def should_stop(session_id: str) -> bool:
 def clear_stop_signal(session_id: str) -> bool:
     """清除停止信号"""
     return get_stop_signal_manager().clear_stop_signal(session_id)
+
+
+def link_session(group_id: str, session_id: str) -> None:
+    """将会话挂到停止信号分组下"""
+    get_stop_signal_manager().link_session(group_id, session_id)
+
+
+async def wait_for_stop(session_id: str) -> None:
+    """等待停止信号"""
+    await get_stop_signal_manager().wait_for_stop(session_id)
+
+
+async def aset_stop_signal(session_id: str) -> bool:
+    """设置停止信号（异步）"""
+    return await get_stop_signal_manager().call("set_stop_signal", session_id)
+
+
+async def ashould_stop(session_id: str) -> bool:
+    """检查是否应该停止（异步）"""
+    return await get_stop_signal_manager().call("should_stop", session_id)
+
+
+async def aclear_stop_signal(session_id: str) -> bool:
+    """清除停止信号（异步）"""
+    return await get_stop_signal_manager().call("clear_stop_signal", session_id)
+
+
+async def alink_session(group_id: str, session_id: str) -> None:
+    """将会话挂到停止信号分组下（异步）"""
+    await get_stop_signal_manager().call("link_session", group_id, session_id)
@@ -1,4 +1,6 @@
+import asyncio
 import os
+import threading
 import tempfile
 from unittest.mock import patch
 
@@ -24,9 +26,12 @@ from .builtin_tools.skill_tools import (
     _prepare_skill_screenshots_dir,
     _sanitize_runtime_path_segment,
 )
+from .assembly_cache import assembly_cache, get_cached_system_prompt
 from .builtin_tools.output_sanitizer import strip_terminal_control_sequences
 from .middleware_config import get_user_friendly_llm_error, _model_retry_should_retry
-from projects.models import Project, ProjectMember
+from .stop_signal import RedisStopSignalManager, StopSignalManager, StopSignalWatcher
+from projects.models import Project, ProjectCredential, ProjectMember
+from prompts.models import UserPrompt
 from requirements.models import DocumentImage, RequirementDocument
 
 
@@ -335,3 +340,209 @@ class TerminalOutputSanitizerTests(SimpleTestCase):
         raw = "\x1b[32m✓\x1b[0m Browser closed"
 
         self.assertEqual(strip_terminal_control_sequences(raw), "✓ Browser closed")
+
+
+class StopSignalTests(SimpleTestCase):
+    def test_group_stop_signal_fans_out_to_linked_sessions(self):
+        manager = StopSignalManager()
+        manager.link_session("test_execution:1", "session-a")
+        manager.link_session("test_execution:1", "session-b")
+
+        manager.set_stop_signal("test_execution:1")
+
+        self.assertTrue(manager.should_stop("session-a"))
+        self.assertTrue(manager.should_stop("session-b"))
+        self.assertFalse(manager.should_stop("session-c"))
+
+    def test_watcher_cancels_in_flight_stream_on_stop(self):
+        manager = StopSignalManager()
+        cancelled = []
+
+        async def slow_stream():
+            yield "first"
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            yield "never"
+
+        async def run():
+            watcher = StopSignalWatcher("session-x", manager=manager)
+            items = []
+            async for item in watcher.iterate(slow_stream()):
+                items.append(item)
+                asyncio.get_running_loop().call_later(
+                    0.01, manager.set_stop_signal, "session-x"
+                )
+            return watcher, items
+
+        watcher, items = async_to_sync(
+            lambda: asyncio.wait_for(run(), timeout=5)
+        )()
+
+        self.assertTrue(watcher.stopped)
+        self.assertEqual(items, ["first"])
+        self.assertEqual(cancelled, [True])
+
+    def test_redis_manager_keeps_sync_redis_calls_off_the_event_loop(self):
+        class RecordingClient:
+            def __init__(self):
+                self.threads = []
+
+            def exists(self, key):
+                self.threads.append(threading.get_ident())
+                return 1
+
+        manager = RedisStopSignalManager("redis://unused")
+        client = manager._client = RecordingClient()
+
+        async def never():
+            await asyncio.Event().wait()
+
+        async def run():
+            loop_thread = threading.get_ident()
+            stopped = await manager.call("should_stop", "session-r")
+            # 本进程已有信号时直接返回，不在事件循环中查询 Redis
+            StopSignalManager.set_stop_signal(manager, "session-local")
+            with patch.object(manager, "_wait_redis", lambda session_id: never()):
+                await asyncio.wait_for(manager.wait_for_stop("session-local"), timeout=5)
+            return loop_thread, stopped
+
+        loop_thread, stopped = async_to_sync(run)()
+
+        self.assertTrue(stopped)
+        self.assertEqual(len(client.threads), 1)
+        self.assertNotEqual(client.threads[0], loop_thread)
+
+    def test_watcher_propagates_stream_errors(self):
+        manager = StopSignalManager()
+
+        async def broken_stream():
+            yield "ok"
+            raise ValueError("boom")
+
+        async def run():
+            watcher = StopSignalWatcher("session-y", manager=manager)
+            return [item async for item in watcher.iterate(broken_stream())]
+
+        with self.assertRaises(ValueError):
+            async_to_sync(run)()
+
+
+class AgentLoopServiceAdapterTests(SimpleTestCase):
+    def test_stream_generator_encodes_service_events_as_sse_frames(self):
+        async def fake_events(*args, **kwargs):
+            yield {"type": "start", "session_id": "s1"}
+            yield {"type": "stream", "data": "你好"}
+
+        class _Request:
+            user = object()
+
+        async def collect():
+            view = agent_loop_view.AgentLoopStreamAPIView()
+            return [
+                frame
+                async for frame in view._create_stream_generator(
+                    _Request(), "hi", "s1", "1", None
+                )
+            ]
+
+        with patch.object(agent_loop_view, "stream_agent_loop_events", fake_events):
+            frames = async_to_sync(collect)()
+
+        self.assertEqual(
+            frames,
+            [
+                'data: {"type":"start","session_id":"s1"}\n\n',
+                'data: {"type":"stream","data":"你好"}\n\n',
+                "data: [DONE]\n\n",
+            ],
+        )
+
+    def test_error_event_followed_by_done_is_reported_as_failure(self):
+        from weixin_integration.services import (
+            WeixinServiceError,
+            _run_weixin_agent_loop_non_stream,
+        )
+
+        async def fake_events(*args, **kwargs):
+            yield {"type": "error", "message": "项目不存在", "code": 404}
+
+        class _Request:
+            user = object()
+
+        async def run():
+            return await _run_weixin_agent_loop_non_stream(
+                request=_Request(),
+                user_message="hi",
+                session_id="s1",
+                project_id="1",
+                project=None,
+            )
+
+        with patch.object(agent_loop_view, "stream_agent_loop_events", fake_events):
+            with self.assertRaises(WeixinServiceError) as ctx:
+                async_to_sync(run)()
+
+        self.assertEqual(ctx.exception.message, "项目不存在")
+        self.assertEqual(ctx.exception.status_code, 404)
+
+
+@override_settings(AGENT_ASSEMBLY_CACHE_ENABLED=True, SHARED_STATE_CACHE_ALIAS="default")
+class AgentAssemblyCacheTests(TestCase):
+    def setUp(self):
+        assembly_cache.clear()
+        self.addCleanup(assembly_cache.clear)
+        self.user = get_user_model().objects.create_user(
+            username="assembly-cache-user",
+            password="password123",
+        )
+        self.project = Project.objects.create(
+            name="Assembly Cache Project",
+            creator=self.user,
+        )
+        self.prompt = UserPrompt.objects.create(
+            user=self.user,
+            name="assembly-cache-prompt",
+            content="登录信息：{credentials_info}",
+        )
+
+    def _prompt(self):
+        content, _source = async_to_sync(get_cached_system_prompt)(
+            self.user, self.prompt.id, self.project
+        )
+        return content
+
+    def test_warm_lookup_skips_database(self):
+        cold = self._prompt()
+
+        with self.assertNumQueries(0):
+            warm = self._prompt()
+
+        self.assertEqual(warm, cold)
+        self.assertEqual(assembly_cache.stats()["hits"], 1)
+
+    def test_model_changes_invalidate_cached_prompt(self):
+        self.assertIn("未配置登录信息", self._prompt())
+
+        ProjectCredential.objects.create(
+            project=self.project,
+            system_url="https://example.test",
+            username="tester",
+            password="secret",
+            user_role="管理员",
+        )
+        self.assertIn("tester", self._prompt())
+
+        self.prompt.content = "新的提示词"
+        self.prompt.save()
+        self.assertIn("新的提示词", self._prompt())
+
+    def test_cache_is_bypassed_when_disabled(self):
+        with override_settings(AGENT_ASSEMBLY_CACHE_ENABLED=False):
+            self._prompt()
+            self._prompt()
+
+        self.assertEqual(assembly_cache.stats()["hits"], 0)
+        self.assertEqual(assembly_cache.stats()["entries"], 0)
@@ -7,6 +7,7 @@ import os
 from datetime import datetime
 from typing import Optional
 from xml.sax.saxutils import escape
+from django.db.models import Count, Max
 from django.http import HttpResponse
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -167,9 +168,75 @@ class ReportExportService:
                 return font_path
         return None
     
+    # 导出格式 -> (扩展名, Content-Type, 渲染方法名)
+    EXPORT_FORMATS = {
+        'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'render_excel'),
+        'word': ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'render_word'),
+        'pdf': ('pdf', 'application/pdf', 'render_pdf'),
+    }
+
+    # 导出格式版本：导出内容的生成逻辑变化时递增，使已缓存的导出文件失效
+    EXPORT_VERSION = 1
+
+    @classmethod
+    def render(cls, report: ReviewReport, export_format: str) -> tuple:
+        """
+        生成导出文件内容
+
+        :return: (bytes, filename, content_type)
+        """
+        if export_format not in cls.EXPORT_FORMATS:
+            raise ValueError(f'不支持的导出格式: {export_format}')
+        extension, content_type, renderer = cls.EXPORT_FORMATS[export_format]
+        data = getattr(cls, renderer)(report)
+        filename = f'评审报告_{report.document.title}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        return data, filename, content_type
+
+    @classmethod
+    def fingerprint(cls, report: ReviewReport, export_format: str) -> list:
+        """导出内容指纹：报告、问题、模块结果及文档标题任一变化都会生成新的导出文件"""
+        issue_stats = report.issues.aggregate(count=Count('id'), latest=Max('updated_at'))
+        module_stats = report.module_results.aggregate(
+            count=Count('id'),
+            latest=Max('updated_at'),
+            module_latest=Max('module__updated_at'),
+        )
+        return [
+            'review_report',
+            cls.EXPORT_VERSION,
+            export_format,
+            str(report.pk),
+            report.updated_at,
+            report.document.updated_at,
+            issue_stats,
+            module_stats,
+        ]
+
+    @classmethod
+    def _to_response(cls, report: ReviewReport, export_format: str) -> HttpResponse:
+        data, filename, content_type = cls.render(report, export_format)
+        response = HttpResponse(data, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
     @classmethod
     def export_to_excel(cls, report: ReviewReport) -> HttpResponse:
         """导出报告为Excel格式"""
+        return cls._to_response(report, 'excel')
+
+    @classmethod
+    def export_to_word(cls, report: ReviewReport) -> HttpResponse:
+        """导出报告为Word格式"""
+        return cls._to_response(report, 'word')
+
+    @classmethod
+    def export_to_pdf(cls, report: ReviewReport) -> HttpResponse:
+        """导出报告为PDF格式"""
+        return cls._to_response(report, 'pdf')
+
+    @classmethod
+    def render_excel(cls, report: ReviewReport) -> bytes:
+        """生成Excel格式报告"""
         workbook = Workbook()
         
         # 删除默认sheet
@@ -191,21 +258,11 @@ class ReportExportService:
         # 保存到字节流
         output = io.BytesIO()
         workbook.save(output)
-        output.seek(0)
-        
-        # 创建响应
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f'评审报告_{report.document.title}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return output.getvalue()
     
     @classmethod
-    def export_to_word(cls, report: ReviewReport) -> HttpResponse:
-        """导出报告为Word格式"""
+    def render_word(cls, report: ReviewReport) -> bytes:
+        """生成Word格式报告"""
         document = Document()
         
         # 标题
@@ -288,7 +345,7 @@ class ReportExportService:
                 document.add_paragraph()  # 空行
         
         # 模块评审结果
-        module_results = report.module_results.all()
+        module_results = report.module_results.select_related('module')
         if module_results:
             document.add_heading('五、模块评审结果', level=1)
             
@@ -339,21 +396,11 @@ class ReportExportService:
         # 保存到字节流
         output = io.BytesIO()
         document.save(output)
-        output.seek(0)
-        
-        # 创建响应
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
-        filename = f'评审报告_{report.document.title}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.docx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
+        return output.getvalue()
     
     @classmethod
-    def export_to_pdf(cls, report: ReviewReport) -> HttpResponse:
-        """导出报告为PDF格式（按专项分析页面样式输出）"""
+    def render_pdf(cls, report: ReviewReport) -> bytes:
+        """生成PDF格式报告（按专项分析页面样式输出）"""
         output = io.BytesIO()
 
         doc = SimpleDocTemplate(
@@ -612,16 +659,7 @@ class ReportExportService:
                 story.append(Spacer(1, 12))
 
         doc.build(story)
-        output.seek(0)
-
-        response = HttpResponse(
-            output.getvalue(),
-            content_type='application/pdf'
-        )
-        filename = f'评审报告_{report.document.title}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        return response
+        return output.getvalue()
     
     @classmethod
     def _create_overview_sheet(cls, workbook: Workbook, report: ReviewReport):
@@ -819,7 +857,7 @@ class ReportExportService:
         sheet.row_dimensions[1].height = 25
         
         # 数据行
-        module_results = report.module_results.all().order_by('module__order')
+        module_results = report.module_results.select_related('module').order_by('module__order')
         for idx, result in enumerate(module_results, 1):
             row_num = idx + 1
             
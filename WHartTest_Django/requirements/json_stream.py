@@ -0,0 +1,163 @@
+"""
+流式增量 JSON 提取
+
+LLM 以流式返回形如 ``{"overall_score": 80, "issues": [{...}, {...}]}`` 的分析结果时，
+IncrementalJsonExtractor 逐块扫描输出，数组字段（如 issues / modules）中的每个对象一闭合就立即解析并回调，
+不必等完整响应结束后再整体解析。
+
+- 扫描是一次性的：每个字符只处理一次，总开销与响应长度成线性
+- 代码块围栏、JSON 前后的说明文字会被跳过（从第一个 ``{`` 开始扫描）
+- 响应结束后 result() 返回完整对象；顶层对象解析失败时回退到 extract_json_from_response
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "start", "expect_key", "last_key")
+
+    def __init__(self, kind: str, key: Optional[str], start: int):
+        self.kind = kind  # "{" 或 "["
+        self.key = key  # 该容器在父对象中的键名（父容器为数组时为 None）
+        self.start = start
+        self.expect_key = kind == "{"
+        self.last_key: Optional[str] = None
+
+
+class IncrementalJsonExtractor:
+    """
+    增量 JSON 提取器
+
+    Args:
+        item_keys: 需要逐项回调的数组字段名，可出现在任意嵌套层级
+        on_item: 回调 (字段名, 序号, 对象)；数组元素对象闭合时调用。
+            序号按字段名在整个输出中累计（同名数组出现在多个嵌套位置时连续编号）
+    """
+
+    def __init__(
+        self,
+        item_keys: Iterable[str] = ("issues",),
+        on_item: Optional[Callable[[str, int, Dict[str, Any]], None]] = None,
+    ):
+        self.item_keys = set(item_keys)
+        self.on_item = on_item
+        self.items: Dict[str, List[Dict[str, Any]]] = {key: [] for key in self.item_keys}
+        self._emitted: Dict[str, int] = {}
+        self.reset()
+
+    def reset(self):
+        """
+        重新开始扫描（如 LLM 调用重试）
+
+        已回调过的序号不会重复回调，重新生成的输出只补充新的元素。
+        """
+        self._text = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._root_span: Optional[Tuple[int, int]] = None
+        self._seen: Dict[str, int] = {}
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def done(self) -> bool:
+        return self._root_span is not None
+
+    def feed(self, chunk: str) -> List[Tuple[str, int, Dict[str, Any]]]:
+        """输入一段新输出，返回本次闭合的 (字段名, 序号, 对象) 列表"""
+        if not chunk:
+            return []
+        self._text += chunk
+        emitted = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self._root_span is not None:
+                break
+            char = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._on_string_closed(text, i)
+                continue
+
+            if not self._stack:
+                # 顶层对象之前的说明文字、代码块围栏
+                if char == "{":
+                    self._stack.append(_Frame("{", None, i))
+                continue
+
+            frame = self._stack[-1]
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in "{[":
+                key = frame.last_key if frame.kind == "{" else None
+                self._stack.append(_Frame(char, key, i))
+            elif char in "}]":
+                closed = self._stack.pop()
+                if not self._stack:
+                    self._root_span = (closed.start, i + 1)
+                    continue
+                parent = self._stack[-1]
+                if closed.kind == "{" and parent.kind == "[" and parent.key in self.item_keys:
+                    index = self._seen.get(parent.key, 0)
+                    self._seen[parent.key] = index + 1
+                    item = self._emit(text, parent.key, index, closed.start, i + 1)
+                    if item is not None:
+                        emitted.append(item)
+            elif char == ":" and frame.kind == "{":
+                frame.expect_key = False
+            elif char == "," and frame.kind == "{":
+                frame.expect_key = True
+        self._pos = len(text)
+        return emitted
+
+    def _on_string_closed(self, text: str, end: int):
+        frame = self._stack[-1] if self._stack else None
+        if frame is not None and frame.kind == "{" and frame.expect_key:
+            try:
+                frame.last_key = json.loads(text[self._string_start : end + 1])
+            except json.JSONDecodeError:
+                frame.last_key = None
+
+    def _emit(self, text: str, key: str, index: int, start: int, end: int):
+        try:
+            item = json.loads(text[start:end])
+        except json.JSONDecodeError as e:
+            logger.debug(f"流式解析 {key}[{index}] 失败: {e}")
+            return None
+        if index < self._emitted.get(key, 0):
+            return None
+        self._emitted[key] = index + 1
+        self.items[key].append(item)
+        if self.on_item:
+            try:
+                self.on_item(key, index, item)
+            except Exception as e:
+                logger.warning(f"处理流式结果 {key}[{index}] 失败: {e}")
+        return key, index, item
+
+    def result(self) -> Optional[dict]:
+        """返回完整的解析结果"""
+        if self._root_span is not None:
+            start, end = self._root_span
+            try:
+                return json.loads(self._text[start:end])
+            except json.JSONDecodeError:
+                pass
+        from .services import extract_json_from_response
+
+        return extract_json_from_response(self._text)
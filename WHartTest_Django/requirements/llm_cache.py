@@ -0,0 +1,146 @@
+"""
+LLM 响应缓存
+
+需求评审的专项分析、模块拆分的结构分析等都是低温度、提示词完全确定的调用，
+重试或重新评审时没有必要重复付费。该缓存位于 safe_llm_invoke 之下：
+
+- 键：模型 + 服务地址 + 温度 + 消息哈希 + 工具 schema 哈希
+- 存储：Django cache 的 LLM_RESPONSE_CACHE_ALIAS 别名（可配置为 Redis / 数据库 / 进程内存），
+  TTL 由 LLM_RESPONSE_CACHE_TTL 控制，条目数量由缓存后端的 MAX_ENTRIES（或 Redis maxmemory）限制，
+  单条响应超过 LLM_RESPONSE_CACHE_MAX_ENTRY_BYTES 时不写入
+- 默认关闭（LLM_RESPONSE_CACHE_ENABLED），单次调用可通过 use_cache=False 绕过
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "wharttest:llm_response:"
+STATS_HITS_KEY = f"{KEY_PREFIX}stats:hits"
+STATS_MISSES_KEY = f"{KEY_PREFIX}stats:misses"
+
+
+def _get_cache():
+    return caches[getattr(settings, "LLM_RESPONSE_CACHE_ALIAS", "default")]
+
+
+def is_cache_enabled(use_cache: Optional[bool] = None) -> bool:
+    """use_cache 为 None 时跟随全局开关，显式传入 True/False 时以调用方为准"""
+    if use_cache is not None:
+        return use_cache
+    return getattr(settings, "LLM_RESPONSE_CACHE_ENABLED", False)
+
+
+def _hash_json(value: Any) -> str:
+    return hashlib.sha256(
+        json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _serialize_messages(messages) -> Any:
+    if isinstance(messages, str):
+        return messages
+    serialized = []
+    for message in messages:
+        if isinstance(message, (list, tuple)):
+            serialized.append(list(message))
+        elif isinstance(message, dict):
+            serialized.append(message)
+        else:
+            serialized.append(
+                [getattr(message, "type", type(message).__name__), getattr(message, "content", str(message))]
+            )
+    return serialized
+
+
+def _llm_params(llm) -> Dict[str, Any]:
+    """读取模型标识、服务地址、温度与绑定的工具（兼容 bind_tools 返回的 RunnableBinding）"""
+    bound_kwargs = getattr(llm, "kwargs", None) or {}
+    model = getattr(llm, "bound", llm)
+    return {
+        "model": getattr(model, "model_name", None) or getattr(model, "model", None),
+        "base_url": getattr(model, "openai_api_base", None) or getattr(model, "base_url", None),
+        "temperature": getattr(model, "temperature", None),
+        "tools": bound_kwargs.get("tools") or [],
+    }
+
+
+def build_cache_key(llm, messages) -> Optional[str]:
+    """生成缓存键；温度高于 LLM_RESPONSE_CACHE_MAX_TEMPERATURE 的调用不可缓存，返回 None"""
+    params = _llm_params(llm)
+    temperature = params["temperature"]
+    max_temperature = getattr(settings, "LLM_RESPONSE_CACHE_MAX_TEMPERATURE", 0.3)
+    if temperature is not None and temperature > max_temperature:
+        return None
+    digest = _hash_json(
+        [
+            params["model"],
+            params["base_url"],
+            temperature,
+            _hash_json(_serialize_messages(messages)),
+            _hash_json(params["tools"]),
+        ]
+    )
+    return f"{KEY_PREFIX}{digest}"
+
+
+def _incr(key: str):
+    cache = _get_cache()
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    except Exception as exc:
+        logger.debug(f"更新 LLM 缓存统计失败: {exc}")
+
+
+def get_cached_response(key: str):
+    try:
+        response = _get_cache().get(key)
+    except Exception as exc:
+        logger.warning(f"读取 LLM 响应缓存失败: {exc}")
+        return None
+    _incr(STATS_HITS_KEY if response is not None else STATS_MISSES_KEY)
+    return response
+
+
+def store_response(key: str, response) -> bool:
+    """写入缓存，超过单条大小上限的响应跳过"""
+    max_bytes = getattr(settings, "LLM_RESPONSE_CACHE_MAX_ENTRY_BYTES", 256 * 1024)
+    try:
+        size = len(pickle.dumps(response))
+        if size > max_bytes:
+            logger.debug(f"LLM 响应 {size} 字节超过缓存上限 {max_bytes}，跳过缓存")
+            return False
+        _get_cache().set(key, response, getattr(settings, "LLM_RESPONSE_CACHE_TTL", 86400))
+        return True
+    except Exception as exc:
+        logger.warning(f"写入 LLM 响应缓存失败: {exc}")
+        return False
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    cache = _get_cache()
+    stored = cache.get_many([STATS_HITS_KEY, STATS_MISSES_KEY])
+    hits = int(stored.get(STATS_HITS_KEY, 0))
+    misses = int(stored.get(STATS_MISSES_KEY, 0))
+    total = hits + misses
+    return {
+        "enabled": is_cache_enabled(),
+        "alias": getattr(settings, "LLM_RESPONSE_CACHE_ALIAS", "default"),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_cache_stats():
+    _get_cache().delete_many([STATS_HITS_KEY, STATS_MISSES_KEY])
@@ -0,0 +1,41 @@
+"""
+Django管理命令：查看/清理 LLM 响应缓存
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from requirements import llm_cache
+
+
+class Command(BaseCommand):
+    help = '查看 LLM 响应缓存命中统计，或清空缓存'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='清空 LLM 响应缓存（包括统计）',
+        )
+        parser.add_argument(
+            '--reset-stats',
+            action='store_true',
+            help='仅重置命中/未命中统计',
+        )
+
+    def handle(self, *args, **options):
+        alias = getattr(settings, 'LLM_RESPONSE_CACHE_ALIAS', 'default')
+
+        if options.get('clear'):
+            if alias == 'default':
+                self.stderr.write('LLM 响应缓存使用 default 缓存，为避免误删其他数据拒绝清空')
+                return
+            caches[alias].clear()
+            self.stdout.write(self.style.SUCCESS(f'已清空 LLM 响应缓存 ({alias})'))
+        elif options.get('reset_stats'):
+            llm_cache.reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('已重置 LLM 响应缓存统计'))
+
+        self.stdout.write(json.dumps(llm_cache.get_cache_stats(), ensure_ascii=False, indent=2))
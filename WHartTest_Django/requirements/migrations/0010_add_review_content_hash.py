@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0009_add_last_split_level'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewreport',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='文档内容、专项分析提示词与模型的哈希，未变化时增量评审直接复用专项分析结果', max_length=64, verbose_name='内容指纹'),
+        ),
+        migrations.AddField(
+            model_name='modulereviewresult',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='模块内容、模块分析提示词与模型的哈希，未变化时增量评审直接复用该结果', max_length=64, verbose_name='内容指纹'),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requirements', '0010_add_review_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewreport',
+            name='section_fingerprints',
+            field=models.JSONField(blank=True, default=dict, help_text='各章节内容哈希与各专项分析（提示词+模型）指纹，增量评审时只重新分析变化的章节', verbose_name='章节指纹'),
+        ),
+    ]
@@ -310,6 +310,19 @@ class ReviewReport(models.Model):
         blank=True,
         help_text='存储完整性、一致性、可测性、可行性、清晰度、逻辑分析6个专项分析的详细结果'
     )
+    content_hash = models.CharField(
+        _('内容指纹'),
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='文档内容、专项分析提示词与模型的哈希，未变化时增量评审直接复用专项分析结果'
+    )
+    section_fingerprints = models.JSONField(
+        _('章节指纹'),
+        default=dict,
+        blank=True,
+        help_text='各章节内容哈希与各专项分析（提示词+模型）指纹，增量评审时只重新分析变化的章节'
+    )
 
     # 元数据
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
@@ -434,6 +447,13 @@ class ModuleReviewResult(models.Model):
     strengths = models.TextField(_('优点'), blank=True)
     weaknesses = models.TextField(_('不足'), blank=True)
     recommendations = models.TextField(_('改进建议'), blank=True)
+    content_hash = models.CharField(
+        _('内容指纹'),
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text='模块内容、模块分析提示词与模型的哈希，未变化时增量评审直接复用该结果'
+    )
 
     # 元数据
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
@@ -365,6 +365,19 @@ class ReviewAnalysisRequestSerializer(serializers.Serializer):
         required=False,
         help_text="并发执行的最大worker数量，默认3。数值越大速度越快但可能触发API限流"
     )
+    incremental = serializers.BooleanField(
+        default=False,
+        required=False,
+        help_text="增量评审：复用上次评审中内容、提示词和模型均未变化的模块及专项分析结果"
+    )
+
+
+class ReviewStartOptionsSerializer(serializers.Serializer):
+    """启动评审的开关参数（表单提交的 "false"/"0" 按假值解析）"""
+    direct_review = serializers.BooleanField(default=False)
+    incremental = serializers.BooleanField(default=False)
+    # 未传时为 None，跟随系统配置（表单中缺省的布尔字段不能按假值处理）
+    use_llm_cache = serializers.BooleanField(required=False, allow_null=True, default=None)
 
 
 class ReviewProgressSerializer(serializers.Serializer):
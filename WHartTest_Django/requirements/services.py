@@ -1,8 +1,11 @@
+import copy
+import hashlib
 import logging
 import json
 import re
+import threading
 from string import Template
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from django.conf import settings
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
@@ -10,6 +13,10 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langgraph_integration.models import LLMConfig
 from .models import RequirementDocument, RequirementModule, DocumentImage
 from prompts.models import UserPrompt
+from wharttest_django.document_parsing import append_image_placeholder, document_parser
+from wharttest_django.progress import ProgressReporter, get_snapshot, job_topic
+from . import llm_cache
+from .json_stream import IncrementalJsonExtractor
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +35,8 @@ def create_llm_instance(active_config, temperature=0.1):
         "base_url": active_config.api_url,
         "max_retries": 3,
         "timeout": 120,
+        # 流式调用时同样返回 token 用量
+        "stream_usage": True,
     }
     llm = ChatOpenAI(**llm_kwargs)
     logger.info(
@@ -39,7 +48,7 @@ def create_llm_instance(active_config, temperature=0.1):
     return llm
 
 
-def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2):
+def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2, use_cache=None):
     """
     安全地调用 LLM，处理空响应和临时性错误。
 
@@ -51,6 +60,7 @@ def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2):
         messages: 消息列表
         max_retries: 最大重试次数
         retry_delay: 重试间隔（秒）
+        use_cache: 是否使用 LLM 响应缓存，None 表示跟随 LLM_RESPONSE_CACHE_ENABLED
 
     Returns:
         LLM 响应对象
@@ -60,6 +70,10 @@ def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2):
     """
     import time
 
+    cache_key, cached = _lookup_llm_cache(llm, messages, use_cache)
+    if cached is not None:
+        return cached
+
     last_error = None
     for attempt in range(max_retries):
         try:
@@ -67,6 +81,8 @@ def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2):
 
             # 验证响应是否有效
             if response and hasattr(response, "content") and response.content:
+                if cache_key:
+                    llm_cache.store_response(cache_key, response)
                 return response
 
             # 响应为空，记录并重试
@@ -97,6 +113,87 @@ def safe_llm_invoke(llm, messages, max_retries=3, retry_delay=2):
     raise last_error or Exception("LLM 调用失败，所有重试都未成功")
 
 
+def _lookup_llm_cache(llm, messages, use_cache=None):
+    """返回 (缓存键, 缓存的响应)；未启用缓存或调用不可缓存时缓存键为 None"""
+    if not llm_cache.is_cache_enabled(use_cache):
+        return None, None
+    cache_key = llm_cache.build_cache_key(llm, messages)
+    if not cache_key:
+        return None, None
+    cached = llm_cache.get_cached_response(cache_key)
+    if cached is not None:
+        logger.debug("LLM 响应缓存命中")
+        if hasattr(cached, "response_metadata"):
+            # 标记为缓存命中，统计 token 用量时不计入实际消耗
+            cached.response_metadata = {
+                **(cached.response_metadata or {}),
+                "from_llm_cache": True,
+            }
+    return cache_key, cached
+
+
+def safe_llm_stream(
+    llm,
+    messages,
+    on_text=None,
+    on_retry=None,
+    max_retries=3,
+    retry_delay=2,
+    use_cache=None,
+):
+    """
+    流式调用 LLM，每收到一段文本就回调 on_text，返回合并后的完整响应（用法与 safe_llm_invoke 的返回值一致）。
+
+    - LLM 响应缓存命中时一次性回调完整内容
+    - 调用失败或返回空内容时重试，重试前回调 on_retry（调用方据此重置增量解析状态）
+    - 模型不支持流式调用时回退到 safe_llm_invoke
+
+    Args:
+        on_text: 文本增量回调
+        on_retry: 重试前回调
+    """
+    import time
+
+    if not hasattr(llm, "stream"):
+        response = safe_llm_invoke(
+            llm, messages, max_retries=max_retries, retry_delay=retry_delay, use_cache=use_cache
+        )
+        if on_text:
+            on_text(response.content)
+        return response
+
+    cache_key, cached = _lookup_llm_cache(llm, messages, use_cache)
+    if cached is not None:
+        if on_text:
+            on_text(cached.content)
+        return cached
+
+    last_error = None
+    for attempt in range(max_retries):
+        response = None
+        try:
+            for chunk in llm.stream(messages):
+                response = chunk if response is None else response + chunk
+                if on_text and isinstance(chunk.content, str) and chunk.content:
+                    on_text(chunk.content)
+
+            if response is not None and response.content:
+                if cache_key:
+                    llm_cache.store_response(cache_key, response)
+                return response
+            logger.warning(f"LLM 流式返回空响应，尝试重试 ({attempt + 1}/{max_retries})")
+        except Exception as e:
+            last_error = e
+            logger.warning(f"LLM 流式调用失败: {e}，尝试重试 ({attempt + 1}/{max_retries})")
+
+        if attempt < max_retries - 1:
+            if on_retry:
+                on_retry()
+            time.sleep(retry_delay * (attempt + 1))
+
+    raise last_error or Exception("LLM 调用失败，所有重试都未成功")
+
+
 def extract_json_from_response(content: str) -> Optional[dict]:
     """
     从 LLM 响应中提取 JSON 对象，支持多种格式。
@@ -254,17 +351,7 @@ class DocumentProcessor:
         image_order: int,
     ) -> int:
         """追加图片占位符，并过滤 Word XML 中连续重复的同一图片引用。"""
-        if not rid:
-            return image_order
-
-        if image_rids and image_rids[-1] == rid:
-            logger.debug("跳过连续重复图片引用: %s", rid)
-            return image_order
-
-        image_id = f"img_{image_order:03d}"
-        content_parts.append(f"\n![图片](docimg://{image_id})\n")
-        image_rids.append(rid)
-        return image_order + 1
+        return append_image_placeholder(content_parts, image_rids, rid, image_order)
 
     def _extract_from_file(self, file, document: RequirementDocument = None) -> str:
         """从文件提取内容"""
@@ -331,37 +418,18 @@ class DocumentProcessor:
         """提取Markdown文件内容"""
         return self._extract_from_txt(file)  # Markdown本质上是文本文件
 
+    def _parse_with_shared_parser(self, file, extension: str):
+        """通过共享解析服务解析文件（相同内容的文件命中缓存，不重复解析）"""
+        return document_parser.parse(file, extension)
+
     def _extract_from_pdf(self, file) -> str:
         """提取PDF文件内容"""
         try:
-            from pypdf import PdfReader
-
-            # 重置文件指针
-            file.seek(0)
-
-            # 创建PDF读取器
-            pdf_reader = PdfReader(file)
-
-            # 提取所有页面的文本
-            text_content = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_content.append(
-                            f"=== 第{page_num + 1}页 ===\n{page_text.strip()}"
-                        )
-                except Exception as e:
-                    logger.warning(f"提取PDF第{page_num + 1}页失败: {e}")
-                    continue
-
-            content = "\n\n".join(text_content)
+            parsed = self._parse_with_shared_parser(file, "pdf")
             logger.info(
-                f"成功提取PDF内容，页数: {len(pdf_reader.pages)}, 内容长度: {len(content)}"
+                f"成功提取PDF内容，页数: {parsed.meta.get('page_count', 0)}, 内容长度: {len(parsed.markdown)}"
             )
-
-            return content
-
+            return parsed.markdown
         except ImportError:
             logger.error("pypdf库未安装，无法解析PDF文档")
             return ""
@@ -372,137 +440,40 @@ class DocumentProcessor:
 
     def _extract_from_word(self, file, document: RequirementDocument = None) -> str:
         """提取Word文件内容，保留标题格式、表格位置和图片"""
-        try:
-            from docx import Document
-            from docx.table import Table
-            from docx.text.paragraph import Paragraph
-            from docx.oxml.ns import qn
-
-            # 重置文件指针
-            file.seek(0)
-
-            # 使用python-docx读取Word文档
-            doc = Document(file)
-
-            logger.info(
-                f"开始提取Word文档，段落数: {len(doc.paragraphs)}, 表格数: {len(doc.tables)}"
-            )
-
-            # 按文档顺序处理所有元素（段落和表格）
-            content_parts = []
-            extracted_paragraphs = 0
-            extracted_tables = 0
-
-            # 创建元素到对象的映射，避免重复查找（性能优化 + 防止内容丢失）
-            paragraph_map = {p._element: p for p in doc.paragraphs}
-            table_map = {t._element: t for t in doc.tables}
-
-            # 图片计数器和收集器（按文档顺序）
-            image_order = 0
-            image_rids = []  # 按文档顺序收集图片的 rId
-
-            # 定义命名空间
-            nsmap = {
-                "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
-                "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
-                "v": "urn:schemas-microsoft-com:vml",
-            }
-
-            # 遍历文档的所有元素
-            for element in doc.element.body:
-                if element.tag.endswith("p"):  # 段落元素
-                    paragraph = paragraph_map.get(element)
-                    if paragraph:
-                        # 检查段落中是否包含图片
-                        drawings = element.findall(".//" + qn("w:drawing"))
-                        inline_pics = element.findall(".//" + qn("w:pict"))
-
-                        text = paragraph.text.strip()
-                        if text:  # 处理非空段落
-                            markdown_text = self._convert_paragraph_to_markdown(
-                                paragraph
-                            )
-                            content_parts.append(markdown_text)
-                            extracted_paragraphs += 1
-
-                        # 如果段落包含图片，提取 rId 并插入占位符
-                        for drawing in drawings:
-                            # 从 a:blip 元素获取 r:embed 属性
-                            blips = drawing.findall(".//a:blip", nsmap)
-                            for blip in blips:
-                                embed = blip.get(
-                                    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
-                                )
-                                image_order = self._append_image_placeholder(
-                                    content_parts,
-                                    image_rids,
-                                    embed,
-                                    image_order,
-                                )
-
-                        for pict in inline_pics:
-                            # 从 v:imagedata 元素获取 r:id 属性
-                            imagedata = pict.findall(".//v:imagedata", nsmap)
-                            for imgdata in imagedata:
-                                rid = imgdata.get(
-                                    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
-                                )
-                                image_order = self._append_image_placeholder(
-                                    content_parts,
-                                    image_rids,
-                                    rid,
-                                    image_order,
-                                )
-
-                elif element.tag.endswith("tbl"):  # 表格元素
-                    table = table_map.get(element)
-                    if table:
-                        table_content = self._extract_table_content(table)
-                        if table_content:
-                            content_parts.append(table_content)
-                            extracted_tables += 1
-
-            content = "\n\n".join(content_parts)
-
-            # 按文档顺序保存图片
-            if document and image_rids:
-                self._extract_and_save_images_ordered(doc, document, image_rids)
-
-            logger.info(
-                f"Word文档提取完成 - 提取段落: {extracted_paragraphs}, 提取表格: {extracted_tables}, 图片占位符: {image_order}, 总内容长度: {len(content)}"
-            )
-            logger.info(
-                f"原始段落数: {len(doc.paragraphs)}, 实际提取: {extracted_paragraphs}, 差异: {len(doc.paragraphs) - extracted_paragraphs}"
-            )
-
-            # 如果内容长度为0或者提取的段落数明显少于原始段落数，记录警告
-            if len(content) == 0:
-                logger.error("Word文档提取结果为空！")
-            elif extracted_paragraphs < len(doc.paragraphs) * 0.5:
-                logger.warning(
-                    f"Word文档可能存在内容丢失！原始{len(doc.paragraphs)}段，仅提取{extracted_paragraphs}段"
-                )
+        return self._extract_word_document(file, "docx", document)
 
-            return content
+    def _extract_from_doc(self, file, document: RequirementDocument = None) -> str:
+        """提取旧版Word(.doc)文件内容，优先转换为docx以保留标题样式"""
+        return self._extract_word_document(file, "doc", document)
 
+    def _extract_word_document(
+        self, file, extension: str, document: RequirementDocument = None
+    ) -> str:
+        try:
+            parsed = self._parse_with_shared_parser(file, extension)
         except ImportError:
             logger.error("python-docx库未安装，无法解析Word文档")
             return ""
         except Exception as e:
             logger.error(f"Word文档解析失败: {e}")
-            import traceback
+            return ""
 
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            # 如果解析失败，使用简化方法
-            return self._extract_from_word_simple(file)
+        if not parsed.markdown:
+            logger.error("Word文档提取结果为空！")
+
+        # 按文档顺序保存图片
+        if document and parsed.images:
+            self._save_parsed_images(document, parsed.images)
+
+        logger.info(
+            f"Word文档提取完成 - 方式: {parsed.meta.get('parse_method')}, 图片: {len(parsed.images)}, "
+            f"总内容长度: {len(parsed.markdown)}, 缓存: {parsed.from_cache}"
+        )
+        return parsed.markdown
 
-    def _extract_and_save_images_ordered(
-        self, doc, document: RequirementDocument, image_rids: list
-    ) -> None:
-        """按文档顺序提取并保存图片（基于收集的 rId 列表）"""
+    def _save_parsed_images(self, document: RequirementDocument, images) -> None:
+        """保存解析出的图片到 DocumentImage（image_id 与正文占位符一致）"""
         from django.core.files.base import ContentFile
-        from PIL import Image
-        import io
 
         ext_map = {
             "image/png": "png",
@@ -515,572 +486,36 @@ class DocumentProcessor:
         }
 
         saved_count = 0
-        for order, rid in enumerate(image_rids):
+        for image in images:
             try:
-                rel = doc.part.rels.get(rid)
-                if not rel:
-                    logger.warning(f"未找到关系 {rid}")
-                    continue
-
-                image_part = rel.target_part
-                image_id = f"img_{order:03d}"
-                image_blob = image_part.blob
-                content_type = image_part.content_type
-
-                # 获取图片尺寸
-                width, height = None, None
-                try:
-                    img = Image.open(io.BytesIO(image_blob))
-                    width, height = img.size
-                except Exception as e:
-                    logger.warning(f"获取图片尺寸失败: {e}")
-
-                ext = ext_map.get(content_type, "png")
+                ext = ext_map.get(image.content_type, "png")
 
                 doc_image = DocumentImage.objects.create(
                     document=document,
-                    image_id=image_id,
-                    order=order,
-                    content_type=content_type,
-                    width=width,
-                    height=height,
-                    file_size=len(image_blob),
+                    image_id=image.image_id,
+                    order=image.order,
+                    content_type=image.content_type,
+                    width=image.width,
+                    height=image.height,
+                    file_size=len(image.blob),
                 )
 
-                filename = f"{document.id}_{image_id}.{ext}"
-                doc_image.image_file.save(filename, ContentFile(image_blob), save=True)
+                filename = f"{document.id}_{image.image_id}.{ext}"
+                doc_image.image_file.save(filename, ContentFile(image.blob), save=True)
 
                 logger.info(
-                    f"保存图片: {image_id}, rId: {rid}, 类型: {content_type}, 尺寸: {width}x{height}"
+                    f"保存图片: {image.image_id}, 类型: {image.content_type}, 尺寸: {image.width}x{image.height}"
                 )
                 saved_count += 1
 
             except Exception as e:
-                logger.error(f"保存图片失败 (rId={rid}): {e}")
+                logger.error(f"保存图片失败 ({image.image_id}): {e}")
                 continue
 
         document.has_images = saved_count > 0
         document.image_count = saved_count
         document.save(update_fields=["has_images", "image_count"])
 
-    def _extract_and_save_images(self, doc, document: RequirementDocument) -> None:
-        """提取 DOCX 中的图片并保存到 DocumentImage"""
-        from docx.opc.constants import RELATIONSHIP_TYPE as RT
-        from django.core.files.base import ContentFile
-        from PIL import Image
-        import io
-
-        image_order = 0
-        for rel in doc.part.rels.values():
-            if rel.reltype == RT.IMAGE:
-                try:
-                    image_part = rel.target_part
-                    image_id = f"img_{image_order:03d}"
-
-                    # 获取图片二进制数据
-                    image_blob = image_part.blob
-                    content_type = image_part.content_type
-
-                    # 获取图片尺寸
-                    width, height = None, None
-                    try:
-                        img = Image.open(io.BytesIO(image_blob))
-                        width, height = img.size
-                    except Exception as e:
-                        logger.warning(f"获取图片尺寸失败: {e}")
-
-                    # 确定文件扩展名
-                    ext_map = {
-                        "image/png": "png",
-                        "image/jpeg": "jpg",
-                        "image/gif": "gif",
-                        "image/bmp": "bmp",
-                        "image/tiff": "tiff",
-                        "image/x-emf": "emf",
-                        "image/x-wmf": "wmf",
-                    }
-                    ext = ext_map.get(content_type, "png")
-
-                    # 创建 DocumentImage 记录
-                    doc_image = DocumentImage.objects.create(
-                        document=document,
-                        image_id=image_id,
-                        order=image_order,
-                        content_type=content_type,
-                        width=width,
-                        height=height,
-                        file_size=len(image_blob),
-                    )
-
-                    # 保存图片文件
-                    filename = f"{document.id}_{image_id}.{ext}"
-                    doc_image.image_file.save(
-                        filename, ContentFile(image_blob), save=True
-                    )
-
-                    logger.info(
-                        f"保存图片: {image_id}, 类型: {content_type}, 尺寸: {width}x{height}"
-                    )
-                    image_order += 1
-
-                except Exception as e:
-                    logger.error(f"保存图片失败: {e}")
-                    continue
-
-        # 更新文档图片统计
-        document.has_images = image_order > 0
-        document.image_count = image_order
-        document.save(update_fields=["has_images", "image_count"])
-
-    def _extract_from_word_simple(self, file) -> str:
-        """简化的Word文档提取方法（备用）"""
-        try:
-            from docx import Document
-
-            # 重置文件指针
-            file.seek(0)
-            doc = Document(file)
-
-            # 简单提取段落
-            paragraphs = []
-            for paragraph in doc.paragraphs:
-                text = paragraph.text.strip()
-                if text:
-                    markdown_text = self._convert_paragraph_to_markdown(paragraph)
-                    paragraphs.append(markdown_text)
-
-            # 提取表格
-            for table in doc.tables:
-                table_content = self._extract_table_content(table)
-                if table_content:
-                    paragraphs.append(table_content)
-
-            content = "\n\n".join(paragraphs)
-            logger.warning(f"使用简化方法提取Word文档内容，段落数: {len(paragraphs)}")
-            return content
-
-        except Exception as e:
-            logger.error(f"简化Word文档解析也失败: {e}")
-            return ""
-
-    def _extract_from_doc(self, file, document: RequirementDocument = None) -> str:
-        """提取旧版Word(.doc)文件内容，优先转换为docx以保留标题样式"""
-        import tempfile
-        import os
-        import platform
-        import subprocess
-
-        file.seek(0)
-        # 检测文件真实格式（通过魔数）
-        header = file.read(8)
-        file.seek(0)
-        logger.debug(
-            f"文件头部魔数: {header[:4] if isinstance(header, bytes) else header[:4].encode()}"
-        )
-
-        # ZIP魔数 (PK..) = docx/xlsx/pptx 等 Office Open XML 格式
-        if isinstance(header, bytes) and header[:4] == b"PK\x03\x04":
-            logger.info("检测到文件实际为 .docx 格式（ZIP魔数），回退到 docx 解析器")
-            return self._extract_from_word(file, document)
-        elif isinstance(header, str) and header[:4] == "PK\x03\x04":
-            logger.info(
-                "检测到文件实际为 .docx 格式（ZIP魔数-str），回退到 docx 解析器"
-            )
-            return self._extract_from_word(file, document)
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".doc") as tmp:
-            tmp.write(file.read())
-            tmp_path = os.path.abspath(tmp.name)
-
-        try:
-            content = None
-
-            # 方法1 (推荐): LibreOffice 转换为 docx，保留标题样式
-            try:
-                import tempfile as tf
-
-                with tf.TemporaryDirectory() as tmp_dir:
-                    result = subprocess.run(
-                        [
-                            "libreoffice",
-                            "--headless",
-                            "--convert-to",
-                            "docx",
-                            "--outdir",
-                            tmp_dir,
-                            tmp_path,
-                        ],
-                        capture_output=True,
-                        text=True,
-                        timeout=120,
-                    )
-                    if result.returncode == 0:
-                        docx_file = os.path.join(
-                            tmp_dir, os.path.basename(tmp_path).replace(".doc", ".docx")
-                        )
-                        if os.path.exists(docx_file):
-                            # 用 python-docx 解析转换后的 docx，保留标题样式
-                            with open(docx_file, "rb") as f:
-                                content = self._extract_from_word(f, document)
-                            if content:
-                                logger.info(
-                                    f"成功提取.doc文档(LibreOffice->docx)，内容长度: {len(content)}"
-                                )
-                                return content
-            except FileNotFoundError:
-                logger.debug("LibreOffice 未安装，尝试其他方法")
-            except Exception as e:
-                logger.debug(f"LibreOffice 转换失败: {e}")
-
-            # 方法2: Windows COM 接口（可以保留样式信息）
-            if platform.system() == "Windows":
-                content = self._extract_doc_with_com_styled(tmp_path)
-                if content:
-                    logger.info(
-                        f"成功提取.doc文档(COM带样式)，内容长度: {len(content)}"
-                    )
-                    return content
-                # 降级到纯文本COM
-                content = self._extract_doc_with_com(tmp_path)
-                if content:
-                    logger.info(
-                        f"成功提取.doc文档(COM纯文本)，内容长度: {len(content)}"
-                    )
-                    return self._infer_headings_from_plain_text(content)
-
-            # 方法3: antiword (纯文本，需要推断标题)
-            try:
-                result = subprocess.run(
-                    ["antiword", "-w", "0", tmp_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=60,
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    content = result.stdout.strip()
-                    logger.info(f"成功提取.doc文档(antiword)，内容长度: {len(content)}")
-                    return self._infer_headings_from_plain_text(content)
-                else:
-                    logger.debug(
-                        f"antiword 返回码: {result.returncode}, stderr: {result.stderr}"
-                    )
-            except FileNotFoundError:
-                logger.debug("antiword 未安装")
-            except Exception as e:
-                logger.debug(f"antiword 失败: {e}")
-
-            # 方法4: catdoc (纯文本，需要推断标题)
-            try:
-                result = subprocess.run(
-                    ["catdoc", "-w", tmp_path],
-                    capture_output=True,
-                    text=True,
-                    timeout=60,
-                )
-                if result.returncode == 0 and result.stdout.strip():
-                    content = result.stdout.strip()
-                    logger.info(f"成功提取.doc文档(catdoc)，内容长度: {len(content)}")
-                    return self._infer_headings_from_plain_text(content)
-            except FileNotFoundError:
-                logger.debug("catdoc 未安装")
-            except Exception as e:
-                logger.debug(f"catdoc 失败: {e}")
-
-            # 方法5: LibreOffice 转纯文本 (最后的备选)
-            try:
-                import tempfile as tf
-
-                with tf.TemporaryDirectory() as tmp_dir:
-                    result = subprocess.run(
-                        [
-                            "libreoffice",
-                            "--headless",
-                            "--convert-to",
-                            "txt:Text",
-                            "--outdir",
-                            tmp_dir,
-                            tmp_path,
-                        ],
-                        capture_output=True,
-                        text=True,
-                        timeout=120,
-                    )
-                    if result.returncode == 0:
-                        txt_file = os.path.join(
-                            tmp_dir, os.path.basename(tmp_path).replace(".doc", ".txt")
-                        )
-                        if os.path.exists(txt_file):
-                            with open(
-                                txt_file, "r", encoding="utf-8", errors="ignore"
-                            ) as f:
-                                content = f.read().strip()
-                            logger.info(
-                                f"成功提取.doc文档(LibreOffice->txt)，内容长度: {len(content)}"
-                            )
-                            return self._infer_headings_from_plain_text(content)
-            except FileNotFoundError:
-                logger.debug("LibreOffice 未安装")
-            except Exception as e:
-                logger.debug(f"LibreOffice 失败: {e}")
-
-            # 所有方法都失败
-            error_msg = (
-                "无法解析 .doc 文件。请安装 LibreOffice 以获得最佳效果：\n"
-                "Ubuntu/Debian: apt-get install libreoffice\n"
-                "或者将文件另存为 .docx 格式后重新上传"
-            )
-            logger.error(error_msg)
-            return ""
-
-        finally:
-            try:
-                os.unlink(tmp_path)
-            except Exception:
-                pass
-
-    def _extract_doc_with_com_styled(self, file_path: str) -> str:
-        """使用Windows COM接口提取.doc内容，保留标题样式"""
-        try:
-            import win32com.client
-            import pythoncom
-
-            pythoncom.CoInitialize()
-            try:
-                word = win32com.client.Dispatch("Word.Application")
-                word.Visible = False
-                word.DisplayAlerts = False
-                doc = word.Documents.Open(
-                    file_path, ReadOnly=True, AddToRecentFiles=False
-                )
-
-                content_parts = []
-                for para in doc.Paragraphs:
-                    text = para.Range.Text.strip()
-                    if not text or text == "\r":
-                        continue
-
-                    # 获取段落样式
-                    style_name = para.Style.NameLocal if para.Style else ""
-
-                    # 根据样式转换为Markdown标题
-                    if "标题 1" in style_name or "Heading 1" in style_name:
-                        content_parts.append(f"# {text}")
-                    elif "标题 2" in style_name or "Heading 2" in style_name:
-                        content_parts.append(f"## {text}")
-                    elif "标题 3" in style_name or "Heading 3" in style_name:
-                        content_parts.append(f"### {text}")
-                    elif "标题 4" in style_name or "Heading 4" in style_name:
-                        content_parts.append(f"#### {text}")
-                    elif "标题 5" in style_name or "Heading 5" in style_name:
-                        content_parts.append(f"##### {text}")
-                    elif "标题 6" in style_name or "Heading 6" in style_name:
-                        content_parts.append(f"###### {text}")
-                    else:
-                        content_parts.append(text)
-
-                doc.Close(False)
-                word.Quit()
-                return "\n\n".join(content_parts)
-            finally:
-                pythoncom.CoUninitialize()
-        except ImportError:
-            logger.debug("pywin32 未安装")
-            return ""
-        except Exception as e:
-            logger.debug(f"COM带样式解析.doc失败: {e}")
-            return ""
-
-    def _extract_doc_with_com(self, file_path: str) -> str:
-        """使用Windows COM接口提取.doc内容"""
-        try:
-            import win32com.client
-            import pythoncom
-
-            pythoncom.CoInitialize()
-            try:
-                word = win32com.client.Dispatch("Word.Application")
-                word.Visible = False
-                word.DisplayAlerts = False
-                doc = word.Documents.Open(
-                    file_path, ReadOnly=True, AddToRecentFiles=False
-                )
-                content = doc.Content.Text
-                doc.Close(False)
-                word.Quit()
-                return content.strip()
-            finally:
-                pythoncom.CoUninitialize()
-        except ImportError:
-            logger.debug("pywin32 未安装")
-            return ""
-        except Exception as e:
-            logger.error(f"COM方式解析.doc失败: {e}")
-            return ""
-
-    def _infer_headings_from_plain_text(self, content: str) -> str:
-        """从纯文本推断标题结构，转换为Markdown格式"""
-        import re
-
-        lines = content.split("\n")
-        result_lines = []
-
-        # 常见的标题模式
-        # 1. 数字编号: "1. xxx", "1.1 xxx", "1.1.1 xxx" 等
-        # 2. 中文编号: "一、xxx", "（一）xxx", "1）xxx" 等
-        # 3. 章节关键词: "第一章 xxx", "第1节 xxx" 等
-
-        # 编号模式 -> 标题级别映射
-        patterns = [
-            # 第X章 -> H1
-            (r"^第[一二三四五六七八九十\d]+章\s*[:：]?\s*(.+)$", 1),
-            # 第X节 -> H2
-            (r"^第[一二三四五六七八九十\d]+节\s*[:：]?\s*(.+)$", 2),
-            # 一、二、三、 -> H1
-            (r"^[一二三四五六七八九十]+[、.．]\s*(.+)$", 1),
-            # （一）（二）-> H2
-            (r"^[（\(][一二三四五六七八九十]+[）\)]\s*(.+)$", 2),
-            # 1. 2. 3. (独立行，较短) -> H2
-            (r"^(\d+)[.、．]\s*(.{2,50})$", 2),
-            # 1.1 1.2 (两级编号) -> H3
-            (r"^(\d+\.\d+)[.、．\s]\s*(.{2,50})$", 3),
-            # 1.1.1 (三级编号) -> H4
-            (r"^(\d+\.\d+\.\d+)[.、．\s]\s*(.{2,50})$", 4),
-            # 1.1.1.1 (四级编号) -> H5
-            (r"^(\d+\.\d+\.\d+\.\d+)[.、．\s]\s*(.{2,50})$", 5),
-            # 1) 2) 3) 形式 -> H3
-            (r"^(\d+)[)）]\s*(.{2,50})$", 3),
-        ]
-
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                result_lines.append("")
-                continue
-
-            matched = False
-            for pattern, level in patterns:
-                match = re.match(pattern, stripped)
-                if match:
-                    # 检查是否可能是标题（不能太长，前后应有空行等启发式判断）
-                    if len(stripped) <= 80:
-                        prefix = "#" * level + " "
-                        result_lines.append(prefix + stripped)
-                        matched = True
-                        break
-
-            if not matched:
-                result_lines.append(line)
-
-        result = "\n".join(result_lines)
-        logger.info(
-            f"标题推断完成，原始长度: {len(content)}, 处理后长度: {len(result)}"
-        )
-        return result
-
-    def _convert_paragraph_to_markdown(self, paragraph) -> str:
-        """将Word段落转换为Markdown格式"""
-        text = paragraph.text.strip()
-        if not text:
-            return ""
-
-        # 检查段落样式
-        style_name = paragraph.style.name if paragraph.style else ""
-
-        # 根据样式名称转换为Markdown标题
-        if "Heading 1" in style_name or "heading 1" in style_name.lower():
-            return f"# {text}"
-        elif "Heading 2" in style_name or "heading 2" in style_name.lower():
-            return f"## {text}"
-        elif "Heading 3" in style_name or "heading 3" in style_name.lower():
-            return f"### {text}"
-        elif "Heading 4" in style_name or "heading 4" in style_name.lower():
-            return f"#### {text}"
-        elif "Heading 5" in style_name or "heading 5" in style_name.lower():
-            return f"##### {text}"
-        elif "Heading 6" in style_name or "heading 6" in style_name.lower():
-            return f"###### {text}"
-        else:
-            # 对于非标题样式的段落，直接返回原文本
-            # 不再根据粗体格式推测标题，避免误判
-            return text
-
-    def _extract_table_content(self, table, depth=0) -> str:
-        """提取表格内容为Markdown格式，支持嵌套表格
-
-        Args:
-            table: Word表格对象
-            depth: 递归深度，用于处理嵌套表格
-        """
-        try:
-            table_rows = []
-            total_cells = 0
-            extracted_cells = 0
-            nested_tables_found = 0
-
-            for i, row in enumerate(table.rows):
-                row_cells = []
-                for cell in row.cells:
-                    total_cells += 1
-
-                    # 检查单元格中是否包含嵌套表格
-                    nested_tables = cell.tables
-                    if nested_tables and depth < 3:  # 最多支持3层嵌套
-                        nested_tables_found += len(nested_tables)
-                        # 提取单元格中的文本（不包括嵌套表格的文本）
-                        cell_text_parts = []
-
-                        # 提取单元格段落文本
-                        for paragraph in cell.paragraphs:
-                            para_text = paragraph.text.strip()
-                            if para_text:
-                                cell_text_parts.append(para_text)
-
-                        # 递归提取嵌套表格
-                        for nested_table in nested_tables:
-                            nested_content = self._extract_table_content(
-                                nested_table, depth + 1
-                            )
-                            if nested_content:
-                                cell_text_parts.append(f"[嵌套表格]\n{nested_content}")
-
-
-                        cell_text = " ".join(cell_text_parts).replace("\n", " ")
-                    else:
-                        # 普通单元格，直接提取文本
-                        cell_text = cell.text.strip().replace("\n", " ")
-
-                    if cell_text:
-                        row_cells.append(cell_text)
-                        extracted_cells += 1
-                    else:
-                        row_cells.append("")
-
-                if any(cell for cell in row_cells):  # 如果行不为空
-                    table_rows.append(" | ".join(row_cells))
-
-                    # 如果是第一行，添加分隔符
-                    if i == 0 and len(row_cells) > 0:
-                        separator = " | ".join(["---"] * len(row_cells))
-                        table_rows.append(separator)
-
-            if table_rows:
-                table_content = "\n".join(table_rows)
-                indent = "  " * depth
-                logger.info(
-                    f"{indent}表格提取完成 (深度{depth}) - 行数: {len(table.rows)}, 总单元格: {total_cells}, 非空单元格: {extracted_cells}, 嵌套表格: {nested_tables_found}, 内容长度: {len(table_content)}"
-                )
-                return table_content
-            else:
-                logger.warning(f"表格为空或所有行都为空 (深度{depth})")
-            return ""
-
-        except Exception as e:
-            logger.error(f"表格内容提取失败 (深度{depth}): {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return ""
-
     def _get_sample_content(self) -> str:
         """获取示例内容用于测试"""
         return """
@@ -1167,8 +602,9 @@ class DocumentProcessor:
 class ModuleSplitter:
     """模块拆分器 - 负责AI智能模块识别和拆分"""
 
-    def __init__(self, user=None):
+    def __init__(self, user=None, use_llm_cache=None):
         self.user = user
+        self.use_llm_cache = use_llm_cache  # None 表示跟随 LLM_RESPONSE_CACHE_ENABLED
         self.llm = self._get_llm_instance()
 
     def _get_llm_instance(self):
@@ -1248,7 +684,7 @@ class ModuleSplitter:
                 HumanMessage(content=formatted_prompt),
             ]
 
-            response = safe_llm_invoke(self.llm, messages)
+            response = safe_llm_invoke(self.llm, messages, use_cache=self.use_llm_cache)
 
             modules_structure = extract_json_from_response(response.content)
             if not modules_structure:
@@ -2097,6 +1533,10 @@ class RequirementModuleService:
     ) -> List[RequirementModule]:
         """处理文档并进行模块拆分"""
         try:
+            # 单次请求可绕过 LLM 响应缓存
+            if split_options and "use_llm_cache" in split_options:
+                self.module_splitter.use_llm_cache = split_options["use_llm_cache"]
+
             # 更新文档状态
             document.status = "module_split"
             document.save()
@@ -2470,13 +1910,29 @@ class ModuleOperationService:
                 module.save()
 
 
+class ModuleReviewError(RuntimeError):
+    """部分模块分析失败；已成功的模块结果已落库，续评时只重试失败的模块"""
+
+    def __init__(self, failed_modules: List[str]):
+        self.failed_modules = failed_modules
+        super().__init__(
+            f"{len(failed_modules)} 个模块分析失败（{'、'.join(failed_modules)}），请重新发起评审"
+        )
+
+
 class RequirementReviewEngine:
     """需求评审AI分析引擎 - 专业的需求文档评审分析"""
 
-    def __init__(self, user=None):
+    def __init__(self, user=None, use_llm_cache=None):
         self.user = user
+        self.use_llm_cache = use_llm_cache  # None 表示跟随 LLM_RESPONSE_CACHE_ENABLED
         self.llm_config = None  # 保存当前使用的LLM配置
         self.llm = self._get_llm_instance()
+        # 最近一次准备好的分析内容，多个专项分析共用同一份（多模态时避免重复读取、编码图片）
+        self._analysis_content_cache = None
+        self._analysis_content_lock = threading.Lock()
+        # 专项分析中每个问题对象闭合时的回调 (分析类型, 序号, 问题)，由全面评审在执行期间设置
+        self._issue_callback = None
 
     def _get_llm_instance(self):
         """获取LLM实例"""
@@ -2556,6 +2012,21 @@ class RequirementReviewEngine:
 
     def _prepare_analysis_content(
         self, content: str, document: RequirementDocument = None
+    ) -> tuple:
+        """准备分析内容，相同文档的多个专项分析复用同一份结果（保证各分析的文档前缀完全一致）"""
+        cache_key = (
+            getattr(document, "id", None),
+            hashlib.sha256((content or "").encode("utf-8")).hexdigest(),
+        )
+        with self._analysis_content_lock:
+            if self._analysis_content_cache and self._analysis_content_cache[0] == cache_key:
+                return self._analysis_content_cache[1]
+            prepared = self._build_analysis_content(content, document)
+            self._analysis_content_cache = (cache_key, prepared)
+            return prepared
+
+    def _build_analysis_content(
+        self, content: str, document: RequirementDocument = None
     ) -> tuple:
         """
         准备分析内容，根据是否支持多模态返回不同格式
@@ -2611,9 +2082,9 @@ class RequirementReviewEngine:
                 HumanMessage(content=formatted_prompt),
             ]
 
-            response = safe_llm_invoke(self.llm, messages)
-
-            analysis_result = extract_json_from_response(response.content)
+            response, analysis_result = self._invoke_for_json(
+                messages, on_issue=(analysis_options or {}).get("on_issue")
+            )
             if analysis_result:
                 # 确保必要字段存在
                 analysis_result.setdefault("overall_rating", "average")
@@ -2658,315 +2129,207 @@ class RequirementReviewEngine:
             ],
         }
 
-    def analyze_completeness(
-        self, content: str, document: RequirementDocument = None
+    # 专项分析共用的系统提示词与文档包裹文本。六个专项分析的消息前缀（系统提示词 + 文档）逐字节一致，
+    # 只有末尾的分析要求不同，便于服务端前缀缓存（OpenAI/DeepSeek/Qwen 等）命中
+    SHARED_REVIEW_SYSTEM_PROMPT = (
+        "你是一位资深的需求评审专家，将从指定维度评审下方的需求文档。"
+        "请仔细阅读文档中的文字和图片，并严格按照文档之后给出的评审要求输出。"
+    )
+    DOCUMENT_CONTEXT_HEADER = "以下是待评审的需求文档：\n\n<document>\n"
+    DOCUMENT_CONTEXT_FOOTER = "\n</document>"
+    DOCUMENT_PLACEHOLDER = "[文档内容见上方 <document> 标签内]"
+
+    # 分析类型 -> (显示名称, 评审角色)
+    SPECIALIZED_ANALYSIS_ROLES = {
+        "completeness_analysis": ("完整性", "你是一位资深的需求分析专家。"),
+        "consistency_analysis": ("一致性", "你是一位资深的需求一致性分析专家。"),
+        "testability_analysis": ("可测性", "你是一位资深的测试专家。"),
+        "feasibility_analysis": ("可行性", "你是一位资深的技术架构师。"),
+        "clarity_analysis": ("清晰度", "你是一位资深的需求分析专家。"),
+        "logic_analysis": (
+            "逻辑",
+            "你是一位资深的需求分析专家，擅长分析业务流程逻辑、业务规则逻辑和状态转换逻辑。",
+        ),
+    }
+
+    def _build_specialized_messages(
+        self, processed_content, is_multimodal: bool, role: str, prompt_template: str
+    ) -> list:
+        """构造 共享前缀（系统提示词 + 文档） + 分析要求 的消息"""
+        formatted_prompt = format_prompt_template(
+            prompt_template, document=self.DOCUMENT_PLACEHOLDER
+        )
+        instructions = f"\n\n【本次评审要求】\n{role}\n\n{formatted_prompt}"
+
+        if is_multimodal:
+            message_content = (
+                [{"type": "text", "text": self.DOCUMENT_CONTEXT_HEADER}]
+                + processed_content
+                + [
+                    {"type": "text", "text": self.DOCUMENT_CONTEXT_FOOTER},
+                    {"type": "text", "text": instructions},
+                ]
+            )
+        else:
+            message_content = (
+                f"{self.DOCUMENT_CONTEXT_HEADER}{processed_content}"
+                f"{self.DOCUMENT_CONTEXT_FOOTER}{instructions}"
+            )
+        return [
+            SystemMessage(content=self.SHARED_REVIEW_SYSTEM_PROMPT),
+            HumanMessage(content=message_content),
+        ]
+
+    @staticmethod
+    def _extract_token_usage(response) -> dict:
+        """读取响应的 token 用量，cached_input_tokens 为命中服务端前缀缓存的输入 token 数"""
+        metadata = getattr(response, "response_metadata", None) or {}
+        if metadata.get("from_llm_cache"):
+            # 本地 LLM 响应缓存命中，没有产生实际调用
+            return {
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "cached_input_tokens": 0,
+                "from_llm_cache": True,
+            }
+
+        usage = getattr(response, "usage_metadata", None) or {}
+        cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+        if not cached:
+            # 兼容未被 LangChain 归一化的字段：OpenAI/Qwen 的 prompt_tokens_details.cached_tokens、
+            # DeepSeek 的 prompt_cache_hit_tokens
+            raw_usage = metadata.get("token_usage") or {}
+            cached = (raw_usage.get("prompt_tokens_details") or {}).get(
+                "cached_tokens"
+            ) or raw_usage.get("prompt_cache_hit_tokens") or 0
+        return {
+            "input_tokens": usage.get("input_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cached_input_tokens": cached,
+        }
+
+    @staticmethod
+    def _sum_token_usage(results) -> dict:
+        totals = {"input_tokens": 0, "output_tokens": 0, "cached_input_tokens": 0}
+        for result in results:
+            usage = (result or {}).get("token_usage") or {}
+            for key in totals:
+                totals[key] += usage.get(key, 0) or 0
+        totals["cache_hit_rate"] = (
+            round(totals["cached_input_tokens"] / totals["input_tokens"], 4)
+            if totals["input_tokens"]
+            else 0.0
+        )
+        return totals
+
+    def _invoke_for_json(self, messages, on_issue=None):
+        """
+        调用 LLM 并解析 JSON 结果，返回 (响应, 解析结果或 None)
+
+        提供 on_issue 且开启 REQUIREMENT_REVIEW_STREAMING 时流式调用，issues 数组中每个问题对象
+        一闭合就回调 on_issue(序号, 问题)，不必等待完整响应。
+        """
+        if on_issue is None or not getattr(settings, "REQUIREMENT_REVIEW_STREAMING", True):
+            response = safe_llm_invoke(self.llm, messages, use_cache=self.use_llm_cache)
+            return response, extract_json_from_response(response.content)
+
+        extractor = IncrementalJsonExtractor(
+            ("issues",), on_item=lambda key, index, item: on_issue(index, item)
+        )
+        response = safe_llm_stream(
+            self.llm,
+            messages,
+            on_text=extractor.feed,
+            on_retry=extractor.reset,
+            use_cache=self.use_llm_cache,
+        )
+        return response, extractor.result()
+
+    def _run_specialized_analysis(
+        self, analysis_type: str, content: str, document: RequirementDocument = None
     ) -> dict:
-        """完整性专项分析 - 分析完整文档的完整性，支持多模态"""
-        logger.info("开始执行完整性分析...")
-        completeness_prompt = self._get_user_prompt("completeness_analysis")
-        if not completeness_prompt:
-            logger.warning("用户未配置完整性分析提示词，返回默认结果")
-            return self._get_default_analysis_result("completeness_analysis")
+        """执行单个专项分析，支持多模态"""
+        display_name, role = self.SPECIALIZED_ANALYSIS_ROLES[analysis_type]
+        logger.info(f"开始执行{display_name}分析...")
+        prompt_template = self._get_user_prompt(analysis_type)
+        if not prompt_template:
+            logger.warning(f"用户未配置{display_name}分析提示词，返回默认结果")
+            return self._get_default_analysis_result(analysis_type)
 
         try:
             # 准备分析内容（可能是纯文本或多模态）
             processed_content, is_multimodal, image_warning = (
                 self._prepare_analysis_content(content, document)
             )
+            messages = self._build_specialized_messages(
+                processed_content, is_multimodal, role, prompt_template
+            )
 
-            if is_multimodal:
-                # 多模态模式：构造图文交替的消息
-                formatted_prompt = format_prompt_template(
-                    completeness_prompt, document="[文档内容见上方图文]"
-                )
-                # 将提示词追加到多模态内容后面
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的需求分析专家，擅长分析包含图片的需求文档。请仔细查看文档中的文字和图片。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                # 纯文本模式
-                formatted_prompt = format_prompt_template(
-                    completeness_prompt, document=processed_content
-                )
-                logger.debug(
-                    f"完整性分析提示词已格式化，文档长度: {len(processed_content)}"
-                )
-                messages = [
-                    SystemMessage(content="你是一位资深的需求分析专家。"),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            logger.info("调用LLM进行完整性分析...")
-            response = safe_llm_invoke(self.llm, messages)
-            logger.info(f"LLM响应完成，内容长度: {len(response.content)}")
+            logger.info(f"调用LLM进行{display_name}分析...")
+            issue_callback = self._issue_callback
+            response, result = self._invoke_for_json(
+                messages,
+                on_issue=(
+                    (lambda index, issue: issue_callback(analysis_type, index, issue))
+                    if issue_callback
+                    else None
+                ),
+            )
+            token_usage = self._extract_token_usage(response)
+            logger.info(
+                f"LLM响应完成，内容长度: {len(response.content)}, 输入token: {token_usage['input_tokens']}, "
+                f"缓存命中token: {token_usage['cached_input_tokens']}"
+            )
 
-            result = extract_json_from_response(response.content)
             if result:
                 logger.info(
-                    f"完整性分析完成，评分: {result.get('overall_score', 'N/A')}, 问题数: {len(result.get('issues', []))}"
+                    f"{display_name}分析完成，评分: {result.get('overall_score', 'N/A')}, 问题数: {len(result.get('issues', []))}"
                 )
                 if image_warning:
                     result["image_warning"] = image_warning
-                return result
             else:
-                logger.warning("完整性分析响应中未找到JSON格式，使用默认结果")
+                logger.warning(f"{display_name}分析响应中未找到JSON格式，使用默认结果")
                 logger.debug(f"AI响应内容前500字符: {response.content[:500]}")
-                return self._get_default_analysis_result("completeness_analysis")
+                result = self._get_default_analysis_result(analysis_type)
+            result["token_usage"] = token_usage
+            return result
 
         except Exception as e:
-            logger.error(f"完整性分析失败: {e}")
+            logger.error(f"{display_name}分析失败: {e}")
             import traceback
 
             logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("completeness_analysis")
+            return self._get_default_analysis_result(analysis_type)
+
+    def analyze_completeness(
+        self, content: str, document: RequirementDocument = None
+    ) -> dict:
+        """完整性专项分析 - 分析完整文档的完整性，支持多模态"""
+        return self._run_specialized_analysis("completeness_analysis", content, document)
 
     def analyze_consistency(
         self, content: str, document: RequirementDocument = None
     ) -> dict:
         """一致性专项分析 - 分析完整文档的一致性，支持多模态"""
-        logger.info("开始执行一致性分析...")
-        consistency_prompt = self._get_user_prompt("consistency_analysis")
-        if not consistency_prompt:
-            logger.warning("用户未配置一致性分析提示词，返回默认结果")
-            return self._get_default_analysis_result("consistency_analysis")
-
-        try:
-            # 准备分析内容（可能是纯文本或多模态）
-            processed_content, is_multimodal, image_warning = (
-                self._prepare_analysis_content(content, document)
-            )
-
-            if is_multimodal:
-                formatted_prompt = format_prompt_template(
-                    consistency_prompt, document="[文档内容见上方图文]"
-                )
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的需求一致性分析专家，擅长分析包含图片的需求文档。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                formatted_prompt = format_prompt_template(
-                    consistency_prompt, document=processed_content
-                )
-                logger.debug(
-                    f"一致性分析提示词已格式化，文档长度: {len(processed_content)}"
-                )
-                messages = [
-                    SystemMessage(content="你是一位资深的需求一致性分析专家。"),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            logger.info("调用LLM进行一致性分析...")
-            response = safe_llm_invoke(self.llm, messages)
-            logger.info(f"LLM响应完成，内容长度: {len(response.content)}")
-
-            result = extract_json_from_response(response.content)
-            if result:
-                logger.info(
-                    f"一致性分析完成，评分: {result.get('overall_score', 'N/A')}, 问题数: {len(result.get('issues', []))}"
-                )
-                if image_warning:
-                    result["image_warning"] = image_warning
-                return result
-            else:
-                logger.warning("一致性分析响应中未找到JSON格式，使用默认结果")
-                logger.debug(f"AI响应内容前500字符: {response.content[:500]}")
-                return self._get_default_analysis_result("consistency_analysis")
-
-        except Exception as e:
-            logger.error(f"一致性分析失败: {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("consistency_analysis")
+        return self._run_specialized_analysis("consistency_analysis", content, document)
 
     def analyze_testability(
         self, content: str, document: RequirementDocument = None
     ) -> dict:
         """可测性专项分析 - 分析完整文档的可测试性，支持多模态"""
-        logger.info("开始执行可测性分析...")
-        testability_prompt = self._get_user_prompt("testability_analysis")
-        if not testability_prompt:
-            logger.warning("用户未配置可测性分析提示词，返回默认结果")
-            return self._get_default_analysis_result("testability_analysis")
-
-        try:
-            # 准备分析内容（可能是纯文本或多模态）
-            processed_content, is_multimodal, image_warning = (
-                self._prepare_analysis_content(content, document)
-            )
-
-            if is_multimodal:
-                formatted_prompt = format_prompt_template(
-                    testability_prompt, document="[文档内容见上方图文]"
-                )
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的测试专家，擅长分析包含图片的需求文档。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                formatted_prompt = format_prompt_template(
-                    testability_prompt, document=processed_content
-                )
-                logger.debug(
-                    f"可测性分析提示词已格式化，文档长度: {len(processed_content)}"
-                )
-                messages = [
-                    SystemMessage(content="你是一位资深的测试专家。"),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            response = safe_llm_invoke(self.llm, messages)
-            result = extract_json_from_response(response.content)
-            if result:
-                logger.info(
-                    f"可测性分析完成，评分: {result.get('overall_score', 'N/A')}"
-                )
-                if image_warning:
-                    result["image_warning"] = image_warning
-                return result
-            else:
-                logger.warning("可测性分析未返回JSON格式，使用默认结果")
-                return self._get_default_analysis_result("testability_analysis")
-
-        except Exception as e:
-            logger.error(f"可测性分析失败: {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("testability_analysis")
+        return self._run_specialized_analysis("testability_analysis", content, document)
 
     def analyze_feasibility(
         self, content: str, document: RequirementDocument = None
     ) -> dict:
         """可行性专项分析 - 分析完整文档的可行性，支持多模态"""
-        logger.info("开始执行可行性分析...")
-        feasibility_prompt = self._get_user_prompt("feasibility_analysis")
-        if not feasibility_prompt:
-            logger.warning("用户未配置可行性分析提示词，返回默认结果")
-            return self._get_default_analysis_result("feasibility_analysis")
-
-        try:
-            # 准备分析内容（可能是纯文本或多模态）
-            processed_content, is_multimodal, image_warning = (
-                self._prepare_analysis_content(content, document)
-            )
-
-            if is_multimodal:
-                formatted_prompt = format_prompt_template(
-                    feasibility_prompt, document="[文档内容见上方图文]"
-                )
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的技术架构师，擅长分析包含图片的需求文档。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                formatted_prompt = format_prompt_template(
-                    feasibility_prompt, document=processed_content
-                )
-                messages = [
-                    SystemMessage(content="你是一位资深的技术架构师。"),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            response = safe_llm_invoke(self.llm, messages)
-            result = extract_json_from_response(response.content)
-            if result:
-                logger.info(
-                    f"可行性分析完成，评分: {result.get('overall_score', 'N/A')}"
-                )
-                if image_warning:
-                    result["image_warning"] = image_warning
-                return result
-            else:
-                logger.warning("可行性分析未返回JSON格式，使用默认结果")
-                return self._get_default_analysis_result("feasibility_analysis")
-
-        except Exception as e:
-            logger.error(f"可行性分析失败: {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("feasibility_analysis")
+        return self._run_specialized_analysis("feasibility_analysis", content, document)
 
     def analyze_clarity(
         self, content: str, document: RequirementDocument = None
     ) -> dict:
         """清晰度专项分析 - 分析完整文档的清晰度，支持多模态"""
-        logger.info("开始执行清晰度分析...")
-        clarity_prompt = self._get_user_prompt("clarity_analysis")
-        if not clarity_prompt:
-            logger.warning("用户未配置清晰度分析提示词，返回默认结果")
-            return self._get_default_analysis_result("clarity_analysis")
-
-        try:
-            # 准备分析内容（可能是纯文本或多模态）
-            processed_content, is_multimodal, image_warning = (
-                self._prepare_analysis_content(content, document)
-            )
-
-            if is_multimodal:
-                formatted_prompt = format_prompt_template(
-                    clarity_prompt, document="[文档内容见上方图文]"
-                )
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的需求分析专家，擅长分析包含图片的需求文档。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                formatted_prompt = format_prompt_template(
-                    clarity_prompt, document=processed_content
-                )
-                messages = [
-                    SystemMessage(content="你是一位资深的需求分析专家。"),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            response = safe_llm_invoke(self.llm, messages)
-            result = extract_json_from_response(response.content)
-            if result:
-                logger.info(
-                    f"清晰度分析完成，评分: {result.get('overall_score', 'N/A')}"
-                )
-                if image_warning:
-                    result["image_warning"] = image_warning
-                return result
-            else:
-                logger.warning("清晰度分析未返回JSON格式，使用默认结果")
-                return self._get_default_analysis_result("clarity_analysis")
-
-        except Exception as e:
-            logger.error(f"清晰度分析失败: {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("clarity_analysis")
+        return self._run_specialized_analysis("clarity_analysis", content, document)
 
     def _get_default_analysis_result(self, analysis_type: str) -> dict:
         """获取默认的分析结果"""
@@ -2979,68 +2342,7 @@ class RequirementReviewEngine:
 
     def analyze_logic(self, content: str, document: RequirementDocument = None) -> dict:
         """逻辑分析专项分析 - 分析完整文档的业务逻辑，支持多模态"""
-        logger.info("开始执行逻辑分析...")
-        logic_prompt = self._get_user_prompt("logic_analysis")
-        if not logic_prompt:
-            logger.warning("用户未配置逻辑分析提示词，返回默认结果")
-            return self._get_default_analysis_result("logic_analysis")
-
-        try:
-            # 准备分析内容（可能是纯文本或多模态）
-            processed_content, is_multimodal, image_warning = (
-                self._prepare_analysis_content(content, document)
-            )
-
-            if is_multimodal:
-                formatted_prompt = format_prompt_template(
-                    logic_prompt, document="[文档内容见上方图文]"
-                )
-                message_content = processed_content + [
-                    {"type": "text", "text": f"\n\n{formatted_prompt}"}
-                ]
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的需求分析专家，擅长分析业务流程逻辑、业务规则逻辑和状态转换逻辑。"
-                    ),
-                    HumanMessage(content=message_content),
-                ]
-            else:
-                formatted_prompt = format_prompt_template(
-                    logic_prompt, document=processed_content
-                )
-                logger.debug(
-                    f"逻辑分析提示词已格式化，文档长度: {len(processed_content)}"
-                )
-                messages = [
-                    SystemMessage(
-                        content="你是一位资深的需求分析专家，擅长分析业务流程逻辑、业务规则逻辑和状态转换逻辑。"
-                    ),
-                    HumanMessage(content=formatted_prompt),
-                ]
-
-            logger.info("调用LLM进行逻辑分析...")
-            response = safe_llm_invoke(self.llm, messages)
-            logger.info(f"LLM响应完成，内容长度: {len(response.content)}")
-
-            result = extract_json_from_response(response.content)
-            if result:
-                logger.info(
-                    f"逻辑分析完成，评分: {result.get('overall_score', 'N/A')}, 问题数: {len(result.get('issues', []))}"
-                )
-                if image_warning:
-                    result["image_warning"] = image_warning
-                return result
-            else:
-                logger.warning("逻辑分析未返回JSON格式，使用默认结果")
-                logger.debug(f"AI响应内容前500字符: {response.content[:500]}")
-                return self._get_default_analysis_result("logic_analysis")
-
-        except Exception as e:
-            logger.error(f"逻辑分析失败: {e}")
-            import traceback
-
-            logger.error(f"详细错误: {traceback.format_exc()}")
-            return self._get_default_analysis_result("logic_analysis")
+        return self._run_specialized_analysis("logic_analysis", content, document)
 
     def analyze_document_comprehensive(
         self, document: RequirementDocument, analysis_options: dict = None
@@ -3052,11 +2354,17 @@ class RequirementReviewEngine:
 
         Args:
             document: 要分析的文档
-            analysis_options: 分析选项，可包含max_workers控制并发数和progress_callback
+            analysis_options: 分析选项，可包含max_workers控制并发数和progress_callback；
+                增量评审时可传入 plan_incremental_analyses 的结果 incremental_plan
         """
         analysis_options = analysis_options or {}
+        incremental_plan = analysis_options.get("incremental_plan") or {}
+        reused_analyses = incremental_plan.get("reused", {})
+        partial_analyses = incremental_plan.get("partial", {})
         max_workers = analysis_options.get("max_workers", 3)  # 从选项中获取，默认3
         progress_callback = analysis_options.get("progress_callback")  # 进度回调函数
+        # 流式问题回调 (分析类型, 序号, 问题)
+        self._issue_callback = analysis_options.get("on_issue")
 
         try:
             logger.info(
@@ -3079,8 +2387,7 @@ class RequirementReviewEngine:
                     )
 
             # 使用线程池并发执行6个专项分析（每个都处理完整文档，充分利用200k上下文）
-            from concurrent.futures import ThreadPoolExecutor, as_completed
-            import threading
+            from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
             logger.info("开始并发执行6个专项分析...")
 
@@ -3105,21 +2412,66 @@ class RequirementReviewEngine:
             completed_count = 0
             progress_lock = threading.Lock()
 
+            # 章节与提示词均未变化的专项分析直接复用基线结果（不重复统计 token）
+            for name, baseline in reused_analyses.items():
+                results[name] = dict(copy.deepcopy(baseline), token_usage=None)
+                completed_count += 1
+                completed_steps.append(f"{analysis_tasks[name][0]}(复用)")
+            analysis_tasks = {
+                name: task for name, task in analysis_tasks.items() if name not in results
+            }
+
+            # 文档内容（含多模态图片）只准备一次，6个分析共用逐字节一致的文档前缀；
+            # 增量评审的部分分析只发送变化的章节
+            partial_content = incremental_plan.get("partial_content")
+            section_titles = {
+                key: self.section_title(text)
+                for key, text in self.split_sections(document.content)
+            }
+            changed_sections = incremental_plan.get("changed_sections") or []
+            full_content_needed = any(name not in partial_analyses for name in analysis_tasks)
+            if full_content_needed:
+                self._prepare_analysis_content(document.content, document)
+            warmup_seconds = analysis_options.get(
+                "prefix_warmup_seconds",
+                getattr(settings, "REQUIREMENT_REVIEW_PREFIX_WARMUP_SECONDS", 3),
+            )
+
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
                 # 提交所有任务 - 传递 document 而非 content
-                future_to_analysis = {
-                    executor.submit(task_func, document.content, document): (
-                        name,
-                        display_name,
+                future_to_analysis = {}
+                for index, (name, (display_name, task_func)) in enumerate(
+                    analysis_tasks.items()
+                ):
+                    content = (
+                        partial_content if name in partial_analyses else document.content
                     )
-                    for name, (display_name, task_func) in analysis_tasks.items()
-                }
+                    future = executor.submit(task_func, content, document)
+                    future_to_analysis[future] = (name, display_name)
+                    if index == 0 and warmup_seconds and warmup_seconds > 0:
+                        # 首个分析先行一小段时间，服务端完成文档前缀预填充并写入前缀缓存后，
+                        # 其余分析再并发提交，才能命中缓存
+                        wait([future], timeout=warmup_seconds)
 
                 # 收集结果
                 for future in as_completed(future_to_analysis):
                     analysis_name, display_name = future_to_analysis[future]
                     try:
                         result = future.result()
+                        if analysis_name in partial_analyses:
+                            self._assign_issue_sections(
+                                result,
+                                {key: section_titles[key] for key in changed_sections},
+                                changed_sections,
+                            )
+                            result = self._merge_partial_analysis(
+                                partial_analyses[analysis_name],
+                                result,
+                                incremental_plan["stale_sections"],
+                                incremental_plan["changed_ratio"],
+                            )
+                        else:
+                            self._assign_issue_sections(result, section_titles, [])
                         results[analysis_name] = result
                         # 收集图片警告（如果有）
                         if result.get("image_warning") and not image_warning:
@@ -3181,6 +2533,14 @@ class RequirementReviewEngine:
                 }
             )
 
+            token_usage = self._sum_token_usage(results.values())
+            comprehensive_report["token_usage"] = token_usage
+            logger.info(
+                f"专项分析token用量 - 输入: {token_usage['input_tokens']}, "
+                f"前缀缓存命中: {token_usage['cached_input_tokens']} ({token_usage['cache_hit_rate']:.0%}), "
+                f"输出: {token_usage['output_tokens']}"
+            )
+
             logger.info(
                 f"文档分析完成，总体评分: {comprehensive_report.get('overall_score', 0)}"
             )
@@ -3197,6 +2557,8 @@ class RequirementReviewEngine:
 
             logger.error(f"详细错误: {traceback.format_exc()}")
             raise
+        finally:
+            self._issue_callback = None
 
     def _generate_comprehensive_report_v2(self, analyses: dict) -> dict:
         """生成综合评审报告 - 新架构版本"""
@@ -3377,7 +2739,7 @@ class RequirementReviewEngine:
                 HumanMessage(content=formatted_prompt),
             ]
 
-            response = safe_llm_invoke(self.llm, messages)
+            response = safe_llm_invoke(self.llm, messages, use_cache=self.use_llm_cache)
 
             global_analysis = extract_json_from_response(response.content)
             if not global_analysis:
@@ -3396,63 +2758,444 @@ class RequirementReviewEngine:
             logger.error(f"全局结构分析失败: {e}")
             return self._get_default_global_analysis()
 
+    # 内置的模块分析/跨模块一致性提示词：用户未在提示词管理中配置 module_analysis 时使用
+    DEFAULT_MODULE_ANALYSIS_PROMPT = """请评审以下需求模块，并严格按 JSON 格式输出评审结果。
+
+模块ID: {module_id}
+模块名称: {module_title}
+全局业务流程: {business_flows}
+全局数据实体: {data_entities}
+全局业务规则: {global_rules}
+
+模块内容:
+{module_content}
+
+输出格式:
+{"module_name": "模块名称", "specification_score": 0-100, "clarity_score": 0-100,
+"completeness_score": 0-100, "consistency_score": 0-100, "feasibility_score": 0-100,
+"overall_score": 0-100,
+"issues": [{"title": "", "description": "", "priority": "high|medium|low", "type": "", "suggestion": "", "location": ""}],
+"strengths": [], "weaknesses": [], "recommendations": []}"""
+
+    DEFAULT_MODULE_CONSISTENCY_PROMPT = """以下是需求文档各模块的评审摘要，请检查模块之间的一致性（接口、数据、业务规则、流程衔接），并严格按 JSON 格式输出。
+
+全局上下文:
+{global_context}
+
+模块摘要:
+{module_analyses}
+
+输出格式:
+{"consistency_score": 0-100, "interface_consistency": 0-100, "data_consistency": 0-100,
+"business_rule_consistency": 0-100, "process_completeness": 0-100,
+"cross_module_issues": [{"title": "", "description": "", "priority": "high|medium|low", "type": "", "modules": []}],
+"missing_connections": [], "redundant_functions": [], "recommendations": []}"""
+
+    SPECIALIZED_ANALYSIS_TYPES = (
+        "completeness",
+        "consistency",
+        "testability",
+        "feasibility",
+        "clarity",
+        "logic",
+    )
+
+    def _get_model_signature(self) -> str:
+        """当前模型标识，模型或服务地址变化时指纹随之变化"""
+        if not self.llm_config:
+            return ""
+        return f"{self.llm_config.name}@{self.llm_config.api_url}"
+
+    @staticmethod
+    def _hash_parts(*parts) -> str:
+        return hashlib.sha256(
+            json.dumps(parts, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+
+    def _get_module_prompt(self) -> str:
+        """模块分析提示词：用户配置优先，否则使用内置模板"""
+        return (
+            self._get_user_prompt("module_analysis")
+            or self.DEFAULT_MODULE_ANALYSIS_PROMPT
+        )
+
+    def get_module_fingerprint(
+        self, module: RequirementModule, module_prompt: str = None
+    ) -> str:
+        """模块评审指纹：模块标题/内容 + 模块分析提示词 + 模型"""
+        return self._hash_parts(
+            self._get_model_signature(),
+            module_prompt or self._get_module_prompt(),
+            module.title,
+            module.content,
+        )
+
+    def get_document_fingerprint(self, document: RequirementDocument) -> str:
+        """专项分析指纹：文档内容 + 6 个专项分析提示词 + 模型"""
+        prompts = [
+            self._get_user_prompt(f"{name}_analysis") or ""
+            for name in self.SPECIALIZED_ANALYSIS_TYPES
+        ]
+        return self._hash_parts(
+            self._get_model_signature(), prompts, document.content or ""
+        )
+
+    SECTION_HEADING_PATTERN = re.compile(r"^#{1,6}[ \t]+\S.*$", re.MULTILINE)
+
+    @classmethod
+    def split_sections(cls, content: str) -> List[Tuple[str, str]]:
+        """按 Markdown 标题切分章节，返回 [(章节键, 章节原文)]；首个标题之前的内容记为「前言」"""
+        content = content or ""
+        starts = [match.start() for match in cls.SECTION_HEADING_PATTERN.finditer(content)]
+        if not starts or starts[0] > 0:
+            starts.insert(0, 0)
+
+        sections = []
+        title_counts: Dict[str, int] = {}
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < len(starts) else len(content)
+            text = content[start:end]
+            if not text.strip():
+                continue
+            title = cls.section_title(text)
+            title_counts[title] = title_counts.get(title, 0) + 1
+            key = title if title_counts[title] == 1 else f"{title}#{title_counts[title]}"
+            sections.append((key, text))
+        return sections
+
+    @staticmethod
+    def section_title(text: str) -> str:
+        """章节原文的标题（首行 Markdown 标题），首个标题之前的内容为「前言」"""
+        first_line = text.lstrip().split("\n", 1)[0]
+        return first_line.lstrip("#").strip() if first_line.startswith("#") else "前言"
+
+    @staticmethod
+    def _assign_issue_sections(analysis: dict, titles: Dict[str, str], default: List[str]) -> None:
+        """
+        为分析结果中的问题标注所属章节键（issue["sections"]），增量评审按章节键替换问题
+
+        按 location 中出现的最长章节标题定位；无法定位的问题记为 default
+        （完整分析为空列表，即文档级问题；部分分析为全部变化章节）。已标注的问题保持不变。
+        """
+        ordered = sorted(titles.items(), key=lambda item: len(item[1]), reverse=True)
+        for issue in analysis.get("issues") or []:
+            if not isinstance(issue, dict) or isinstance(issue.get("sections"), list):
+                continue
+            location = str(issue.get("location") or "")
+            key = next((key for key, title in ordered if title and title in location), None)
+            issue["sections"] = [key] if key else list(default)
+
+    def get_section_fingerprints(self, document: RequirementDocument) -> dict:
+        """
+        章节级指纹：各章节内容哈希（忽略空白差异）与各专项分析的 提示词+模型 哈希
+
+        专项分析按章节指纹复用：提示词只影响对应的那个专项分析，
+        内容修改只需重新分析改动过的章节。
+        """
+        sections = {}
+        for key, text in self.split_sections(document.content):
+            normalized = " ".join(text.split())
+            sections[key] = {
+                "hash": hashlib.sha256(normalized.encode("utf-8")).hexdigest(),
+                "size": len(normalized),
+                "title": self.section_title(text),
+            }
+        model_signature = self._get_model_signature()
+        analyses = {
+            name: self._hash_parts(
+                model_signature, self._get_user_prompt(f"{name}_analysis") or ""
+            )
+            for name in self.SPECIALIZED_ANALYSIS_TYPES
+        }
+        return {"sections": sections, "analyses": analyses}
+
+    def plan_incremental_analyses(
+        self,
+        document: RequirementDocument,
+        fingerprints: dict,
+        baseline_analyses: dict,
+        baseline_fingerprints: dict,
+    ) -> dict:
+        """
+        根据章节指纹规划专项分析的复用方式
+
+        - reused：章节与提示词均未变化，直接复用基线结果
+        - partial：提示词未变、变化章节占比不超过 REQUIREMENT_REVIEW_PARTIAL_MAX_RATIO，
+          只分析变化的章节，再与基线结果合并
+        - 其余专项分析完整执行
+        """
+        plan = {
+            "reused": {},
+            "partial": {},
+            "stale_sections": [],
+            "changed_sections": [],
+            "changed_ratio": 0.0,
+        }
+        baseline_sections = (baseline_fingerprints or {}).get("sections") or {}
+        baseline_prompts = (baseline_fingerprints or {}).get("analyses") or {}
+        if not baseline_sections or not baseline_analyses:
+            return plan
+
+        sections = fingerprints["sections"]
+        changed = [
+            key
+            for key, section in sections.items()
+            if (baseline_sections.get(key) or {}).get("hash") != section["hash"]
+        ]
+        removed = [key for key in baseline_sections if key not in sections]
+        total_size = sum(section["size"] for section in sections.values()) or 1
+        changed_ratio = sum(sections[key]["size"] for key in changed) / total_size
+        max_ratio = getattr(settings, "REQUIREMENT_REVIEW_PARTIAL_MAX_RATIO", 0.5)
+        baseline_titles = {
+            key: section.get("title", key) for key, section in baseline_sections.items()
+        }
+
+        for name in self.SPECIALIZED_ANALYSIS_TYPES:
+            baseline = baseline_analyses.get(f"{name}_analysis")
+            if not baseline or baseline_prompts.get(name) != fingerprints["analyses"][name]:
+                continue
+            # 早于章节键的基线问题按基线章节标题补标注
+            baseline = copy.deepcopy(baseline)
+            self._assign_issue_sections(baseline, baseline_titles, [])
+            if not changed:
+                # 只删除了章节：无需调用 LLM，去掉定位在已删除章节中的问题即可
+                plan["reused"][name] = (
+                    self._merge_partial_analysis(baseline, {}, removed, 0.0)
+                    if removed
+                    else baseline
+                )
+            elif changed_ratio <= max_ratio:
+                plan["partial"][name] = baseline
+
+        plan["stale_sections"] = changed + removed
+        plan["changed_sections"] = changed
+        plan["changed_ratio"] = changed_ratio
+        if plan["partial"]:
+            changed_text = "\n\n".join(
+                text for key, text in self.split_sections(document.content) if key in changed
+            )
+            unchanged = [key for key in sections if key not in changed]
+            plan["partial_content"] = (
+                "【增量评审】以下仅为自上次评审后修改或新增的章节，请只评审这些章节。"
+                f"未变化的章节（已评审）：{'、'.join(unchanged) or '无'}。"
+                f"已删除的章节：{'、'.join(removed) or '无'}。\n\n{changed_text}"
+            )
+        return plan
+
+    @staticmethod
+    def _merge_partial_analysis(
+        baseline: dict, partial: dict, stale_sections: List[str], changed_ratio: float
+    ) -> dict:
+        """合并基线结果与变化章节的分析结果：按章节键丢弃属于变化/删除章节的基线问题，评分按章节篇幅加权"""
+        stale = set(stale_sections)
+
+        def is_stale(issue) -> bool:
+            return bool(stale.intersection(issue.get("sections") or ()))
+
+        merged = copy.deepcopy(baseline)
+        merged["issues"] = [
+            issue
+            for issue in baseline.get("issues") or []
+            if isinstance(issue, dict) and not is_stale(issue)
+        ] + list(partial.get("issues") or [])
+
+        baseline_score = baseline.get("overall_score")
+        partial_score = partial.get("overall_score")
+        if isinstance(baseline_score, (int, float)) and isinstance(partial_score, (int, float)):
+            merged["overall_score"] = round(
+                baseline_score * (1 - changed_ratio) + partial_score * changed_ratio
+            )
+        for key, value in partial.items():
+            if isinstance(value, list) and key != "issues":
+                existing = merged.get(key) if isinstance(merged.get(key), list) else []
+                merged[key] = existing + [item for item in value if item not in existing]
+        merged["token_usage"] = partial.get("token_usage")
+        merged["incremental_sections"] = list(stale_sections)
+        return merged
+
+    def rebuild_comprehensive_report(
+        self, document: RequirementDocument, specialized_analyses: dict
+    ) -> dict:
+        """用已保存的专项分析结果重新生成综合报告（不调用 LLM）"""
+        analyses = {
+            name: copy.deepcopy(specialized_analyses.get(f"{name}_analysis", {}))
+            for name in self.SPECIALIZED_ANALYSIS_TYPES
+        }
+        image_warning = next(
+            (a.get("image_warning") for a in analyses.values() if a.get("image_warning")),
+            None,
+        )
+        analyses["document"] = document
+        analyses["image_warning"] = image_warning
+        return self._generate_comprehensive_report_v2(analyses)
+
+    def analyze_modules_map_reduce(
+        self, document: RequirementDocument, analysis_options: dict = None
+    ) -> dict:
+        """
+        模块级 map-reduce 评审
+
+        map：各模块并发分析，同时进行中的请求数受 module_concurrency 限制，
+        每个模块完成后立即回调 on_module_result（用于落库）；
+        reduce：跨模块一致性分析只读取各模块的精简摘要，不再携带模块原文。
+
+        Args:
+            document: 要分析的文档（需已拆分模块）
+            analysis_options: 分析选项，可包含
+                - module_concurrency: 模块分析并发数，默认取 REQUIREMENT_MODULE_REVIEW_CONCURRENCY
+                - completed_module_results: {module_id: 分析结果}，已完成的模块直接复用（断点续评）
+                - on_module_result: 单个模块完成时的回调 (module, analysis)
+                - progress_callback: 进度回调 (progress, current_step, completed_steps)
+        """
+        analysis_options = analysis_options or {}
+
+        global_context = self._get_default_global_analysis()
+        if self._get_user_prompt("global_analysis"):
+            global_context = self._analyze_global_structure(document)
+
+        module_analyses = self._analyze_modules_detailed(
+            document,
+            global_context,
+            max_workers=analysis_options.get("module_concurrency"),
+            completed_results=analysis_options.get("completed_module_results"),
+            on_module_result=analysis_options.get("on_module_result"),
+            progress_callback=analysis_options.get("progress_callback"),
+        )
+        consistency_analysis = self._analyze_cross_module_consistency(
+            document, module_analyses, global_context
+        )
+
+        return {
+            "global_analysis": global_context,
+            "module_analyses": module_analyses,
+            "consistency_analysis": consistency_analysis,
+        }
+
     def _analyze_modules_detailed(
-        self, document: RequirementDocument, global_context: dict
+        self,
+        document: RequirementDocument,
+        global_context: dict,
+        max_workers: int = None,
+        completed_results: Dict[str, dict] = None,
+        on_module_result=None,
+        progress_callback=None,
     ) -> List[dict]:
-        """详细分析各个模块"""
-        modules = document.modules.order_by("order")
-        module_analyses = []
+        """并发分析各个模块，返回按模块顺序排列的分析结果
 
-        for module in modules:
-            try:
-                analysis = self._analyze_single_module(module, global_context)
-                module_analyses.append(analysis)
-            except Exception as e:
-                logger.error(f"模块 {module.title} 分析失败: {e}")
-                # 添加默认分析结果
-                module_analyses.append(self._get_default_module_analysis(module))
+        分析失败的模块不会回调 on_module_result（不落库），全部模块处理完后抛出
+        ModuleReviewError，评审报告随之标记为失败；再次发起评审时只重试这些模块。
+        """
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        modules = list(document.modules.order_by("order"))
+        results: Dict[str, dict] = {
+            str(module_id): analysis
+            for module_id, analysis in (completed_results or {}).items()
+        }
+        pending = [module for module in modules if str(module.id) not in results]
+
+        if len(pending) < len(modules):
+            logger.info(
+                f"复用已完成的模块评审结果 {len(modules) - len(pending)} 个，待分析 {len(pending)} 个"
+            )
+
+        if pending:
+            max_workers = max_workers or getattr(
+                settings, "REQUIREMENT_MODULE_REVIEW_CONCURRENCY", 4
+            )
+            max_workers = max(1, min(int(max_workers), len(pending)))
+            # 提示词在主线程读取一次，工作线程只调用 LLM，不访问数据库
+            module_prompt = self._get_module_prompt()
+            completed_steps = []
+            failed_modules = []
 
-        return module_analyses
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                future_to_module = {
+                    executor.submit(
+                        self._analyze_single_module,
+                        module,
+                        global_context,
+                        module_prompt,
+                    ): module
+                    for module in pending
+                }
+
+                for future in as_completed(future_to_module):
+                    module = future_to_module[future]
+                    try:
+                        analysis = future.result()
+                    except Exception as e:
+                        logger.error(f"模块 {module.title} 分析失败: {e}")
+                        failed_modules.append(module.title)
+                        step = f"模块 {module.title} 分析失败"
+                    else:
+                        results[str(module.id)] = analysis
+                        if on_module_result:
+                            try:
+                                on_module_result(module, analysis)
+                            except Exception as e:
+                                logger.error(f"保存模块 {module.title} 评审结果失败: {e}")
+                        completed_steps.append(module.title)
+                        step = f"模块 {module.title} 分析完成"
+
+                    if progress_callback:
+                        progress_callback(
+                            (len(completed_steps) + len(failed_modules)) / len(pending),
+                            step,
+                            completed_steps.copy(),
+                        )
+
+            if failed_modules:
+                raise ModuleReviewError(failed_modules)
+
+        return [results[str(module.id)] for module in modules if str(module.id) in results]
 
     def _analyze_single_module(
-        self, module: RequirementModule, global_context: dict
+        self, module: RequirementModule, global_context: dict, module_prompt: str = None
     ) -> dict:
         """分析单个模块"""
 
-        module_prompt = self._get_user_prompt("module_analysis")
-        if not module_prompt:
-            raise ValueError("用户未配置模块分析提示词，请先在提示词管理中配置")
+        module_prompt = module_prompt or self._get_module_prompt()
 
-        try:
-            formatted_prompt = format_prompt_template(
-                module_prompt,
-                module_id=str(module.id),
-                module_title=module.title,
-                module_content=module.content[:3000],
-                business_flows=", ".join(global_context.get("business_flows", [])),
-                data_entities=", ".join(global_context.get("data_entities", [])),
-                global_rules=", ".join(global_context.get("global_rules", [])),
-            )
-            messages = [
-                SystemMessage(content="你是一位专业的需求分析师，正在进行需求评审。"),
-                HumanMessage(content=formatted_prompt),
-            ]
+        formatted_prompt = format_prompt_template(
+            module_prompt,
+            module_id=str(module.id),
+            module_title=module.title,
+            module_content=module.content[:3000],
+            business_flows=", ".join(global_context.get("business_flows", [])),
+            data_entities=", ".join(global_context.get("data_entities", [])),
+            global_rules=", ".join(global_context.get("global_rules", [])),
+        )
+        messages = [
+            SystemMessage(content="你是一位专业的需求分析师，正在进行需求评审。"),
+            HumanMessage(content=formatted_prompt),
+        ]
 
-            response = safe_llm_invoke(self.llm, messages)
+        # 调用或解析失败直接抛出，由调用方记录为失败模块，不以默认结果代替
+        response = safe_llm_invoke(self.llm, messages, use_cache=self.use_llm_cache)
 
-            analysis = extract_json_from_response(response.content)
-            if analysis:
-                analysis["module_id"] = str(module.id)
-                return analysis
-            else:
-                return self._get_default_module_analysis(module)
+        analysis = extract_json_from_response(response.content)
+        if not analysis:
+            raise ValueError(f"模块 {module.title} 的分析结果无法解析为 JSON")
+        analysis["module_id"] = str(module.id)
+        analysis.setdefault("module_name", module.title)
+        return analysis
 
-        except json.JSONDecodeError as e:
-            logger.error(f"解析模块分析JSON失败: {e}")
-            return self._get_default_module_analysis(module)
-        except Exception as e:
-            logger.error(f"模块分析失败: {e}")
-            return self._get_default_module_analysis(module)
+    def _summarize_module_analysis(self, analysis: dict) -> dict:
+        """提取模块分析的精简摘要，供跨模块一致性分析使用"""
+        issues = analysis.get("issues") or []
+        return {
+            "module_id": analysis.get("module_id"),
+            "module_name": analysis.get("module_name"),
+            "overall_score": analysis.get("overall_score"),
+            "consistency_score": analysis.get("consistency_score"),
+            "issues": [
+                {"title": issue.get("title"), "priority": issue.get("priority")}
+                for issue in issues[:5]
+                if isinstance(issue, dict)
+            ],
+            "weaknesses": (analysis.get("weaknesses") or [])[:3],
+        }
 
     def _analyze_cross_module_consistency(
         self,
@@ -3460,20 +3203,17 @@ class RequirementReviewEngine:
         module_analyses: List[dict],
         global_context: dict,
     ) -> dict:
-        """分析跨模块一致性"""
-
-        consistency_prompt = self._get_user_prompt("consistency_analysis")
-        if not consistency_prompt:
-            raise ValueError("用户未配置一致性分析提示词，请先在提示词管理中配置")
+        """分析跨模块一致性（reduce：只读取模块摘要）"""
 
         try:
-            context_str = json.dumps(global_context, ensure_ascii=False, indent=2)
-            analyses_str = json.dumps(module_analyses, ensure_ascii=False, indent=2)
+            context_str = json.dumps(global_context, ensure_ascii=False)
+            summaries = [self._summarize_module_analysis(m) for m in module_analyses]
+            analyses_str = json.dumps(summaries, ensure_ascii=False)
 
             formatted_prompt = format_prompt_template(
-                consistency_prompt,
+                self.DEFAULT_MODULE_CONSISTENCY_PROMPT,
                 global_context=context_str[:2000],
-                module_analyses=analyses_str[:4000],
+                module_analyses=analyses_str[:8000],
             )
             messages = [
                 SystemMessage(
@@ -3482,7 +3222,7 @@ class RequirementReviewEngine:
                 HumanMessage(content=formatted_prompt),
             ]
 
-            response = safe_llm_invoke(self.llm, messages)
+            response = safe_llm_invoke(self.llm, messages, use_cache=self.use_llm_cache)
 
             consistency_analysis = extract_json_from_response(response.content)
             if not consistency_analysis:
@@ -3671,23 +3411,6 @@ class RequirementReviewEngine:
             "weaknesses": ["需要更详细的需求描述"],
         }
 
-    def _get_default_module_analysis(self, module: RequirementModule) -> dict:
-        """获取默认的模块分析结果"""
-        return {
-            "module_id": str(module.id),
-            "module_name": module.title,
-            "specification_score": 70,
-            "clarity_score": 70,
-            "completeness_score": 70,
-            "consistency_score": 70,
-            "feasibility_score": 70,
-            "overall_score": 70,
-            "issues": [],
-            "strengths": ["模块功能基本清晰"],
-            "weaknesses": ["需要更详细的描述"],
-            "recommendations": ["补充详细的功能说明"],
-        }
-
     def _get_default_consistency_analysis(self) -> dict:
         """获取默认的一致性分析结果"""
         return {
@@ -3714,7 +3437,7 @@ class RequirementReviewService:
         self, document: RequirementDocument, analysis_options: dict = None
     ) -> "ReviewReport":
         """启动直接评审（不拆分模块）"""
-        from .models import ReviewReport, ReviewIssue
+        from .models import ReviewReport
 
         try:
             # 检查文档内容
@@ -3733,9 +3456,27 @@ class RequirementReviewService:
             document.status = "reviewing"
             document.save()
 
-            # 对整个文档进行评审
+            if analysis_options and "use_llm_cache" in analysis_options:
+                self.review_engine.use_llm_cache = analysis_options["use_llm_cache"]
+
+            progress_reporter = ProgressReporter("review", document.id)
+            progress_reporter.update(
+                status="in_progress",
+                report_id=str(review_report.id),
+                progress=0,
+                current_step="直接评审",
+            )
+
+            # 对整个文档进行评审（问题流式落库并推送）
+            direct_options = dict(analysis_options or {})
+            direct_options["on_issue"] = self._issue_streamer(
+                progress_reporter,
+                lambda issue_data: self._create_direct_review_issue(
+                    review_report, issue_data
+                ),
+            )
             review_result = self.review_engine.analyze_document_directly(
-                document.content, analysis_options or {}
+                document.content, direct_options
             )
 
             # 更新评审报告
@@ -3753,22 +3494,11 @@ class RequirementReviewService:
             review_report.status = "completed"
             review_report.save()
 
-            # 创建问题记录
+            # 以完整结果为准同步问题记录（流式阶段已落库的问题原地更新，保留 ID）
             issues = review_result.get("issues", [])
-            for issue_data in issues:
-                # 映射字段名
-                issue_params = {
-                    "report": review_report,
-                    "title": issue_data.get("title", "未知问题"),
-                    "description": issue_data.get("description", ""),
-                    "priority": issue_data.get("priority", "medium"),
-                    "issue_type": issue_data.get(
-                        "category", "specification"
-                    ),  # category -> issue_type
-                    "suggestion": issue_data.get("suggestion", ""),
-                    "location": issue_data.get("location", ""),
-                }
-                ReviewIssue.objects.create(**issue_params)
+            self._sync_review_issues(
+                review_report, issues, self._direct_review_issue_fields
+            )
 
             # 更新统计信息
             review_report.total_issues = len(issues)
@@ -3781,6 +3511,10 @@ class RequirementReviewService:
             document.status = "review_completed"
             document.save()
 
+            progress_reporter.finish(
+                "completed", progress=1.0, overall_score=review_report.completion_score
+            )
+
             logger.info(f"文档 {document.id} 直接评审完成")
             return review_report
 
@@ -3789,28 +3523,125 @@ class RequirementReviewService:
             if "review_report" in locals():
                 review_report.status = "failed"
                 review_report.save()
+            if "progress_reporter" in locals():
+                progress_reporter.finish("failed", error=str(e))
             raise
 
+    @staticmethod
+    def _direct_review_issue_fields(issue_data: dict) -> dict:
+        """直接评审问题记录的字段"""
+        return {
+            "title": issue_data.get("title", "未知问题"),
+            "description": issue_data.get("description", ""),
+            "priority": issue_data.get("priority", "medium"),
+            "issue_type": issue_data.get("category", "specification"),  # category -> issue_type
+            "suggestion": issue_data.get("suggestion", ""),
+            "location": issue_data.get("location", ""),
+        }
+
+    def _create_direct_review_issue(self, review_report: "ReviewReport", issue_data: dict):
+        """创建直接评审的问题记录"""
+        from .models import ReviewIssue
+
+        return ReviewIssue.objects.create(
+            report=review_report, **self._direct_review_issue_fields(issue_data)
+        )
+
+    def _sync_review_issues(self, review_report: "ReviewReport", issues: list, build_fields):
+        """
+        以完整分析结果为准同步报告的问题记录
+
+        按 (问题类型, 标题, 描述) 对应流式阶段已落库的记录：对应上的原地更新（保留已推送给前端的 ID），
+        新出现的批量创建，不再出现的（包括续评前残留的记录）删除。
+        """
+        from .models import ReviewIssue
+
+        existing: Dict[tuple, list] = {}
+        for issue in review_report.issues.all():
+            key = (issue.issue_type, issue.title, issue.description)
+            existing.setdefault(key, []).append(issue)
+
+        new_issues = []
+        for issue_data in issues:
+            try:
+                fields = build_fields(issue_data)
+            except Exception as e:
+                logger.error(f"创建问题记录失败: {e}")
+                continue
+            matches = existing.get((fields["issue_type"], fields["title"], fields["description"]))
+            if not matches:
+                new_issues.append(ReviewIssue(report=review_report, **fields))
+                continue
+            issue = matches.pop(0)
+            changed = [name for name, value in fields.items() if getattr(issue, name) != value]
+            if changed:
+                for name in changed:
+                    setattr(issue, name, fields[name])
+                issue.save(update_fields=changed)
+
+        stale_ids = [issue.id for matches in existing.values() for issue in matches]
+        if stale_ids:
+            ReviewIssue.objects.filter(id__in=stale_ids).delete()
+        ReviewIssue.objects.bulk_create(new_issues)
+
+    def _issue_streamer(self, progress_reporter: ProgressReporter, create_issue):
+        """
+        构造流式问题回调：LLM 输出中每闭合一个问题对象就立即落库，并把已发现的问题推送给进度订阅者
+
+        评审结束时以完整分析结果为准同步问题记录（见 _sync_review_issues），已推送的问题 ID 保持有效。
+        """
+        streamed = []
+        lock = threading.Lock()
+
+        def on_issue(issue_data: dict):
+            try:
+                issue = create_issue(issue_data)
+            except Exception as e:
+                logger.warning(f"流式问题落库失败: {e}")
+                return
+            if issue is None:
+                return
+            with lock:
+                streamed.append(
+                    {
+                        "id": str(issue.id),
+                        "title": issue.title,
+                        "priority": issue.priority,
+                        "issue_type": issue.issue_type,
+                    }
+                )
+                summaries = list(streamed)
+            progress_reporter.update(
+                streamed_issues=summaries, streamed_issue_count=len(summaries)
+            )
+
+        return on_issue
+
     def start_comprehensive_review(
         self, document: RequirementDocument, analysis_options: dict = None
     ) -> "ReviewReport":
         """启动全面的需求评审（基于模块）"""
-        from .models import ReviewReport, ReviewIssue, ModuleReviewResult
+        from .models import ReviewReport
 
         try:
             # 检查文档状态（允许 ready_for_review 或 reviewing 状态）
             if document.status not in ["ready_for_review", "reviewing"]:
                 raise ValueError(f"文档状态 {document.status} 不允许开始评审")
 
-            # 创建评审报告
-            review_report = ReviewReport.objects.create(
-                document=document,
-                status="in_progress",
-                reviewer="AI需求评审助手",
-                review_type="comprehensive",  # 标记为全面评审
-                progress=0,
-                current_step="初始化",
-            )
+            # 上次评审中断（进程崩溃/任务失败）时复用其报告，已落库的模块结果不再重新分析
+            review_report = self._get_resumable_report(document)
+            if review_report:
+                logger.info(f"恢复未完成的评审报告: {review_report.id}")
+            else:
+                # 创建评审报告
+                review_report = ReviewReport.objects.create(
+                    document=document,
+                    status="in_progress",
+                    reviewer="AI需求评审助手",
+                    review_type="comprehensive",  # 标记为全面评审
+                    progress=0,
+                    current_step="初始化",
+                )
 
             # 确保文档状态为 reviewing
             if document.status != "reviewing":
@@ -3819,56 +3650,229 @@ class RequirementReviewService:
 
             logger.info(f"开始评审文档: {document.title}")
 
+            # 进度实时推送给订阅者，评审报告只在粗粒度检查点落库
+            def save_progress_checkpoint(state: dict):
+                review_report.progress = state.get("progress", review_report.progress)
+                review_report.current_step = state.get(
+                    "current_step", review_report.current_step
+                )
+                review_report.completed_steps = state.get(
+                    "completed_steps", review_report.completed_steps
+                )
+                review_report.save(
+                    update_fields=[
+                        "progress",
+                        "current_step",
+                        "completed_steps",
+                        "updated_at",
+                    ]
+                )
+
+            progress_reporter = ProgressReporter(
+                "review", document.id, checkpoint=save_progress_checkpoint
+            )
+            progress_reporter.update(
+                status="in_progress",
+                report_id=str(review_report.id),
+                progress=review_report.progress,
+                current_step=review_report.current_step,
+            )
+
             # 定义进度回调函数
             def progress_callback(
                 progress: float, current_step: str, completed_steps: list
             ):
                 """更新评审进度"""
-                try:
-                    review_report.progress = progress
-                    review_report.current_step = current_step
-                    review_report.completed_steps = completed_steps
-                    review_report.save(
-                        update_fields=[
-                            "progress",
-                            "current_step",
-                            "completed_steps",
-                            "updated_at",
-                        ]
-                    )
-                    logger.debug(f"进度更新: {progress} - {current_step}")
-                except Exception as e:
-                    logger.warning(f"进度更新失败: {e}")
+                progress_reporter.update(
+                    progress=progress,
+                    current_step=current_step,
+                    completed_steps=completed_steps,
+                )
+                logger.debug(f"进度更新: {progress} - {current_step}")
 
             # 创建新的分析选项字典（避免修改原始参数）
             local_analysis_options = dict(analysis_options or {})
-            local_analysis_options["progress_callback"] = progress_callback
+            engine = self.review_engine
+            if "use_llm_cache" in local_analysis_options:
+                # 单次评审可绕过 LLM 响应缓存（如用户要求强制重新评审）
+                engine.use_llm_cache = local_analysis_options["use_llm_cache"]
+
+            # 增量评审：以最近一次完成的全面评审为基线，指纹未变的模块/专项分析直接复用
+            baseline_report = None
+            if local_analysis_options.get("incremental"):
+                baseline_report = (
+                    ReviewReport.objects.filter(
+                        document=document,
+                        review_type="comprehensive",
+                        status="completed",
+                    )
+                    .exclude(id=review_report.id)
+                    .order_by("-review_date")
+                    .first()
+                )
+                logger.info(
+                    f"增量评审基线报告: {baseline_report.id if baseline_report else '无'}"
+                )
+
+            # 模块级 map-reduce 评审：每个模块完成即落库，中断后可从已落库结果继续
+            module_result = None
+            module_review_enabled = local_analysis_options.get(
+                "module_review",
+                getattr(settings, "REQUIREMENT_MODULE_REVIEW_ENABLED", False),
+            )
+            if module_review_enabled and document.modules.exists():
+                module_prompt = engine._get_module_prompt()
+                fingerprints = {
+                    str(module.id): engine.get_module_fingerprint(module, module_prompt)
+                    for module in document.modules.all()
+                }
+                completed_module_results = {}
+                if baseline_report:
+                    completed_module_results.update(
+                        self._reuse_module_results(
+                            baseline_report, review_report, fingerprints
+                        )
+                    )
+                completed_module_results.update(
+                    self._load_module_results(review_report, fingerprints)
+                )
 
-            # 执行AI分析
-            analysis_result = self.review_engine.analyze_document_comprehensive(
-                document, local_analysis_options
+                module_weight = 0.3
+                module_result = engine.analyze_modules_map_reduce(
+                    document,
+                    {
+                        "module_concurrency": local_analysis_options.get(
+                            "module_concurrency"
+                        ),
+                        "completed_module_results": completed_module_results,
+                        "on_module_result": lambda module, analysis: self._save_module_result(
+                            review_report,
+                            module,
+                            analysis,
+                            content_hash=fingerprints.get(str(module.id), ""),
+                        ),
+                        "progress_callback": lambda progress, step, steps: progress_callback(
+                            progress * module_weight, step, steps
+                        ),
+                    },
+                )
+                local_analysis_options["progress_callback"] = (
+                    lambda progress, step, steps: progress_callback(
+                        module_weight + progress * (1 - module_weight), step, steps
+                    )
+                )
+            else:
+                local_analysis_options["progress_callback"] = progress_callback
+
+            # 专项分析：按章节指纹复用基线结果，只重新分析变化的章节（见 plan_incremental_analyses）
+            document_hash = engine.get_document_fingerprint(document)
+            section_fingerprints = engine.get_section_fingerprints(document)
+            incremental_plan = None
+            if baseline_report and baseline_report.specialized_analyses:
+                if baseline_report.section_fingerprints:
+                    incremental_plan = engine.plan_incremental_analyses(
+                        document,
+                        section_fingerprints,
+                        baseline_report.specialized_analyses,
+                        baseline_report.section_fingerprints,
+                    )
+                elif baseline_report.content_hash == document_hash:
+                    # 早于章节指纹的基线报告：只能整体复用
+                    incremental_plan = {
+                        "reused": {
+                            name: baseline_report.specialized_analyses.get(f"{name}_analysis", {})
+                            for name in engine.SPECIALIZED_ANALYSIS_TYPES
+                        },
+                        "stale_sections": [],
+                    }
+            reuse_specialized = bool(
+                incremental_plan
+                and len(incremental_plan["reused"]) == len(engine.SPECIALIZED_ANALYSIS_TYPES)
+                and not incremental_plan["stale_sections"]
             )
+            if incremental_plan and not reuse_specialized:
+                logger.info(
+                    f"增量专项分析：复用 {len(incremental_plan['reused'])} 个，"
+                    f"仅分析变化章节 {len(incremental_plan.get('partial', {}))} 个，"
+                    f"变化章节: {incremental_plan['stale_sections']}"
+                )
+                local_analysis_options["incremental_plan"] = incremental_plan
+            if reuse_specialized:
+                logger.info("文档内容与专项分析提示词未变化，复用基线专项分析结果")
+                analysis_result = engine.rebuild_comprehensive_report(
+                    document, baseline_report.specialized_analyses
+                )
+                local_analysis_options["progress_callback"](
+                    1.0, "复用专项分析结果", []
+                )
+            else:
+                # 执行AI分析：专项分析的问题边生成边落库
+                stream_issue = self._issue_streamer(
+                    progress_reporter,
+                    lambda issue_data: self._create_review_issue(
+                        review_report, issue_data
+                    ),
+                )
+                local_analysis_options["on_issue"] = (
+                    lambda analysis_type, index, issue: stream_issue(
+                        self._normalize_specialized_issue(analysis_type, issue)
+                    )
+                )
+                analysis_result = engine.analyze_document_comprehensive(
+                    document, local_analysis_options
+                )
 
             # 清理回调引用，避免序列化问题
             del local_analysis_options["progress_callback"]
+            local_analysis_options.pop("on_issue", None)
+            local_analysis_options.pop("incremental_plan", None)
+
+            if module_result:
+                analysis_result["module_analyses"] = module_result["module_analyses"]
+                analysis_result.setdefault("specialized_analyses", {})[
+                    "module_consistency_analysis"
+                ] = module_result["consistency_analysis"]
 
             # 更新评审报告
+            review_report.content_hash = document_hash
+            review_report.section_fingerprints = section_fingerprints
             self._update_review_report(review_report, analysis_result)
 
-            # 创建问题记录
-            self._create_review_issues(review_report, analysis_result)
+            # 同步问题记录（流式阶段已落库的问题保留 ID，续评前残留且不再出现的问题被删除）
+            if reuse_specialized:
+                # 复用基线时没有流式落库的问题，只可能有续评前的残留
+                review_report.issues.all().delete()
+                self._copy_review_issues(baseline_report, review_report)
+            else:
+                self._create_review_issues(review_report, analysis_result)
+                if incremental_plan:
+                    self._carry_over_resolutions(baseline_report, review_report)
 
             # 创建模块评审结果
             self._create_module_results(review_report, analysis_result)
 
-            # 完成评审
+            # 完成评审（最后几次进度可能未到检查点，随最终状态一并保存）
             review_report.status = "completed"
+            review_report.progress = 1.0
+            review_report.current_step = progress_reporter.state.get(
+                "current_step", review_report.current_step
+            )
+            review_report.completed_steps = progress_reporter.state.get(
+                "completed_steps", review_report.completed_steps
+            )
             review_report.save()
 
             # 更新文档状态
             document.status = "review_completed"
             document.save()
 
+            progress_reporter.checkpoint = None
+            progress_reporter.finish(
+                "completed",
+                progress=1.0,
+                overall_score=review_report.completion_score,
+            )
+
             logger.info(
                 f"评审完成: {document.title}, 总体评分: {review_report.completion_score}"
             )
@@ -3886,6 +3890,11 @@ class RequirementReviewService:
             document.status = "failed"
             document.save()
 
+            if "progress_reporter" in locals():
+                # 评审报告已整体保存，终态事件不再单独落库
+                progress_reporter.checkpoint = None
+                progress_reporter.finish("failed", error=str(e))
+
             raise
 
     def _update_review_report(
@@ -3938,82 +3947,277 @@ class RequirementReviewService:
     def _create_review_issues(
         self, review_report: "ReviewReport", analysis_result: dict
     ):
-        """创建评审问题记录"""
-        from .models import ReviewIssue
+        """创建评审问题记录（与流式阶段已落库的问题同步）"""
+        self._sync_review_issues(
+            review_report,
+            analysis_result.get("issues", []),
+            lambda issue_data: self._review_issue_fields(review_report, issue_data),
+        )
 
-        issues = analysis_result.get("issues", [])
+    def _review_issue_fields(self, review_report: "ReviewReport", issue_data: dict) -> dict:
+        """全面评审问题记录的字段"""
+        # 查找相关模块
+        module_id = None
+        if issue_data.get("module_name"):
+            module_id = (
+                review_report.document.modules.filter(
+                    title__icontains=issue_data["module_name"]
+                )
+                .values_list("id", flat=True)
+                .first()
+            )
 
-        for issue_data in issues:
-            try:
-                # 查找相关模块
-                module = None
-                if issue_data.get("module_name"):
-                    module = review_report.document.modules.filter(
-                        title__icontains=issue_data["module_name"]
-                    ).first()
+        return {
+            "module_id": module_id,
+            # 映射问题类型
+            "issue_type": self._map_issue_type(issue_data.get("type", "clarity")),
+            "priority": issue_data.get("priority", "medium"),
+            "title": issue_data.get("title", "未知问题"),
+            "description": issue_data.get("description", ""),
+            "suggestion": issue_data.get("suggestion", ""),
+            "location": issue_data.get("location", ""),
+            "section": issue_data.get("module_name", ""),
+        }
 
-                # 映射问题类型
-                issue_type = self._map_issue_type(issue_data.get("type", "clarity"))
+    def _create_review_issue(self, review_report: "ReviewReport", issue_data: dict):
+        """创建单条评审问题记录，失败时返回 None"""
+        from .models import ReviewIssue
 
-                ReviewIssue.objects.create(
-                    report=review_report,
-                    module=module,
-                    issue_type=issue_type,
-                    priority=issue_data.get("priority", "medium"),
-                    title=issue_data.get("title", "未知问题"),
-                    description=issue_data.get("description", ""),
-                    suggestion=issue_data.get("suggestion", ""),
-                    location=issue_data.get("location", ""),
-                    section=issue_data.get("module_name", ""),
-                )
+        try:
+            return ReviewIssue.objects.create(
+                report=review_report, **self._review_issue_fields(review_report, issue_data)
+            )
 
-            except Exception as e:
-                logger.error(f"创建问题记录失败: {e}")
+        except Exception as e:
+            logger.error(f"创建问题记录失败: {e}")
+            return None
+
+    @staticmethod
+    def _normalize_specialized_issue(analysis_type: str, issue: dict) -> dict:
+        """与综合报告汇总问题时的处理保持一致：标注来源，severity 统一映射为 priority"""
+        source = analysis_type.replace("_analysis", "")
+        issue_data = dict(issue, source=source, analysis_type=source)
+        if "severity" in issue_data and "priority" not in issue_data:
+            issue_data["priority"] = issue_data["severity"]
+        return issue_data
 
     def _create_module_results(
         self, review_report: "ReviewReport", analysis_result: dict
     ):
         """创建模块评审结果"""
-        from .models import ModuleReviewResult
-
         module_analyses = analysis_result.get("module_analyses", [])
+        saved_module_ids = set(
+            str(module_id)
+            for module_id in review_report.module_results.values_list(
+                "module_id", flat=True
+            )
+        )
 
         for module_analysis in module_analyses:
             try:
-                # 查找模块
+                # 查找模块（评审过程中已落库的模块跳过）
                 module_id = module_analysis.get("module_id")
-                if not module_id:
+                if not module_id or str(module_id) in saved_module_ids:
                     continue
 
                 module = review_report.document.modules.filter(id=module_id).first()
                 if not module:
                     continue
 
-                # 计算严重程度评分（分数越高问题越严重）
-                overall_score = module_analysis.get("overall_score", 70)
-                severity_score = max(0, 100 - overall_score)
+                self._save_module_result(review_report, module, module_analysis)
+
+            except Exception as e:
+                logger.error(f"创建模块结果失败: {e}")
+
+    def _save_module_result(
+        self,
+        review_report: "ReviewReport",
+        module: RequirementModule,
+        module_analysis: dict,
+        content_hash: str = "",
+    ) -> "ModuleReviewResult":
+        """保存单个模块的评审结果（同一报告同一模块只保留一条）"""
+        from .models import ModuleReviewResult
+
+        # 计算严重程度评分（分数越高问题越严重）
+        overall_score = module_analysis.get("overall_score", 70)
+        severity_score = max(0, 100 - overall_score)
+
+        # 映射评级
+        module_rating = self._map_module_rating(overall_score)
+
+        module_result, _ = ModuleReviewResult.objects.update_or_create(
+            report=review_report,
+            module=module,
+            defaults={
+                "module_rating": module_rating,
+                "issues_count": len(module_analysis.get("issues", [])),
+                "severity_score": severity_score,
+                "analysis_content": json.dumps(
+                    module_analysis, ensure_ascii=False, indent=2
+                ),
+                "strengths": "\n".join(module_analysis.get("strengths", [])),
+                "weaknesses": "\n".join(module_analysis.get("weaknesses", [])),
+                "recommendations": "\n".join(
+                    module_analysis.get("recommendations", [])
+                ),
+                "content_hash": content_hash,
+            },
+        )
+        return module_result
+
+    def _load_module_results(
+        self, review_report: "ReviewReport", fingerprints: Dict[str, str]
+    ) -> Dict[str, dict]:
+        """读取报告中已落库且指纹仍然有效的模块评审结果，返回 {module_id: 分析结果}"""
+        completed = {}
+        for module_result in review_report.module_results.all():
+            if fingerprints.get(str(module_result.module_id)) != module_result.content_hash:
+                continue
+            try:
+                analysis = json.loads(module_result.analysis_content)
+            except (TypeError, ValueError):
+                continue
+            analysis["module_id"] = str(module_result.module_id)
+            completed[str(module_result.module_id)] = analysis
+        return completed
+
+    def _reuse_module_results(
+        self,
+        baseline_report: "ReviewReport",
+        review_report: "ReviewReport",
+        fingerprints: Dict[str, str],
+    ) -> Dict[str, dict]:
+        """把基线报告中指纹未变的模块结果复制到当前报告，返回 {module_id: 分析结果}"""
+        from .models import ModuleReviewResult
+
+        existing = set(
+            str(module_id)
+            for module_id in review_report.module_results.values_list(
+                "module_id", flat=True
+            )
+        )
+        reused = {}
+        copies = []
+        for module_result in baseline_report.module_results.all():
+            module_id = str(module_result.module_id)
+            if (
+                module_id in existing
+                or not module_result.content_hash
+                or fingerprints.get(module_id) != module_result.content_hash
+            ):
+                continue
+            try:
+                analysis = json.loads(module_result.analysis_content)
+            except (TypeError, ValueError):
+                continue
+            analysis["module_id"] = module_id
+            reused[module_id] = analysis
+            copies.append(
+                ModuleReviewResult(
+                    report=review_report,
+                    module_id=module_result.module_id,
+                    module_rating=module_result.module_rating,
+                    issues_count=module_result.issues_count,
+                    severity_score=module_result.severity_score,
+                    analysis_content=module_result.analysis_content,
+                    strengths=module_result.strengths,
+                    weaknesses=module_result.weaknesses,
+                    recommendations=module_result.recommendations,
+                    content_hash=module_result.content_hash,
+                )
+            )
+
+        ModuleReviewResult.objects.bulk_create(copies)
+        logger.info(f"增量评审复用模块结果 {len(copies)} 个，共 {len(fingerprints)} 个模块")
+        return reused
 
-                # 映射评级
-                module_rating = self._map_module_rating(overall_score)
+    def _copy_review_issues(
+        self, baseline_report: "ReviewReport", review_report: "ReviewReport"
+    ):
+        """复制基线报告的问题记录（保留解决状态）"""
+        from .models import ReviewIssue
 
-                ModuleReviewResult.objects.create(
+        ReviewIssue.objects.bulk_create(
+            [
+                ReviewIssue(
                     report=review_report,
-                    module=module,
-                    module_rating=module_rating,
-                    issues_count=len(module_analysis.get("issues", [])),
-                    severity_score=severity_score,
-                    analysis_content=json.dumps(
-                        module_analysis, ensure_ascii=False, indent=2
-                    ),
-                    strengths="\n".join(module_analysis.get("strengths", [])),
-                    weaknesses="\n".join(module_analysis.get("weaknesses", [])),
-                    recommendations="\n".join(
-                        module_analysis.get("recommendations", [])
-                    ),
+                    module_id=issue.module_id,
+                    issue_type=issue.issue_type,
+                    priority=issue.priority,
+                    title=issue.title,
+                    description=issue.description,
+                    suggestion=issue.suggestion,
+                    location=issue.location,
+                    page_number=issue.page_number,
+                    section=issue.section,
+                    is_resolved=issue.is_resolved,
+                    resolution_note=issue.resolution_note,
                 )
+                for issue in baseline_report.issues.all()
+            ]
+        )
 
-            except Exception as e:
-                logger.error(f"创建模块结果失败: {e}")
+    def _carry_over_resolutions(
+        self, baseline_report: "ReviewReport", review_report: "ReviewReport"
+    ):
+        """基线中已解决的问题在增量评审中被沿用时，保留其解决状态"""
+        resolved = {
+            (issue.title, issue.description): issue.resolution_note
+            for issue in baseline_report.issues.filter(is_resolved=True)
+        }
+        if not resolved:
+            return
+        for issue in review_report.issues.all():
+            key = (issue.title, issue.description)
+            if key in resolved:
+                issue.is_resolved = True
+                issue.resolution_note = resolved[key]
+                issue.save(update_fields=["is_resolved", "resolution_note"])
+
+    def _get_resumable_report(
+        self, document: RequirementDocument
+    ) -> Optional["ReviewReport"]:
+        """
+        认领可续评的报告：最近一次全面评审已有模块结果落库，且评审失败，
+        或仍为评审中但已超过 REQUIREMENT_REVIEW_STALE_SECONDS 未更新（执行进程已退出）。
+
+        正常运行的评审每次写入进度检查点都会刷新 updated_at，不会被其他 worker 接管；
+        认领用带原状态与 updated_at 条件的 UPDATE 完成，并发续评时只有一个 worker 成功。
+        """
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ReviewReport
+
+        latest = (
+            ReviewReport.objects.filter(document=document, review_type="comprehensive")
+            .order_by("-review_date")
+            .first()
+        )
+        if not latest or not latest.module_results.exists():
+            return None
+
+        stale_before = timezone.now() - timedelta(
+            seconds=getattr(settings, "REQUIREMENT_REVIEW_STALE_SECONDS", 1800)
+        )
+        if not (
+            latest.status == "failed"
+            or (latest.status == "in_progress" and latest.updated_at < stale_before)
+        ):
+            return None
+
+        claimed = ReviewReport.objects.filter(
+            id=latest.id, status=latest.status, updated_at=latest.updated_at
+        ).update(
+            status="in_progress",
+            progress=0,
+            current_step="恢复评审",
+            updated_at=timezone.now(),
+        )
+        if not claimed:
+            return None
+        latest.refresh_from_db()
+        return latest
 
     def _map_issue_type(self, ai_type: str) -> str:
         """映射AI分析的问题类型到数据库字段"""
@@ -4047,10 +4251,7 @@ class RequirementReviewService:
             return "poor"
 
     def get_review_progress(self, document: RequirementDocument) -> dict:
-        """获取评审进度（模拟实现）"""
-        # 这里可以实现真实的进度跟踪
-        # 目前返回模拟数据
-
+        """获取评审进度：优先取进度总线的最新推送状态，其次为报告中的检查点"""
         latest_review = document.review_reports.order_by("-review_date").first()
         if not latest_review:
             return {"status": "not_started", "progress": 0, "message": "尚未开始评审"}
@@ -4063,12 +4264,18 @@ class RequirementReviewService:
                 "report_id": str(latest_review.id),
             }
         elif latest_review.status == "in_progress":
+            progress = latest_review.progress
+            current_step = latest_review.current_step
+            snapshot = get_snapshot(job_topic("review", document.id))
+            if snapshot and snapshot.get("report_id") == str(latest_review.id):
+                progress = snapshot.get("progress", progress)
+                current_step = snapshot.get("current_step", current_step)
             return {
                 "status": "in_progress",
-                "progress": 75,  # 模拟进度
+                "progress": round((progress or 0) * 100),
                 "message": "正在进行评审分析...",
-                "current_step": "分析模块一致性",
-                "estimated_remaining": "2分钟",
+                "current_step": current_step,
+                "report_id": str(latest_review.id),
             }
         else:
             return {"status": "failed", "progress": 0, "message": "评审失败，请重试"}
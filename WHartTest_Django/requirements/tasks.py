@@ -85,4 +85,28 @@ def execute_requirement_review(self, document_id, analysis_options=None, review_
         return {
             'status': 'error',
             'message': str(e)
-        }
\ No newline at end of file
+        }
+
+@shared_task(name='requirements.export_review_report')
+def export_review_report(job_id):
+    """
+    异步导出评审报告
+
+    Args:
+        job_id: 导出任务ID，参数（report_id、format）保存在任务记录中
+    """
+    from wharttest_django.export_jobs import export_jobs
+
+    record = export_jobs.run(job_id, build_review_report_export)
+    return {'job_id': job_id, 'status': record['status'] if record else 'failed'}
+
+
+def build_review_report_export(record, reporter):
+    """按任务记录生成评审报告导出文件，返回 (bytes, filename, content_type)"""
+    from .export_service import ReportExportService
+    from .models import ReviewReport
+
+    params = record['params']
+    report = ReviewReport.objects.select_related('document').get(id=params['report_id'])
+    reporter.update(progress=0.1, stage='rendering')
+    return ReportExportService.render(report, params['format'])
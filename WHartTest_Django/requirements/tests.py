@@ -1,22 +1,42 @@
+import json
 import os
 import tempfile
+import threading
 import time
+from datetime import timedelta
 from unittest.mock import MagicMock, patch
 
 from django.contrib.auth.models import Permission, User
+from django.core.cache import caches
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, override_settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from rest_framework.test import APIClient
 
 from api_keys.models import APIKey
 from projects.models import Project, ProjectMember
 
 from .docx_editor_client import DocxEditorClientError, create_docx_editor_session
-from .models import DocumentImage, RequirementDocument, RequirementModule, ReviewReport
-from .services import DocumentProcessor
+from .models import (
+    DocumentImage,
+    ModuleReviewResult,
+    RequirementDocument,
+    RequirementModule,
+    ReviewIssue,
+    ReviewReport,
+)
+from . import llm_cache
+from .services import (
+    DocumentProcessor,
+    ModuleReviewError,
+    RequirementReviewEngine,
+    RequirementReviewService,
+    safe_llm_invoke,
+)
 
 
 class DocxEditorSessionActionTests(TestCase):
@@ -425,6 +445,171 @@ class DocumentProcessorImageCleanupTests(TestCase):
         )
 
 
+@override_settings(DOCUMENT_PARSE_WORKERS=0)
+class SharedDocumentParsingTests(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.override_media = override_settings(
+            MEDIA_ROOT=self.temp_dir.name,
+            DOCUMENT_PARSE_CACHE_DIR=os.path.join(self.temp_dir.name, "parse_cache"),
+        )
+        self.override_media.enable()
+        self.addCleanup(self.override_media.disable)
+
+        self.user = User.objects.create_user(username="parser", password="password123")
+        self.project = Project.objects.create(name="Parse Project", creator=self.user)
+
+    def _build_docx(self) -> bytes:
+        import io
+
+        from docx import Document
+        from PIL import Image
+
+        image_buffer = io.BytesIO()
+        Image.new("RGB", (4, 3), "red").save(image_buffer, format="PNG")
+        image_buffer.seek(0)
+
+        doc = Document()
+        doc.add_heading("用户登录", level=1)
+        doc.add_paragraph("用户输入账号密码登录系统。")
+        doc.add_picture(image_buffer)
+        table = doc.add_table(rows=2, cols=2)
+        table.cell(0, 0).text = "字段"
+        table.cell(0, 1).text = "说明"
+        table.cell(1, 0).text = "账号"
+        table.cell(1, 1).text = "手机号|邮箱"
+        output = io.BytesIO()
+        doc.save(output)
+        return output.getvalue()
+
+    def _create_document(self, data: bytes) -> RequirementDocument:
+        return RequirementDocument.objects.create(
+            project=self.project,
+            title="Parse Requirement",
+            document_type="docx",
+            uploader=self.user,
+            file=SimpleUploadedFile("login.docx", data),
+        )
+
+    def test_docx_extraction_keeps_structure_and_saves_images(self):
+        document = self._create_document(self._build_docx())
+
+        content = DocumentProcessor().extract_content(document, force_file=True)
+        document.refresh_from_db()
+
+        self.assertIn("# 用户登录", content)
+        self.assertIn("![图片](docimg://img_000)", content)
+        self.assertIn("账号 | 手机号\\|邮箱", content)
+        self.assertTrue(document.has_images)
+        image = document.images.get()
+        self.assertEqual(image.image_id, "img_000")
+        self.assertEqual((image.width, image.height), (4, 3))
+
+    def test_reupload_of_same_file_hits_parse_cache(self):
+        from wharttest_django import document_parsing
+
+        data = self._build_docx()
+        first = self._create_document(data)
+        second = self._create_document(data)
+        processor = DocumentProcessor()
+
+        with patch.object(
+            document_parsing,
+            "parse_bytes_in_process",
+            wraps=document_parsing.parse_bytes_in_process,
+        ) as parse:
+            first_content = processor.extract_content(first, force_file=True)
+            second_content = processor.extract_content(second, force_file=True)
+
+        parse.assert_called_once()
+        self.assertEqual(first_content, second_content)
+        # 命中缓存时图片同样从缓存恢复并入库
+        self.assertEqual(second.images.count(), 1)
+        self.assertEqual(
+            second.images.get().image_file.read(), first.images.get().image_file.read()
+        )
+
+    def test_knowledge_plain_content_strips_image_placeholders(self):
+        from wharttest_django.document_parsing import document_parser
+
+        parsed = document_parser.parse(self._build_docx(), "docx")
+
+        self.assertIn("docimg://", parsed.markdown)
+        self.assertNotIn("docimg://", parsed.markdown_without_images())
+        self.assertIn("用户输入账号密码登录系统。", parsed.markdown_without_images())
+
+    @override_settings(DOCUMENT_PARSE_TIMEOUT=10)
+    def test_parse_timeout_drains_other_parses_before_recycling_pool(self):
+        from concurrent.futures import Future
+
+        from wharttest_django.document_parsing import DocumentParseError, DocumentParsingService
+
+        class FakeExecutor:
+            def __init__(self):
+                self._processes = {1: MagicMock()}
+                self.futures = []
+                self.closed = threading.Event()
+
+            def submit(self, fn, *args):
+                self.futures.append(Future())
+                return self.futures[-1]
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                self.closed.set()
+
+        service = DocumentParsingService()
+        executor = service._executor = FakeExecutor()
+        results = []
+        with patch.object(DocumentParsingService, "_can_use_pool", return_value=True):
+            other = threading.Thread(target=lambda: results.append(service._run(b"a", "pdf")))
+            other.start()
+            while not executor.futures:
+                time.sleep(0.01)
+            with override_settings(DOCUMENT_PARSE_TIMEOUT=1), self.assertRaises(DocumentParseError):
+                service._run(b"b", "pdf")
+
+            # 新的解析改用新进程池，旧进程池中仍在进行的解析不受影响
+            self.assertIsNone(service._executor)
+            self.assertFalse(executor.closed.is_set())
+            executor.futures[0].set_result("parsed")
+            other.join(timeout=1)
+
+        self.assertEqual(results, ["parsed"])
+        self.assertTrue(executor.closed.wait(timeout=5))
+        executor._processes[1].terminate.assert_called_once()
+
+    @override_settings(DOCUMENT_PARSE_WORKERS=2)
+    def test_daemon_process_parses_in_subprocess_with_timeout(self):
+        from wharttest_django.document_parsing import DocumentParseError, DocumentParsingService
+
+        service = DocumentParsingService()
+        with patch.object(DocumentParsingService, "_can_use_pool", return_value=False):
+            parsed = service._run(self._build_docx(), "docx")
+            self.assertIn("用户输入账号密码登录系统。", parsed.markdown)
+
+            with self.assertRaises(DocumentParseError):
+                service._run(b"text", "txt")
+            with override_settings(DOCUMENT_PARSE_TIMEOUT=0.01), self.assertRaises(DocumentParseError) as ctx:
+                service._run(self._build_docx(), "docx")
+            self.assertIn("超时", str(ctx.exception))
+
+    def test_cache_pruning_is_throttled(self):
+        from wharttest_django.document_parsing import DocumentParsingService
+
+        service = DocumentParsingService()
+        with override_settings(DOCUMENT_PARSE_CACHE_MAX_BYTES=1000), patch.object(
+            DocumentParsingService, "_prune_cache"
+        ) as prune:
+            service._maybe_prune_cache(10)
+            service._maybe_prune_cache(10)
+            self.assertEqual(prune.call_count, 1)
+
+            # 新写入超过上限的 1/10 时提前淘汰
+            service._maybe_prune_cache(100)
+            self.assertEqual(prune.call_count, 2)
+
+
 class RequirementDocumentImageAccessTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -487,3 +672,1046 @@ class RequirementDocumentImageAccessTests(TestCase):
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(b"".join(response.streaming_content), b"new")
+
+
+class _SlowModuleLLM:
+    """模拟耗时的 LLM 调用，记录并发峰值与收到的提示词"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        prompt = messages[-1].content
+        with self._lock:
+            self.prompts.append(prompt)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if "模块摘要" in prompt:
+            payload = {"consistency_score": 88, "cross_module_issues": []}
+        else:
+            payload = {"overall_score": 80, "issues": [{"title": "缺少异常流程", "priority": "high"}]}
+        return MagicMock(content=json.dumps(payload, ensure_ascii=False))
+
+
+class _FailingModuleLLM(_SlowModuleLLM):
+    """指定模块返回无法解析的内容，模拟单个模块分析失败"""
+
+    def __init__(self, failing_marker):
+        super().__init__(delay=0)
+        self.failing_marker = failing_marker
+
+    def invoke(self, messages):
+        response = super().invoke(messages)
+        if self.failing_marker and self.failing_marker in messages[-1].content:
+            return MagicMock(content="服务繁忙，请稍后再试")
+        return response
+
+
+@override_settings(REQUIREMENT_MODULE_REVIEW_ENABLED=True)
+@patch.object(RequirementReviewEngine, "_get_llm_instance", lambda self: None)
+class ModuleMapReduceReviewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reviewer", password="password123")
+        self.project = Project.objects.create(name="Review Project", creator=self.user)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Module Requirement",
+            document_type="txt",
+            uploader=self.user,
+            content="全文",
+            status="ready_for_review",
+        )
+        self.modules = [
+            RequirementModule.objects.create(
+                document=self.document,
+                title=f"模块{index}",
+                content=f"模块{index}原文-" + "x" * 50,
+                order=index,
+            )
+            for index in range(4)
+        ]
+
+    @override_settings(REQUIREMENT_MODULE_REVIEW_CONCURRENCY=2)
+    def test_modules_run_concurrently_and_reduce_reads_summaries(self):
+        engine = RequirementReviewEngine(user=self.user)
+        engine.llm = _SlowModuleLLM(delay=0.1)
+        saved = []
+
+        started = time.monotonic()
+        result = engine.analyze_modules_map_reduce(
+            self.document,
+            {"on_module_result": lambda module, analysis: saved.append(module.id)},
+        )
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(engine.llm.max_in_flight, 2)
+        # 4 个模块、并发 2：两轮 map + 一次 reduce，远小于串行的 5 轮
+        self.assertLess(elapsed, 0.45)
+        self.assertCountEqual(saved, [module.id for module in self.modules])
+        self.assertEqual(
+            [analysis["module_id"] for analysis in result["module_analyses"]],
+            [str(module.id) for module in self.modules],
+        )
+        self.assertEqual(result["consistency_analysis"]["consistency_score"], 88)
+
+        reduce_prompt = engine.llm.prompts[-1]
+        self.assertIn("缺少异常流程", reduce_prompt)
+        self.assertNotIn("模块0原文", reduce_prompt)
+
+    def test_comprehensive_review_resumes_from_persisted_module_results(self):
+        service = RequirementReviewService(user=self.user)
+        service.review_engine.llm = _SlowModuleLLM(delay=0)
+
+        interrupted = ReviewReport.objects.create(
+            document=self.document, status="failed", review_type="comprehensive"
+        )
+        for module in self.modules[:3]:
+            service._save_module_result(
+                interrupted,
+                module,
+                {"module_id": str(module.id), "overall_score": 90},
+                content_hash=service.review_engine.get_module_fingerprint(module),
+            )
+
+        specialized = {"overall_score": 75, "issues": [], "specialized_analyses": {}}
+        with patch.object(
+            RequirementReviewEngine,
+            "analyze_document_comprehensive",
+            return_value=specialized,
+        ):
+            report = service.start_comprehensive_review(self.document)
+
+        self.assertEqual(report.id, interrupted.id)
+        self.assertEqual(report.status, "completed")
+        # 只剩 1 个模块需要分析，另加一次跨模块一致性分析
+        self.assertEqual(len(service.review_engine.llm.prompts), 2)
+        self.assertIn("模块3原文", service.review_engine.llm.prompts[0])
+        self.assertEqual(ModuleReviewResult.objects.filter(report=report).count(), 4)
+        self.assertEqual(
+            report.specialized_analyses["module_consistency_analysis"]["consistency_score"],
+            88,
+        )
+
+    def test_failed_module_is_not_saved_and_retried_on_resume(self):
+        service = RequirementReviewService(user=self.user)
+        service.review_engine.llm = _FailingModuleLLM("模块3原文")
+        specialized = {"overall_score": 75, "issues": [], "specialized_analyses": {}}
+
+        with self.assertRaises(ModuleReviewError):
+            service.start_comprehensive_review(self.document)
+
+        failed = ReviewReport.objects.get(document=self.document)
+        self.assertEqual(failed.status, "failed")
+        self.assertFalse(failed.module_results.filter(module=self.modules[3]).exists())
+        self.assertEqual(failed.module_results.count(), 3)
+
+        self.document.status = "ready_for_review"
+        self.document.save()
+        service.review_engine.llm = _FailingModuleLLM(None)
+        with patch.object(
+            RequirementReviewEngine,
+            "analyze_document_comprehensive",
+            return_value=specialized,
+        ):
+            report = service.start_comprehensive_review(self.document)
+
+        self.assertEqual(report.id, failed.id)
+        self.assertEqual(report.status, "completed")
+        self.assertIn("模块3原文", service.review_engine.llm.prompts[0])
+        self.assertEqual(len(service.review_engine.llm.prompts), 2)
+        self.assertEqual(report.module_results.count(), 4)
+
+    def test_running_report_is_only_resumed_after_heartbeat_goes_stale(self):
+        service = RequirementReviewService(user=self.user)
+        running = ReviewReport.objects.create(
+            document=self.document, status="in_progress", review_type="comprehensive"
+        )
+        service._save_module_result(
+            running, self.modules[0], {"module_id": str(self.modules[0].id)}
+        )
+
+        self.assertIsNone(service._get_resumable_report(self.document))
+
+        ReviewReport.objects.filter(id=running.id).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(service._get_resumable_report(self.document).id, running.id)
+        # 已被认领（updated_at 刷新），其他 worker 不能再次接管
+        self.assertIsNone(service._get_resumable_report(self.document))
+
+    def test_incremental_review_only_reanalyzes_changed_modules(self):
+        service = RequirementReviewService(user=self.user)
+        engine = service.review_engine
+        engine.llm = _SlowModuleLLM(delay=0)
+
+        baseline = ReviewReport.objects.create(
+            document=self.document,
+            status="completed",
+            review_type="comprehensive",
+            content_hash=engine.get_document_fingerprint(self.document),
+            specialized_analyses={
+                "completeness_analysis": {"overall_score": 60, "issues": []},
+                "logic_analysis": {"overall_score": 90, "issues": []},
+            },
+        )
+        baseline.issues.create(
+            issue_type="logic", priority="high", title="流程缺失", description="d", is_resolved=True
+        )
+        for module in self.modules:
+            service._save_module_result(
+                baseline,
+                module,
+                {"module_id": str(module.id), "overall_score": 90},
+                content_hash=engine.get_module_fingerprint(module),
+            )
+
+        changed = self.modules[2]
+        changed.content = "模块2修改后的原文"
+        changed.save()
+
+        with patch.object(
+            RequirementReviewEngine, "analyze_document_comprehensive"
+        ) as specialized:
+            report = service.start_comprehensive_review(
+                self.document, {"incremental": True}
+            )
+
+        specialized.assert_not_called()
+        self.assertNotEqual(report.id, baseline.id)
+        # 仅修改过的模块 + 跨模块一致性
+        self.assertEqual(len(engine.llm.prompts), 2)
+        self.assertIn("模块2修改后的原文", engine.llm.prompts[0])
+        self.assertEqual(report.module_results.count(), 4)
+        self.assertEqual(
+            report.module_results.get(module=changed).content_hash,
+            engine.get_module_fingerprint(changed),
+        )
+        self.assertEqual(report.completeness_score, 60)
+        self.assertEqual(report.content_hash, baseline.content_hash)
+        self.assertEqual(
+            list(report.issues.values_list("title", "is_resolved")), [("流程缺失", True)]
+        )
+
+
+class _SectionRecordingEngine:
+    """替代 _run_specialized_analysis：记录每个专项分析收到的内容"""
+
+    def __init__(self):
+        self.contents = {}
+
+    def __call__(self, analysis_type, content, document=None):
+        self.contents[analysis_type] = content
+        return {
+            "overall_score": 50,
+            "issues": [{"title": f"{analysis_type}新问题", "location": "支付", "priority": "high"}],
+        }
+
+
+@patch.object(RequirementReviewEngine, "_get_llm_instance", lambda self: None)
+class SectionIncrementalReviewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="section-reviewer", password="password123")
+        self.project = Project.objects.create(name="Section Project", creator=self.user)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Section Requirement",
+            document_type="md",
+            uploader=self.user,
+            content="# 登录\n" + "登录规则 " * 40 + "\n# 支付\n支付规则\n",
+            status="ready_for_review",
+        )
+
+    def _baseline(self, service):
+        engine = service.review_engine
+        analysis = {
+            "overall_score": 90,
+            "issues": [
+                {"title": "登录锁定缺失", "location": "登录", "priority": "high"},
+                {"title": "支付超时未定义", "location": "支付", "priority": "medium"},
+            ],
+        }
+        baseline = ReviewReport.objects.create(
+            document=self.document,
+            status="completed",
+            review_type="comprehensive",
+            content_hash=engine.get_document_fingerprint(self.document),
+            section_fingerprints=engine.get_section_fingerprints(self.document),
+            specialized_analyses={
+                f"{name}_analysis": analysis for name in engine.SPECIALIZED_ANALYSIS_TYPES
+            },
+        )
+        baseline.issues.create(
+            issue_type="logic", priority="high", title="登录锁定缺失", description="", is_resolved=True
+        )
+        return baseline
+
+    def test_split_sections_keys_sections_by_heading(self):
+        sections = RequirementReviewEngine.split_sections("前置说明\n# 登录\na\n## 登录\nb\n")
+
+        self.assertEqual([key for key, _text in sections], ["前言", "登录", "登录#2"])
+
+    def test_whitespace_only_change_reuses_all_analyses(self):
+        service = RequirementReviewService(user=self.user)
+        baseline = self._baseline(service)
+        self.document.content = self.document.content.replace("\n", "  \r\n")
+        self.document.save()
+
+        with patch.object(RequirementReviewEngine, "analyze_document_comprehensive") as specialized:
+            report = service.start_comprehensive_review(self.document, {"incremental": True})
+
+        specialized.assert_not_called()
+        self.assertNotEqual(report.id, baseline.id)
+        self.assertEqual(report.issues.count(), 1)
+
+    def test_changed_section_is_reanalyzed_alone_and_merged(self):
+        service = RequirementReviewService(user=self.user)
+        self._baseline(service)
+        self.document.content = self.document.content.replace("支付规则", "支付规则：30 分钟未支付自动取消")
+        self.document.save()
+        recorder = _SectionRecordingEngine()
+
+        with patch.object(RequirementReviewEngine, "_run_specialized_analysis", recorder):
+            report = service.start_comprehensive_review(
+                self.document, {"incremental": True, "prefix_warmup_seconds": 0}
+            )
+
+        self.assertEqual(len(recorder.contents), 6)
+        for content in recorder.contents.values():
+            self.assertIn("30 分钟未支付自动取消", content)
+            self.assertNotIn("登录规则", content)
+
+        completeness = report.specialized_analyses["completeness_analysis"]
+        titles = [issue["title"] for issue in completeness["issues"]]
+        # 未变化章节（登录）的问题保留，变化章节（支付）的旧问题被新结果替换
+        self.assertEqual(titles, ["登录锁定缺失", "completeness_analysis新问题"])
+        self.assertLess(completeness["overall_score"], 90)
+        self.assertGreater(completeness["overall_score"], 50)
+        carried = report.issues.filter(title="登录锁定缺失")
+        self.assertTrue(carried.exists())
+        self.assertTrue(all(issue.is_resolved for issue in carried))
+
+
+    def test_issues_are_replaced_by_section_key(self):
+        service = RequirementReviewService(user=self.user)
+        engine = service.review_engine
+        self.document.content = "# 登录\n" + "登录规则 " * 40 + "\n# C# 接口\n接口规则\n"
+        self.document.save()
+        analysis = {
+            "overall_score": 90,
+            "issues": [
+                {"title": "登录锁定缺失", "location": "登录"},
+                {"title": "文档级问题", "location": ""},
+                {"title": "上次增量问题", "location": "某处", "sections": ["C# 接口"]},
+            ],
+        }
+        ReviewReport.objects.create(
+            document=self.document,
+            status="completed",
+            review_type="comprehensive",
+            content_hash=engine.get_document_fingerprint(self.document),
+            section_fingerprints=engine.get_section_fingerprints(self.document),
+            specialized_analyses={
+                f"{name}_analysis": analysis for name in engine.SPECIALIZED_ANALYSIS_TYPES
+            },
+        )
+        self.document.content = self.document.content.replace("接口规则", "接口规则：超时 3 秒")
+        self.document.save()
+
+        with patch.object(RequirementReviewEngine, "_run_specialized_analysis", _SectionRecordingEngine()):
+            report = service.start_comprehensive_review(
+                self.document, {"incremental": True, "prefix_warmup_seconds": 0}
+            )
+
+        issues = report.specialized_analyses["logic_analysis"]["issues"]
+        self.assertEqual(
+            [(issue["title"], issue["sections"]) for issue in issues],
+            [
+                ("登录锁定缺失", ["登录"]),
+                ("文档级问题", []),
+                # 新问题的 location 无法对应章节标题，归到本次唯一变化的章节
+                ("logic_analysis新问题", ["C# 接口"]),
+            ],
+        )
+
+    def test_final_issues_update_streamed_rows_in_place(self):
+        service = RequirementReviewService(user=self.user)
+        report = ReviewReport.objects.create(
+            document=self.document, status="in_progress", review_type="comprehensive"
+        )
+        streamed = service._create_review_issue(
+            report, {"type": "logic", "title": "登录锁定缺失", "priority": "medium"}
+        )
+        stale = report.issues.create(issue_type="clarity", title="续评前残留", description="")
+
+        service._create_review_issues(
+            report,
+            {
+                "issues": [
+                    {"type": "logic", "title": "登录锁定缺失", "priority": "high", "module_name": "登录"},
+                    {"type": "completeness", "title": "支付超时未定义"},
+                ]
+            },
+        )
+
+        # 已推送给前端的问题 ID 保持不变，不再出现的问题被删除
+        streamed.refresh_from_db()
+        self.assertEqual(streamed.priority, "high")
+        self.assertEqual(streamed.section, "登录")
+        self.assertFalse(report.issues.filter(id=stale.id).exists())
+        self.assertEqual(
+            sorted(report.issues.values_list("title", flat=True)), ["支付超时未定义", "登录锁定缺失"]
+        )
+
+
+class StartReviewOptionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username="review-admin", password="password123")
+        self.project = Project.objects.create(name="Options Project", creator=self.user)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Options Requirement",
+            document_type="txt",
+            uploader=self.user,
+            content="内容",
+            status="ready_for_review",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("requirement-documents-start-review", kwargs={"pk": self.document.id})
+
+    def test_form_false_values_are_parsed_as_false(self):
+        with patch("requirements.tasks.execute_requirement_review.delay") as delay:
+            delay.return_value = MagicMock(id="task-1")
+            response = self.client.post(
+                self.url, {"incremental": "false", "direct_review": "false"}, format="multipart"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        analysis_options, review_type = delay.call_args.args[1:3]
+        self.assertFalse(analysis_options["incremental"])
+        self.assertEqual(review_type, "comprehensive")
+        self.assertNotIn("use_llm_cache", analysis_options)
+
+    def test_use_llm_cache_false_string_disables_cache(self):
+        with patch("requirements.tasks.execute_requirement_review.delay") as delay:
+            delay.return_value = MagicMock(id="task-1")
+            response = self.client.post(self.url, {"use_llm_cache": "false"}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIs(delay.call_args.args[1]["use_llm_cache"], False)
+
+
+class _CountingLLM:
+    model_name = "deepseek-chat"
+    openai_api_base = "https://llm.example.com/v1"
+
+    def __init__(self, temperature=0.1):
+        self.temperature = temperature
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"第{self.calls}次响应")
+
+
+class _PrefixRecordingLLM:
+    """记录每次调用的消息，并返回带前缀缓存用量的响应"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def invoke(self, messages):
+        with self._lock:
+            self.calls.append(messages)
+            first_call = len(self.calls) == 1
+        return AIMessage(
+            content=json.dumps({"overall_score": 80, "issues": []}),
+            usage_metadata={
+                "input_tokens": 1000,
+                "output_tokens": 50,
+                "total_tokens": 1050,
+                "input_token_details": {"cache_read": 0 if first_call else 900},
+            },
+        )
+
+
+@patch.object(RequirementReviewEngine, "_get_llm_instance", lambda self: None)
+class PrefixCacheFriendlyReviewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="prefix", password="password123")
+        self.project = Project.objects.create(name="Prefix Project", creator=self.user)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Prefix Requirement",
+            document_type="txt",
+            uploader=self.user,
+            content="用户登录需求全文。" * 200,
+            status="reviewing",
+        )
+
+    def test_specialized_analyses_share_byte_identical_document_prefix(self):
+        engine = RequirementReviewEngine(user=self.user)
+        engine.llm = _PrefixRecordingLLM()
+
+        with patch.object(
+            RequirementReviewEngine,
+            "_get_user_prompt",
+            lambda self, prompt_type: f"请进行{prompt_type}，文档：{{document}}，输出JSON",
+        ):
+            report = engine.analyze_document_comprehensive(
+                self.document, {"prefix_warmup_seconds": 0}
+            )
+
+        self.assertEqual(len(engine.llm.calls), 6)
+        system_prompts = {messages[0].content for messages in engine.llm.calls}
+        self.assertEqual(len(system_prompts), 1)
+
+        human_contents = [messages[1].content for messages in engine.llm.calls]
+        prefix = (
+            RequirementReviewEngine.DOCUMENT_CONTEXT_HEADER
+            + self.document.content
+            + RequirementReviewEngine.DOCUMENT_CONTEXT_FOOTER
+        )
+        for content in human_contents:
+            self.assertTrue(content.startswith(prefix))
+            # 分析要求追加在文档之后，模板中的 {document} 不再内嵌全文
+            self.assertEqual(content.count(self.document.content), 1)
+        self.assertEqual(len({content[len(prefix):] for content in human_contents}), 6)
+
+        self.assertEqual(
+            report["token_usage"],
+            {
+                "input_tokens": 6000,
+                "output_tokens": 300,
+                "cached_input_tokens": 4500,
+                "cache_hit_rate": 0.75,
+            },
+        )
+        self.assertEqual(
+            report["specialized_analyses"]["logic_analysis"]["token_usage"]["input_tokens"],
+            1000,
+        )
+
+    def test_llm_cache_hits_are_not_counted_as_billed_usage(self):
+        response = AIMessage(
+            content="{}",
+            usage_metadata={"input_tokens": 10, "output_tokens": 1, "total_tokens": 11},
+            response_metadata={"from_llm_cache": True},
+        )
+
+        usage = RequirementReviewEngine._extract_token_usage(response)
+
+        self.assertEqual(usage["input_tokens"], 0)
+        self.assertTrue(usage["from_llm_cache"])
+
+    def test_deepseek_style_cache_hit_tokens_are_read_from_raw_usage(self):
+        response = AIMessage(
+            content="{}",
+            usage_metadata={"input_tokens": 100, "output_tokens": 5, "total_tokens": 105},
+            response_metadata={"token_usage": {"prompt_cache_hit_tokens": 64}},
+        )
+
+        self.assertEqual(
+            RequirementReviewEngine._extract_token_usage(response)["cached_input_tokens"], 64
+        )
+
+
+@override_settings(LLM_RESPONSE_CACHE_ENABLED=True)
+class LLMResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["llm_responses"].clear()
+        self.messages = [SystemMessage(content="评审专家"), HumanMessage(content="评审文档")]
+
+    def test_repeated_prompt_is_served_from_cache(self):
+        llm = _CountingLLM()
+
+        first = safe_llm_invoke(llm, self.messages)
+        second = safe_llm_invoke(llm, list(self.messages))
+
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(second.content, first.content)
+        stats = llm_cache.get_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_cache_key_varies_with_model_settings_and_can_be_bypassed(self):
+        llm = _CountingLLM()
+        safe_llm_invoke(llm, self.messages)
+
+        safe_llm_invoke(llm, self.messages, use_cache=False)
+        self.assertEqual(llm.calls, 2)
+
+        other_temperature = _CountingLLM(temperature=0.2)
+        safe_llm_invoke(other_temperature, self.messages)
+        self.assertEqual(other_temperature.calls, 1)
+
+        hot = _CountingLLM(temperature=0.9)
+        safe_llm_invoke(hot, self.messages)
+        safe_llm_invoke(hot, self.messages)
+        self.assertEqual(hot.calls, 2)
+
+    @override_settings(LLM_RESPONSE_CACHE_ENABLED=False)
+    def test_cache_is_opt_in(self):
+        llm = _CountingLLM()
+        safe_llm_invoke(llm, self.messages)
+        safe_llm_invoke(llm, self.messages)
+        self.assertEqual(llm.calls, 2)
+
+        safe_llm_invoke(llm, self.messages, use_cache=True)
+        safe_llm_invoke(llm, self.messages, use_cache=True)
+        self.assertEqual(llm.calls, 3)
+
+
+class _RecordingChannelLayer:
+    def __init__(self):
+        self.sent = []
+
+    async def group_send(self, group, message):
+        self.sent.append((group, message))
+
+
+@override_settings(PROGRESS_EVENT_MIN_INTERVAL_MS=100)
+class ProgressBusTests(SimpleTestCase):
+    def setUp(self):
+        from wharttest_django.progress import ProgressBus
+
+        self.bus = ProgressBus()
+        self.layer = _RecordingChannelLayer()
+        patcher = patch("channels.layers.get_channel_layer", return_value=self.layer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wait_for_final(self, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.layer.sent and self.layer.sent[-1][1]["data"]["final"]:
+                return
+            time.sleep(0.01)
+        self.fail("未收到终态进度事件")
+
+    def test_rapid_updates_are_coalesced_and_final_state_is_delivered(self):
+        for step in range(50):
+            self.bus.publish("review.doc-1", {"progress": step / 50, "current_step": f"步骤{step}"})
+        self.bus.publish("review.doc-1", {"status": "completed", "progress": 1.0}, final=True)
+        self._wait_for_final()
+
+        self.assertLess(len(self.layer.sent), 5)
+        group, message = self.layer.sent[-1]
+        self.assertEqual(group, "progress.review.doc-1")
+        self.assertEqual(message["type"], "progress.event")
+        # 合并后的事件携带完整状态
+        self.assertEqual(message["data"]["seq"], 51)
+        self.assertEqual(message["data"]["current_step"], "步骤49")
+        self.assertEqual(message["data"]["status"], "completed")
+
+    def test_reporter_only_checkpoints_on_coarse_progress(self):
+        from wharttest_django.progress import ProgressReporter
+
+        checkpoints = []
+        with patch("wharttest_django.progress.progress_bus", self.bus):
+            reporter = ProgressReporter(
+                "review", "doc-2", checkpoint=checkpoints.append, min_delta=0.25, min_interval=60
+            )
+            for step in range(1, 21):
+                reporter.update(progress=step / 20, current_step=f"步骤{step}")
+            reporter.finish("completed")
+        self._wait_for_final()
+
+        # 首次更新 + 每跨过 0.25 一次，最后的 1.0 由结束时强制落库
+        self.assertEqual(
+            [checkpoint.get("progress") for checkpoint in checkpoints],
+            [0.05, 0.3, 0.55, 0.8, 1.0],
+        )
+        self.assertEqual(checkpoints[-1]["status"], "completed")
+        self.assertEqual(checkpoints[-1]["current_step"], "步骤20")
+
+    def test_state_of_abandoned_topics_is_evicted(self):
+        with override_settings(PROGRESS_STATE_TTL=60, PROGRESS_STATE_MAX_TOPICS=3):
+            with patch("wharttest_django.progress.time.time", return_value=1000.0):
+                self.bus.publish("review.stale", {"progress": 0.5})
+            for index in range(3):
+                self.bus.publish(f"review.doc-{index}", {"progress": 0.1})
+            self.assertNotIn("review.stale", self.bus._state)
+
+            for index in range(3, 6):
+                self.bus.publish(f"review.doc-{index}", {"progress": 0.1})
+            # 超出数量上限时淘汰最久未更新的主题
+            self.assertEqual(list(self.bus._state), ["review.doc-3", "review.doc-4", "review.doc-5"])
+
+
+class ProgressSubscriptionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="watcher", password="password123")
+        self.outsider = User.objects.create_user(username="outsider", password="password123")
+        self.project = Project.objects.create(name="Progress Project", creator=self.user)
+        ProjectMember.objects.create(project=self.project, user=self.user, role="member")
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Progress Requirement",
+            document_type="txt",
+            uploader=self.user,
+            content="全文",
+            status="reviewing",
+        )
+        self.report = ReviewReport.objects.create(
+            document=self.document,
+            status="in_progress",
+            review_type="comprehensive",
+            progress=0.3,
+            current_step="模块评审",
+        )
+
+    def _communicator(self, user):
+        from channels.testing import WebsocketCommunicator
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        from wharttest_django.progress_consumer import ProgressConsumer
+
+        token = str(AccessToken.for_user(user))
+        return WebsocketCommunicator(
+            ProgressConsumer.as_asgi(), f"/ws/progress/?token={token}"
+        )
+
+    def test_member_receives_snapshot_and_progress_events(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        topic = f"review.{self.document.id}"
+
+        async def scenario():
+            communicator = self._communicator(self.user)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+
+            await communicator.send_json_to({"action": "subscribe", "topic": topic})
+            subscribed = await communicator.receive_json_from()
+            self.assertEqual(subscribed["type"], "subscribed")
+            self.assertEqual(subscribed["snapshot"]["progress"], 0.3)
+            self.assertEqual(subscribed["snapshot"]["report_id"], str(self.report.id))
+
+            await get_channel_layer().group_send(
+                f"progress.{topic}",
+                {"type": "progress.event", "topic": topic, "data": {"progress": 0.6}},
+            )
+            event = await communicator.receive_json_from()
+            self.assertEqual(event, {"type": "progress", "topic": topic, "data": {"progress": 0.6}})
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_snapshot_is_stored_in_shared_state_cache(self):
+        from django.conf import settings
+
+        from wharttest_django.progress import ProgressBus, SNAPSHOT_KEY_PREFIX
+
+        topic = f"review.{self.document.id}"
+        shared_cache = {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "progress-shared-test",
+        }
+        with self.settings(
+            CACHES={**settings.CACHES, "progress-shared": shared_cache},
+            SHARED_STATE_CACHE_ALIAS="progress-shared",
+        ), patch("channels.layers.get_channel_layer", return_value=None):
+            bus = ProgressBus()
+            bus._pending[topic] = {
+                "topic": topic,
+                "report_id": str(self.report.id),
+                "progress": 0.7,
+                "current_step": "专项分析",
+            }
+            bus.flush()
+
+            # worker 写入的快照在共享缓存中，其他进程（ASGI / HTTP）查询时可见
+            self.assertIsNone(caches["default"].get(f"{SNAPSHOT_KEY_PREFIX}{topic}"))
+            self.assertEqual(caches["progress-shared"].get(f"{SNAPSHOT_KEY_PREFIX}{topic}")["progress"], 0.7)
+            with patch.object(RequirementReviewEngine, "_get_llm_instance", lambda engine: None):
+                service = RequirementReviewService(user=self.user)
+            progress = service.get_review_progress(self.document)
+
+        self.assertEqual(progress["progress"], 70)
+        self.assertEqual(progress["current_step"], "专项分析")
+
+    def test_non_member_cannot_subscribe(self):
+        from asgiref.sync import async_to_sync
+
+        async def scenario():
+            communicator = self._communicator(self.outsider)
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.send_json_to(
+                {"action": "subscribe", "topic": f"review.{self.document.id}"}
+            )
+            response = await communicator.receive_json_from()
+            self.assertEqual(response["type"], "error")
+            await communicator.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_connection_without_token_is_rejected(self):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+
+        from wharttest_django.progress_consumer import ProgressConsumer
+
+        async def scenario():
+            communicator = WebsocketCommunicator(ProgressConsumer.as_asgi(), "/ws/progress/")
+            connected, _ = await communicator.connect()
+            self.assertFalse(connected)
+
+        async_to_sync(scenario)()
+
+
+class ReviewReportExportJobTests(TestCase):
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            EXPORT_ARTIFACT_DIR=self.export_dir, EXPORT_JOBS_ASYNC=False
+        )
+        self.settings_override.enable()
+        self.admin = User.objects.create_superuser(
+            username="exporter", password="password123", email="exporter@example.com"
+        )
+        self.project = Project.objects.create(name="Export Project", creator=self.admin)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Export Requirement",
+            document_type="txt",
+            uploader=self.admin,
+            content="全文",
+            status="review_completed",
+        )
+        self.report = ReviewReport.objects.create(
+            document=self.document,
+            status="completed",
+            review_type="comprehensive",
+            summary="初版总结",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = reverse("review-reports-export", kwargs={"pk": self.report.id})
+
+    def tearDown(self):
+        import shutil
+
+        self.settings_override.disable()
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def _artifact_count(self):
+        return len([name for name in os.listdir(self.export_dir) if name.endswith(".bin")])
+
+    def test_sync_export_reuses_artifact_until_report_changes(self):
+        from .export_service import ReportExportService
+
+        with patch.object(
+            ReportExportService, "render_excel", wraps=ReportExportService.render_excel
+        ) as render_excel:
+            first = self.client.get(self.url, {"export_format": "excel"})
+            second = self.client.get(self.url, {"export_format": "excel"})
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(b"".join(first.streaming_content), b"".join(second.streaming_content))
+            self.assertEqual(render_excel.call_count, 1)
+            self.assertEqual(
+                first["Content-Type"],
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
+
+            self.report.summary = "修订后的总结"
+            self.report.save()
+            third = self.client.get(self.url, {"export_format": "excel"})
+            self.assertEqual(third.status_code, 200)
+            self.assertEqual(render_excel.call_count, 2)
+        self.assertEqual(self._artifact_count(), 2)
+
+    def test_async_export_returns_job_with_download_url(self):
+        response = self.client.post(self.url, {"export_format": "word", "async": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], "completed")
+        self.assertFalse(response.data["cached"])
+        self.assertTrue(response.data["filename"].endswith(".docx"))
+
+        job_url = reverse("review-reports-export-job", kwargs={"job_id": response.data["job_id"]})
+        self.assertEqual(self.client.get(job_url).data["status"], "completed")
+        download = self.client.get(response.data["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"PK"))
+
+        again = self.client.post(self.url, {"export_format": "word", "async": True}, format="json")
+        self.assertTrue(again.data["cached"])
+        self.assertEqual(again.data["job_id"], response.data["job_id"])
+
+    def test_export_job_is_hidden_from_non_members(self):
+        response = self.client.post(self.url, {"export_format": "excel", "async": True}, format="json")
+        outsider = User.objects.create_user(username="export-outsider", password="password123")
+        outsider.user_permissions.add(
+            *Permission.objects.filter(content_type__app_label="requirements", codename__startswith="view_")
+        )
+        client = APIClient()
+        client.force_authenticate(outsider)
+        self.assertIn(client.get(response.data["download_url"]).status_code, (403, 404))
+
+    def test_unknown_export_format_is_rejected(self):
+        response = self.client.get(self.url, {"export_format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_export_builds_without_celery_task(self):
+        from .tasks import export_review_report
+
+        with override_settings(EXPORT_JOBS_ASYNC=True), \
+                patch.object(export_review_report, "apply") as apply, \
+                patch.object(export_review_report, "delay") as delay:
+            response = self.client.get(self.url, {"export_format": "excel"})
+        self.assertEqual(response.status_code, 200)
+        apply.assert_not_called()
+        delay.assert_not_called()
+
+    def test_async_export_returns_503_when_queue_is_unavailable(self):
+        from .tasks import export_review_report
+
+        with override_settings(EXPORT_JOBS_ASYNC=True), \
+                patch.object(export_review_report, "delay", side_effect=ConnectionError("broker down")):
+            response = self.client.post(self.url, {"export_format": "excel", "async": True}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class IncrementalJsonExtractorTests(SimpleTestCase):
+    RESPONSE = (
+        "分析结果如下：\n```json\n"
+        + json.dumps(
+            {
+                "overall_score": 72,
+                "summary": "存在 {不完整} 的 [描述]",
+                "issues": [
+                    {"title": "缺少\"异常\"流程", "detail": {"steps": [1, 2]}},
+                    {"title": "边界值未定义"},
+                ],
+                "strengths": ["结构清晰"],
+            },
+            ensure_ascii=False,
+        )
+        + "\n```"
+    )
+
+    def test_items_are_emitted_as_soon_as_they_close(self):
+        from .json_stream import IncrementalJsonExtractor
+
+        emitted_at = []
+        extractor = IncrementalJsonExtractor(("issues",))
+        for offset in range(0, len(self.RESPONSE), 5):
+            for key, index, item in extractor.feed(self.RESPONSE[offset : offset + 5]):
+                emitted_at.append((index, item["title"], offset))
+
+        self.assertEqual([title for _, title, _ in emitted_at], ['缺少"异常"流程', "边界值未定义"])
+        # 第一个问题在响应结束前就已解析出来
+        self.assertLess(emitted_at[0][2], len(self.RESPONSE) - 40)
+        self.assertTrue(extractor.done)
+        self.assertEqual(extractor.result()["strengths"], ["结构清晰"])
+
+    def test_reset_does_not_emit_items_twice(self):
+        from .json_stream import IncrementalJsonExtractor
+
+        received = []
+        extractor = IncrementalJsonExtractor(
+            ("issues",), on_item=lambda key, index, item: received.append(index)
+        )
+        cut = self.RESPONSE.index("边界值")
+        extractor.feed(self.RESPONSE[:cut])
+        extractor.reset()
+        extractor.feed(self.RESPONSE)
+        self.assertEqual(received, [0, 1])
+
+    def test_falls_back_to_full_extraction_for_truncated_output(self):
+        from .json_stream import IncrementalJsonExtractor
+
+        extractor = IncrementalJsonExtractor(("issues",))
+        extractor.feed('{"overall_score": 60, "issues": [{"title": "a"}')
+        self.assertFalse(extractor.done)
+        self.assertEqual(extractor.items["issues"], [{"title": "a"}])
+        self.assertIsNone(extractor.result())
+
+
+class _StreamingReviewLLM:
+    """按小块流式返回专项分析结果，并在流结束前记录已落库的问题数"""
+
+    def __init__(self, document):
+        self.document = document
+        self.persisted_before_end = []
+        self._lock = threading.Lock()
+
+    def stream(self, messages):
+        from langchain_core.messages import AIMessageChunk
+
+        payload = json.dumps(
+            {
+                "overall_score": 70,
+                "issues": [
+                    {"title": "登录失败次数未限制", "severity": "high"},
+                    {"title": "密码规则未说明", "priority": "low"},
+                ],
+            },
+            ensure_ascii=False,
+        )
+        for offset in range(0, len(payload), 8):
+            yield AIMessageChunk(content=payload[offset : offset + 8])
+        with self._lock:
+            self.persisted_before_end.append(
+                ReviewIssue.objects.filter(report__document=self.document).count()
+            )
+        yield AIMessageChunk(
+            content="",
+            usage_metadata={"input_tokens": 100, "output_tokens": 20, "total_tokens": 120},
+        )
+
+
+@patch.object(RequirementReviewEngine, "_get_llm_instance", lambda self: None)
+class StreamingReviewTests(TransactionTestCase):
+    # 问题在专项分析的工作线程中落库，需要真实提交才能被其他线程的连接看到
+    def setUp(self):
+        self.user = User.objects.create_user(username="streamer", password="password123")
+        self.project = Project.objects.create(name="Streaming Project", creator=self.user)
+        self.document = RequirementDocument.objects.create(
+            project=self.project,
+            title="Streaming Requirement",
+            document_type="txt",
+            uploader=self.user,
+            content="用户登录需求全文。",
+            status="ready_for_review",
+        )
+
+    @override_settings(REQUIREMENT_MODULE_REVIEW_ENABLED=False)
+    def test_issues_are_persisted_and_published_while_streaming(self):
+        service = RequirementReviewService(user=self.user)
+        service.review_engine.llm = _StreamingReviewLLM(self.document)
+        published = []
+
+        with patch.object(
+            RequirementReviewEngine,
+            "_get_user_prompt",
+            lambda self, prompt_type: "请分析文档：{document}，输出JSON",
+        ), patch(
+            "wharttest_django.progress.progress_bus.publish",
+            lambda topic, data, final=False: published.append(data),
+        ):
+            report = service.start_comprehensive_review(
+                self.document, {"max_workers": 1, "prefix_warmup_seconds": 0}
+            )
+
+        # 每个专项分析的流结束前，其问题已经落库
+        self.assertTrue(all(count >= 2 for count in service.review_engine.llm.persisted_before_end))
+        streamed_counts = [data["streamed_issue_count"] for data in published if "streamed_issue_count" in data]
+        self.assertEqual(streamed_counts[0], 1)
+        self.assertEqual(max(streamed_counts), 12)
+
+        # 最终问题记录以完整结果为准，不重复
+        self.assertEqual(report.issues.count(), 12)
+        self.assertEqual(report.issues.filter(priority="high").count(), 6)
+        self.assertEqual(report.specialized_analyses["logic_analysis"]["token_usage"]["input_tokens"], 100)
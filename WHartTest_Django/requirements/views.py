@@ -31,6 +31,7 @@ from .serializers import (
     ModuleReviewResultSerializer,
     ModuleAdjustmentSerializer,
     ReviewAnalysisRequestSerializer,
+    ReviewStartOptionsSerializer,
     ReviewProgressSerializer,
 )
 from .filters import (
@@ -716,11 +717,17 @@ class RequirementDocumentViewSet(BaseModelViewSet):
         - direct_review: 是否直接评审整个文档 (默认: false)
         - analysis_type: 分析类型 (默认: comprehensive)
         - parallel_processing: 是否并行处理 (默认: true)
+        - incremental: 增量评审，复用上次评审中内容未变化的模块/专项分析结果 (默认: false)
+        - use_llm_cache: 是否使用 LLM 响应缓存 (默认: 跟随系统配置)
         """
         document = self.get_object()
 
         # 获取评审类型
-        direct_review = request.data.get("direct_review", False)
+        options = ReviewStartOptionsSerializer(data=request.data)
+        if not options.is_valid():
+            return Response(options.errors, status=status.HTTP_400_BAD_REQUEST)
+        direct_review = options.validated_data["direct_review"]
+        incremental = options.validated_data["incremental"]
 
         # 检查文档状态
         if direct_review:
@@ -744,7 +751,11 @@ class RequirementDocumentViewSet(BaseModelViewSet):
                 )
         else:
             # 模块评审：必须是ready_for_review或failed状态（允许重新评审）
-            if document.status not in ["ready_for_review", "failed"]:
+            # 增量评审用于修改后的复评，额外允许已完成评审的文档
+            allowed_statuses = ["ready_for_review", "failed"]
+            if incremental:
+                allowed_statuses.append("review_completed")
+            if document.status not in allowed_statuses:
                 return Response(
                     {"error": "文档状态不允许开始评审，请先完成模块拆分"},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -765,7 +776,11 @@ class RequirementDocumentViewSet(BaseModelViewSet):
                 "custom_requirements": request.data.get("custom_requirements", ""),
                 "max_workers": request.data.get("max_workers", 3),  # 新增：并发数
                 "direct_review": direct_review,
+                "incremental": incremental,
             }
+            if options.validated_data["use_llm_cache"] is not None:
+                # 显式传 false 时本次评审绕过 LLM 响应缓存
+                analysis_options["use_llm_cache"] = options.validated_data["use_llm_cache"]
 
             # 立即更新文档状态为评审中
             document.status = "reviewing"
@@ -960,6 +975,112 @@ class ReviewReportViewSet(BaseModelViewSet):
             document__project__members__user=user
         ).distinct()
 
+    @action(detail=True, methods=["get", "post"], url_path="export")
+    def export(self, request, pk=None):
+        """
+        导出评审报告
+        GET/POST /api/requirements/reports/{id}/export/?export_format=excel|word|pdf&async=true
+
+        async=true 时提交后台导出任务，返回任务状态与下载地址（进度主题 export.<job_id>）；
+        否则在本次请求内生成并直接返回文件。报告内容未变化时复用已生成的文件。
+        """
+        from wharttest_django.export_jobs import ExportQueueUnavailable, export_jobs
+        from .export_service import ReportExportService
+        from .tasks import build_review_report_export, export_review_report
+
+        report = self.get_object()
+        params = request.data if request.method == "POST" else request.query_params
+        # 不使用 format 参数名：DRF 会将其当作响应渲染器格式
+        export_format = params.get("export_format") or "excel"
+        if export_format not in ReportExportService.EXPORT_FORMATS:
+            return Response(
+                {"error": f"不支持的导出格式: {export_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        async_export = str(params.get("async", "")).lower() in ("1", "true")
+
+        try:
+            record = export_jobs.start(
+                "review_report",
+                ReportExportService.fingerprint(report, export_format),
+                task=export_review_report,
+                builder=build_review_report_export,
+                project_id=report.document.project_id,
+                params={"report_id": str(report.id), "format": export_format},
+                user_id=request.user.id,
+                download_url=lambda job_id: reverse(
+                    "review-reports-export-job-download", kwargs={"job_id": job_id}
+                ),
+                inline=not async_export,
+            )
+        except ExportQueueUnavailable:
+            return Response(
+                {"error": "导出队列暂不可用，请稍后重试"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        if async_export:
+            return Response(
+                {**export_jobs.public_state(record), "cached": record["cached"]},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        if record["status"] != "completed":
+            return Response(
+                {"error": f"导出失败: {record.get('error')}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return export_jobs.file_response(record)
+
+    def _get_export_job(self, job_id):
+        from wharttest_django.export_jobs import export_jobs
+
+        record = export_jobs.get(job_id)
+        if not record or record.get("kind") != "review_report":
+            return None
+        # 通过 get_queryset 复用报告的项目成员可见性
+        if not self.get_queryset().filter(id=record["params"]["report_id"]).exists():
+            return None
+        return record
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export-jobs/(?P<job_id>[a-z_]+-[0-9a-f]{32})",
+    )
+    def export_job(self, request, job_id=None):
+        """
+        查询后台导出任务状态
+        GET /api/requirements/reports/export-jobs/{job_id}/
+        """
+        from wharttest_django.export_jobs import export_jobs
+
+        record = self._get_export_job(job_id)
+        if record is None:
+            return Response({"error": "导出任务不存在"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(export_jobs.public_state(record))
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export-jobs/(?P<job_id>[a-z_]+-[0-9a-f]{32})/download",
+    )
+    def export_job_download(self, request, job_id=None):
+        """
+        下载后台导出任务生成的文件
+        GET /api/requirements/reports/export-jobs/{job_id}/download/
+        """
+        from wharttest_django.export_jobs import export_jobs
+
+        record = self._get_export_job(job_id)
+        if record is None:
+            return Response({"error": "导出任务不存在"}, status=status.HTTP_404_NOT_FOUND)
+        if not export_jobs.has_artifact(record):
+            return Response(
+                {"error": "导出文件尚未生成", **export_jobs.public_state(record)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return export_jobs.file_response(record)
+
 
 class ReviewIssueViewSet(BaseModelViewSet):
     """评审问题视图集"""
@@ -2,18 +2,29 @@
 用例导出服务 - 支持模版化导出
 """
 
+import hashlib
 import io
+import json
 import posixpath
 import re
 import zipfile
 import xml.etree.ElementTree as ET
+from django.db.models import Count, Max, Prefetch
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 
 
 class TestCaseExportService:
     """测试用例导出服务"""
 
+    # 导出格式版本：导出内容的生成逻辑变化时递增，使已缓存的导出文件失效
+    EXPORT_VERSION = 2
+
+    CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    # 每处理多少条用例回调一次进度
+    PROGRESS_EVERY = 200
 
     # 内部字段名到默认列名的映射
     DEFAULT_FIELD_NAMES = {
@@ -32,14 +43,24 @@ class TestCaseExportService:
         :param template: ImportExportTemplate 实例，为 None 时使用默认格式
         """
         self.template = template
+        # 模块 ID -> 完整路径，导出前一次性构建，避免逐行沿 parent 链查询
+        self._module_paths = None
+        self._progress_callback = None
+        self._total = 0
 
-    def export(self, queryset, project_name: str) -> tuple:
+    def export(self, queryset, project_name: str, progress_callback=None) -> tuple:
         """
         导出用例到 Excel
         :param queryset: TestCase QuerySet
         :param project_name: 项目名称（用于文件名）
+        :param progress_callback: 进度回调 (已处理数, 总数)，可选
         :return: (bytes, filename)
         """
+        self._progress_callback = progress_callback
+        self._total = self._safe_count(queryset)
+        self._module_paths = self._build_module_paths(queryset)
+        queryset = self._prepare_queryset(queryset)
+
         # 获取字段映射（模版或默认）
         field_mappings = self._get_field_mappings()
         value_transformations = self._get_value_transformations()
@@ -64,9 +85,9 @@ class TestCaseExportService:
     def _export_default_bytes(
         self, queryset, field_mappings: dict, value_transformations: dict
     ) -> bytes:
-        wb = Workbook()
-        ws = wb.active
-        ws.title = (
+        # 只写模式按行流式写入，内存占用不随用例数量增长
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(
             self.template.sheet_name
             if self.template and self.template.sheet_name
             else "测试用例"
@@ -77,29 +98,38 @@ class TestCaseExportService:
         header_row = self.template.header_row if self.template else 1
         header_to_col = {}
         for col, header in enumerate(headers, 1):
-            cell_value = header if header is not None else ""
-            cell = ws.cell(row=header_row, column=col, value=cell_value)
+            if header is not None and str(header):
+                header_to_col[str(header).strip()] = col
+
+        # 调整列宽（只写模式下须在写入数据前设置）
+        for col in range(1, len(headers) + 1):
+            col_letter = self._get_column_letter(col)
+            ws.column_dimensions[col_letter].width = 20
+
+        for _ in range(header_row - 1):
+            ws.append([])
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header if header is not None else "")
             cell.font = Font(bold=True)
             cell.alignment = Alignment(horizontal="center")
-            if cell_value:
-                header_to_col[str(cell_value).strip()] = col
+            header_cells.append(cell)
+        ws.append(header_cells)
 
         # 写入数据
         data_start_row = self.template.data_start_row if self.template else 2
-        for row_idx, testcase in enumerate(queryset, data_start_row):
-            self._write_testcase_row(
-                ws,
-                row_idx,
-                testcase,
-                field_mappings,
-                value_transformations,
-                header_to_col=header_to_col if header_to_col else None,
+        for _ in range(header_row + 1, data_start_row):
+            ws.append([])
+        for done, testcase in enumerate(queryset, 1):
+            ws.append(
+                self._build_testcase_row(
+                    testcase,
+                    field_mappings,
+                    value_transformations,
+                    header_to_col=header_to_col if header_to_col else None,
+                )
             )
-
-        # 调整列宽
-        for col in range(1, len(headers) + 1):
-            col_letter = self._get_column_letter(col)
-            ws.column_dimensions[col_letter].width = 20
+            self._report_progress(done)
 
         output = io.BytesIO()
         wb.save(output)
@@ -126,7 +156,7 @@ class TestCaseExportService:
 
         header_row = self.template.header_row if self.template else 1
         data_start_row = self.template.data_start_row if self.template else 2
-        data_count = self._safe_count(queryset)
+        data_count = self._total
         need_last_row = (
             data_start_row + data_count - 1 if data_count > 0 else data_start_row
         )
@@ -166,6 +196,7 @@ class TestCaseExportService:
                     testcase, field, value_transformations
                 )
             patcher.write_row_values(row_idx=row_idx, values_by_col=values_by_header)
+            self._report_progress(row_idx - data_start_row + 1)
             row_idx += 1
 
         patcher.extend_table_and_filter_refs()
@@ -235,16 +266,14 @@ class TestCaseExportService:
                 headers.append(field_mappings[field])
         return headers
 
-    def _write_testcase_row(
+    def _build_testcase_row(
         self,
-        ws,
-        row: int,
         testcase,
         field_mappings: dict,
         value_transformations: dict,
         header_to_col: dict | None = None,
-    ):
-        """写入单个用例行"""
+    ) -> list:
+        """构建单个用例行的单元格值列表（下标 0 对应第 1 列）"""
         field_order = [
             "name",
             "module",
@@ -254,25 +283,32 @@ class TestCaseExportService:
             "level",
             "notes",
         ]
+        values_by_col = {}
         col = 1
 
         for field in field_order:
             if field not in field_mappings:
                 continue
 
-            value = self._get_field_value(testcase, field, value_transformations)
             if header_to_col is not None:
                 header_name = field_mappings.get(field)
                 if not header_name:
                     continue
-                col = header_to_col.get(str(header_name).strip())
-                if not col:
+                target_col = header_to_col.get(str(header_name).strip())
+                if not target_col:
                     continue
-                ws.cell(row=row, column=col, value=value)
             else:
                 # 兼容旧逻辑：按字段顺序顺次写入
-                ws.cell(row=row, column=col, value=value)
+                target_col = col
                 col += 1
+            values_by_col[target_col] = self._get_field_value(
+                testcase, field, value_transformations
+            )
+
+        row = [None] * max(values_by_col, default=0)
+        for target_col, value in values_by_col.items():
+            row[target_col - 1] = value
+        return row
 
     def _get_field_value(
         self, testcase, field: str, value_transformations: dict
@@ -296,17 +332,114 @@ class TestCaseExportService:
         elif field == "notes":
             return testcase.notes or ""
         elif field == "steps":
-            return self._format_steps_desc(testcase.steps.all())
+            return self._format_steps_desc(self._get_ordered_steps(testcase))
         elif field == "expected_results":
-            return self._format_expected_results(testcase.steps.all())
+            return self._format_expected_results(self._get_ordered_steps(testcase))
         return ""
 
+    def _prepare_queryset(self, queryset):
+        """预取模块与按序步骤，导出时每条用例不再单独查询"""
+        if not hasattr(queryset, "prefetch_related"):
+            return queryset
+        from testcases.models import TestCaseStep
+
+        # 先清空调用方已有的 prefetch（如未排序的 "steps"），避免同名预取冲突
+        return queryset.select_related("module").prefetch_related(None).prefetch_related(
+            Prefetch("steps", queryset=TestCaseStep.objects.order_by("step_number"))
+        ).iterator(chunk_size=500)
+
+    def _get_ordered_steps(self, testcase):
+        """优先使用预取的步骤（已按 step_number 排序）"""
+        if "steps" in getattr(testcase, "_prefetched_objects_cache", {}):
+            return testcase.steps.all()
+        return testcase.steps.order_by("step_number")
+
+    def _build_module_paths(self, queryset) -> dict | None:
+        """一次查询项目下全部模块，在内存中拼出每个模块的完整路径"""
+        if not hasattr(queryset, "values_list"):
+            return None
+        from testcases.models import TestCaseModule
+
+        project_ids = set(queryset.values_list("project_id", flat=True).distinct())
+        nodes = {
+            module_id: (name, parent_id)
+            for module_id, name, parent_id in TestCaseModule.objects.filter(
+                project_id__in=project_ids
+            ).values_list("id", "name", "parent_id")
+        }
+
+        paths = {}
+
+        def resolve(module_id):
+            if module_id in paths:
+                return paths[module_id]
+            parts = []
+            current = module_id
+            seen = set()
+            while current in nodes and current not in seen:
+                seen.add(current)
+                name, parent_id = nodes[current]
+                parts.insert(0, name)
+                current = parent_id
+            paths[module_id] = parts
+            return parts
+
+        for module_id in nodes:
+            resolve(module_id)
+        return paths
+
+    def _report_progress(self, done: int):
+        if self._progress_callback and (
+            done % self.PROGRESS_EVERY == 0 or done == self._total
+        ):
+            self._progress_callback(done, self._total)
+
+    def fingerprint(self, queryset, project_name: str) -> list:
+        """
+        导出内容指纹，用于复用已生成的导出文件
+
+        覆盖：用例 ID 及顺序、用例/步骤/模块的最近更新时间与数量、模版及其更新时间、导出格式版本
+        """
+        from testcases.models import TestCaseModule
+
+        ordered_ids = list(queryset.values_list("id", flat=True))
+        case_stats = queryset.order_by().aggregate(
+            latest=Max("updated_at"),
+            steps_count=Count("steps", distinct=True),
+            steps_latest=Max("steps__updated_at"),
+        )
+        module_stats = TestCaseModule.objects.filter(
+            project_id__in=set(queryset.values_list("project_id", flat=True).distinct())
+        ).aggregate(count=Count("id"), latest=Max("updated_at"))
+        template_part = None
+        if self.template:
+            template_part = [
+                self.template.pk,
+                self.template.updated_at,
+                getattr(self.template.template_file, "name", None) or "",
+            ]
+        ids_digest = hashlib.sha256(
+            json.dumps(ordered_ids).encode("utf-8")
+        ).hexdigest()
+        return [
+            "testcases",
+            self.EXPORT_VERSION,
+            project_name,
+            ids_digest,
+            case_stats,
+            module_stats,
+            template_part,
+        ]
+
     def _get_module_path(self, module) -> str:
         """获取模块完整路径"""
         if not module:
             return ""
 
         delimiter = self.template.module_path_delimiter if self.template else "/"
+        if self._module_paths is not None and module.pk in self._module_paths:
+            return delimiter + delimiter.join(self._module_paths[module.pk])
+
         path_parts = []
         current = module
         while current:
@@ -316,16 +449,16 @@ class TestCaseExportService:
         return delimiter + delimiter.join(path_parts)
 
     def _format_steps_desc(self, steps) -> str:
-        """格式化步骤描述"""
+        """格式化步骤描述（steps 须已按 step_number 排序）"""
         step_list = []
-        for step in steps.order_by("step_number"):
+        for step in steps:
             step_list.append(f"[{step.step_number}]{step.description}")
         return "\n".join(step_list)
 
     def _format_expected_results(self, steps) -> str:
-        """格式化预期结果"""
+        """格式化预期结果（steps 须已按 step_number 排序）"""
         result_list = []
-        for step in steps.order_by("step_number"):
+        for step in steps:
             result_list.append(f"[{step.step_number}]{step.expected_result}")
         return "\n".join(result_list)
 
@@ -0,0 +1,55 @@
+"""
+用例导出异步任务
+"""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='testcase_templates.export_testcases')
+def export_testcases(job_id):
+    """
+    异步导出测试用例到 Excel
+
+    Args:
+        job_id: 导出任务ID，参数（project_id、testcase_ids/module_ids、template_id）保存在任务记录中
+    """
+    from wharttest_django.export_jobs import export_jobs
+
+    record = export_jobs.run(job_id, build_testcases_export)
+    return {'job_id': job_id, 'status': record['status'] if record else 'failed'}
+
+
+def build_testcases_export(record, reporter):
+    """按任务记录生成用例导出文件，返回 (bytes, filename, content_type)"""
+    from .export_service import TestCaseExportService
+
+    service, queryset, project_name = build_export_request(record['params'])
+
+    def on_progress(done, total):
+        reporter.update(progress=round(done / total, 4) if total else 1.0, processed=done, total=total)
+
+    data, filename = service.export(queryset, project_name, progress_callback=on_progress)
+    return data, filename, TestCaseExportService.CONTENT_TYPE
+
+
+def build_export_request(params):
+    """根据任务参数重建导出服务与用例查询集"""
+    from projects.models import Project
+    from testcases.models import TestCase
+    from .export_service import TestCaseExportService
+    from .models import ImportExportTemplate
+
+    project = Project.objects.get(pk=params['project_id'])
+    queryset = TestCase.objects.filter(project=project)
+    if params.get('testcase_ids'):
+        queryset = queryset.filter(id__in=params['testcase_ids'])
+    elif params.get('module_ids') is not None:
+        queryset = queryset.filter(module_id__in=params['module_ids'])
+
+    template = None
+    if params.get('template_id'):
+        template = ImportExportTemplate.objects.get(pk=params['template_id'])
+    return TestCaseExportService(template), queryset, project.name
@@ -4,6 +4,7 @@
 import logging
 import asyncio
 import re
+from contextlib import aclosing
 from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
@@ -13,16 +14,52 @@ from django.conf import settings
 import os
 import json
 import uuid
-import httpx
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from .models import TestExecution, TestSuite, TestCaseResult, TestCase
 from prompts.models import UserPrompt, PromptType
+from langgraph_integration.views import check_project_permission
+from orchestrator_integration.agent_loop_view import stream_agent_loop_events
+from orchestrator_integration.stop_signal import (
+    aclear_stop_signal,
+    alink_session,
+    get_stop_signal_manager,
+    set_stop_signal,
+)
 from asgiref.sync import sync_to_async
+from wharttest_django.progress import publish_progress
 
 logger = logging.getLogger(__name__)
 
 
+def _execution_stop_key(execution_id) -> str:
+    """测试执行的停止信号分组 ID，执行中的 Agent Loop 会话都挂在该分组下"""
+    return f"test_execution:{execution_id}"
+
+
+def _publish_execution_progress(execution, final: bool = False):
+    """推送测试执行进度（已完成用例数 / 总数及各状态计数）"""
+    done = (
+        execution.passed_count
+        + execution.failed_count
+        + execution.skipped_count
+        + execution.error_count
+    )
+    publish_progress(
+        "test_execution",
+        execution.id,
+        {
+            "status": execution.status,
+            "total": execution.total_count,
+            "passed": execution.passed_count,
+            "failed": execution.failed_count,
+            "skipped": execution.skipped_count,
+            "error": execution.error_count,
+            "progress": round(done / execution.total_count, 4) if execution.total_count else 0,
+        },
+        final=final,
+    )
+
+
 @shared_task(bind=True, name='testcases.execute_test_suite')
 def execute_test_suite(self, execution_id):
     """
@@ -53,6 +90,7 @@ def execute_test_suite(self, execution_id):
         # 更新总数
         execution.total_count = testcases.count()
         execution.save(update_fields=['total_count', 'updated_at'])
+        _publish_execution_progress(execution)
         
         # 收集所有待执行的任务
         all_tasks = []
@@ -85,6 +123,7 @@ def execute_test_suite(self, execution_id):
         execution.status = 'completed' if execution.status != 'cancelled' else 'cancelled'
         execution.completed_at = timezone.now()
         execution.save(update_fields=['status', 'completed_at', 'updated_at'])
+        _publish_execution_progress(execution, final=True)
         
         logger.info(f"测试套件执行完成: {suite.name}, "
                    f"通过: {execution.passed_count}, "
@@ -120,6 +159,7 @@ def execute_test_suite(self, execution_id):
             execution.status = 'failed'
             execution.completed_at = timezone.now()
             execution.save(update_fields=['status', 'completed_at', 'updated_at'])
+            _publish_execution_progress(execution, final=True)
         except:
             pass
             
@@ -217,6 +257,17 @@ async def _execute_tasks_concurrently(execution, tasks_list, max_concurrent):
                 # 更新统计（使用原子操作避免竞态）
                 await sync_to_async(_update_execution_counts)(execution, normalized_status)
                 
+            except asyncio.CancelledError:
+                # 收到取消信号，进行中的用例记为跳过
+                task_obj.status = 'skip'
+                task_obj.error_message = "测试执行已取消"
+                task_obj.completed_at = timezone.now()
+                if task_obj.started_at:
+                    task_obj.execution_time = (task_obj.completed_at - task_obj.started_at).total_seconds()
+                await sync_to_async(task_obj.save)()
+                await sync_to_async(_update_execution_counts)(execution, 'skip')
+                raise
+
             except Exception as e:
                 task_name = task_obj.testcase.name
                     
@@ -237,10 +288,24 @@ async def _execute_tasks_concurrently(execution, tasks_list, max_concurrent):
                 await sync_to_async(_update_execution_counts)(execution, 'error')
     
     # 创建所有任务
-    async_tasks = [execute_with_semaphore(task) for task in tasks_list]
+    async_tasks = [asyncio.ensure_future(execute_with_semaphore(task)) for task in tasks_list]
     
-    # 并发执行所有任务
-    await asyncio.gather(*async_tasks, return_exceptions=True)
+    # 并发执行所有任务，同时监听取消信号（cancel_test_execution 可能在其他进程中发出）
+    stop_key = _execution_stop_key(execution.id)
+    all_done = asyncio.gather(*async_tasks, return_exceptions=True)
+    stop_waiter = asyncio.ensure_future(get_stop_signal_manager().wait_for_stop(stop_key))
+    try:
+        done, _ = await asyncio.wait(
+            {all_done, stop_waiter}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if stop_waiter in done:
+            logger.info(f"收到取消信号，立即中止测试执行: {execution.id}")
+            for task in async_tasks:
+                task.cancel()
+            await all_done
+    finally:
+        stop_waiter.cancel()
+        await aclear_stop_signal(stop_key)
 
 
 def _update_execution_counts(execution, status):
@@ -265,6 +330,7 @@ def _update_execution_counts(execution, status):
             'passed_count', 'failed_count', 'skipped_count',
             'error_count', 'updated_at'
         ])
+    _publish_execution_progress(exec_obj)
 
 
 @sync_to_async
@@ -416,7 +482,7 @@ def _extract_test_result_json(response_text: str) -> dict | None:
     return None
 
 async def _execute_testcase_via_chat_api(result: TestCaseResult):
-    """通过 Agent Loop SSE API 执行测试用例"""
+    """通过进程内 Agent Loop 服务执行测试用例（与 Agent Loop HTTP 接口共用同一实现）"""
     # 使用thread_sensitive=False避免死锁
     execution = await sync_to_async(lambda: result.execution, thread_sensitive=False)()
     testcase = await sync_to_async(lambda: result.testcase, thread_sensitive=False)()
@@ -471,154 +537,126 @@ async def _execute_testcase_via_chat_api(result: TestCaseResult):
         logger.info(f"格式化后的提示词长度: {len(formatted_prompt)} 字符")
         execution_log.append(f"✓ 准备执行 {len(steps)} 个测试步骤")
         
-        # 5. 构造 Agent Loop API 请求
-        api_url = f"{settings.BASE_URL}/api/orchestrator/agent-loop/" if hasattr(settings, 'BASE_URL') else "http://localhost:8000/api/orchestrator/agent-loop/"
-        
+        # 5. 准备 Agent Loop 会话
         # 生成唯一的会话ID
         session_id = f"test_exec_{execution.id}_{testcase.id}_{result.id}_{uuid.uuid4().hex[:8]}"
+        # 挂到执行的停止信号分组下，取消执行时 Agent Loop 会话随之停止
+        await alink_session(_execution_stop_key(execution.id), session_id)
         
-        request_data = {
-            "message": formatted_prompt,
-            "session_id": session_id,
-            "project_id": str(project.id),
-            "prompt_id": str(prompt.id),
-            "use_knowledge_base": False,
-            "generate_playwright_script": generate_playwright_script,
-            "test_case_id": testcase.id
-        }
-        
-        logger.info(f"调用 Agent Loop API: {api_url}")
-        logger.info(f"会话ID: {session_id}")
+        logger.info(f"调用进程内 Agent Loop 服务，会话ID: {session_id}")
         execution_log.append(f"✓ 开始与AI测试引擎通信...")
         
-        # 6. 生成认证令牌并调用 Agent Loop SSE API
-        def generate_token():
-            refresh = RefreshToken.for_user(executor)
-            return str(refresh.access_token)
-        
-        access_token = await sync_to_async(generate_token)()
-        
-        headers = {
-            'Authorization': f'Bearer {access_token}',
-            'Content-Type': 'application/json',
-            'Accept': 'text/event-stream'
-        }
+        # 6. 校验项目权限后直接在当前进程内运行 Agent Loop，消费 Python 事件
+        has_permission = await sync_to_async(check_project_permission)(executor, project.id)
+        if not has_permission:
+            raise Exception("执行人无权访问该项目")
         
-        # 收集 SSE 流式响应
+        # 收集流式响应
         final_response = ""
         current_step_response = ""  # 当前步骤的响应内容
         step_count = 0
         
-        async with httpx.AsyncClient(timeout=1000.0) as client:
-            async with client.stream(
-                'POST',
-                api_url,
-                json=request_data,
-                headers=headers
-            ) as response:
-                response.raise_for_status()
+        # 显式关闭事件流，确保异常退出时也能取消进行中的模型/工具调用
+        async with aclosing(stream_agent_loop_events(
+            executor,
+            formatted_prompt,
+            session_id,
+            str(project.id),
+            project,
+            prompt_id=prompt.id,
+            use_knowledge_base=False,
+            generate_playwright_script=generate_playwright_script,
+            test_case_id=testcase.id,
+        )) as events:
+            async for data in events:
+                event_type = data.get('type', '')
                 
-                async for line in response.aiter_lines():
-                    if not line or not line.startswith('data: '):
-                        continue
-                    
-                    try:
-                        data_str = line[6:]  # 去掉 'data: ' 前缀
-                        if data_str == '[DONE]':
-                            break
-                        
-                        data = json.loads(data_str)
-                        event_type = data.get('type', '')
-                        
-                        if event_type == 'step_start':
-                            step_count += 1
-                            current_step_response = ""  # 重置当前步骤响应
-                            execution_log.append(f"\n🔄 AI执行步骤 {step_count}")
-                        
-                        elif event_type == 'stream':
-                            # 流式响应：每个事件包含一小段文本
-                            stream_data = data.get('data', '')
-                            if stream_data:
-                                final_response += stream_data
-                                current_step_response += stream_data
-                        
-                        elif event_type == 'content':
-                            content = data.get('content', '')
-                            if content:
-                                final_response += content
-                        
-                        elif event_type == 'message':
-                            # Agent Loop 的 message 事件包含 AI 的响应（思考过程）
-                            msg_data = data.get('data', '')
-                            if msg_data:
-                                final_response += msg_data
-                                # 显示 AI 的说明（前150字符）
-                                short_msg = msg_data[:150].replace('\n', ' ').strip()
-                                if len(msg_data) > 150:
-                                    short_msg += '...'
-                                if short_msg:
-                                    execution_log.append(f"   💬 {short_msg}")
-                        
-                        elif event_type == 'tool_call':
-                            tool_name = data.get('name', data.get('tool', ''))
-                            tool_args = data.get('arguments', data.get('args', ''))
-                            if tool_name:
-                                execution_log.append(f"   🔧 调用工具: {tool_name}")
-                            if tool_args and isinstance(tool_args, str) and len(tool_args) > 0:
-                                # 只显示参数的前100个字符
-                                short_args = tool_args[:100] + '...' if len(tool_args) > 100 else tool_args
-                                execution_log.append(f"      参数: {short_args}")
-                        
-                        elif event_type == 'tool_start':
-                            # 工具开始执行
-                            tool_name = data.get('name', data.get('tool', ''))
-                            if tool_name:
-                                execution_log.append(f"   🔧 调用工具: {tool_name}")
-                        
-                        elif event_type == 'tool_result':
-                            # 工具执行结果
-                            result_summary = data.get('summary', '')
-                            if result_summary:
-                                # 只显示结果摘要的前150字符
-                                short_result = result_summary[:150].replace('\n', ' ')
-                                if len(result_summary) > 150:
-                                    short_result += '...'
-                                execution_log.append(f"   🔧 工具结果: {short_result}")
-                        
-                        elif event_type == 'stream_end':
-                            # 流式响应结束，输出当前步骤的响应摘要
-                            if current_step_response.strip():
-                                summary = current_step_response.strip()[:200].replace('\n', ' ')
-                                if len(current_step_response.strip()) > 200:
-                                    summary += '...'
-                                execution_log.append(f"   📝 {summary}")
-                        
-                        elif event_type == 'step_end' or event_type == 'step_complete':
-                            # 步骤完全结束信号，tool_result已显示工具结果，此处不再重复
-                            pass
-                        
-                        elif event_type == 'final':
-                            final_response = data.get('content', final_response)
-                        
-                        elif event_type == 'ai':
-                            # AI消息事件，检查是否是最终响应
-                            content = data.get('content', '')
-                            agent_type = data.get('agent_type', '')
-                            if agent_type == 'final' and content:
-                                # 这是最终AI响应，包含测试结果JSON
-                                final_response = content
-                                logger.info(f"收到最终AI响应, 长度: {len(content)}")
-                            elif content:
-                                # 普通AI响应，累加到final_response
-                                final_response += content
-                        
-                        elif event_type == 'error':
-                            error_msg = data.get('message', '未知错误')
-                            execution_log.append(f"   ❌ 错误: {error_msg}")
-                            raise Exception(error_msg)
-                    
-                    except json.JSONDecodeError:
-                        continue
+                if event_type == 'step_start':
+                    step_count += 1
+                    current_step_response = ""  # 重置当前步骤响应
+                    execution_log.append(f"\n🔄 AI执行步骤 {step_count}")
+                
+                elif event_type == 'stream':
+                    # 流式响应：每个事件包含一小段文本
+                    stream_data = data.get('data', '')
+                    if stream_data:
+                        final_response += stream_data
+                        current_step_response += stream_data
+                
+                elif event_type == 'content':
+                    content = data.get('content', '')
+                    if content:
+                        final_response += content
+                
+                elif event_type == 'message':
+                    # Agent Loop 的 message 事件包含 AI 的响应（思考过程）
+                    msg_data = data.get('data', '')
+                    if msg_data:
+                        final_response += msg_data
+                        # 显示 AI 的说明（前150字符）
+                        short_msg = msg_data[:150].replace('\n', ' ').strip()
+                        if len(msg_data) > 150:
+                            short_msg += '...'
+                        if short_msg:
+                            execution_log.append(f"   💬 {short_msg}")
+                
+                elif event_type == 'tool_call':
+                    tool_name = data.get('name', data.get('tool', ''))
+                    tool_args = data.get('arguments', data.get('args', ''))
+                    if tool_name:
+                        execution_log.append(f"   🔧 调用工具: {tool_name}")
+                    if tool_args and isinstance(tool_args, str) and len(tool_args) > 0:
+                        # 只显示参数的前100个字符
+                        short_args = tool_args[:100] + '...' if len(tool_args) > 100 else tool_args
+                        execution_log.append(f"      参数: {short_args}")
+                
+                elif event_type == 'tool_start':
+                    # 工具开始执行
+                    tool_name = data.get('name', data.get('tool', ''))
+                    if tool_name:
+                        execution_log.append(f"   🔧 调用工具: {tool_name}")
+                
+                elif event_type == 'tool_result':
+                    # 工具执行结果
+                    result_summary = data.get('summary', '')
+                    if result_summary:
+                        # 只显示结果摘要的前150字符
+                        short_result = result_summary[:150].replace('\n', ' ')
+                        if len(result_summary) > 150:
+                            short_result += '...'
+                        execution_log.append(f"   🔧 工具结果: {short_result}")
+                
+                elif event_type == 'stream_end':
+                    # 流式响应结束，输出当前步骤的响应摘要
+                    if current_step_response.strip():
+                        summary = current_step_response.strip()[:200].replace('\n', ' ')
+                        if len(current_step_response.strip()) > 200:
+                            summary += '...'
+                        execution_log.append(f"   📝 {summary}")
+                
+                elif event_type == 'step_end' or event_type == 'step_complete':
+                    # 步骤完全结束信号，tool_result已显示工具结果，此处不再重复
+                    pass
+                
+                elif event_type == 'final':
+                    final_response = data.get('content', final_response)
+                
+                elif event_type == 'ai':
+                    # AI消息事件，检查是否是最终响应
+                    content = data.get('content', '')
+                    agent_type = data.get('agent_type', '')
+                    if agent_type == 'final' and content:
+                        # 这是最终AI响应，包含测试结果JSON
+                        final_response = content
+                        logger.info(f"收到最终AI响应, 长度: {len(content)}")
+                    elif content:
+                        # 普通AI响应，累加到final_response
+                        final_response += content
+                
+                elif event_type == 'error':
+                    error_msg = data.get('message', '未知错误')
+                    execution_log.append(f"   ❌ 错误: {error_msg}")
+                    raise Exception(error_msg)
         
         logger.info(f"Agent Loop 执行完成，共 {step_count} 个步骤")
         
@@ -700,12 +738,6 @@ async def _execute_testcase_via_chat_api(result: TestCaseResult):
         except Exception as e:
             logger.warning(f"清理MCP会话失败: {e}")
         
-    except httpx.HTTPError as e:
-        error_msg = f"调用 Agent Loop API 失败: {str(e)}"
-        execution_log.append(f"\n✗ {error_msg}")
-        logger.error(error_msg, exc_info=True)
-        raise Exception(error_msg)
-    
     except Exception as e:
         error_msg = f"执行过程异常: {str(e)}"
         execution_log.append(f"\n✗ {error_msg}")
@@ -745,6 +777,10 @@ def cancel_test_execution(execution_id):
                 completed_at=timezone.now()
             )
             
+            # 广播停止信号：执行进程立即取消进行中的用例，
+            # 分组内的 Agent Loop 会话（可能在任意 worker 上）同时停止
+            set_stop_signal(_execution_stop_key(execution_id))
+            
             logger.info(f"测试执行已取消: {execution_id}")
             return {'success': True, 'message': '测试执行已取消'}
         else:
@@ -0,0 +1,127 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from unittest.mock import patch
+from openpyxl import load_workbook
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from projects.models import Project
+from testcase_templates.export_service import TestCaseExportService
+from testcases.models import TestCase as TestCaseModel, TestCaseModule, TestCaseStep
+
+
+class TestCaseExportTests(TestCase):
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            EXPORT_ARTIFACT_DIR=self.export_dir, EXPORT_JOBS_ASYNC=False
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_superuser(
+            username='exporter', password='password', email='exporter@example.com'
+        )
+        self.project = Project.objects.create(name='Export Project', creator=self.user)
+        self.root = TestCaseModule.objects.create(project=self.project, name='根模块', creator=self.user)
+        self.child = TestCaseModule.objects.create(
+            project=self.project, name='子模块', parent=self.root, creator=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('project-testcases-export-excel', kwargs={'project_pk': self.project.pk})
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def _create_testcases(self, count, start=0):
+        for index in range(start, start + count):
+            testcase = TestCaseModel.objects.create(
+                project=self.project, module=self.child, name=f'用例{index}', creator=self.user
+            )
+            # 倒序创建，验证导出按 step_number 排序
+            for step_number in (2, 1):
+                TestCaseStep.objects.create(
+                    test_case=testcase,
+                    step_number=step_number,
+                    description=f'步骤{step_number}',
+                    expected_result=f'结果{step_number}',
+                    creator=self.user,
+                )
+
+    def _export_queries(self):
+        queryset = TestCaseModel.objects.filter(project=self.project)
+        with CaptureQueriesContext(connection) as context:
+            data, _ = TestCaseExportService().export(queryset, self.project.name)
+        return data, len(context.captured_queries)
+
+    def test_export_query_count_does_not_grow_with_testcases(self):
+        self._create_testcases(2)
+        _, small_queries = self._export_queries()
+        self._create_testcases(10, start=2)
+        data, large_queries = self._export_queries()
+        self.assertEqual(small_queries, large_queries)
+
+        sheet = load_workbook(io.BytesIO(data)).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][:2], ('用例名称', '所属模块'))
+        self.assertEqual(len(rows), 13)
+        self.assertEqual(rows[1][1], '/根模块/子模块')
+        self.assertEqual(rows[1][3], '[1]步骤1\n[2]步骤2')
+        self.assertEqual(rows[1][4], '[1]结果1\n[2]结果2')
+
+    def test_sync_export_reuses_artifact_until_testcases_change(self):
+        self._create_testcases(3)
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(b''.join(first.streaming_content), b''.join(second.streaming_content))
+        self.assertEqual(len([name for name in os.listdir(self.export_dir) if name.endswith('.bin')]), 1)
+
+        for step in TestCaseStep.objects.filter(step_number=1):
+            step.description = '修改后的步骤'
+            step.save()
+        changed = self.client.get(self.url)
+        rows = list(load_workbook(io.BytesIO(b''.join(changed.streaming_content))).active.iter_rows(values_only=True))
+        self.assertIn('修改后的步骤', rows[1][3])
+
+    def test_async_export_reports_job_and_download_url(self):
+        self._create_testcases(3)
+        published = []
+        with patch(
+            'wharttest_django.progress.progress_bus.publish',
+            lambda topic, data, final=False: published.append((topic, data, final)),
+        ):
+            response = self.client.post(
+                self.url, {'ids': [], 'module_ids': [self.root.pk], 'async': True}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], 'completed')
+        topic, final_state, final = published[-1]
+        self.assertEqual(topic, f"export.{response.data['job_id']}")
+        self.assertTrue(final)
+        self.assertEqual(final_state['status'], 'completed')
+
+        job_url = reverse(
+            'project-testcases-export-job',
+            kwargs={'project_pk': self.project.pk, 'job_id': response.data['job_id']},
+        )
+        self.assertEqual(self.client.get(job_url).data['status'], 'completed')
+        download = self.client.get(response.data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        rows = list(load_workbook(io.BytesIO(b''.join(download.streaming_content))).active.iter_rows(values_only=True))
+        self.assertEqual(len(rows), 4)
+
+        other_project = Project.objects.create(name='Other Project', creator=self.user)
+        other_job_url = reverse(
+            'project-testcases-export-job',
+            kwargs={'project_pk': other_project.pk, 'job_id': response.data['job_id']},
+        )
+        self.assertEqual(self.client.get(other_job_url).status_code, status.HTTP_404_NOT_FOUND)
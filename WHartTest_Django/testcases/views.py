@@ -6,8 +6,8 @@ from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from django.db import transaction
-from django.http import HttpResponse
 from django.conf import settings
+from django.urls import reverse
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -30,6 +30,7 @@ from .serializers import (
 )
 from .permissions import IsProjectMemberForTestCase, IsProjectMemberForTestCaseModule
 from .filters import TestCaseFilter  # 导入自定义过滤器
+from wharttest_django.export_jobs import export_jobs
 from wharttest_django.pagination import StandardPagination
 
 # 确保导入项目自定义的权限类
@@ -178,7 +179,12 @@ class TestCaseViewSet(viewsets.ModelViewSet):
         如果提供template_id，则使用模版配置导出
         """
         from testcase_templates.models import ImportExportTemplate
-        from testcase_templates.export_service import TestCaseExportService
+        from testcase_templates.tasks import (
+            build_export_request,
+            build_testcases_export,
+            export_testcases,
+        )
+        from wharttest_django.export_jobs import ExportQueueUnavailable
 
         testcase_ids = None
         template_id = None
@@ -230,26 +236,23 @@ class TestCaseViewSet(viewsets.ModelViewSet):
                         status=400,
                     )
 
-        # 根据过滤条件构建queryset
-        queryset = self.get_queryset()
+        # 根据过滤条件构建导出参数（由导出任务重建查询集）
+        project = get_object_or_404(Project, pk=project_pk)
+        export_params = {"project_id": project.pk}
         if testcase_ids:
-            queryset = queryset.filter(id__in=testcase_ids)
+            export_params["testcase_ids"] = testcase_ids
         elif module_ids:
             # 收集所有选中模块及其子模块的ID
             all_module_ids = set()
             for mid in module_ids:
                 try:
-                    module = TestCaseModule.objects.get(id=mid)
+                    module = TestCaseModule.objects.get(id=mid, project=project)
                     all_module_ids.update(module.get_all_descendant_ids())
                 except TestCaseModule.DoesNotExist:
                     pass
-            if all_module_ids:
-                queryset = queryset.filter(module_id__in=all_module_ids)
-            else:
-                queryset = queryset.none()
+            export_params["module_ids"] = sorted(all_module_ids)
 
         # 获取模版（如果指定）
-        template = None
         if template_id:
             try:
                 template = ImportExportTemplate.objects.get(
@@ -260,30 +263,89 @@ class TestCaseViewSet(viewsets.ModelViewSet):
                     {"error": "指定的导出模版不存在或不可用"},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            export_params["template_id"] = template.pk
 
-        # 获取项目名称
-        project = get_object_or_404(Project, pk=project_pk)
+        # async=true 时提交后台导出任务并立即返回，否则在本次请求内生成（内容未变化时复用已生成的文件）
+        async_export = str(
+            request.data.get("async", "")
+            if request.method == "POST"
+            else request.query_params.get("async", "")
+        ).lower() in ("1", "true")
 
-        # 使用导出服务
-        export_service = TestCaseExportService(template)
+        export_service, queryset, project_name = build_export_request(export_params)
         try:
-            excel_data, filename = export_service.export(queryset, project.name)
-        except Exception as e:
-            import logging
+            record = export_jobs.start(
+                "testcases",
+                export_service.fingerprint(queryset, project_name),
+                task=export_testcases,
+                builder=build_testcases_export,
+                project_id=project.pk,
+                params=export_params,
+                user_id=request.user.id,
+                download_url=lambda job_id: reverse(
+                    "project-testcases-export-job-download",
+                    kwargs={"project_pk": project.pk, "job_id": job_id},
+                ),
+                inline=not async_export,
+            )
+        except ExportQueueUnavailable:
+            return Response(
+                {"error": "导出队列暂不可用，请稍后重试"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
-            logging.getLogger(__name__).exception("导出Excel失败")
+        if async_export:
+            return Response(
+                {**export_jobs.public_state(record), "cached": record["cached"]},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        if record["status"] != "completed":
             return Response(
-                {"error": f"导出失败: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST
+                {"error": f"导出失败: {record.get('error')}"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        return export_jobs.file_response(record)
 
-        # 创建HTTP响应
-        response = HttpResponse(
-            excel_data,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    def _get_export_job(self, job_id):
+        record = export_jobs.get(job_id)
+        if not record or str(record.get("project_id")) != str(self.kwargs.get("project_pk")):
+            return None
+        return record
 
-        return response
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export-jobs/(?P<job_id>[a-z_]+-[0-9a-f]{32})",
+    )
+    def export_job(self, request, project_pk=None, job_id=None):
+        """
+        查询后台导出任务状态
+        GET /api/projects/1/testcases/export-jobs/{job_id}/
+        """
+        record = self._get_export_job(job_id)
+        if record is None:
+            return Response({"error": "导出任务不存在"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(export_jobs.public_state(record))
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export-jobs/(?P<job_id>[a-z_]+-[0-9a-f]{32})/download",
+    )
+    def export_job_download(self, request, project_pk=None, job_id=None):
+        """
+        下载后台导出任务生成的文件
+        GET /api/projects/1/testcases/export-jobs/{job_id}/download/
+        """
+        record = self._get_export_job(job_id)
+        if record is None:
+            return Response({"error": "导出任务不存在"}, status=status.HTTP_404_NOT_FOUND)
+        if not export_jobs.has_artifact(record):
+            return Response(
+                {"error": "导出文件尚未生成", **export_jobs.public_state(record)},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return export_jobs.file_response(record)
 
     def _get_module_path(self, module):
         """
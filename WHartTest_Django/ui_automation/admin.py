@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    UiModule, UiPage, UiElement, UiPageSteps, UiPageStepsDetailed,
+    UiModule, UiPage, UiElement, UiElementLocatorStat, UiPageSteps, UiPageStepsDetailed,
     UiTestCase, UiCaseStepsDetailed, UiExecutionRecord, UiPublicData, UiEnvironmentConfig
 )
 
@@ -26,6 +26,13 @@ class UiElementAdmin(admin.ModelAdmin):
     search_fields = ('name', 'locator_value')
 
 
+@admin.register(UiElementLocatorStat)
+class UiElementLocatorStatAdmin(admin.ModelAdmin):
+    list_display = ('element', 'variant', 'success_count', 'failure_count', 'consecutive_failures', 'avg_ms', 'max_ms', 'updated_at')
+    list_filter = ('variant',)
+    search_fields = ('element__name',)
+
+
 class UiPageStepsDetailedInline(admin.TabularInline):
     model = UiPageStepsDetailed
     extra = 1
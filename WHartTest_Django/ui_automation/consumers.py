@@ -7,6 +7,7 @@ UI自动化 WebSocket Consumer
 - /ws/ui/actuator/ - 执行器连接，用于接收执行任务和返回结果
 """
 
+import asyncio
 import json
 import logging
 from typing import Optional
@@ -18,16 +19,23 @@ from .socket_models import (
     SocketDataModel, QueueModel, NoticeType, ResponseCode,
     UiSocketEnum, ExecutionTaskModel, StepResultModel, CaseResultModel
 )
+from .dispatch import get_dispatcher
+from .result_writer import PendingResult, get_result_writer, locator_attempts, write_results
+from .trace_parser import load_trace_index
 from wharttest_django.i18n import translate_app_text
 
 logger = logging.getLogger('ui_automation')
 
 
 class SocketUserManager:
-    """WebSocket用户管理器"""
+    """WebSocket用户管理器
+
+    执行器连接同时登记到调度注册表（多 worker 时保存在 Redis），
+    不在本进程的执行器通过通道层转发消息。
+    """
     
     _web_users: dict[str, 'UiAutomationConsumer'] = {}      # 前端用户连接
-    _actuator_users: dict[str, 'UiAutomationConsumer'] = {} # 执行器连接
+    _actuator_users: dict[str, 'UiAutomationConsumer'] = {} # 本进程内的执行器连接
     
     @classmethod
     def add_web_user(cls, user_id: str, consumer: 'UiAutomationConsumer'):
@@ -41,29 +49,54 @@ class SocketUserManager:
             logger.info(f"Web用户断开: {user_id}, 当前连接数: {len(cls._web_users)}")
     
     @classmethod
-    def add_actuator(cls, actuator_id: str, consumer: 'UiAutomationConsumer'):
+    async def add_actuator(cls, actuator_id: str, consumer: 'UiAutomationConsumer'):
         cls._actuator_users[actuator_id] = consumer
-        logger.info(f"执行器连接: {actuator_id}, 当前执行器数: {len(cls._actuator_users)}")
+        await get_dispatcher().call_store('register', actuator_id, consumer.channel_name, consumer.actuator_info)
+        logger.info(f"执行器连接: {actuator_id}, 本进程执行器数: {len(cls._actuator_users)}")
     
     @classmethod
-    def remove_actuator(cls, actuator_id: str):
-        if actuator_id in cls._actuator_users:
+    async def remove_actuator(cls, actuator_id: str, consumer: Optional['UiAutomationConsumer'] = None) -> bool:
+        """移除执行器连接，返回注册表中是否注销了该连接（执行器已在别处重连时为 False）"""
+        if actuator_id in cls._actuator_users and (consumer is None or cls._actuator_users[actuator_id] is consumer):
             del cls._actuator_users[actuator_id]
-            logger.info(f"执行器断开: {actuator_id}, 当前执行器数: {len(cls._actuator_users)}")
+            logger.info(f"执行器断开: {actuator_id}, 本进程执行器数: {len(cls._actuator_users)}")
+        channel_name = getattr(consumer, 'channel_name', None)
+        return await get_dispatcher().call_store('unregister', actuator_id, channel_name)
     
     @classmethod
     def get_actuator(cls, actuator_id: Optional[str] = None) -> Optional['UiAutomationConsumer']:
-        """获取执行器，如果不指定则返回第一个可用的"""
-        if actuator_id and actuator_id in cls._actuator_users:
-            return cls._actuator_users[actuator_id]
-        if cls._actuator_users:
-            return list(cls._actuator_users.values())[0]
-        return None
+        """获取本进程内的执行器连接，如果不指定则返回负载最低的"""
+        if actuator_id:
+            return cls._actuator_users.get(actuator_id)
+        record = get_dispatcher().pick_actuator()
+        if record and record['id'] in cls._actuator_users:
+            return cls._actuator_users[record['id']]
+        return next(iter(cls._actuator_users.values()), None)
     
     @classmethod
     def get_actuator_by_id(cls, actuator_id: str) -> Optional['UiAutomationConsumer']:
-        """根据ID获取指定执行器"""
+        """根据ID获取本进程内的执行器连接"""
         return cls._actuator_users.get(actuator_id)
+
+    @classmethod
+    def resolve_actuator_id(cls, actuator_id: Optional[str] = None, lane: str = 'interactive') -> Optional[str]:
+        """确定目标执行器（跨 worker）：指定时校验是否在线，否则选择该通道空闲最多的执行器"""
+        dispatcher = get_dispatcher()
+        if actuator_id:
+            online = actuator_id in cls._actuator_users or dispatcher.store.get_actuator(actuator_id)
+            return actuator_id if online else None
+        record = dispatcher.pick_actuator(lane)
+        return record['id'] if record else None
+
+    @classmethod
+    async def aresolve_actuator_id(cls, actuator_id: Optional[str] = None, lane: str = 'interactive') -> Optional[str]:
+        """resolve_actuator_id 的异步版本（供 consumer 调用，不阻塞事件循环）"""
+        dispatcher = get_dispatcher()
+        if actuator_id:
+            online = actuator_id in cls._actuator_users or await dispatcher.call_store('get_actuator', actuator_id)
+            return actuator_id if online else None
+        record = await dispatcher.apick_actuator(lane)
+        return record['id'] if record else None
     
     @classmethod
     def get_web_user(cls, user_id: str) -> Optional['UiAutomationConsumer']:
@@ -71,32 +104,35 @@ class SocketUserManager:
     
     @classmethod
     def has_actuator(cls) -> bool:
-        return bool(cls._actuator_users)
+        return bool(cls.get_actuator_records())
     
     @classmethod
     def get_actuator_count(cls) -> int:
-        return len(cls._actuator_users)
+        return len(cls.get_actuator_records())
     
     @classmethod
     def get_all_actuators(cls) -> list['UiAutomationConsumer']:
         return list(cls._actuator_users.values())
+
+    @classmethod
+    def get_actuator_records(cls) -> list[dict]:
+        """所有在线执行器的注册信息（包含其他 worker 上的执行器）"""
+        return get_dispatcher().store.list_actuators()
     
     @classmethod
     def get_actuator_info(cls, actuator_id: str) -> dict:
         """获取执行器详细信息"""
-        if actuator_id in cls._actuator_users:
-            consumer = cls._actuator_users[actuator_id]
-            return getattr(consumer, 'actuator_info', {})
-        return {}
+        record = get_dispatcher().store.get_actuator(actuator_id)
+        return record['info'] if record else {}
 
     @classmethod
     async def send_to_actuator_by_id(cls, actuator_id: str, socket_data) -> bool:
-        """向指定执行器发送 WebSocket 消息（供视图调用）"""
+        """向指定执行器发送 WebSocket 消息，执行器不在本进程时经通道层转发"""
         actuator = cls._actuator_users.get(actuator_id)
-        if not actuator:
-            return False
-        await actuator.send_json(socket_data)
-        return True
+        if actuator:
+            await actuator.send_json(socket_data)
+            return True
+        return await get_dispatcher().send(actuator_id, socket_data)
 
     @classmethod
     async def broadcast_to_web_users(cls, socket_data):
@@ -115,6 +151,7 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         self.group_name: str = 'ui_automation'
         self.actuator_info: dict = {}  # 执行器信息
         self.language: str = 'zh-Hans'
+        self._heartbeat_task: Optional[asyncio.Task] = None
 
     def _get_query_params(self) -> dict[str, list[str]]:
         query_string = self.scope.get('query_string', b'').decode('utf-8')
@@ -175,7 +212,8 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
                 'headless': False,
                 'connected_at': datetime.datetime.now().isoformat(),
             }
-            SocketUserManager.add_actuator(self.user_id, self)
+            await SocketUserManager.add_actuator(self.user_id, self)
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
         else:
             self.is_actuator = False
             # 从用户认证获取ID
@@ -203,12 +241,33 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
         
         if self.is_actuator:
-            SocketUserManager.remove_actuator(self.user_id)
+            if self._heartbeat_task:
+                self._heartbeat_task.cancel()
+            await get_result_writer().flush()
+            if await SocketUserManager.remove_actuator(self.user_id, self):
+                # 未完成的分片用例重新分配给其他执行器
+                await get_dispatcher().on_actuator_lost(self.user_id)
         else:
             SocketUserManager.remove_web_user(self.user_id)
         
         logger.info(f"{'执行器' if self.is_actuator else 'Web'}断开: {self.user_id}, code: {close_code}")
     
+    async def _heartbeat_loop(self):
+        """连接存活期间定期刷新注册表心跳，并清理心跳超时（所在 worker 已退出）的执行器"""
+        dispatcher = get_dispatcher()
+        interval = max(1, dispatcher.store.heartbeat_ttl // 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await dispatcher.call_store('touch', self.user_id)
+                await dispatcher.reap()
+            except Exception as e:
+                logger.warning(f"执行器 {self.user_id} 心跳刷新失败: {e}")
+
+    async def actuator_forward(self, event):
+        """通道层转发给本连接执行器的消息（来自其他 worker）"""
+        await self.send(text_data=event['text'])
+
     async def receive(self, text_data=None, bytes_data=None):
         """接收消息"""
         if not text_data:
@@ -247,7 +306,11 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
                 UiSocketEnum.STEP_RESULT: self.handle_step_result,
                 UiSocketEnum.PAGE_STEP_RESULT: self.handle_page_step_result,
                 UiSocketEnum.CASE_RESULT: self.handle_case_result,
+                UiSocketEnum.CASE_ARTIFACTS: self.handle_case_artifacts,
                 UiSocketEnum.SET_ACTUATOR_INFO: self.handle_set_actuator_info,
+                UiSocketEnum.ACTUATOR_CAPACITY: self.handle_actuator_capacity,
+                UiSocketEnum.BATCH_SHARD_DONE: self.handle_batch_shard_done,
+                UiSocketEnum.BATCH_REVOKED: self.handle_batch_revoked,
             }
         else:
             # 前端发送执行请求 -> 转发给执行器
@@ -271,12 +334,9 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     async def handle_execute_page_steps(self, args: dict, user: str):
         """处理执行页面步骤请求"""
         actuator_id = args.get('actuator_id')
-        if actuator_id:
-            actuator = SocketUserManager.get_actuator_by_id(actuator_id)
-        else:
-            actuator = SocketUserManager.get_actuator()
+        target_id = await SocketUserManager.aresolve_actuator_id(actuator_id)
         
-        if not actuator:
+        if not target_id:
             await self.send_json(SocketDataModel(
                 code=ResponseCode.ERROR,
                 msg=self._localize("没有可用的执行器，请先启动执行器服务" if not actuator_id else f"执行器 {actuator_id} 不在线")
@@ -284,7 +344,7 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
             return
         
         # 转发给执行器，使用服务端分配的user_id而非客户端传入的user
-        await actuator.send_json(SocketDataModel(
+        await SocketUserManager.send_to_actuator_by_id(target_id, SocketDataModel(
             code=ResponseCode.SUCCESS,
             msg="execute",
             user=self.user_id,
@@ -303,11 +363,8 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     async def handle_execute_test_case(self, args: dict, user: str):
         """处理执行测试用例请求"""
         actuator_id = args.get('actuator_id')
-        if actuator_id:
-            actuator = SocketUserManager.get_actuator_by_id(actuator_id)
-        else:
-            actuator = SocketUserManager.get_actuator()
-        if not actuator:
+        target_id = await SocketUserManager.aresolve_actuator_id(actuator_id)
+        if not target_id:
             await self.send_json(SocketDataModel(
                 code=ResponseCode.ERROR,
                 msg=self._localize("没有可用的执行器，请先启动执行器服务" if not actuator_id else f"执行器 {actuator_id} 不在线")
@@ -320,7 +377,7 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
             await self.update_testcase_status(case_id, 1)  # 1 = 执行中
         
         # 转发给执行器，使用服务端分配的user_id而非客户端传入的user
-        await actuator.send_json(SocketDataModel(
+        await SocketUserManager.send_to_actuator_by_id(target_id, SocketDataModel(
             code=ResponseCode.SUCCESS,
             msg="execute",
             user=self.user_id,
@@ -339,11 +396,12 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     async def handle_execute_batch(self, args: dict, user: str):
         """处理批量执行请求"""
         actuator_id = args.get('actuator_id')
-        if actuator_id:
-            actuator = SocketUserManager.get_actuator_by_id(actuator_id)
-        else:
-            actuator = SocketUserManager.get_actuator()
-        if not actuator:
+        dispatcher = get_dispatcher()
+        online = (
+            await SocketUserManager.aresolve_actuator_id(actuator_id, lane='batch') if actuator_id
+            else await dispatcher.aopen_actuators()
+        )
+        if not online:
             await self.send_json(SocketDataModel(
                 code=ResponseCode.ERROR,
                 msg=self._localize("没有可用的执行器，请先启动执行器服务" if not actuator_id else f"执行器 {actuator_id} 不在线")
@@ -370,17 +428,21 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         # 将 batch_id 加入参数传递给执行器
         args['batch_id'] = batch_id
 
-        # 转发给执行器，使用服务端分配的user_id而非客户端传入的user
-        await actuator.send_json(SocketDataModel(
-            code=ResponseCode.SUCCESS,
-            msg="execute_batch",
-            user=self.user_id,
-            is_notice=NoticeType.ACTUATOR,
-            data=QueueModel(
-                func_name=UiSocketEnum.TEST_CASE_BATCH,
-                func_args=args
-            )
-        ))
+        if actuator_id:
+            # 指定执行器时整批发送，使用服务端分配的user_id而非客户端传入的user
+            await SocketUserManager.send_to_actuator_by_id(actuator_id, SocketDataModel(
+                code=ResponseCode.SUCCESS,
+                msg="execute_batch",
+                user=self.user_id,
+                is_notice=NoticeType.ACTUATOR,
+                data=QueueModel(
+                    func_name=UiSocketEnum.TEST_CASE_BATCH,
+                    func_args=args
+                )
+            ))
+        else:
+            # 未指定执行器时分片到所有空闲执行器
+            await dispatcher.start_batch(batch_id, case_ids, args, self.user_id)
 
         await self.send_json(SocketDataModel(
             code=ResponseCode.SUCCESS,
@@ -393,9 +455,12 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     
     async def handle_stop_execution(self, args: dict, user: str):
         """处理停止执行请求"""
-        # 广播给所有执行器
-        for actuator in SocketUserManager.get_all_actuators():
-            await actuator.send_json(SocketDataModel(
+        # 丢弃分片批次中尚未分配的用例
+        dispatcher = get_dispatcher()
+        await dispatcher.cancel_batches()
+        # 广播给所有执行器（包括其他 worker 上的执行器）
+        for record in await dispatcher.call_store('list_actuators'):
+            await SocketUserManager.send_to_actuator_by_id(record['id'], SocketDataModel(
                 code=ResponseCode.SUCCESS,
                 msg="stop",
                 user=self.user_id,
@@ -472,8 +537,12 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         """处理用例执行结果（来自执行器）"""
         logger.info(f"收到用例结果, 执行用户: {user}")
         
-        # 保存执行结果到数据库
-        await self.save_execution_result(args)
+        # 执行结果进入缓冲，短时间内批量写入数据库
+        await get_result_writer().submit(args)
+
+        # 分片批次：用例完成后为该执行器继续分配
+        if args.get('batch_id') and args.get('case_id'):
+            await get_dispatcher().on_case_result(self.user_id, int(args['batch_id']), int(args['case_id']))
         
         # 广播给所有前端（避免重复发送）
         await self.channel_layer.group_send(
@@ -488,6 +557,36 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
             }
         )
     
+    async def handle_case_artifacts(self, args: dict, user: str):
+        """处理用例产物地址回填（来自执行器，用例结果发送后异步上传完成）"""
+        # 对应的执行记录可能仍在缓冲中，先落库
+        await get_result_writer().flush()
+        updated = await self.apply_case_artifacts(args)
+        if not updated:
+            return
+
+        await self.channel_layer.group_send(
+            self.group_name,
+            {
+                'type': 'broadcast_result',
+                'data': {
+                    'func_name': UiSocketEnum.CASE_ARTIFACTS,
+                    'args': args,
+                    'user': user
+                }
+            }
+        )
+
+    async def handle_batch_shard_done(self, args: dict, user: str):
+        """执行器完成一个批量分片"""
+        if args.get('batch_id') and args.get('shard_id'):
+            await get_dispatcher().on_shard_done(self.user_id, int(args['batch_id']), args['shard_id'])
+
+    async def handle_batch_revoked(self, args: dict, user: str):
+        """执行器确认撤回的用例（工作窃取）"""
+        if args.get('batch_id'):
+            await get_dispatcher().on_revoked(self.user_id, int(args['batch_id']), args.get('case_ids') or [])
+
     async def broadcast_result(self, event):
         """广播结果给所有前端"""
         if not self.is_actuator:
@@ -514,96 +613,69 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     @sync_to_async
     def update_page_step_status(self, page_step_id: int, status: int, result_data: dict):
         """更新页面步骤状态"""
-        from .models import UiPageSteps
+        from .models import UiPageSteps, UiElementLocatorStat
         try:
             UiPageSteps.objects.filter(id=page_step_id).update(
                 status=status,
                 result_data=result_data
             )
+            attempts = locator_attempts(result_data.get('steps') or [])
+            if attempts:
+                UiElementLocatorStat.record_attempts(attempts)
             logger.info(f"页面步骤状态更新: page_step_id={page_step_id}, status={status}")
         except Exception as e:
             logger.error(f"更新页面步骤状态失败: {e}")
     
     @sync_to_async
     def save_execution_result(self, args: dict):
-        """保存执行结果到数据库"""
-        from .models import UiExecutionRecord, UiTestCase, UiBatchExecutionRecord
-        from django.contrib.auth.models import User
-        from datetime import datetime, timedelta
-
-        logger.info(f">>> save_execution_result 被调用, args: {args}")
-
-        # 状态映射: string -> int
-        status_map = {'success': 2, 'failed': 3, 'skipped': 4}
-        status_str = args.get('status', 'unknown')
-        status = status_map.get(status_str, 3)  # 默认失败
-
-        duration = args.get('duration', 0)
-        end_time = datetime.now()
-        start_time = end_time - timedelta(seconds=duration) if duration else end_time
-
-        # 提取步骤结果
-        steps = args.get('steps', [])
-        screenshots = []
-        for step in steps:
-            if step.get('screenshot'):
-                screenshots.append(step['screenshot'])
-
-        # 提取 trace 路径
-        trace_path = args.get('trace_path')
-
-        # 提取 batch_id
-        batch_id = args.get('batch_id')
-        
-        # 提取执行人信息
-        executor_id = args.get('executor_id')
-        executor = None
-        if executor_id:
-            try:
-                executor = User.objects.get(id=executor_id)
-                logger.info(f"找到执行人: id={executor_id}, username={executor.username}")
-            except User.DoesNotExist:
-                logger.warning(f"执行人不存在: id={executor_id}")
+        """立即保存单个执行结果到数据库（执行器回传的结果经缓冲写入器批量保存）"""
+        import datetime
 
-        case_id = args.get('case_id')
         try:
-            record = UiExecutionRecord.objects.create(
-                test_case_id=case_id,
-                batch_id=batch_id,
-                executor=executor,
-                status=status,
-                trigger_type='manual',
-                step_results=steps,
-                screenshots=screenshots,
-                trace_path=trace_path,
-                log=args.get('message', ''),
-                error_message=args.get('message') if status == 3 else None,
-                start_time=start_time,
-                end_time=end_time,
-                duration=duration
-            )
-            logger.info(f"执行记录已保存: id={record.id}, case_id={case_id}, batch_id={batch_id}, status={status}")
-
-            # 同时更新测试用例的状态
-            if case_id:
-                UiTestCase.objects.filter(id=case_id).update(
-                    status=status,
-                    result_data={'last_execution': record.id, 'steps': steps},
-                    error_message=args.get('message') if status == 3 else None
-                )
-                logger.info(f"测试用例状态已更新: case_id={case_id}, status={status}")
-
-            # 更新批量执行记录统计
-            if batch_id:
-                try:
-                    batch = UiBatchExecutionRecord.objects.get(id=batch_id)
-                    batch.update_statistics()
-                    logger.info(f"批量执行记录统计已更新: batch_id={batch_id}")
-                except UiBatchExecutionRecord.DoesNotExist:
-                    logger.warning(f"批量执行记录不存在: batch_id={batch_id}")
+            write_results([PendingResult(args, datetime.datetime.now())])
         except Exception as e:
             logger.error(f"保存执行结果失败: {e}", exc_info=True)
 
+    @sync_to_async
+    def apply_case_artifacts(self, args: dict) -> bool:
+        """将上传完成的截图/Trace 地址回填到执行记录
+
+        args: {result_id, step_screenshots: {步骤序号: 地址}, trace_path}
+        """
+        from .models import UiExecutionRecord, UiTestCase
+
+        result_id = args.get('result_id')
+        if not result_id:
+            return False
+        record = UiExecutionRecord.objects.filter(result_id=result_id).first()
+        if not record:
+            logger.warning(f"产物回填失败，执行记录不存在: result_id={result_id}")
+            return False
+
+        steps = list(record.step_results or [])
+        for index, url in (args.get('step_screenshots') or {}).items():
+            index = int(index)
+            if 0 <= index < len(steps) and isinstance(steps[index], dict):
+                steps[index] = {**steps[index], 'screenshot': url}
+        record.step_results = steps
+        record.screenshots = [step['screenshot'] for step in steps if isinstance(step, dict) and step.get('screenshot')]
+        update_fields = ['step_results', 'screenshots']
+        if 'trace_path' in args:
+            record.trace_path = args.get('trace_path')
+            update_fields.append('trace_path')
+            # 上传后已在后台生成的 Trace 索引一并写入
+            index = load_trace_index(record.trace_path) if record.trace_path else None
+            if index:
+                record.trace_data = index
+                update_fields.append('trace_data')
+        record.save(update_fields=update_fields)
+
+        UiTestCase.objects.filter(
+            id=record.test_case_id, result_data__last_execution=record.id
+        ).update(result_data={'last_execution': record.id, 'steps': steps})
+        logger.info(f"执行记录产物已回填: id={record.id}, 截图 {len(record.screenshots)} 张")
+        return True
+
     @sync_to_async
     def create_batch_record(self, case_ids: list) -> int:
         """创建批量执行记录"""
@@ -652,14 +724,34 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         # 允许执行器主动上报 IP（如宿主机 IP）
         if 'ip' in args and args['ip']:
             self.actuator_info['ip'] = args['ip']
+        if 'capacity' in args:
+            self.actuator_info['capacity'] = args['capacity']
 
         logger.info(f"执行器 {self.user_id} 信息已更新: {self.actuator_info}")
+        await self._sync_actuator_info()
         
         await self.send_json(SocketDataModel(
             code=ResponseCode.SUCCESS,
             msg="执行器信息已更新"
         ))
     
+    async def handle_actuator_capacity(self, args: dict, user: str):
+        """处理执行器各通道实时容量上报（任务开始/结束时由执行器推送）"""
+        if not self.is_actuator:
+            return
+        if 'capacity' in args:
+            self.actuator_info['capacity'] = args['capacity']
+        if 'is_open' in args:
+            self.actuator_info['is_open'] = args['is_open']
+        await self._sync_actuator_info()
+
+    async def _sync_actuator_info(self):
+        """执行器信息/容量同步到注册表，有未完成的分片批次时继续分配"""
+        dispatcher = get_dispatcher()
+        await dispatcher.call_store('touch', self.user_id, info=self.actuator_info)
+        if await dispatcher.call_store('active_batches'):
+            await dispatcher.on_actuator_available()
+    
     async def send_json(self, data: SocketDataModel):
         """发送JSON消息"""
         await self.send(text_data=data.model_dump_json())
@@ -667,8 +759,9 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
     @classmethod
     async def send_to_actuator(cls, task: ExecutionTaskModel, user: str) -> bool:
         """发送任务给执行器（供视图调用）"""
-        actuator = SocketUserManager.get_actuator()
-        if not actuator:
+        lane = 'batch' if task.task_type == 'batch' else 'interactive'
+        actuator_id = await SocketUserManager.aresolve_actuator_id(lane=lane)
+        if not actuator_id:
             return False
         
         func_name = UiSocketEnum.TEST_CASE
@@ -677,7 +770,7 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
         elif task.task_type == 'batch':
             func_name = UiSocketEnum.TEST_CASE_BATCH
         
-        await actuator.send_json(SocketDataModel(
+        return await SocketUserManager.send_to_actuator_by_id(actuator_id, SocketDataModel(
             code=ResponseCode.SUCCESS,
             msg="execute",
             user=user,
@@ -687,4 +780,3 @@ class UiAutomationConsumer(AsyncWebsocketConsumer):
                 func_args=task.model_dump()
             )
         ))
-        return True
@@ -0,0 +1,608 @@
+"""
+UI自动化执行器调度
+
+多 worker 部署时执行器连接分布在不同进程，调度状态需要在进程间共享：
+
+- 执行器注册表：记录执行器所在 channel、上报的信息与实时容量、心跳时间，
+  心跳超时的执行器视为离线（所在 worker 已退出）
+- 批量分片：未指定执行器的批量任务拆分为多个分片，分发给所有空闲执行器；
+  执行器完成分片后继续领取，分片大小随剩余用例数递减，尾部分片更小，各执行器同时收尾
+- 工作窃取：待分配用例已领完而某执行器空闲时，从积压最多的执行器撤回尚未开始的用例，
+  执行器确认撤回后重新分配
+- 执行器断开或心跳超时时，其未完成的用例重新入队
+
+配置 CHANNEL_LAYER_BACKEND=redis 时调度状态保存在 Redis（默认与通道层同一实例），
+否则保存在进程内存（仅单进程有效）。Redis 存储是阻塞调用，异步代码通过
+ActuatorDispatcher.call_store 在线程池中访问，不阻塞事件循环。
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from asgiref.sync import sync_to_async
+
+from .socket_models import SocketDataModel, QueueModel, NoticeType, ResponseCode, UiSocketEnum
+
+logger = logging.getLogger('ui_automation')
+
+
+def _lane_available(record: dict, lane: str) -> int:
+    """执行器某通道的空闲并发数（未上报容量的旧版执行器视为 1）"""
+    capacity = (record.get('info') or {}).get('capacity') or {}
+    return int((capacity.get(lane) or {}).get('available', 1))
+
+
+def _lane_running(record: dict) -> int:
+    capacity = (record.get('info') or {}).get('capacity') or {}
+    return sum(int(lane.get('running', 0)) for lane in capacity.values() if isinstance(lane, dict))
+
+
+class ActuatorStore:
+    """执行器注册表与批量分片状态（进程内存实现，线程安全）"""
+
+    # 方法调用是否会阻塞（网络 IO）；为 True 时调度器在线程池中调用
+    blocking = False
+
+    def __init__(self, heartbeat_ttl: int = 45):
+        self.heartbeat_ttl = heartbeat_ttl
+        self._actuators: dict[str, dict] = {}
+        # batch_id -> {'meta': dict, 'pending': list, 'inflight': {actuator_id: {case_id: [shard_id, pos]}}}
+        self._batches: dict[int, dict] = {}
+        self._locks: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    # ---------- 执行器注册表 ----------
+
+    def register(self, actuator_id: str, channel_name: str, info: dict) -> None:
+        with self._lock:
+            self._actuators[actuator_id] = {
+                'id': actuator_id,
+                'channel_name': channel_name,
+                'info': dict(info),
+                'heartbeat': time.time(),
+            }
+
+    def touch(self, actuator_id: str, info: Optional[dict] = None) -> None:
+        """刷新心跳，可同时更新执行器信息"""
+        with self._lock:
+            record = self._actuators.get(actuator_id)
+            if record is None:
+                return
+            record['heartbeat'] = time.time()
+            if info:
+                record['info'].update(info)
+
+    def unregister(self, actuator_id: str, channel_name: Optional[str] = None) -> bool:
+        """注销执行器；指定 channel_name 时仅注销该连接（执行器已在其他 worker 重连时保留新注册）"""
+        with self._lock:
+            record = self._actuators.get(actuator_id)
+            if record is None or (channel_name and record['channel_name'] != channel_name):
+                return False
+            del self._actuators[actuator_id]
+            return True
+
+    def get_actuator(self, actuator_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._actuators.get(actuator_id)
+            return dict(record) if record and self._alive(record) else None
+
+    def list_actuators(self) -> list[dict]:
+        with self._lock:
+            return [dict(record) for record in self._actuators.values() if self._alive(record)]
+
+    def pop_expired(self) -> list[str]:
+        """移除心跳超时的执行器，返回其 ID"""
+        with self._lock:
+            expired = [aid for aid, record in self._actuators.items() if not self._alive(record)]
+            for actuator_id in expired:
+                del self._actuators[actuator_id]
+            return expired
+
+    def _alive(self, record: dict) -> bool:
+        return time.time() - record['heartbeat'] <= self.heartbeat_ttl
+
+    # ---------- 批量分片 ----------
+
+    def create_batch(self, batch_id: int, case_ids: list[int], meta: dict) -> None:
+        with self._lock:
+            self._batches[batch_id] = {'meta': meta, 'pending': list(case_ids), 'inflight': {}}
+
+    def get_batch_meta(self, batch_id: int) -> Optional[dict]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return batch['meta'] if batch else None
+
+    def active_batches(self) -> list[int]:
+        with self._lock:
+            return list(self._batches)
+
+    def pending_count(self, batch_id: int) -> int:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            return len(batch['pending']) if batch else 0
+
+    def pop_pending(self, batch_id: int, count: int) -> list[int]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if not batch:
+                return []
+            popped, batch['pending'] = batch['pending'][:count], batch['pending'][count:]
+            return popped
+
+    def requeue(self, batch_id: int, case_ids: list[int]) -> None:
+        """用例重新放回待分配队列头部"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch:
+                batch['pending'] = list(case_ids) + batch['pending']
+
+    def assign(self, batch_id: int, actuator_id: str, shard_id: str, case_ids: list[int]) -> bool:
+        """把分片分配给执行器；执行器在该批次中仍有在途用例（已被其他调度抢先分配）时返回 False"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if not batch or batch['inflight'].get(actuator_id):
+                return False
+            batch['inflight'][actuator_id] = {case_id: [shard_id, pos] for pos, case_id in enumerate(case_ids)}
+            return True
+
+    def inflight(self, batch_id: int) -> dict[str, dict[int, list]]:
+        """执行器 -> {用例ID: [分片ID, 分片内序号]}"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if not batch:
+                return {}
+            return {aid: dict(cases) for aid, cases in batch['inflight'].items()}
+
+    def release(self, batch_id: int, actuator_id: str, case_ids: Optional[list[int]] = None,
+                shard_id: Optional[str] = None) -> list[int]:
+        """从执行器的在途用例中移除（默认全部，可按用例或分片），返回被移除的用例ID"""
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if not batch:
+                return []
+            inflight = batch['inflight'].get(actuator_id, {})
+            if case_ids is not None:
+                targets = [case_id for case_id in case_ids if case_id in inflight]
+            elif shard_id is not None:
+                targets = [case_id for case_id, (shard, _) in inflight.items() if shard == shard_id]
+            else:
+                targets = list(inflight)
+            for case_id in targets:
+                del inflight[case_id]
+            return targets
+
+    def delete_batch(self, batch_id: int) -> None:
+        with self._lock:
+            self._batches.pop(batch_id, None)
+
+    def acquire_lock(self, name: str, ttl: int) -> bool:
+        with self._lock:
+            now = time.time()
+            if self._locks.get(name, 0) > now:
+                return False
+            self._locks[name] = now + ttl
+            return True
+
+    def release_lock(self, name: str) -> None:
+        with self._lock:
+            self._locks.pop(name, None)
+
+
+class RedisActuatorStore(ActuatorStore):
+    """基于 Redis 的执行器注册表与分片状态，多个 ASGI worker 共享"""
+
+    PREFIX = "wharttest:ui_dispatch:"
+    blocking = True
+
+    # 执行器在该批次没有在途用例时才写入分片（同一执行器不会被多个 worker 同时分配）
+    # KEYS: 在途用例哈希, 批次执行器集合；ARGV: 执行器ID, 用例ID, 分片位置, ...
+    ASSIGN_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+"""
+
+    def __init__(self, redis_url: str, heartbeat_ttl: int = 45):
+        super().__init__(heartbeat_ttl=heartbeat_ttl)
+        import redis
+
+        self._client = redis.Redis.from_url(
+            redis_url,
+            decode_responses=True,
+            socket_connect_timeout=1,
+            socket_timeout=2,
+        )
+        self._assign_script = self._client.register_script(self.ASSIGN_SCRIPT)
+
+    def _key(self, *parts) -> str:
+        return self.PREFIX + ':'.join(str(part) for part in parts)
+
+    # ---------- 执行器注册表 ----------
+
+    def register(self, actuator_id: str, channel_name: str, info: dict) -> None:
+        record = {'id': actuator_id, 'channel_name': channel_name, 'info': dict(info), 'heartbeat': time.time()}
+        self._client.hset(self._key('actuators'), actuator_id, json.dumps(record))
+
+    def _load(self, actuator_id: str) -> Optional[dict]:
+        raw = self._client.hget(self._key('actuators'), actuator_id)
+        return json.loads(raw) if raw else None
+
+    def touch(self, actuator_id: str, info: Optional[dict] = None) -> None:
+        record = self._load(actuator_id)
+        if record is None:
+            return
+        record['heartbeat'] = time.time()
+        if info:
+            record['info'].update(info)
+        self._client.hset(self._key('actuators'), actuator_id, json.dumps(record))
+
+    def unregister(self, actuator_id: str, channel_name: Optional[str] = None) -> bool:
+        record = self._load(actuator_id)
+        if record is None or (channel_name and record['channel_name'] != channel_name):
+            return False
+        self._client.hdel(self._key('actuators'), actuator_id)
+        return True
+
+    def get_actuator(self, actuator_id: str) -> Optional[dict]:
+        record = self._load(actuator_id)
+        return record if record and self._alive(record) else None
+
+    def _all_records(self) -> list[dict]:
+        return [json.loads(raw) for raw in self._client.hgetall(self._key('actuators')).values()]
+
+    def list_actuators(self) -> list[dict]:
+        return [record for record in self._all_records() if self._alive(record)]
+
+    def pop_expired(self) -> list[str]:
+        expired = [record['id'] for record in self._all_records() if not self._alive(record)]
+        if expired:
+            self._client.hdel(self._key('actuators'), *expired)
+        return expired
+
+    # ---------- 批量分片 ----------
+
+    def create_batch(self, batch_id: int, case_ids: list[int], meta: dict) -> None:
+        pipe = self._client.pipeline()
+        pipe.set(self._key('batch', batch_id, 'meta'), json.dumps(meta))
+        pipe.delete(self._key('batch', batch_id, 'pending'))
+        if case_ids:
+            pipe.rpush(self._key('batch', batch_id, 'pending'), *case_ids)
+        pipe.sadd(self._key('batches'), batch_id)
+        pipe.execute()
+
+    def get_batch_meta(self, batch_id: int) -> Optional[dict]:
+        raw = self._client.get(self._key('batch', batch_id, 'meta'))
+        return json.loads(raw) if raw else None
+
+    def active_batches(self) -> list[int]:
+        return [int(batch_id) for batch_id in self._client.smembers(self._key('batches'))]
+
+    def pending_count(self, batch_id: int) -> int:
+        return self._client.llen(self._key('batch', batch_id, 'pending'))
+
+    def pop_pending(self, batch_id: int, count: int) -> list[int]:
+        key = self._key('batch', batch_id, 'pending')
+        pipe = self._client.pipeline(transaction=True)
+        pipe.lrange(key, 0, count - 1)
+        pipe.ltrim(key, count, -1)
+        popped, _ = pipe.execute()
+        return [int(case_id) for case_id in popped]
+
+    def requeue(self, batch_id: int, case_ids: list[int]) -> None:
+        if case_ids and self._client.sismember(self._key('batches'), batch_id):
+            self._client.lpush(self._key('batch', batch_id, 'pending'), *reversed(case_ids))
+
+    def assign(self, batch_id: int, actuator_id: str, shard_id: str, case_ids: list[int]) -> bool:
+        if not case_ids:
+            return False
+        args = [actuator_id]
+        for pos, case_id in enumerate(case_ids):
+            args.extend([case_id, f"{shard_id}:{pos}"])
+        return bool(self._assign_script(
+            keys=[
+                self._key('batch', batch_id, 'inflight', actuator_id),
+                self._key('batch', batch_id, 'actuators'),
+            ],
+            args=args,
+        ))
+
+    def inflight(self, batch_id: int) -> dict[str, dict[int, list]]:
+        result = {}
+        for actuator_id in self._client.smembers(self._key('batch', batch_id, 'actuators')):
+            cases = self._client.hgetall(self._key('batch', batch_id, 'inflight', actuator_id))
+            result[actuator_id] = {}
+            for case_id, value in cases.items():
+                shard, pos = value.rsplit(':', 1)
+                result[actuator_id][int(case_id)] = [shard, int(pos)]
+        return result
+
+    def release(self, batch_id: int, actuator_id: str, case_ids: Optional[list[int]] = None,
+                shard_id: Optional[str] = None) -> list[int]:
+        key = self._key('batch', batch_id, 'inflight', actuator_id)
+        inflight = self._client.hgetall(key)
+        if case_ids is not None:
+            targets = [case_id for case_id in case_ids if str(case_id) in inflight]
+        elif shard_id is not None:
+            targets = [int(case_id) for case_id, value in inflight.items() if value.rsplit(':', 1)[0] == shard_id]
+        else:
+            targets = [int(case_id) for case_id in inflight]
+        if targets:
+            self._client.hdel(key, *targets)
+        return targets
+
+    def delete_batch(self, batch_id: int) -> None:
+        actuators = self._client.smembers(self._key('batch', batch_id, 'actuators'))
+        pipe = self._client.pipeline()
+        for actuator_id in actuators:
+            pipe.delete(self._key('batch', batch_id, 'inflight', actuator_id))
+        pipe.delete(
+            self._key('batch', batch_id, 'meta'),
+            self._key('batch', batch_id, 'pending'),
+            self._key('batch', batch_id, 'actuators'),
+        )
+        pipe.srem(self._key('batches'), batch_id)
+        pipe.execute()
+
+    def acquire_lock(self, name: str, ttl: int) -> bool:
+        return bool(self._client.set(self._key('lock', name), 1, nx=True, ex=ttl))
+
+    def release_lock(self, name: str) -> None:
+        self._client.delete(self._key('lock', name))
+
+
+class ActuatorDispatcher:
+    """执行器负载感知调度与批量分片
+
+    Args:
+        store: 调度状态存储
+        sender: 发送消息给执行器的协程 sender(执行器记录, SocketDataModel)，默认通过通道层发送
+        min_shard: 分片最少用例数
+        max_shard: 分片最多用例数
+        steal_min: 执行器积压不少于该值的 2 倍时才发起窃取
+        steal_timeout: 撤回请求等待确认的时间（秒），超时后允许再次窃取
+    """
+
+    def __init__(
+        self,
+        store: ActuatorStore,
+        sender: Optional[Callable[[dict, SocketDataModel], Awaitable[None]]] = None,
+        min_shard: int = 5,
+        max_shard: int = 100,
+        steal_min: int = 2,
+        steal_timeout: int = 30,
+    ):
+        self.store = store
+        self.sender = sender or self._send_via_channel_layer
+        self.min_shard = max(1, min_shard)
+        self.max_shard = max(self.min_shard, max_shard)
+        self.steal_min = max(1, steal_min)
+        self.steal_timeout = steal_timeout
+
+    async def call_store(self, method: str, *args, **kwargs):
+        """在异步代码中调用调度状态存储；阻塞的存储（Redis）在线程池中执行"""
+        func = getattr(self.store, method)
+        if not self.store.blocking:
+            return func(*args, **kwargs)
+        return await sync_to_async(func, thread_sensitive=False)(*args, **kwargs)
+
+    # ---------- 执行器选择 ----------
+
+    @staticmethod
+    def _open(records: list[dict]) -> list[dict]:
+        return [record for record in records if (record.get('info') or {}).get('is_open', True)]
+
+    @staticmethod
+    def _pick(candidates: list[dict], lane: str) -> Optional[dict]:
+        if not candidates:
+            return None
+        return max(candidates, key=lambda record: (_lane_available(record, lane), -_lane_running(record)))
+
+    def open_actuators(self) -> list[dict]:
+        return self._open(self.store.list_actuators())
+
+    async def aopen_actuators(self) -> list[dict]:
+        return self._open(await self.call_store('list_actuators'))
+
+    def pick_actuator(self, lane: str = 'interactive') -> Optional[dict]:
+        """选择指定通道空闲并发最多、总负载最低的执行器"""
+        return self._pick(self.open_actuators(), lane)
+
+    async def apick_actuator(self, lane: str = 'interactive') -> Optional[dict]:
+        return self._pick(await self.aopen_actuators(), lane)
+
+    async def send(self, actuator_id: str, socket_data: SocketDataModel) -> bool:
+        record = await self.call_store('get_actuator', actuator_id)
+        if record is None:
+            return False
+        await self.sender(record, socket_data)
+        return True
+
+    # ---------- 批量分片 ----------
+
+    async def start_batch(self, batch_id: int, case_ids: list[int], args: dict, user: Optional[str]) -> int:
+        """创建分片批次并分发，返回收到分片的执行器数量（0 表示没有可用执行器）"""
+        if not await self.aopen_actuators():
+            return 0
+        args = {key: value for key, value in args.items() if key not in ('case_ids', 'actuator_id')}
+        await self.call_store('create_batch', batch_id, list(case_ids), {'args': args, 'user': user})
+        assigned = await self.pump(batch_id)
+        logger.info(f"批量执行 {batch_id} 已分片: {len(case_ids)} 个用例, {assigned} 个执行器")
+        return assigned
+
+    async def pump(self, batch_id: int) -> int:
+        """为空闲执行器分配分片，待分配为空时发起窃取，全部完成时清理批次；返回本次分配的分片数"""
+        await self.reap()
+        meta = await self.call_store('get_batch_meta', batch_id)
+        if meta is None:
+            return 0
+
+        actuators = await self.aopen_actuators()
+        inflight = await self.call_store('inflight', batch_id)
+        idle = [
+            record for record in actuators
+            if not inflight.get(record['id'])
+            and (record['id'] in inflight or _lane_available(record, 'batch') > 0)
+        ]
+
+        assigned = 0
+        waiting = False
+        for record in idle:
+            size = self._shard_size(await self.call_store('pending_count', batch_id), len(actuators))
+            case_ids = await self.call_store('pop_pending', batch_id, size)
+            if not case_ids:
+                waiting = True
+                break
+            if await self._send_shard(batch_id, meta, record, case_ids):
+                assigned += 1
+            else:
+                # 其他 worker 已抢先给该执行器分配了分片
+                await self.call_store('requeue', batch_id, case_ids)
+
+        if await self.call_store('pending_count', batch_id) == 0:
+            inflight = await self.call_store('inflight', batch_id)
+            if not any(inflight.values()):
+                await self.call_store('delete_batch', batch_id)
+                logger.info(f"批量执行 {batch_id} 分片全部完成")
+            elif waiting:
+                await self._steal(batch_id, inflight)
+        return assigned
+
+    async def on_case_result(self, actuator_id: str, batch_id: int, case_id: int) -> None:
+        if await self.call_store('get_batch_meta', batch_id) is None:
+            return
+        await self.call_store('release', batch_id, actuator_id, case_ids=[case_id])
+        if not (await self.call_store('inflight', batch_id)).get(actuator_id):
+            await self.pump(batch_id)
+
+    async def on_shard_done(self, actuator_id: str, batch_id: int, shard_id: str) -> None:
+        """执行器完成分片（结果丢失的用例不再等待）"""
+        if await self.call_store('get_batch_meta', batch_id) is None:
+            return
+        await self.call_store('release', batch_id, actuator_id, shard_id=shard_id)
+        await self.pump(batch_id)
+
+    async def on_revoked(self, actuator_id: str, batch_id: int, case_ids: list[int]) -> None:
+        """执行器确认撤回的用例重新入队并分配"""
+        await self.call_store('release_lock', f"steal:{batch_id}:{actuator_id}")
+        released = await self.call_store(
+            'release', batch_id, actuator_id, case_ids=[int(case_id) for case_id in case_ids]
+        )
+        if released:
+            logger.info(f"批量执行 {batch_id}: 从执行器 {actuator_id} 撤回 {len(released)} 个用例重新分配")
+            await self.call_store('requeue', batch_id, released)
+        await self.pump(batch_id)
+
+    async def on_actuator_lost(self, actuator_id: str) -> None:
+        """执行器离线，未完成用例重新入队"""
+        for batch_id in await self.call_store('active_batches'):
+            released = await self.call_store('release', batch_id, actuator_id)
+            if released:
+                logger.warning(f"执行器 {actuator_id} 离线, 批量执行 {batch_id} 的 {len(released)} 个用例重新入队")
+                await self.call_store('requeue', batch_id, released)
+                await self.pump(batch_id)
+
+    async def on_actuator_available(self) -> None:
+        """执行器上线或空闲时继续分配未完成的批次"""
+        for batch_id in await self.call_store('active_batches'):
+            await self.pump(batch_id)
+
+    async def reap(self) -> None:
+        """清理心跳超时的执行器（所在 worker 异常退出时不会触发断开事件）"""
+        for actuator_id in await self.call_store('pop_expired'):
+            logger.warning(f"执行器 {actuator_id} 心跳超时")
+            await self.on_actuator_lost(actuator_id)
+
+    async def cancel_batches(self) -> list[int]:
+        """停止执行时丢弃所有分片批次的待分配用例"""
+        batch_ids = await self.call_store('active_batches')
+        for batch_id in batch_ids:
+            await self.call_store('delete_batch', batch_id)
+        return batch_ids
+
+    def _shard_size(self, pending: int, actuator_count: int) -> int:
+        """分片大小随剩余用例数递减（剩余量 / 2N），避免尾部由单个执行器拖长"""
+        size = math.ceil(pending / (2 * max(1, actuator_count)))
+        return max(self.min_shard, min(self.max_shard, size))
+
+    async def _send_shard(self, batch_id: int, meta: dict, record: dict, case_ids: list[int]) -> bool:
+        """原子地认领执行器并发送分片；执行器已被其他调度认领时返回 False"""
+        shard_id = uuid.uuid4().hex[:12]
+        if not await self.call_store('assign', batch_id, record['id'], shard_id, case_ids):
+            return False
+        await self.sender(record, SocketDataModel(
+            code=ResponseCode.SUCCESS,
+            msg="execute_batch",
+            user=meta.get('user'),
+            is_notice=NoticeType.ACTUATOR,
+            data=QueueModel(
+                func_name=UiSocketEnum.TEST_CASE_BATCH,
+                func_args={**meta['args'], 'batch_id': batch_id, 'shard_id': shard_id, 'case_ids': case_ids},
+            ),
+        ))
+        logger.info(f"批量执行 {batch_id}: 分片 {shard_id} ({len(case_ids)} 个用例) -> 执行器 {record['id']}")
+        return True
+
+    async def _steal(self, batch_id: int, inflight: dict) -> None:
+        """从积压最多的执行器撤回后半部分尚未开始的用例"""
+        victim_id, cases = max(inflight.items(), key=lambda item: len(item[1]))
+        if len(cases) < 2 * self.steal_min:
+            return
+        if not await self.call_store('acquire_lock', f"steal:{batch_id}:{victim_id}", self.steal_timeout):
+            return
+        ordered = sorted(cases, key=lambda case_id: (cases[case_id][0], cases[case_id][1]))
+        case_ids = ordered[len(ordered) // 2:]
+        sent = await self.send(victim_id, SocketDataModel(
+            code=ResponseCode.SUCCESS,
+            msg="revoke",
+            is_notice=NoticeType.ACTUATOR,
+            data=QueueModel(
+                func_name=UiSocketEnum.BATCH_REVOKE,
+                func_args={'batch_id': batch_id, 'case_ids': case_ids},
+            ),
+        ))
+        if sent:
+            logger.info(f"批量执行 {batch_id}: 向执行器 {victim_id} 请求撤回 {len(case_ids)} 个用例")
+
+    @staticmethod
+    async def _send_via_channel_layer(record: dict, socket_data: SocketDataModel) -> None:
+        from channels.layers import get_channel_layer
+
+        await get_channel_layer().send(record['channel_name'], {
+            'type': 'actuator.forward',
+            'text': socket_data.model_dump_json(),
+        })
+
+
+# 全局单例
+_dispatcher: Optional[ActuatorDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> ActuatorDispatcher:
+    """获取全局调度器单例（通道层为 Redis 时调度状态保存在 Redis）"""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                from django.conf import settings
+
+                heartbeat_ttl = getattr(settings, 'UI_ACTUATOR_HEARTBEAT_TTL', 45)
+                redis_url = getattr(settings, 'UI_DISPATCH_REDIS_URL', '')
+                if redis_url:
+                    store = RedisActuatorStore(redis_url, heartbeat_ttl=heartbeat_ttl)
+                else:
+                    store = ActuatorStore(heartbeat_ttl=heartbeat_ttl)
+                _dispatcher = ActuatorDispatcher(
+                    store,
+                    min_shard=getattr(settings, 'UI_BATCH_MIN_SHARD', 5),
+                    max_shard=getattr(settings, 'UI_BATCH_MAX_SHARD', 100),
+                )
+    return _dispatcher
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui_automation', '0003_add_batch_execution_record'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uiexecutionrecord',
+            name='result_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='执行器结果标识'),
+        ),
+    ]
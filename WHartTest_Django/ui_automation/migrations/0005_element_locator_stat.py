@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-19 11:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ui_automation', '0004_uiexecutionrecord_result_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UiElementLocatorStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('variant', models.SmallIntegerField(choices=[(1, '主定位'), (2, '备用定位1'), (3, '备用定位2')], verbose_name='定位方式')),
+                ('locator_hash', models.CharField(max_length=16, verbose_name='定位指纹')),
+                ('success_count', models.PositiveIntegerField(default=0, verbose_name='成功次数')),
+                ('failure_count', models.PositiveIntegerField(default=0, verbose_name='失败次数')),
+                ('consecutive_failures', models.PositiveIntegerField(default=0, verbose_name='连续失败次数')),
+                ('avg_ms', models.FloatField(default=0, verbose_name='平均解析耗时(毫秒)')),
+                ('last_ms', models.FloatField(default=0, verbose_name='最近解析耗时(毫秒)')),
+                ('max_ms', models.FloatField(default=0, verbose_name='最大解析耗时(毫秒)')),
+                ('last_success_at', models.DateTimeField(blank=True, null=True, verbose_name='最近成功时间')),
+                ('last_failure_at', models.DateTimeField(blank=True, null=True, verbose_name='最近失败时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+                ('element', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='locator_stats', to='ui_automation.uielement', verbose_name='所属元素')),
+            ],
+            options={
+                'verbose_name': '元素定位统计',
+                'verbose_name_plural': '元素定位统计',
+                'db_table': 'ui_element_locator_stat',
+                'unique_together': {('element', 'variant')},
+            },
+        ),
+    ]
@@ -6,13 +6,19 @@ UI 自动化数据模型
 - UiModule: 模块管理
 - UiPage: 页面管理
 - UiElement: 页面元素
+- UiElementLocatorStat: 元素各定位方式的解析统计
 - UiPageSteps: 页面步骤（一组操作的集合）
 - UiPageStepsDetailed: 步骤详情（具体的操作步骤）
 - UiTestCase: 测试用例
 - UiCaseStepsDetailed: 用例步骤（引用 PageSteps）
 """
 
+import hashlib
+from collections import defaultdict
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -142,6 +148,143 @@ class UiElement(models.Model):
     def __str__(self):
         return f"{self.page.name} - {self.name}"
 
+    # 定位方式序号 -> 字段后缀（1 = 主定位, 2/3 = 备用定位）
+    LOCATOR_VARIANT_SUFFIX = {1: '', 2: '_2', 3: '_3'}
+
+    def locator_of(self, variant: int) -> tuple:
+        """指定定位方式的 (定位类型, 定位表达式, 元素下标)"""
+        suffix = self.LOCATOR_VARIANT_SUFFIX[variant]
+        return (
+            getattr(self, f'locator_type{suffix}') or '',
+            getattr(self, f'locator_value{suffix}') or '',
+            getattr(self, f'locator_index{suffix}') or 0,
+        )
+
+    def locator_signature(self, variant: int) -> str:
+        """定位方式指纹，定位表达式修改后变化"""
+        raw = '\x1f'.join(str(part) for part in self.locator_of(variant))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+class UiElementLocatorStat(models.Model):
+    """元素定位解析统计
+
+    按元素的每个定位方式记录执行器的解析结果与耗时，执行器据此优先尝试历史最快的可用定位，
+    对经常失败的定位使用较短的探测超时。定位表达式修改后（指纹变化）统计重新开始。
+    """
+    VARIANT_CHOICES = [(1, _('主定位')), (2, _('备用定位1')), (3, _('备用定位2'))]
+    # 平均耗时的滑动平均权重
+    EMA_ALPHA = 0.3
+
+    element = models.ForeignKey(
+        UiElement, on_delete=models.CASCADE,
+        related_name='locator_stats', verbose_name=_('所属元素')
+    )
+    variant = models.SmallIntegerField(_('定位方式'), choices=VARIANT_CHOICES)
+    locator_hash = models.CharField(_('定位指纹'), max_length=16)
+    success_count = models.PositiveIntegerField(_('成功次数'), default=0)
+    failure_count = models.PositiveIntegerField(_('失败次数'), default=0)
+    consecutive_failures = models.PositiveIntegerField(_('连续失败次数'), default=0)
+    avg_ms = models.FloatField(_('平均解析耗时(毫秒)'), default=0)
+    last_ms = models.FloatField(_('最近解析耗时(毫秒)'), default=0)
+    max_ms = models.FloatField(_('最大解析耗时(毫秒)'), default=0)
+    last_success_at = models.DateTimeField(_('最近成功时间'), null=True, blank=True)
+    last_failure_at = models.DateTimeField(_('最近失败时间'), null=True, blank=True)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+
+    class Meta:
+        verbose_name = _('元素定位统计')
+        verbose_name_plural = _('元素定位统计')
+        unique_together = ('element', 'variant')
+        db_table = 'ui_element_locator_stat'
+
+    def __str__(self):
+        return f"{self.element_id} - {self.get_variant_display()}"
+
+    @property
+    def success_rate(self) -> float:
+        total = self.success_count + self.failure_count
+        return round(self.success_count / total * 100, 1) if total else 0
+
+    def reset(self, locator_hash: str) -> None:
+        """定位表达式已修改，统计重新开始"""
+        self.locator_hash = locator_hash
+        self.success_count = self.failure_count = self.consecutive_failures = 0
+        self.avg_ms = self.last_ms = self.max_ms = 0
+        self.last_success_at = self.last_failure_at = None
+
+    def apply(self, ok: bool, ms: float, at) -> None:
+        """计入一次解析结果；平均/最大耗时只统计成功的解析"""
+        if ok:
+            self.avg_ms = ms if not self.success_count else self.avg_ms + self.EMA_ALPHA * (ms - self.avg_ms)
+            self.success_count += 1
+            self.consecutive_failures = 0
+            self.last_ms = ms
+            self.max_ms = max(self.max_ms, ms)
+            self.last_success_at = at
+        else:
+            self.failure_count += 1
+            self.consecutive_failures += 1
+            self.last_failure_at = at
+
+    @classmethod
+    def record_attempts(cls, attempts: list[dict]) -> int:
+        """合并执行器上报的定位尝试，返回涉及的统计行数
+
+        Args:
+            attempts: [{'element_id', 'variant', 'ok', 'ms'}, ...]，同一元素可出现多次
+        """
+        grouped = defaultdict(list)
+        for attempt in attempts:
+            try:
+                key = (int(attempt['element_id']), int(attempt['variant']))
+                ms = float(attempt.get('ms') or 0)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if key[1] in UiElement.LOCATOR_VARIANT_SUFFIX:
+                grouped[key].append((bool(attempt.get('ok')), ms))
+        if not grouped:
+            return 0
+
+        elements = UiElement.objects.in_bulk({element_id for element_id, variant in grouped})
+        existing = {
+            (stat.element_id, stat.variant): stat
+            for stat in cls.objects.filter(element_id__in=elements.keys())
+        }
+        now = timezone.now()
+        to_create, to_update = [], []
+        for (element_id, variant), outcomes in grouped.items():
+            element = elements.get(element_id)
+            if element is None:
+                continue
+            signature = element.locator_signature(variant)
+            stat = existing.get((element_id, variant))
+            if stat is None:
+                stat = cls(element_id=element_id, variant=variant, locator_hash=signature)
+                to_create.append(stat)
+            else:
+                if stat.locator_hash != signature:
+                    stat.reset(signature)
+                to_update.append(stat)
+            for ok, ms in outcomes:
+                stat.apply(ok, ms, now)
+
+        fields = [
+            'locator_hash', 'success_count', 'failure_count', 'consecutive_failures',
+            'avg_ms', 'last_ms', 'max_ms', 'last_success_at', 'last_failure_at', 'updated_at',
+        ]
+        for stat in to_update:
+            stat.updated_at = now
+        if to_update:
+            cls.objects.bulk_update(to_update, fields)
+        if to_create:
+            # 并发写入时以后写入的为准（统计为近似值）
+            cls.objects.bulk_create(
+                to_create, update_conflicts=True,
+                unique_fields=['element', 'variant'], update_fields=fields,
+            )
+        return len(to_create) + len(to_update)
+
 
 class UiPageSteps(models.Model):
     """页面步骤（一组操作的集合），如"登录操作"、"添加商品"等"""
@@ -352,6 +495,25 @@ class UiBatchExecutionRecord(models.Model):
                 self.duration = (self.end_time - self.start_time).total_seconds()
         self.save()
 
+    @classmethod
+    def add_results(cls, batch_id: int, passed: int = 0, failed: int = 0) -> bool:
+        """原子累加成功/失败数，不读取、不重写整行；返回批次是否存在
+
+        计数达到用例总数时按执行记录校准一次（update_statistics）并写入结束状态。
+        """
+        updated = cls.objects.filter(id=batch_id).update(
+            passed_cases=F('passed_cases') + passed,
+            failed_cases=F('failed_cases') + failed,
+        )
+        if not updated:
+            return False
+        batch = cls.objects.filter(
+            id=batch_id, status__lt=2, total_cases__lte=F('passed_cases') + F('failed_cases')
+        ).first()
+        if batch:
+            batch.update_statistics()
+        return True
+
 
 class UiExecutionRecord(models.Model):
     """UI 测试执行记录"""
@@ -378,6 +540,7 @@ class UiExecutionRecord(models.Model):
     video_path = models.CharField(_('视频路径'), max_length=500, null=True, blank=True)
     trace_path = models.CharField(_('Trace 文件路径'), max_length=500, null=True, blank=True)
     trace_data = models.JSONField(_('Trace 解析数据'), null=True, blank=True)
+    result_id = models.CharField(_('执行器结果标识'), max_length=64, null=True, blank=True, db_index=True)
     log = models.TextField(_('执行日志'), blank=True, null=True)
     error_message = models.TextField(_('错误信息'), null=True, blank=True)
     start_time = models.DateTimeField(_('开始时间'), null=True, blank=True)
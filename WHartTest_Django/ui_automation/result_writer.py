@@ -0,0 +1,206 @@
+"""
+UI自动化执行结果缓冲写入
+
+执行器并发回传用例结果时，逐条写库会让每个结果执行多次查询，并在同一批次行上串行等待。
+结果先进入进程内缓冲，按短定时器或缓冲数量批量落库（单个事务）：
+
+- 执行人、用例、批次是否存在各一次查询
+- 执行记录 bulk_create 一次插入
+- 用例最新状态 bulk_update 一次更新
+- 批次成功/失败数按批次汇总后用 F 表达式原子累加，计数达到总数时校准一次
+- 步骤中的定位尝试合并到元素定位统计（涉及元素各一次查询与批量更新）
+
+每次刷写的查询数只与涉及的批次数相关，与结果数无关。
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+logger = logging.getLogger('ui_automation')
+
+# 执行器上报状态 -> 执行记录状态
+STATUS_MAP = {'success': 2, 'failed': 3, 'skipped': 4}
+
+
+@dataclass
+class PendingResult:
+    """待写入的用例结果"""
+    args: dict
+    received_at: datetime
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def locator_attempts(steps) -> list[dict]:
+    """从步骤结果中提取定位尝试 [{'element_id', 'variant', 'ok', 'ms'}, ...]"""
+    attempts = []
+    for step in steps:
+        if not isinstance(step, dict) or not step.get('element_id'):
+            continue
+        for attempt in step.get('locator_attempts') or []:
+            if isinstance(attempt, dict):
+                attempts.append({**attempt, 'element_id': step['element_id']})
+    return attempts
+
+
+def write_results(entries: list[PendingResult]) -> list:
+    """批量写入用例结果（同步），返回创建的执行记录"""
+    from django.contrib.auth.models import User
+    from .models import UiExecutionRecord, UiTestCase, UiBatchExecutionRecord, UiElementLocatorStat
+
+    if not entries:
+        return []
+
+    executor_ids = {_to_int(entry.args.get('executor_id')) for entry in entries} - {None}
+    case_ids = {_to_int(entry.args.get('case_id')) for entry in entries} - {None}
+    batch_ids = {_to_int(entry.args.get('batch_id')) for entry in entries} - {None}
+    existing_executors = set(User.objects.filter(id__in=executor_ids).values_list('id', flat=True))
+    existing_cases = set(UiTestCase.objects.filter(id__in=case_ids).values_list('id', flat=True))
+    existing_batches = set(UiBatchExecutionRecord.objects.filter(id__in=batch_ids).values_list('id', flat=True))
+
+    records = []
+    for entry in entries:
+        args = entry.args
+        case_id = _to_int(args.get('case_id'))
+        if case_id not in existing_cases:
+            logger.warning(f"测试用例不存在，跳过执行结果: case_id={case_id}")
+            continue
+        batch_id = _to_int(args.get('batch_id'))
+        if batch_id and batch_id not in existing_batches:
+            logger.warning(f"批量执行记录不存在: batch_id={batch_id}")
+            batch_id = None
+        executor_id = _to_int(args.get('executor_id'))
+        if executor_id and executor_id not in existing_executors:
+            logger.warning(f"执行人不存在: id={executor_id}")
+            executor_id = None
+
+        status = STATUS_MAP.get(args.get('status', 'unknown'), 3)  # 默认失败
+        duration = args.get('duration', 0)
+        end_time = entry.received_at
+        steps = args.get('steps', [])
+        records.append(UiExecutionRecord(
+            test_case_id=case_id,
+            batch_id=batch_id,
+            executor_id=executor_id,
+            status=status,
+            trigger_type='manual',
+            step_results=steps,
+            screenshots=[step['screenshot'] for step in steps if step.get('screenshot')],
+            trace_path=args.get('trace_path'),
+            result_id=args.get('result_id'),
+            log=args.get('message', ''),
+            error_message=args.get('message') if status == 3 else None,
+            start_time=end_time - timedelta(seconds=duration) if duration else end_time,
+            end_time=end_time,
+            duration=duration,
+        ))
+    if not records:
+        return []
+
+    with transaction.atomic():
+        UiExecutionRecord.objects.bulk_create(records)
+
+        # 同一用例多次出现时以最后一次结果为准
+        latest_cases = {}
+        for record in records:
+            latest_cases[record.test_case_id] = UiTestCase(
+                id=record.test_case_id,
+                status=record.status,
+                result_data={'last_execution': record.id, 'steps': record.step_results},
+                error_message=record.error_message,
+            )
+        UiTestCase.objects.bulk_update(list(latest_cases.values()), ['status', 'result_data', 'error_message'])
+
+        counts = defaultdict(lambda: [0, 0])
+        for record in records:
+            if record.batch_id and record.status in (2, 3):
+                counts[record.batch_id][record.status - 2] += 1
+        for batch_id, (passed, failed) in counts.items():
+            UiBatchExecutionRecord.add_results(batch_id, passed=passed, failed=failed)
+
+        attempts = locator_attempts(step for record in records for step in record.step_results or [])
+        if attempts:
+            UiElementLocatorStat.record_attempts(attempts)
+
+    logger.info(f"执行结果已批量保存: {len(records)} 条, 涉及批次 {len(counts)} 个")
+    return records
+
+
+class ExecutionResultWriter:
+    """用例结果缓冲写入器
+
+    Args:
+        flush_interval: 结果最长缓冲时间（秒）
+        max_pending: 缓冲结果数达到该值时立即写入
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_pending: int = 200):
+        self.flush_interval = flush_interval
+        self.max_pending = max(1, max_pending)
+        self._pending: list[PendingResult] = []
+        self._timer: Optional[asyncio.Task] = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def submit(self, args: dict) -> None:
+        """结果加入缓冲，由定时器或缓冲数量触发写入"""
+        self._pending.append(PendingResult(args, datetime.now()))
+        if len(self._pending) >= self.max_pending:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> int:
+        """立即写入缓冲中的结果，返回写入的结果数"""
+        if not self._pending:
+            return 0
+        entries, self._pending = self._pending, []
+        try:
+            await sync_to_async(write_results)(entries)
+        except Exception as e:
+            logger.error(f"批量保存执行结果失败，改为逐条保存: {e}", exc_info=True)
+            for entry in entries:
+                try:
+                    await sync_to_async(write_results)([entry])
+                except Exception as e:
+                    logger.error(f"保存执行结果失败: case_id={entry.args.get('case_id')}, {e}")
+        return len(entries)
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+
+# 全局单例
+_writer: Optional[ExecutionResultWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_result_writer() -> ExecutionResultWriter:
+    """获取进程内的结果写入器单例"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                from django.conf import settings
+
+                _writer = ExecutionResultWriter(
+                    flush_interval=getattr(settings, 'UI_RESULT_FLUSH_INTERVAL', 0.5),
+                    max_pending=getattr(settings, 'UI_RESULT_FLUSH_SIZE', 200),
+                )
+    return _writer
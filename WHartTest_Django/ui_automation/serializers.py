@@ -3,7 +3,7 @@
 
 from rest_framework import serializers
 from .models import (
-    UiModule, UiPage, UiElement, UiPageSteps, UiPageStepsDetailed,
+    UiModule, UiPage, UiElement, UiElementLocatorStat, UiPageSteps, UiPageStepsDetailed,
     UiTestCase, UiCaseStepsDetailed, UiExecutionRecord, UiPublicData, UiEnvironmentConfig,
     UiBatchExecutionRecord
 )
@@ -34,6 +34,31 @@ class UiElementSerializer(serializers.ModelSerializer):
         read_only_fields = ['creator', 'created_at', 'updated_at']
 
 
+class UiElementLocatorStatSerializer(serializers.ModelSerializer):
+    """元素定位统计序列化器"""
+    element_name = serializers.CharField(source='element.name', read_only=True)
+    page = serializers.IntegerField(source='element.page_id', read_only=True)
+    page_name = serializers.CharField(source='element.page.name', read_only=True)
+    variant_display = serializers.CharField(source='get_variant_display', read_only=True)
+    locator_type = serializers.SerializerMethodField()
+    locator_value = serializers.SerializerMethodField()
+    success_rate = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UiElementLocatorStat
+        fields = [
+            'id', 'element', 'element_name', 'page', 'page_name', 'variant', 'variant_display',
+            'locator_type', 'locator_value', 'success_count', 'failure_count', 'consecutive_failures',
+            'success_rate', 'avg_ms', 'last_ms', 'max_ms', 'last_success_at', 'last_failure_at', 'updated_at',
+        ]
+
+    def get_locator_type(self, obj):
+        return obj.element.locator_of(obj.variant)[0]
+
+    def get_locator_value(self, obj):
+        return obj.element.locator_of(obj.variant)[1]
+
+
 class UiPageSerializer(serializers.ModelSerializer):
     """页面序列化器"""
     module_name = serializers.CharField(source='module.name', read_only=True)
@@ -212,6 +237,36 @@ class UiTestCaseExecuteSerializer(UiTestCaseSerializer):
         fields = '__all__'
 
 
+# 执行状态/结果类字段每次执行都会变化，执行包中排除，保证内容未改动时 ETag 稳定
+BUNDLE_VOLATILE_FIELDS = ['status', 'result_data', 'error_message', 'updated_at']
+
+
+class UiPageStepsBundleSerializer(UiPageStepsExecuteSerializer):
+    """执行包中的页面步骤（不含执行状态字段）"""
+
+    class Meta(UiPageStepsExecuteSerializer.Meta):
+        fields = None
+        exclude = ['status', 'result_data', 'updated_at']
+
+
+class UiCaseStepsBundleSerializer(UiCaseStepsWithDetailSerializer):
+    """执行包中的用例步骤（不含执行状态字段）"""
+    page_step = UiPageStepsBundleSerializer(read_only=True)
+
+    class Meta(UiCaseStepsWithDetailSerializer.Meta):
+        fields = None
+        exclude = BUNDLE_VOLATILE_FIELDS
+
+
+class UiTestCaseBundleSerializer(UiTestCaseSerializer):
+    """执行包中的测试用例（结构同 UiTestCaseExecuteSerializer，不含执行状态字段）"""
+    case_step_details = UiCaseStepsBundleSerializer(source='case_steps', many=True, read_only=True)
+
+    class Meta(UiTestCaseSerializer.Meta):
+        fields = None
+        exclude = BUNDLE_VOLATILE_FIELDS
+
+
 class UiExecutionRecordListSerializer(serializers.ModelSerializer):
     """执行记录列表序列化器（精简字段，提升性能）"""
     test_case_name = serializers.CharField(source='test_case.name', read_only=True)
@@ -30,8 +30,13 @@ class UiSocketEnum:
     STOP_EXECUTION = 'u_stop_execution'   # 停止执行
     STEP_RESULT = 'u_step_result'         # 步骤执行结果
     CASE_RESULT = 'u_case_result'         # 用例执行结果
+    CASE_ARTIFACTS = 'u_case_artifacts'   # 用例产物（截图/Trace）上传完成后回填地址
     SET_ACTUATOR_INFO = 't_set_actuator_info'  # 设置执行器信息
     SET_ACTUATOR_STATE = 't_set_actuator_state'  # 切换执行器状态（is_open 等）
+    ACTUATOR_CAPACITY = 't_actuator_capacity'  # 执行器上报各通道实时容量
+    BATCH_SHARD_DONE = 'u_batch_shard_done'  # 执行器完成批量分片
+    BATCH_REVOKE = 'u_batch_revoke'       # 撤回执行器尚未开始的分片用例（工作窃取）
+    BATCH_REVOKED = 'u_batch_revoked'     # 执行器确认已撤回的用例
 
 
 class QueueModel(BaseModel):
@@ -77,6 +82,10 @@ class StepResultModel(BaseModel):
     screenshot: Optional[str] = None  # 截图路径
     duration: float = 0      # 执行时长(秒)
     element_found: bool = True
+    wait_duration: float = 0  # 步骤内等待耗时(秒)
+    wait_saved: float = 0     # 自适应等待相比固定等待节省的时间(秒)
+    element_id: Optional[int] = None  # 操作的元素
+    locator_attempts: list[dict] = []  # 定位尝试 [{variant, ok, ms}]，汇总到元素定位统计
 
 
 class CaseResultModel(BaseModel):
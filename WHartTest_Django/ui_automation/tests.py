@@ -1,3 +1,516 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zipfile
+from unittest import mock
 
-# 在此编写测试。
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from projects.models import Project
+from .consumers import UiAutomationConsumer
+from .dispatch import ActuatorDispatcher, ActuatorStore
+from .result_writer import ExecutionResultWriter
+from .models import (
+    UiModule, UiPage, UiElement, UiPageSteps, UiPageStepsDetailed,
+    UiTestCase, UiCaseStepsDetailed, UiPublicData, UiEnvironmentConfig, UiExecutionRecord,
+    UiBatchExecutionRecord, UiElementLocatorStat
+)
+from .socket_models import UiSocketEnum
+
+
+class ExecutionBundleTests(TestCase):
+    url = '/api/ui-automation/testcases/execution-bundle/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='bundle', password='password', email='bundle@example.com'
+        )
+        self.project = Project.objects.create(name='UI Project', creator=self.user)
+        self.module = UiModule.objects.create(project=self.project, name='模块', creator=self.user)
+        self.page = UiPage.objects.create(
+            project=self.project, module=self.module, name='登录页', url='/login', creator=self.user
+        )
+        self.element = UiElement.objects.create(
+            page=self.page, name='用户名', locator_value='#username', creator=self.user
+        )
+        self.page_step = UiPageSteps.objects.create(
+            project=self.project, page=self.page, module=self.module, name='登录', creator=self.user
+        )
+        UiPageStepsDetailed.objects.create(
+            page_step=self.page_step, element=self.element, step_sort=1,
+            ope_key='fill', ope_value={'text': '${{username}}'}
+        )
+        UiPublicData.objects.create(project=self.project, key='username', value='admin', creator=self.user)
+        UiEnvironmentConfig.objects.create(
+            project=self.project, name='测试环境', base_url='http://example.com', is_default=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_cases(self, count):
+        cases = []
+        for index in range(count):
+            case = UiTestCase.objects.create(
+                project=self.project, module=self.module, name=f'用例{index}', creator=self.user
+            )
+            UiCaseStepsDetailed.objects.create(test_case=case, page_step=self.page_step, case_sort=1)
+            cases.append(case)
+        return cases
+
+    def _get(self, cases, **headers):
+        ids = ','.join(str(case.id) for case in cases)
+        return self.client.get(self.url, {'ids': ids}, **headers)
+
+    def test_bundle_contains_cases_public_data_and_default_env(self):
+        cases = self._create_cases(2)
+        response = self._get(list(reversed(cases)) + [cases[0]])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()['data']
+        self.assertEqual([case['id'] for case in data['cases']], [cases[1].id, cases[0].id])
+        self.assertEqual(data['missing'], [])
+        step = data['cases'][0]['case_step_details'][0]['page_step']
+        self.assertEqual(step['page_url'], '/login')
+        self.assertEqual(step['step_details'][0]['locator_value'], '#username')
+        project = data['projects'][str(self.project.id)]
+        self.assertEqual(project['public_data'], [{'key': 'username', 'value': 'admin', 'type': 0}])
+        self.assertEqual(project['default_env_config']['base_url'], 'http://example.com')
+
+    def test_query_count_does_not_grow_with_cases(self):
+        small = self._create_cases(1)
+        with CaptureQueriesContext(connection) as small_queries:
+            self._get(small)
+        large = small + self._create_cases(5)
+        with CaptureQueriesContext(connection) as large_queries:
+            self._get(large)
+        self.assertEqual(len(small_queries), len(large_queries))
+
+    def test_etag_not_modified_until_definition_changes(self):
+        cases = self._create_cases(1)
+        first = self._get(cases)
+        etag = first['ETag']
+
+        # 执行状态变化不影响 ETag
+        UiTestCase.objects.filter(pk=cases[0].pk).update(status=2, result_data={'ok': True})
+        self.assertEqual(self._get(cases, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.element.locator_value = '#user'
+        self.element.save()
+        changed = self._get(cases, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': 'a,b'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_URL='/media/')
+class ArtifactUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='actuator', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, *contents, kind='screenshot', content_type='image/webp', name='shot{}.webp'):
+        files = [
+            SimpleUploadedFile(name.format(i), content, content_type=content_type)
+            for i, content in enumerate(contents)
+        ]
+        return self.client.post(
+            '/api/ui-automation/artifacts/upload/', {'kind': kind, 'files': files}, format='multipart'
+        )
+
+    def test_upload_is_content_addressed_and_deduplicated(self):
+        response = self._upload(b'one', b'two', b'one')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        files = response.json()['data']['files']
+        self.assertEqual(files[0]['path'], files[2]['path'])
+        self.assertEqual([f['deduplicated'] for f in files], [False, False, True])
+        digest = hashlib.sha256(b'one').hexdigest()
+        self.assertEqual(files[0]['hash'], digest)
+        self.assertTrue(files[0]['url'].startswith('/media/ui_screenshots/sha256/'))
+
+        check = self.client.post(
+            '/api/ui-automation/artifacts/check/',
+            {'kind': 'screenshot', 'hashes': [digest, hashlib.sha256(b'three').hexdigest()]},
+            format='json'
+        )
+        self.assertEqual(check.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(check.json()['data']['found']), [digest])
+
+    def test_extension_comes_from_content_type(self):
+        response = self._upload(b'png-bytes', content_type='image/png', name='shot{}.html')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.json()['data']['files'][0]['path'].endswith('.png'))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self._upload(b'x', kind='video').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self._upload(b'x', content_type='text/html', name='shot{}.png').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        check = self.client.post(
+            '/api/ui-automation/artifacts/check/', {'hashes': ['not-a-hash']}, format='json'
+        )
+        self.assertEqual(check.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_case_artifacts_patch_execution_record(self):
+        project = Project.objects.create(name='UI Project', creator=self.user)
+        module = UiModule.objects.create(project=project, name='模块', creator=self.user)
+        case = UiTestCase.objects.create(project=project, module=module, name='用例', creator=self.user)
+        consumer = UiAutomationConsumer()
+        async_to_sync(consumer.save_execution_result)({
+            'case_id': case.id, 'status': 'success', 'result_id': 'r1',
+            'steps': [{'step_id': 1, 'screenshot': None}, {'step_id': 2, 'screenshot': None}],
+        })
+
+        updated = async_to_sync(consumer.apply_case_artifacts)({
+            'result_id': 'r1', 'step_screenshots': {'1': '/media/b.webp'}, 'trace_path': 'ui_traces/t.zip'
+        })
+        self.assertTrue(updated)
+        record = UiExecutionRecord.objects.get(result_id='r1')
+        self.assertEqual(record.screenshots, ['/media/b.webp'])
+        self.assertEqual(record.step_results[1]['screenshot'], '/media/b.webp')
+        self.assertEqual(record.trace_path, 'ui_traces/t.zip')
+        case.refresh_from_db()
+        self.assertEqual(case.result_data['steps'][1]['screenshot'], '/media/b.webp')
+        self.assertFalse(async_to_sync(consumer.apply_case_artifacts)({'result_id': 'missing'}))
+
+
+class ActuatorDispatcherTests(TestCase):
+    def setUp(self):
+        self.sent = []
+        self.store = ActuatorStore()
+        self.dispatcher = ActuatorDispatcher(self.store, sender=self._sender, min_shard=2, max_shard=10, steal_min=2)
+        for actuator_id in ('a1', 'a2'):
+            self.store.register(actuator_id, f'channel.{actuator_id}', {'is_open': True})
+
+    async def _sender(self, record, socket_data):
+        self.sent.append((record['id'], socket_data.data.func_name, socket_data.data.func_args))
+
+    def _shards(self, actuator_id=None):
+        return [
+            args for aid, func_name, args in self.sent
+            if func_name == UiSocketEnum.TEST_CASE_BATCH and actuator_id in (None, aid)
+        ]
+
+    def test_batch_is_sharded_across_idle_actuators(self):
+        assigned = async_to_sync(self.dispatcher.start_batch)(1, list(range(1, 21)), {'env_config_id': 3}, 'u1')
+        self.assertEqual(assigned, 2)
+        # 剩余 20 个用例、2 个执行器：首片 ceil(20/4)=5，第二片 ceil(15/4)=4
+        first, second = self._shards('a1')[0], self._shards('a2')[0]
+        self.assertEqual(first['case_ids'], [1, 2, 3, 4, 5])
+        self.assertEqual(second['case_ids'], [6, 7, 8, 9])
+        self.assertEqual(first['env_config_id'], 3)
+        self.assertNotEqual(first['shard_id'], second['shard_id'])
+        self.assertEqual(self.store.pending_count(1), 11)
+
+        # 完成分片后继续领取更小的分片
+        for case_id in first['case_ids']:
+            async_to_sync(self.dispatcher.on_case_result)('a1', 1, case_id)
+        self.assertEqual(self._shards('a1')[1]['case_ids'], [10, 11, 12])
+
+    def _complete(self, actuator_id, batch_id, case_ids):
+        for case_id in case_ids:
+            async_to_sync(self.dispatcher.on_case_result)(actuator_id, batch_id, case_id)
+
+    def test_work_stealing_and_requeue_on_actuator_lost(self):
+        self.dispatcher.min_shard = 8
+        # a1 批量通道已满，首片全部分给 a2
+        self.store.touch('a1', info={'capacity': {'batch': {'available': 0}}})
+        async_to_sync(self.dispatcher.start_batch)(2, list(range(1, 13)), {}, 'u1')
+        self.assertEqual(self._shards('a2')[0]['case_ids'], list(range(1, 9)))
+
+        self.store.touch('a1', info={'capacity': {'batch': {'available': 1}}})
+        async_to_sync(self.dispatcher.on_actuator_available)()
+        self.assertEqual(self._shards('a1')[0]['case_ids'], [9, 10, 11, 12])
+
+        # a1 先完成且无待分配用例：向积压最多的 a2 撤回后半部分
+        self._complete('a1', 2, [9, 10, 11, 12])
+        revoke = [args for aid, func_name, args in self.sent if func_name == UiSocketEnum.BATCH_REVOKE]
+        self.assertEqual(revoke, [{'batch_id': 2, 'case_ids': [5, 6, 7, 8]}])
+
+        # a2 已开始用例 5，只确认撤回 6-8，重新分配给 a1
+        async_to_sync(self.dispatcher.on_revoked)('a2', 2, [6, 7, 8])
+        self.assertEqual(self._shards('a1')[1]['case_ids'], [6, 7, 8])
+        self.assertEqual(sorted(self.store.inflight(2)['a2']), [1, 2, 3, 4, 5])
+
+        # a2 离线：未完成用例重新入队，a1 空闲后领取
+        self.store.unregister('a2')
+        async_to_sync(self.dispatcher.on_actuator_lost)('a2')
+        self.assertEqual(self.store.pending_count(2), 5)
+        self._complete('a1', 2, [6, 7, 8])
+        self.assertEqual(self._shards('a1')[2]['case_ids'], [1, 2, 3, 4, 5])
+        self._complete('a1', 2, [1, 2, 3, 4, 5])
+        self.assertIsNone(self.store.get_batch_meta(2))
+
+    def test_shard_done_releases_cases_without_results(self):
+        async_to_sync(self.dispatcher.start_batch)(3, [1, 2, 3, 4], {}, 'u1')
+        shard = self._shards('a1')[0]
+        async_to_sync(self.dispatcher.on_shard_done)('a1', 3, shard['shard_id'])
+        async_to_sync(self.dispatcher.on_shard_done)('a2', 3, self._shards('a2')[0]['shard_id'])
+        self.assertIsNone(self.store.get_batch_meta(3))
+
+    def test_no_open_actuator(self):
+        for actuator_id in ('a1', 'a2'):
+            self.store.touch(actuator_id, info={'is_open': False})
+        self.assertEqual(async_to_sync(self.dispatcher.start_batch)(5, [1], {}, 'u1'), 0)
+        self.assertEqual(self.store.active_batches(), [])
+
+
+    def test_actuator_claimed_by_another_worker_is_skipped(self):
+        self.store.create_batch(6, list(range(1, 9)), {'args': {}, 'user': 'u1'})
+        # 其他 worker 已给 a1 分配分片，本进程读取的在途状态尚未包含它
+        self.assertTrue(self.store.assign(6, 'a1', 'other', [99]))
+        with mock.patch.object(self.store, 'inflight', return_value={}):
+            assigned = async_to_sync(self.dispatcher.pump)(6)
+
+        self.assertEqual(assigned, 1)
+        self.assertEqual(self._shards('a1'), [])
+        self.assertEqual(self._shards('a2')[0]['case_ids'], [1, 2])
+        # a1 未认领成功时弹出的用例放回队列
+        self.assertEqual(self.store.pending_count(6), 6)
+        self.assertFalse(self.store.assign(6, 'a1', 'again', [3]))
+
+    def test_blocking_store_is_called_off_the_event_loop(self):
+        threads = {}
+        self.store.blocking = True
+        original = self.store.list_actuators
+
+        def list_actuators():
+            threads['store'] = threading.get_ident()
+            return original()
+
+        async def scenario():
+            threads['loop'] = threading.get_ident()
+            return await self.dispatcher.aopen_actuators()
+
+        with mock.patch.object(self.store, 'list_actuators', side_effect=list_actuators):
+            self.assertEqual(len(async_to_sync(scenario)()), 2)
+        self.assertNotEqual(threads['store'], threads['loop'])
+
+
+class ExecutionResultWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='password')
+        project = Project.objects.create(name='UI Project', creator=self.user)
+        module = UiModule.objects.create(project=project, name='模块', creator=self.user)
+        self.cases = [
+            UiTestCase.objects.create(project=project, module=module, name=f'用例{index}', creator=self.user)
+            for index in range(20)
+        ]
+
+    def _batch(self, total):
+        return UiBatchExecutionRecord.objects.create(name='批次', total_cases=total, status=1, executor=self.user)
+
+    def _results(self, batch, cases, status='success'):
+        return [
+            {'case_id': case.id, 'batch_id': batch.id, 'executor_id': self.user.id, 'status': status, 'steps': []}
+            for case in cases
+        ]
+
+    def _write(self, results, max_pending=1000):
+        async def scenario():
+            writer = ExecutionResultWriter(flush_interval=60, max_pending=max_pending)
+            for args in results:
+                await writer.submit(args)
+            pending = writer.pending_count
+            await writer.flush()
+            return pending
+        return async_to_sync(scenario)()
+
+    def test_flush_query_count_does_not_grow_with_results(self):
+        small, large = self._batch(100), self._batch(100)
+        with CaptureQueriesContext(connection) as small_queries:
+            self._write(self._results(small, self.cases[:2]))
+        with CaptureQueriesContext(connection) as large_queries:
+            self._write(self._results(large, self.cases))
+        self.assertEqual(len(small_queries), len(large_queries))
+        self.assertEqual(UiExecutionRecord.objects.filter(batch=large).count(), 20)
+        large.refresh_from_db()
+        self.assertEqual((large.passed_cases, large.status), (20, 1))
+
+    def test_counters_and_completion(self):
+        batch = self._batch(4)
+        results = self._results(batch, self.cases[:3]) + self._results(batch, self.cases[3:4], status='failed')
+        self.assertEqual(self._write(results, max_pending=2), 0)
+        batch.refresh_from_db()
+        self.assertEqual((batch.passed_cases, batch.failed_cases, batch.status), (3, 1, 3))
+        self.assertIsNotNone(batch.end_time)
+        case = UiTestCase.objects.get(pk=self.cases[3].pk)
+        record = UiExecutionRecord.objects.get(test_case=case)
+        self.assertEqual((case.status, case.result_data['last_execution']), (3, record.id))
+        self.assertEqual(record.executor, self.user)
+
+    def test_missing_case_is_skipped(self):
+        batch = self._batch(2)
+        self._write([{'case_id': 999999, 'batch_id': batch.id, 'status': 'success'}] + self._results(batch, self.cases[:1]))
+        self.assertEqual(UiExecutionRecord.objects.filter(batch=batch).count(), 1)
+
+
+class ElementLocatorStatTests(TestCase):
+    url = '/api/ui-automation/elements/locator-stats/'
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='locator', password='password', email='locator@example.com'
+        )
+        self.project = Project.objects.create(name='UI Project', creator=self.user)
+        module = UiModule.objects.create(project=self.project, name='模块', creator=self.user)
+        page = UiPage.objects.create(project=self.project, module=module, name='登录页', url='/login', creator=self.user)
+        self.element = UiElement.objects.create(
+            page=page, name='登录按钮', locator_type='css', locator_value='#old-login',
+            locator_type_2='text', locator_value_2='登录', creator=self.user
+        )
+        self.case = UiTestCase.objects.create(project=self.project, module=module, name='登录', creator=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _step(self, *attempts):
+        return {
+            'step_id': 1, 'status': 'success', 'element_id': self.element.id,
+            'locator_attempts': [{'variant': v, 'ok': ok, 'ms': ms} for v, ok, ms in attempts],
+        }
+
+    def _write(self, *steps):
+        async def scenario():
+            writer = ExecutionResultWriter(flush_interval=60)
+            await writer.submit({'case_id': self.case.id, 'status': 'success', 'steps': list(steps)})
+            await writer.flush()
+        async_to_sync(scenario)()
+
+    def test_results_aggregate_into_stats(self):
+        self._write(self._step((1, False, 3000), (2, True, 100)), self._step((1, False, 3000), (2, True, 200)))
+        primary = UiElementLocatorStat.objects.get(element=self.element, variant=1)
+        fallback = UiElementLocatorStat.objects.get(element=self.element, variant=2)
+        self.assertEqual((primary.failure_count, primary.consecutive_failures, primary.success_count), (2, 2, 0))
+        self.assertEqual((fallback.success_count, fallback.max_ms), (2, 200))
+        self.assertAlmostEqual(fallback.avg_ms, 130)
+
+        self._write(self._step((2, True, 100)))
+        fallback.refresh_from_db()
+        self.assertEqual(fallback.success_count, 3)
+
+    def test_locator_change_resets_stats(self):
+        self._write(self._step((1, False, 3000)))
+        response = self.client.get(self.url, {'ids': str(self.element.id)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()['data']), 1)
+
+        self.element.locator_value = '#login'
+        self.element.save()
+        # 过期统计不返回，下次写入时重新开始
+        self.assertEqual(self.client.get(self.url, {'ids': str(self.element.id)}).json()['data'], [])
+        self._write(self._step((1, True, 50)))
+        primary = UiElementLocatorStat.objects.get(element=self.element, variant=1)
+        self.assertEqual((primary.failure_count, primary.success_count, primary.avg_ms), (0, 1, 50))
+
+    def test_slowest_locators_by_project(self):
+        self._write(self._step((1, True, 900), (2, True, 40)))
+        response = self.client.get(self.url, {'project': self.project.id})
+        data = response.json()['data']
+        self.assertEqual([(row['variant'], row['avg_ms']) for row in data], [(1, 900), (2, 40)])
+        self.assertEqual((data[0]['element_name'], data[0]['locator_value']), ('登录按钮', '#old-login'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_URL='/media/')
+class TraceIndexTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(username='trace', password='password', email='trace@example.com')
+        project = Project.objects.create(name='UI Project', creator=self.user)
+        module = UiModule.objects.create(project=project, name='模块', creator=self.user)
+        case = UiTestCase.objects.create(project=project, module=module, name='用例', creator=self.user)
+        self.record = UiExecutionRecord.objects.create(test_case=case, status=2, trace_path=self._write_trace())
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _write_trace(self):
+        from django.conf import settings
+
+        events = [
+            {'type': 'context-options', 'options': {'viewport': {'width': 1280, 'height': 720}}},
+            {'type': 'before', 'callId': 'c1', 'method': 'goto', 'params': {'url': 'http://example.com'}, 'startTime': 10},
+            {'type': 'frame-snapshot', 'snapshot': {'html': ['HTML', {}, 'x' * 10000]}},
+            {'type': 'after', 'callId': 'c1', 'endTime': 30},
+            {'type': 'console', 'messageType': 'error', 'text': 'boom', 'timestamp': 20},
+        ]
+        network = {'type': 'resource-snapshot', 'snapshot': {
+            'request': {'url': 'http://example.com/api', 'method': 'GET', 'headers': []},
+            'response': {'status': 200, 'statusText': 'OK', 'headers': [],
+                         'content': {'size': 11, 'mimeType': 'application/json', '_sha1': 'body.json'}},
+        }}
+        relative_path = f'ui_traces/test/{self._testMethodName}.zip'
+        full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with zipfile.ZipFile(full_path, 'w') as zf:
+            zf.writestr('trace.trace', '\n'.join(json.dumps(event) for event in events))
+            zf.writestr('trace.network', json.dumps(network))
+            zf.writestr('resources/page@abc-1000.jpeg', b'jpeg-bytes')
+            zf.writestr('resources/body.json', '{"ok": true}')
+        return relative_path
+
+    def _get_trace(self, **params):
+        return self.client.get(f'/api/ui-automation/execution-records/{self.record.id}/trace/', params)
+
+    def test_index_stores_timeline_and_serves_resources_on_demand(self):
+        response = self._get_trace()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()['data']['data']
+        self.assertEqual([action['type'] for action in data['actions']], ['goto'])
+        self.assertEqual(data['console_messages'][0]['text'], 'boom')
+
+        # 数据库中只保存索引，不含快照内容与访问令牌
+        self.record.refresh_from_db()
+        self.assertEqual(self.record.trace_data['snapshots'], [{'snapshot_id': 'resources/page@abc-1000.jpeg', 'timestamp': 10.0}])
+        self.assertNotIn('response_body_url', self.record.trace_data['network_requests'][0])
+
+        anonymous = Client()
+        snapshot = anonymous.get(data['snapshots'][0]['screenshot'])
+        self.assertEqual(snapshot.status_code, status.HTTP_200_OK)
+        self.assertEqual(snapshot.content, b'jpeg-bytes')
+        self.assertEqual(snapshot['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', snapshot['Cache-Control'])
+        cached = anonymous.get(data['snapshots'][0]['screenshot'], HTTP_IF_NONE_MATCH=snapshot['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        body = anonymous.get(data['network_requests'][0]['response_body_url'])
+        self.assertEqual(body.content, b'{"ok": true}')
+        self.assertEqual(body['Content-Type'], 'application/octet-stream')
+        self.assertTrue(body['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(body['X-Content-Type-Options'], 'nosniff')
+
+    def test_resource_outside_index_is_rejected(self):
+        data = self._get_trace().json()['data']['data']
+        url = data['snapshots'][0]['screenshot'].replace('resources%2Fpage%40abc-1000.jpeg', 'trace.trace')
+        self.assertIn('name=trace.trace', url)
+        self.assertEqual(Client().get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_resource_requires_valid_token(self):
+        url = f'/api/ui-automation/trace-resources/{self.record.id}/'
+        self.assertEqual(Client().get(url, {'name': 'trace.trace'}).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            Client().get(url, {'name': 'trace.trace', 'token': 'bad'}).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+    def test_large_trace_is_indexed_in_background(self):
+        with mock.patch('ui_automation.views.TRACE_SYNC_PARSE_MAX_SIZE', 0), \
+                mock.patch('ui_automation.trace_parser.index_trace_in_background') as schedule:
+            response = self._get_trace()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        schedule.assert_called_once_with(self.record.trace_path)
+
+        # 后台索引完成后直接读取索引文件
+        from .trace_parser import build_trace_index
+        build_trace_index(self.record.trace_path)
+        with mock.patch('ui_automation.views.TRACE_SYNC_PARSE_MAX_SIZE', 0):
+            self.assertEqual(self._get_trace().status_code, status.HTTP_200_OK)
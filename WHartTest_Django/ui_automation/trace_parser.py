@@ -2,23 +2,37 @@
 """
 Playwright Trace 解析器
 
-解析 trace.zip 文件，提取关键信息用于前端展示：
+解析 trace.zip 文件，生成用于前端展示的索引：
 - 操作时间线
 - 网络请求
 - 页面快照
 - 控制台日志
+
+索引只包含时间线与元数据，快照图片、请求/响应体仅记录 zip 内的成员名，
+查看时按需从 zip 中读取单个成员，不需要解压或加载整个文件。
+索引在 Trace 上传后由后台线程生成，保存为 Trace 旁的 .index.json 文件，并写入执行记录。
 """
 
+import io
 import json
 import logging
+import os
+import threading
 import zipfile
-import base64
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass, asdict
 
 logger = logging.getLogger('ui_automation')
 
+# 索引格式版本（旧版解析结果内嵌 base64 快照，不含 version）
+TRACE_INDEX_VERSION = 2
+# 网络请求/响应体按需读取的大小上限
+MAX_BODY_SIZE = 100 * 1024
+# 体积大、不参与时间线的事件，跳过 JSON 解析
+_SKIPPED_EVENT_PREFIXES = ('{"type":"frame-snapshot"', '{"type":"screencast-frame"')
+
 
 @dataclass
 class TraceAction:
@@ -52,7 +66,8 @@ class TraceNetworkRequest:
     request_headers: dict
     response_headers: dict
     request_body: Optional[str] = None
-    response_body: Optional[str] = None
+    request_body_ref: Optional[str] = None   # 请求体在 zip 中的成员名
+    response_body_ref: Optional[str] = None  # 响应体在 zip 中的成员名
     response_size: int = 0
 
 
@@ -71,7 +86,7 @@ class TraceSnapshot:
     snapshot_id: str
     timestamp: float
     html: Optional[str] = None   # DOM 快照
-    screenshot: Optional[str] = None  # Base64 截图
+    screenshot: Optional[str] = None  # 截图地址（按需从 zip 读取）
 
 
 @dataclass
@@ -122,11 +137,10 @@ class TraceParser:
 
         file_list = zf.namelist()
 
-        # 查找并解析 trace 事件文件
+        # 查找并解析 trace 事件文件（逐行流式读取）
         for name in file_list:
             if name.endswith('.trace'):
-                content = zf.read(name).decode('utf-8')
-                events = self._parse_trace_events(content)
+                events = self._parse_trace_events(self._iter_lines(zf, name))
                 actions.extend(events.get('actions', []))
                 console_messages.extend(events.get('console', []))
                 metadata.update(events.get('metadata', {}))
@@ -134,38 +148,30 @@ class TraceParser:
         # 解析网络请求文件
         for name in file_list:
             if name.endswith('.network'):
-                content = zf.read(name).decode('utf-8')
-                network_requests.extend(self._parse_network_events(content, zf))
+                network_requests.extend(self._parse_network_events(self._iter_lines(zf, name), zf))
 
-        # 解析截图（仅提取 page@ 截图帧，排除网站资源图片）
+        # 登记截图帧（仅 page@ 截图帧，排除网站资源图片），不读取图片内容
         # 截图命名格式: resources/page@<hash>-<timestamp>.jpeg
         # 网站资源命名格式: resources/<sha1_hash>.png (纯 hash，无 page@ 前缀)
         for name in file_list:
             if not (name.endswith('.png') or name.endswith('.jpeg')):
                 continue
             basename = name.split('/')[-1]
-            # 只提取 page@ 开头的截图帧，排除纯 sha1 hash 命名的资源图片
+            # 只登记 page@ 开头的截图帧，排除纯 sha1 hash 命名的资源图片
             if not basename.startswith('page@'):
                 continue
+            # 从文件名提取时间戳 (格式: page@<hash>-<timestamp>.jpeg)
+            timestamp = 0
             try:
-                img_data = zf.read(name)
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-                ext = 'png' if name.endswith('.png') else 'jpeg'
-                # 从文件名提取时间戳 (格式: page@<hash>-<timestamp>.jpeg)
-                timestamp = 0
-                try:
-                    # 提取最后一个 - 后面的数字
-                    ts_part = basename.rsplit('-', 1)[-1].replace('.jpeg', '').replace('.png', '')
-                    timestamp = float(ts_part)
-                except (ValueError, IndexError):
-                    pass
-                snapshots.append({
-                    'snapshot_id': name,
-                    'timestamp': timestamp,
-                    'screenshot': f"data:image/{ext};base64,{img_base64}"
-                })
-            except Exception as e:
-                logger.warning(f"读取截图失败 {name}: {e}")
+                # 提取最后一个 - 后面的数字
+                ts_part = basename.rsplit('-', 1)[-1].replace('.jpeg', '').replace('.png', '')
+                timestamp = float(ts_part)
+            except (ValueError, IndexError):
+                pass
+            snapshots.append({
+                'snapshot_id': name,
+                'timestamp': timestamp,
+            })
 
         # 按时间戳排序截图
         snapshots.sort(key=lambda x: x.get('timestamp', 0))
@@ -206,6 +212,7 @@ class TraceParser:
             network_summary['total_size'] += req.get('response_size', 0)
         
         return {
+            'version': TRACE_INDEX_VERSION,
             'title': metadata.get('title', 'Trace'),
             'start_time': start_time,
             'end_time': end_time,
@@ -226,14 +233,23 @@ class TraceParser:
             }
         }
     
-    def _parse_trace_events(self, content: str) -> dict:
-        """解析 trace.trace 事件内容"""
+    @staticmethod
+    def _iter_lines(zf: zipfile.ZipFile, name: str):
+        """逐行读取 zip 成员，不一次性加载到内存"""
+        with zf.open(name) as raw:
+            for line in io.TextIOWrapper(raw, encoding='utf-8', errors='replace'):
+                if line.startswith(_SKIPPED_EVENT_PREFIXES):
+                    continue
+                yield line
+
+    def _parse_trace_events(self, lines) -> dict:
+        """解析 trace.trace 事件行"""
         actions = []
         console = []
         metadata = {}
         pending_actions = {}  # callId -> before event data
 
-        for line in content.strip().split('\n'):
+        for line in lines:
             if not line.strip():
                 continue
             try:
@@ -295,11 +311,11 @@ class TraceParser:
             'metadata': metadata
         }
 
-    def _parse_network_events(self, content: str, zf: zipfile.ZipFile) -> list:
-        """解析 trace.network 文件"""
+    def _parse_network_events(self, lines, zf: zipfile.ZipFile) -> list:
+        """解析 trace.network 事件行，请求/响应体只记录 zip 成员名"""
         network = []
 
-        for line in content.strip().split('\n'):
+        for line in lines:
             if not line.strip():
                 continue
             try:
@@ -320,41 +336,26 @@ class TraceParser:
                     # 计算耗时
                     duration = snapshot.get('time', 0)
 
-                    # 提取请求体
+                    # 提取请求体（内联文本直接保留，_sha1 引用记录成员名）
                     request_body = None
+                    request_body_ref = None
                     post_data = request.get('postData', {})
                     if post_data:
                         # postData 可能是字符串或对象
                         if isinstance(post_data, str):
                             request_body = post_data
                         elif isinstance(post_data, dict):
-                            # 可能有 text 或 _sha1 引用
                             if post_data.get('text'):
                                 request_body = post_data.get('text')
                             elif post_data.get('_sha1'):
-                                try:
-                                    resource_path = f"resources/{post_data.get('_sha1')}"
-                                    if resource_path in zf.namelist():
-                                        body_bytes = zf.read(resource_path)
-                                        if len(body_bytes) <= 100 * 1024:
-                                            request_body = body_bytes.decode('utf-8', errors='replace')
-                                except Exception:
-                                    pass
-
-                    # 提取响应体（从 resources 目录读取）
-                    response_body = None
+                                request_body_ref = self._body_ref(zf, post_data.get('_sha1'))
+
+                    # 响应体（resources 目录中的文本内容）
+                    response_body_ref = None
                     sha1_ref = resp_content.get('_sha1', '')
                     mime_type = resp_content.get('mimeType', '')
                     if sha1_ref and self._is_text_content(mime_type):
-                        try:
-                            resource_path = f"resources/{sha1_ref}"
-                            if resource_path in zf.namelist():
-                                body_bytes = zf.read(resource_path)
-                                # 限制响应体大小，避免过大
-                                if len(body_bytes) <= 100 * 1024:  # 100KB 限制
-                                    response_body = body_bytes.decode('utf-8', errors='replace')
-                        except Exception:
-                            pass
+                        response_body_ref = self._body_ref(zf, sha1_ref)
 
                     network.append({
                         'request_id': snapshot.get('pageref', '') + '_' + request.get('url', '')[:50],
@@ -371,13 +372,24 @@ class TraceParser:
                         'response_headers': resp_headers,
                         'response_size': body_size,
                         'request_body': request_body,
-                        'response_body': response_body,
+                        'request_body_ref': request_body_ref,
+                        'response_body_ref': response_body_ref,
                     })
             except json.JSONDecodeError:
                 continue
 
         return network
 
+    @staticmethod
+    def _body_ref(zf: zipfile.ZipFile, sha1: str) -> Optional[str]:
+        """请求/响应体在 zip 中的成员名（不存在或超过大小上限时为 None）"""
+        name = f"resources/{sha1}"
+        try:
+            info = zf.getinfo(name)
+        except KeyError:
+            return None
+        return name if info.file_size <= MAX_BODY_SIZE else None
+
     def _is_text_content(self, mime_type: str) -> bool:
         """判断是否为文本类型内容"""
         if not mime_type:
@@ -393,3 +405,108 @@ def parse_trace_file(trace_path: str) -> Optional[dict]:
     """解析 trace 文件的便捷函数"""
     parser = TraceParser(trace_path)
     return parser.parse()
+
+
+def resolve_trace_path(trace_path: str) -> str:
+    """执行记录中的相对路径 -> 文件绝对路径"""
+    from django.conf import settings
+
+    if os.path.isabs(trace_path):
+        return trace_path
+    return os.path.join(settings.MEDIA_ROOT, trace_path.lstrip('/'))
+
+
+def is_trace_index(data) -> bool:
+    return isinstance(data, dict) and data.get('version') == TRACE_INDEX_VERSION
+
+
+def index_file_path(trace_path: str) -> str:
+    return resolve_trace_path(trace_path) + '.index.json'
+
+
+def load_trace_index(trace_path: str) -> Optional[dict]:
+    """读取已生成的索引文件（不存在或版本不符时返回 None）"""
+    try:
+        with open(index_file_path(trace_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if is_trace_index(data) else None
+
+
+def build_trace_index(trace_path: str) -> Optional[dict]:
+    """解析 trace 并写入索引文件，返回索引"""
+    index = parse_trace_file(resolve_trace_path(trace_path))
+    if index is None:
+        return None
+    target = index_file_path(trace_path)
+    tmp_path = f"{target}.{threading.get_ident()}.part"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_path, target)
+    return index
+
+
+def trace_resource_kinds(index: Optional[dict]) -> dict[str, str]:
+    """索引中允许按需读取的成员：成员名 -> 'snapshot'（截图帧）或 'body'（请求/响应体）"""
+    kinds = {}
+    for item in (index or {}).get('network_requests', []):
+        for key in ('request_body_ref', 'response_body_ref'):
+            if item.get(key):
+                kinds[item[key]] = 'body'
+    for snapshot in (index or {}).get('snapshots', []):
+        if snapshot.get('snapshot_id'):
+            kinds[snapshot['snapshot_id']] = 'snapshot'
+    return kinds
+
+
+def read_trace_member(trace_path: str, name: str) -> Optional[tuple[bytes, zipfile.ZipInfo]]:
+    """读取 trace 中的单个成员（截图帧或请求/响应体），成员不存在时返回 None
+
+    只读取 zip 中央目录与该成员所在的字节区间。
+    """
+    with zipfile.ZipFile(resolve_trace_path(trace_path), 'r') as zf:
+        try:
+            info = zf.getinfo(name)
+        except KeyError:
+            return None
+        return zf.read(info), info
+
+
+# 后台生成索引（同一 trace 同时只解析一次）
+_index_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='trace-index')
+_indexing: set[str] = set()
+_indexing_lock = threading.Lock()
+
+
+def is_indexing(trace_path: str) -> bool:
+    with _indexing_lock:
+        return trace_path in _indexing
+
+
+def index_trace_in_background(trace_path: str) -> bool:
+    """提交后台索引任务，完成后写入引用该 trace 的执行记录；已在解析中时返回 False"""
+    with _indexing_lock:
+        if trace_path in _indexing:
+            return False
+        _indexing.add(trace_path)
+    _index_executor.submit(_index_trace, trace_path)
+    return True
+
+
+def _index_trace(trace_path: str) -> None:
+    from django.db import close_old_connections
+    from .models import UiExecutionRecord
+
+    try:
+        index = build_trace_index(trace_path)
+        if index is None:
+            return
+        updated = UiExecutionRecord.objects.filter(trace_path=trace_path).update(trace_data=index)
+        logger.info(f"Trace 索引已生成: {trace_path}, 动作 {len(index['actions'])} 个, 关联执行记录 {updated} 条")
+    except Exception as e:
+        logger.error(f"生成 Trace 索引失败 {trace_path}: {e}", exc_info=True)
+    finally:
+        with _indexing_lock:
+            _indexing.discard(trace_path)
+        close_old_connections()
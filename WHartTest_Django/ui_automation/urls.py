@@ -9,7 +9,7 @@ from .views import (
     UiTestCaseViewSet, UiCaseStepsDetailedViewSet,
     UiExecutionRecordViewSet, UiPublicDataViewSet, UiEnvironmentConfigViewSet,
     ActuatorViewSet, UiBatchExecutionRecordViewSet, upload_screenshot, upload_trace,
-    trigger_batch_execution
+    check_artifacts, upload_artifacts, trace_resource_view, trigger_batch_execution
 )
 
 router = DefaultRouter()
@@ -29,5 +29,8 @@ router.register('batch-records', UiBatchExecutionRecordViewSet, basename='ui-bat
 urlpatterns = router.urls + [
     path('screenshots/upload/', upload_screenshot, name='ui-screenshot-upload'),
     path('traces/upload/', upload_trace, name='ui-trace-upload'),
+    path('artifacts/check/', check_artifacts, name='ui-artifacts-check'),
+    path('artifacts/upload/', upload_artifacts, name='ui-artifacts-upload'),
+    path('trace-resources/<int:pk>/', trace_resource_view, name='ui-trace-resource'),
     path('trigger-batch/', trigger_batch_execution, name='ui-trigger-batch'),
 ]
\ No newline at end of file
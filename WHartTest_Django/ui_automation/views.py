@@ -1,16 +1,24 @@
 # -*- coding: utf-8 -*-
 """UI 自动化视图"""
 
+import hashlib
+import json
+import re
+import tempfile
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.utils import encoders
+from django.http import HttpResponseNotModified
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+from django.db.models import Prefetch
 from django.db.models.deletion import ProtectedError
 from django.db import transaction
 
 from .models import (
-    UiModule, UiPage, UiElement, UiPageSteps, UiPageStepsDetailed,
+    UiModule, UiPage, UiElement, UiElementLocatorStat, UiPageSteps, UiPageStepsDetailed,
     UiTestCase, UiCaseStepsDetailed, UiExecutionRecord, UiPublicData, UiEnvironmentConfig,
     UiBatchExecutionRecord
 )
@@ -20,8 +28,10 @@ from .serializers import (
     UiPageStepsDetailedSerializer, UiTestCaseSerializer, UiTestCaseListSerializer, UiTestCaseDetailSerializer,
     UiCaseStepsDetailedSerializer, UiExecutionRecordSerializer, UiExecutionRecordListSerializer,
     UiPublicDataSerializer, UiEnvironmentConfigSerializer, UiTestCaseExecuteSerializer,
-    UiPageStepsExecuteSerializer, UiBatchExecutionRecordSerializer, UiBatchExecutionRecordDetailSerializer
+    UiPageStepsExecuteSerializer, UiBatchExecutionRecordSerializer, UiBatchExecutionRecordDetailSerializer,
+    UiTestCaseBundleSerializer, UiElementLocatorStatSerializer
 )
+from .trace_parser import index_file_path, index_trace_in_background
 
 
 class UiModuleViewSet(viewsets.ModelViewSet):
@@ -102,6 +112,56 @@ class UiElementViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(creator=self.request.user)
 
+    # 按元素查询定位统计时单次最多的元素数
+    LOCATOR_STATS_MAX_IDS = 1000
+    LOCATOR_STATS_ORDERING = {'avg_ms', 'max_ms', 'last_ms', 'failure_count', 'consecutive_failures', 'success_count'}
+
+    @action(detail=False, methods=['get'], url_path='locator-stats')
+    def locator_stats(self, request):
+        """元素定位解析统计
+
+        GET ?ids=1,2,3                      指定元素的统计（执行器执行前拉取，用于调整定位尝试顺序）
+        GET ?project=1&page=2&limit=50      按平均解析耗时倒序（ordering 可指定），用于查找慢定位
+
+        定位表达式修改后（指纹不一致）的过期统计不返回。
+        """
+        stats = UiElementLocatorStat.objects.select_related('element__page')
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                element_ids = [int(i) for i in ids.split(',') if i.strip()]
+            except ValueError:
+                return Response({'error': 'ids 参数格式错误'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(element_ids) > self.LOCATOR_STATS_MAX_IDS:
+                return Response(
+                    {'error': f'单次最多查询 {self.LOCATOR_STATS_MAX_IDS} 个元素'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            stats = stats.filter(element_id__in=element_ids).order_by('element_id', 'variant')
+        else:
+            project = request.query_params.get('project')
+            page = request.query_params.get('page')
+            if not project and not page:
+                return Response({'error': '缺少 ids、project 或 page 参数'}, status=status.HTTP_400_BAD_REQUEST)
+            if project:
+                stats = stats.filter(element__page__project_id=project)
+            if page:
+                stats = stats.filter(element__page_id=page)
+            ordering = request.query_params.get('ordering', '-avg_ms')
+            if ordering.lstrip('-') not in self.LOCATOR_STATS_ORDERING:
+                ordering = '-avg_ms'
+            try:
+                limit = min(max(int(request.query_params.get('limit', 50)), 1), 500)
+            except ValueError:
+                limit = 50
+            # 过期统计在取出后过滤，多取一些以尽量凑满 limit
+            stats = stats.order_by(ordering, 'id')[:limit * 2]
+
+        current = [stat for stat in stats if stat.locator_hash == stat.element.locator_signature(stat.variant)]
+        if not ids:
+            current = current[:limit]
+        return Response(UiElementLocatorStatSerializer(current, many=True).data)
+
 
 class UiPageStepsViewSet(viewsets.ModelViewSet):
     """页面步骤管理视图"""
@@ -220,6 +280,87 @@ class UiTestCaseViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    # 单次执行包最多包含的用例数（执行器按批次分段拉取）
+    BUNDLE_MAX_CASES = 200
+
+    @action(detail=False, methods=['get'], url_path='execution-bundle')
+    def execution_bundle(self, request):
+        """获取批量执行所需的全部数据（供执行器使用）
+
+        GET ?ids=1,2,3&env_config_id=5
+
+        一次返回用例执行数据（结构同 execute-data）、涉及项目的启用公共数据与默认环境配置，
+        以及指定的环境配置，替代逐个用例的多次请求。响应带 ETag，内容未变化时返回 304。
+        """
+        try:
+            ids = [int(i) for i in request.query_params.get('ids', '').split(',') if i.strip()]
+        except ValueError:
+            return Response({'error': 'ids 参数格式错误'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'error': '缺少 ids 参数'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.BUNDLE_MAX_CASES:
+            return Response(
+                {'error': f'单次最多获取 {self.BUNDLE_MAX_CASES} 个用例'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        testcases = UiTestCase.objects.filter(id__in=ids).select_related(
+            'module', 'creator'
+        ).prefetch_related(
+            Prefetch(
+                'case_steps',
+                queryset=UiCaseStepsDetailed.objects.select_related(
+                    'page_step__page', 'page_step__module', 'page_step__creator'
+                ).prefetch_related(
+                    Prefetch(
+                        'page_step__step_details',
+                        queryset=UiPageStepsDetailed.objects.select_related('element')
+                    )
+                )
+            )
+        )
+        case_by_id = {testcase.id: testcase for testcase in testcases}
+        ordered = [case_by_id[case_id] for case_id in dict.fromkeys(ids) if case_id in case_by_id]
+        project_ids = sorted({testcase.project_id for testcase in ordered})
+
+        projects = {str(project_id): {'public_data': [], 'default_env_config': None} for project_id in project_ids}
+        public_data = UiPublicData.objects.filter(
+            project_id__in=project_ids, is_enabled=True
+        ).order_by('project_id', 'key').values('project_id', 'key', 'value', 'type')
+        for item in public_data:
+            project_id = item.pop('project_id')
+            projects[str(project_id)]['public_data'].append(item)
+        default_envs = UiEnvironmentConfig.objects.filter(
+            project_id__in=project_ids, is_default=True
+        ).select_related('creator')
+        for env in default_envs:
+            # 与 env-configs 列表接口一致：同一项目取排序后的第一个
+            if projects[str(env.project_id)]['default_env_config'] is None:
+                projects[str(env.project_id)]['default_env_config'] = UiEnvironmentConfigSerializer(env).data
+
+        env_config = None
+        env_config_id = request.query_params.get('env_config_id')
+        if env_config_id:
+            env = UiEnvironmentConfig.objects.select_related('creator').filter(pk=env_config_id).first()
+            env_config = UiEnvironmentConfigSerializer(env).data if env else None
+
+        data = {
+            'cases': UiTestCaseBundleSerializer(ordered, many=True).data,
+            'missing': [case_id for case_id in ids if case_id not in case_by_id],
+            'projects': projects,
+            'env_config': env_config,
+        }
+
+        etag = '"%s"' % hashlib.sha256(
+            json.dumps(data, sort_keys=True, ensure_ascii=False, cls=encoders.JSONEncoder).encode('utf-8')
+        ).hexdigest()[:32]
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+
     @action(detail=False, methods=['post'], url_path='batch-delete')
     def batch_delete(self, request, **kwargs):
         """
@@ -359,9 +500,17 @@ class UiExecutionRecordViewSet(viewsets.ModelViewSet):
         """删除执行记录及其关联文件"""
         import os
         from django.conf import settings
+        from django.db.models import Q
+
+        def is_shared(path):
+            # 按内容哈希存储的产物可能被多条记录引用
+            if '/sha256/' not in path:
+                return False
+            others = UiExecutionRecord.objects.exclude(pk=instance.pk)
+            return others.filter(Q(trace_path=path) | Q(screenshots__icontains=path)).exists()
 
         def safe_delete(path):
-            if not path:
+            if not path or is_shared(path):
                 return
             full_path = path if os.path.isabs(path) else os.path.join(settings.MEDIA_ROOT, path.lstrip('/'))
             if os.path.exists(full_path):
@@ -375,58 +524,72 @@ class UiExecutionRecordViewSet(viewsets.ModelViewSet):
         # 删除视频
         safe_delete(instance.video_path)
 
-        # 删除 Trace 文件
-        safe_delete(instance.trace_path)
+        # 删除 Trace 文件及其索引
+        if instance.trace_path and not is_shared(instance.trace_path):
+            safe_delete(instance.trace_path)
+            safe_delete(f"{instance.trace_path}.index.json")
 
         instance.delete()
     
     @action(detail=True, methods=['get'], url_path='trace')
     def get_trace_data(self, request, pk=None):
-        """获取执行记录的 Trace 数据
+        """获取执行记录的 Trace 索引（操作时间线、网络请求、控制台、快照列表）
 
-        如果 trace_data 已解析则直接返回，否则尝试解析 trace_path
+        索引在 Trace 上传后由后台生成并写入 trace_data；尚未生成时，小文件直接解析，
+        大文件提交后台解析并返回 202。快照图片与请求/响应体通过带签名的资源地址按需读取。
         可通过 ?refresh=1 强制重新解析
         """
+        from .trace_parser import (
+            build_trace_index, index_trace_in_background, is_indexing, is_trace_index,
+            load_trace_index, resolve_trace_path,
+        )
+
         instance = self.get_object()
         refresh = request.query_params.get('refresh', '').lower() in ('1', 'true')
 
-        # 如果已有解析数据且不需要刷新，直接返回
-        if instance.trace_data and not refresh:
+        # 已有索引且不需要刷新，直接返回（旧版内嵌快照的解析结果重新生成索引）
+        if is_trace_index(instance.trace_data) and not refresh:
             return Response({
                 'status': 'success',
-                'data': instance.trace_data
+                'data': _with_trace_resource_urls(instance, instance.trace_data)
             })
-        
-        # 尝试解析 trace 文件
+
         if not instance.trace_path:
             return Response({
                 'status': 'error',
                 'message': '此执行记录没有 Trace 数据'
             }, status=status.HTTP_404_NOT_FOUND)
-        
-        from .trace_parser import parse_trace_file
-        import os
-        from django.conf import settings
-        
-        # 构建完整路径
-        trace_path = instance.trace_path
-        if not os.path.isabs(trace_path):
-            trace_path = os.path.join(settings.MEDIA_ROOT, trace_path)
-        
-        trace_data = parse_trace_file(trace_path)
+
+        trace_data = None if refresh else load_trace_index(instance.trace_path)
+        if trace_data is None:
+            processing = Response({
+                'status': 'processing',
+                'message': 'Trace 正在解析，请稍后刷新'
+            }, status=status.HTTP_202_ACCEPTED)
+            if is_indexing(instance.trace_path):
+                return processing
+            try:
+                size = os.path.getsize(resolve_trace_path(instance.trace_path))
+            except OSError:
+                size = 0
+            if size > TRACE_SYNC_PARSE_MAX_SIZE:
+                index_trace_in_background(instance.trace_path)
+                return processing
+            trace_data = build_trace_index(instance.trace_path)
+
         if not trace_data:
             return Response({
                 'status': 'error',
                 'message': 'Trace 文件解析失败'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        # 保存解析结果
+
+        # 保存索引
         instance.trace_data = trace_data
         instance.save(update_fields=['trace_data'])
-        
+
         return Response({
             'status': 'success',
-            'data': trace_data
+            'data': _with_trace_resource_urls(instance, trace_data)
         })
 
 
@@ -482,8 +645,9 @@ class ActuatorViewSet(viewsets.ViewSet):
         from .consumers import SocketUserManager
 
         actuators = []
-        for actuator_id, consumer in SocketUserManager._actuator_users.items():
-            actuator_info = getattr(consumer, 'actuator_info', {})
+        for record in SocketUserManager.get_actuator_records():
+            actuator_id = record['id']
+            actuator_info = record.get('info') or {}
             actuators.append({
                 'id': actuator_id,
                 'name': actuator_info.get('name', actuator_id),
@@ -494,6 +658,7 @@ class ActuatorViewSet(viewsets.ViewSet):
                 'browser_type': actuator_info.get('browser_type', 'chromium'),
                 'headless': actuator_info.get('headless', False),
                 'connected_at': actuator_info.get('connected_at'),
+                'capacity': actuator_info.get('capacity'),
             })
 
         return Response({
@@ -524,23 +689,25 @@ class ActuatorViewSet(viewsets.ViewSet):
         from .consumers import SocketUserManager
         from .socket_models import SocketDataModel, QueueModel, NoticeType, ResponseCode, UiSocketEnum
 
-        actuator = SocketUserManager.get_actuator_by_id(pk)
-        if not actuator:
+        if not SocketUserManager.resolve_actuator_id(pk):
             return Response({'error': f'执行器 {pk} 不在线'}, status=status.HTTP_404_NOT_FOUND)
 
         is_open = request.data.get('is_open')
         if is_open is None:
             return Response({'error': '缺少 is_open 参数'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 更新内存中执行器的 actuator_info
-        actuator.actuator_info['is_open'] = bool(is_open)
+        # 更新执行器注册信息（本进程连接与调度注册表）
+        from .dispatch import get_dispatcher
+        actuator = SocketUserManager.get_actuator_by_id(pk)
+        if actuator:
+            actuator.actuator_info['is_open'] = bool(is_open)
+        get_dispatcher().store.touch(pk, info={'is_open': bool(is_open)})
 
         # 通过 WebSocket 通知执行器
-        import asyncio
         from asgiref.sync import async_to_sync
 
         async def _send():
-            await actuator.send_json(SocketDataModel(
+            await SocketUserManager.send_to_actuator_by_id(pk, SocketDataModel(
                 code=ResponseCode.SUCCESS,
                 msg='update_state',
                 user=request.user.username if hasattr(request.user, 'username') else 'web',
@@ -664,6 +831,8 @@ def upload_trace(request):
     # 返回相对路径（用于存储到数据库）和 URL（用于下载）
     relative_path = f"ui_traces/{date_dir}/{filename}"
     url = f"{settings.MEDIA_URL}{relative_path}"
+    # 后台生成 Trace 索引，查看时无需再解析
+    index_trace_in_background(relative_path)
     return Response({
         'status': 'success',
         'url': url,
@@ -671,6 +840,234 @@ def upload_trace(request):
     }, status=status.HTTP_201_CREATED)
 
 
+# ---------- 产物批量上传（按内容哈希去重） ----------
+ARTIFACT_DIRS = {'screenshot': 'ui_screenshots', 'trace': 'ui_traces'}
+# 允许上传的内容类型 -> 存储扩展名（扩展名只由校验过的内容类型决定，不使用客户端文件名）
+ARTIFACT_CONTENT_TYPES = {
+    'screenshot': {'image/png': '.png', 'image/jpeg': '.jpg', 'image/webp': '.webp'},
+    'trace': {'application/zip': '.zip', 'application/x-zip-compressed': '.zip'},
+}
+ARTIFACT_MAX_FILES = 50
+ARTIFACT_MAX_HASHES = 500
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _artifact_dir(kind: str, digest: str) -> str:
+    """内容寻址存储目录：media/{类型目录}/sha256/{哈希前两位}/"""
+    return os.path.join(settings.MEDIA_ROOT, ARTIFACT_DIRS[kind], 'sha256', digest[:2])
+
+
+def _artifact_info(kind: str, digest: str, filename: str) -> dict:
+    relative_path = f"{ARTIFACT_DIRS[kind]}/sha256/{digest[:2]}/{filename}"
+    return {'hash': digest, 'path': relative_path, 'url': f"{settings.MEDIA_URL}{relative_path}"}
+
+
+def _find_artifact(kind: str, digest: str):
+    """按哈希查找已存储的产物，返回 {hash, path, url} 或 None"""
+    directory = _artifact_dir(kind, digest)
+    if not os.path.isdir(directory):
+        return None
+    for filename in os.listdir(directory):
+        if os.path.splitext(filename)[0] == digest:
+            return _artifact_info(kind, digest, filename)
+    return None
+
+
+def _store_artifact(file, kind: str) -> dict:
+    """边写入边计算哈希，内容已存在时丢弃本次上传"""
+    staging_dir = os.path.join(settings.MEDIA_ROOT, ARTIFACT_DIRS[kind], 'sha256')
+    os.makedirs(staging_dir, exist_ok=True)
+    sha = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=staging_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in file.chunks():
+                sha.update(chunk)
+                f.write(chunk)
+        digest = sha.hexdigest()
+        existing = _find_artifact(kind, digest)
+        if existing:
+            return {**existing, 'name': file.name, 'size': file.size, 'deduplicated': True}
+        ext = ARTIFACT_CONTENT_TYPES[kind][file.content_type]
+        os.makedirs(_artifact_dir(kind, digest), exist_ok=True)
+        os.replace(tmp_path, os.path.join(_artifact_dir(kind, digest), f"{digest}{ext}"))
+        tmp_path = None
+        info = _artifact_info(kind, digest, f"{digest}{ext}")
+        return {**info, 'name': file.name, 'size': file.size, 'deduplicated': False}
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def check_artifacts(request):
+    """查询服务端已存在的产物
+
+    请求体: {"kind": "screenshot" | "trace", "hashes": [sha256, ...]}
+    返回已存在哈希对应的存储路径，执行器据此跳过重复上传
+    """
+    kind = request.data.get('kind', 'screenshot')
+    hashes = request.data.get('hashes')
+    if kind not in ARTIFACT_DIRS:
+        return Response({'error': f'不支持的产物类型: {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(hashes, list) or len(hashes) > ARTIFACT_MAX_HASHES:
+        return Response(
+            {'error': f'hashes 必须为列表且不超过 {ARTIFACT_MAX_HASHES} 个'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    found = {}
+    for digest in hashes:
+        digest = str(digest).lower()
+        if not _SHA256_RE.match(digest):
+            return Response({'error': f'无效的哈希: {digest}'}, status=status.HTTP_400_BAD_REQUEST)
+        existing = _find_artifact(kind, digest)
+        if existing:
+            found[digest] = existing
+    return Response({'status': 'success', 'found': found})
+
+
+@api_view(['POST'])
+@parser_classes([MultiPartParser])
+@permission_classes([IsAuthenticated])
+def upload_artifacts(request):
+    """批量上传执行产物（截图/Trace），按内容哈希存储，相同内容只保存一份
+
+    表单字段: kind = screenshot | trace, files = 多个文件
+    """
+    kind = request.data.get('kind', 'screenshot')
+    if kind not in ARTIFACT_DIRS:
+        return Response({'error': f'不支持的产物类型: {kind}'}, status=status.HTTP_400_BAD_REQUEST)
+    files = request.FILES.getlist('files')
+    if not files:
+        return Response({'error': '未提供文件'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(files) > ARTIFACT_MAX_FILES:
+        return Response(
+            {'error': f'单次最多上传 {ARTIFACT_MAX_FILES} 个文件'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    invalid = [file.name for file in files if file.content_type not in ARTIFACT_CONTENT_TYPES[kind]]
+    if invalid:
+        return Response(
+            {'error': f'不支持的文件类型: {", ".join(invalid)}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    stored = [_store_artifact(file, kind) for file in files]
+    if kind == 'trace':
+        for item in stored:
+            if not os.path.exists(index_file_path(item['path'])):
+                index_trace_in_background(item['path'])
+    return Response({'status': 'success', 'files': stored}, status=status.HTTP_201_CREATED)
+
+
+# ---------- Trace 资源按需读取 ----------
+import mimetypes
+from urllib.parse import urlencode
+
+from django.core import signing
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotFound
+from django.urls import reverse
+
+# 小于该大小的 Trace 在查看时同步解析，更大的提交后台解析
+TRACE_SYNC_PARSE_MAX_SIZE = 20 * 1024 * 1024
+# Trace 资源访问令牌有效期（1 天）
+TRACE_TOKEN_MAX_AGE = 24 * 3600
+TRACE_TOKEN_SALT = 'ui_automation.trace_resource'
+# 可内联返回的快照图片类型（不含 SVG）
+TRACE_INLINE_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
+
+
+def _with_trace_resource_urls(record, trace_data: dict) -> dict:
+    """为索引中的快照、请求/响应体附加带签名的按需读取地址"""
+    token = signing.dumps({'record_id': record.pk, 'trace_path': record.trace_path}, salt=TRACE_TOKEN_SALT)
+    base_url = reverse('ui-trace-resource', args=[record.pk])
+
+    def resource_url(name: str) -> str:
+        return f"{base_url}?{urlencode({'token': token, 'name': name})}"
+
+    data = dict(trace_data)
+    data['snapshots'] = [
+        {**snapshot, 'screenshot': resource_url(snapshot['snapshot_id'])}
+        for snapshot in trace_data.get('snapshots', [])
+    ]
+    requests = []
+    for item in trace_data.get('network_requests', []):
+        item = dict(item)
+        if item.get('request_body_ref'):
+            item['request_body_url'] = resource_url(item['request_body_ref'])
+        if item.get('response_body_ref'):
+            item['response_body_url'] = resource_url(item['response_body_ref'])
+        requests.append(item)
+    data['network_requests'] = requests
+    return data
+
+
+def trace_resource_view(request, pk):
+    """按需读取 Trace 中的单个资源（快照截图、请求/响应体）
+
+    通过签名 token 认证（<img> 无法携带 Authorization 头）。
+    只允许读取索引中列出的快照与请求/响应体；快照以图片类型内联返回，
+    其余内容一律作为附件下载（application/octet-stream），避免 Trace 中的 HTML/SVG 在本站域名下渲染。
+    Trace 内容不可变，响应带 ETag 与长期缓存头。
+    """
+    from .trace_parser import (
+        is_trace_index, load_trace_index, read_trace_member, resolve_trace_path, trace_resource_kinds,
+    )
+
+    token = request.GET.get('token')
+    name = request.GET.get('name')
+    if not token:
+        return HttpResponseForbidden('缺少访问令牌')
+    if not name:
+        return HttpResponseBadRequest('缺少资源名称')
+    try:
+        data = signing.loads(token, salt=TRACE_TOKEN_SALT, max_age=TRACE_TOKEN_MAX_AGE)
+    except signing.SignatureExpired:
+        return HttpResponseForbidden('链接已过期')
+    except signing.BadSignature:
+        return HttpResponseForbidden('无效的访问链接')
+    if data.get('record_id') != pk or not data.get('trace_path'):
+        return HttpResponseForbidden('无效的访问链接')
+
+    trace_path = data['trace_path']
+    records = UiExecutionRecord.objects.filter(pk=pk, trace_path=trace_path)
+    if not records.exists():
+        return HttpResponseNotFound('执行记录不存在')
+    index = records.values_list('trace_data', flat=True).first()
+    if not is_trace_index(index):
+        index = load_trace_index(trace_path)
+    kind = trace_resource_kinds(index).get(name)
+    if kind is None:
+        return HttpResponseNotFound('资源不存在')
+    try:
+        stat = os.stat(resolve_trace_path(trace_path))
+    except OSError:
+        return HttpResponseNotFound('Trace 文件不存在')
+
+    etag = '"{}"'.format(hashlib.sha1(f"{trace_path}:{stat.st_size}:{stat.st_mtime_ns}:{name}".encode()).hexdigest())
+    cache_control = f'private, max-age={TRACE_TOKEN_MAX_AGE}, immutable'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        member = read_trace_member(trace_path, name)
+        if member is None:
+            return HttpResponseNotFound('资源不存在')
+        content, _ = member
+        response = HttpResponse(content, content_type='application/octet-stream')
+    content_type = mimetypes.guess_type(name)[0] or ''
+    if kind == 'snapshot' and content_type in TRACE_INLINE_IMAGE_TYPES:
+        response['Content-Type'] = content_type
+    else:
+        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(name)}"'
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
 # ---------- 内部触发批量执行（供 Celery 任务调用） ----------
 from asgiref.sync import async_to_sync
 
@@ -688,6 +1085,7 @@ def trigger_batch_execution(request):
         ui_environment_id: int - UI 环境配置 ID（可选；用于将浏览器/视口等配置下发给执行器）
     """
     from .consumers import SocketUserManager
+    from .dispatch import get_dispatcher
     from .socket_models import SocketDataModel, QueueModel, NoticeType, ResponseCode, UiSocketEnum
 
     case_ids = request.data.get('case_ids', [])
@@ -699,13 +1097,14 @@ def trigger_batch_execution(request):
     if not case_ids:
         return Response({'error': '未提供用例 ID'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # 查找执行器
+    # 查找执行器（未指定时分片到所有空闲执行器）
+    dispatcher = get_dispatcher()
     if actuator_id:
-        actuator = SocketUserManager.get_actuator_by_id(actuator_id)
+        online = SocketUserManager.resolve_actuator_id(actuator_id, lane='batch')
     else:
-        actuator = SocketUserManager.get_actuator()
+        online = dispatcher.open_actuators()
 
-    if not actuator:
+    if not online:
         return Response(
             {'error': f'执行器 {actuator_id} 不在线' if actuator_id else '没有可用的执行器'},
             status=status.HTTP_503_SERVICE_UNAVAILABLE
@@ -746,16 +1145,19 @@ def trigger_batch_execution(request):
         args['env_config_id'] = ui_environment_id
 
     # 通过 WebSocket 发送给执行器
-    async_to_sync(actuator.send_json)(SocketDataModel(
-        code=ResponseCode.SUCCESS,
-        msg='execute_batch',
-        user='system',
-        is_notice=NoticeType.ACTUATOR,
-        data=QueueModel(
-            func_name=UiSocketEnum.TEST_CASE_BATCH,
-            func_args=args,
-        ),
-    ))
+    if actuator_id:
+        async_to_sync(SocketUserManager.send_to_actuator_by_id)(actuator_id, SocketDataModel(
+            code=ResponseCode.SUCCESS,
+            msg='execute_batch',
+            user='system',
+            is_notice=NoticeType.ACTUATOR,
+            data=QueueModel(
+                func_name=UiSocketEnum.TEST_CASE_BATCH,
+                func_args=args,
+            ),
+        ))
+    else:
+        async_to_sync(dispatcher.start_batch)(batch.id, case_ids, args, 'system')
 
     return Response({
         'status': 'success',
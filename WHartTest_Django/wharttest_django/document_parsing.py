@@ -0,0 +1,932 @@
+"""
+共享文档解析服务
+
+需求评审与知识库都需要把 PDF / Word(.docx/.doc) / Excel 解析为 Markdown。解析由本模块统一完成：
+
+- CPU 密集的解析（python-docx、pypdf、LibreOffice 转换等）在进程池中执行，带超时，
+  不阻塞请求线程；Celery prefork 子进程（daemon 进程不能创建进程池）中每个文档在独立子进程中解析，
+  同样带超时；DOCUMENT_PARSE_WORKERS=0 时在当前进程执行
+- 解析结果（Markdown、分页文本、图片）按 文件 SHA-256 + 扩展名 + 解析器版本 缓存到磁盘，
+  重复上传或跨功能（需求文档/知识库）使用同一文件时直接命中，不再解析
+- 缓存总大小超过 DOCUMENT_PARSE_CACHE_MAX_BYTES 时按最近使用时间淘汰
+
+解析函数只依赖文件字节，不访问数据库；图片入库等业务处理由调用方完成。
+"""
+
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 解析逻辑变化时递增，使旧缓存失效
+PARSER_VERSION = 1
+
+SUPPORTED_EXTENSIONS = {"pdf", "docx", "doc", "xlsx", "xls"}
+
+IMAGE_PLACEHOLDER_PATTERN = re.compile(r"\n?!\[图片\]\(docimg://[^)]+\)\n?")
+
+_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NSMAP = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "r": _RELATIONSHIP_NS,
+    "v": "urn:schemas-microsoft-com:vml",
+}
+
+_DOC_PARSE_ERROR = (
+    "无法解析 .doc 文件。请安装 LibreOffice 以获得最佳效果：\n"
+    "Ubuntu/Debian: apt-get install libreoffice\n"
+    "或者将文件另存为 .docx 格式后重新上传"
+)
+
+
+class DocumentParseError(ValueError):
+    """文档无法解析（格式不支持、内容损坏、解析超时等）"""
+
+
+@dataclass
+class ParsedImage:
+    image_id: str
+    order: int
+    content_type: str
+    blob: bytes
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+@dataclass
+class ParsedDocument:
+    markdown: str
+    # PDF 按页的 (页码索引, 文本)，仅包含非空页
+    pages: List[Tuple[int, str]] = field(default_factory=list)
+    images: List[ParsedImage] = field(default_factory=list)
+    meta: Dict[str, Any] = field(default_factory=dict)
+    sha256: str = ""
+    from_cache: bool = False
+
+    def markdown_without_images(self) -> str:
+        """去掉图片占位符的 Markdown（知识库分块不需要图片引用）"""
+        return IMAGE_PLACEHOLDER_PATTERN.sub("\n", self.markdown).strip()
+
+
+# ============== Markdown 转换 ==============
+
+
+def convert_paragraph_to_markdown(paragraph) -> str:
+    """将 Word 段落转换为 Markdown 格式（按段落样式识别标题）"""
+    text = paragraph.text.strip()
+    if not text:
+        return ""
+
+    style_name = (paragraph.style.name if paragraph.style else "").lower()
+    for level in range(1, 7):
+        if f"heading {level}" in style_name:
+            return f"{'#' * level} {text}"
+    # 非标题样式直接返回原文本，不根据粗体等格式推测标题
+    return text
+
+
+def _sanitize_cell_text(text: str) -> str:
+    """清理单元格文本，转义 Markdown 特殊字符"""
+    text = (text or "").replace("\r", " ").replace("\n", " ").replace("\t", " ")
+    text = " ".join(text.split())
+    return text.replace("|", "\\|")
+
+
+def _is_vertical_merge_continue(table, row_idx: int, col_idx: int, cell) -> bool:
+    # Word 中 <w:vMerge/> 无 val 属性时通常表示"继续合并"
+    try:
+        tc_pr = cell._tc.tcPr
+        v_merge = tc_pr.vMerge if tc_pr is not None else None
+        if v_merge is None:
+            return False
+        v_merge_val = getattr(v_merge, "val", None)
+        if v_merge_val == "restart":
+            return False
+        if v_merge_val == "continue":
+            return True
+        # val 为 None 时，通过检查上一行是否有 vMerge 来判断
+        if row_idx == 0:
+            return False
+        prev_tc_pr = table.rows[row_idx - 1].cells[col_idx]._tc.tcPr
+        return prev_tc_pr is not None and prev_tc_pr.vMerge is not None
+    except Exception:
+        return False
+
+
+def extract_table_markdown(table, depth: int = 0) -> str:
+    """提取 Word 表格为 Markdown，处理合并单元格，最多支持 3 层嵌套表格"""
+    try:
+        row_count = len(table.rows)
+        if row_count == 0:
+            return ""
+
+        # 优先用 table.columns 获取列数（更稳定），失败时回退到行 cells 的最大长度
+        try:
+            max_cols = len(table.columns)
+        except Exception:
+            max_cols = max((len(row.cells) for row in table.rows), default=0)
+        if max_cols == 0:
+            return ""
+
+        grid = [["" for _ in range(max_cols)] for _ in range(row_count)]
+
+        for row_idx, row in enumerate(table.rows):
+            # 同一行中重复引用同一 tc 表示水平合并
+            processed_cells_in_row = set()
+
+            for col_idx, cell in enumerate(row.cells):
+                if col_idx >= max_cols:
+                    break
+
+                cell_id = id(cell._tc)
+                if cell_id in processed_cells_in_row or _is_vertical_merge_continue(
+                    table, row_idx, col_idx, cell
+                ):
+                    continue
+
+                nested_tables = cell.tables
+                if nested_tables and depth < 3:
+                    cell_text_parts = [
+                        p.text.strip() for p in cell.paragraphs if p.text.strip()
+                    ]
+                    for nested_table in nested_tables:
+                        nested_content = extract_table_markdown(nested_table, depth + 1)
+                        if nested_content:
+                            cell_text_parts.append(f"[嵌套表格] {nested_content}")
+                    cell_text = _sanitize_cell_text(" ".join(cell_text_parts))
+                else:
+                    cell_text = _sanitize_cell_text(cell.text.strip())
+
+                grid[row_idx][col_idx] = cell_text
+                processed_cells_in_row.add(cell_id)
+
+        table_rows = []
+        for row_cells in grid:
+            # 跳过全空行
+            if not any(cell.strip() for cell in row_cells):
+                continue
+            table_rows.append(" | ".join(row_cells))
+            # 第一行后添加分隔符
+            if len(table_rows) == 1:
+                table_rows.append(" | ".join(["---"] * max_cols))
+
+        return "\n".join(table_rows)
+
+    except Exception as e:
+        logger.warning(f"表格提取失败 (深度{depth}): {e}")
+        return ""
+
+
+# 编号模式 -> 标题级别
+_HEADING_PATTERNS = [
+    # 第X章 -> H1
+    (re.compile(r"^第[一二三四五六七八九十\d]+章\s*[:：]?\s*(.+)$"), 1),
+    # 第X节 -> H2
+    (re.compile(r"^第[一二三四五六七八九十\d]+节\s*[:：]?\s*(.+)$"), 2),
+    # 一、二、三、 -> H1
+    (re.compile(r"^[一二三四五六七八九十]+[、.．]\s*(.+)$"), 1),
+    # （一）（二）-> H2
+    (re.compile(r"^[（\(][一二三四五六七八九十]+[）\)]\s*(.+)$"), 2),
+    # 1. 2. 3. (独立行，较短) -> H2
+    (re.compile(r"^(\d+)[.、．]\s*(.{2,50})$"), 2),
+    # 1.1 1.2 (两级编号) -> H3
+    (re.compile(r"^(\d+\.\d+)[.、．\s]\s*(.{2,50})$"), 3),
+    # 1.1.1 (三级编号) -> H4
+    (re.compile(r"^(\d+\.\d+\.\d+)[.、．\s]\s*(.{2,50})$"), 4),
+    # 1.1.1.1 (四级编号) -> H5
+    (re.compile(r"^(\d+\.\d+\.\d+\.\d+)[.、．\s]\s*(.{2,50})$"), 5),
+    # 1) 2) 3) 形式 -> H3
+    (re.compile(r"^(\d+)[)）]\s*(.{2,50})$"), 3),
+]
+
+
+def infer_headings_from_plain_text(content: str) -> str:
+    """从纯文本推断标题结构，转换为 Markdown 格式"""
+    result_lines = []
+    for line in content.split("\n"):
+        stripped = line.strip()
+        if not stripped:
+            result_lines.append("")
+            continue
+
+        for pattern, level in _HEADING_PATTERNS:
+            if len(stripped) <= 80 and pattern.match(stripped):
+                result_lines.append("#" * level + " " + stripped)
+                break
+        else:
+            result_lines.append(line)
+
+    return "\n".join(result_lines)
+
+
+def append_image_placeholder(
+    content_parts: List[str],
+    image_rids: List[str],
+    rid: Optional[str],
+    image_order: int,
+) -> int:
+    """追加图片占位符，并过滤 Word XML 中连续重复的同一图片引用。"""
+    if not rid:
+        return image_order
+
+    if image_rids and image_rids[-1] == rid:
+        logger.debug("跳过连续重复图片引用: %s", rid)
+        return image_order
+
+    image_id = f"img_{image_order:03d}"
+    content_parts.append(f"\n![图片](docimg://{image_id})\n")
+    image_rids.append(rid)
+    return image_order + 1
+
+
+def dataframe_to_markdown(df) -> str:
+    """将 DataFrame 转换为 Markdown 表格"""
+    if df.empty:
+        return ""
+
+    headers = [_sanitize_cell_text(str(col)) for col in df.columns]
+    table_parts = [" | ".join(headers), " | ".join(["---"] * len(headers))]
+    for _, row in df.iterrows():
+        table_parts.append(" | ".join(_sanitize_cell_text(str(cell)) for cell in row))
+    return "\n".join(table_parts)
+
+
+# ============== 各格式解析（在工作进程中执行） ==============
+
+
+def _collect_docx_images(doc, image_rids: List[str]) -> List[ParsedImage]:
+    images = []
+    for order, rid in enumerate(image_rids):
+        rel = doc.part.rels.get(rid)
+        if not rel:
+            logger.warning(f"未找到关系 {rid}")
+            continue
+        image_part = rel.target_part
+        blob = image_part.blob
+        width, height = None, None
+        try:
+            from PIL import Image
+
+            width, height = Image.open(io.BytesIO(blob)).size
+        except Exception as e:
+            logger.warning(f"获取图片尺寸失败: {e}")
+        images.append(
+            ParsedImage(
+                image_id=f"img_{order:03d}",
+                order=order,
+                content_type=image_part.content_type,
+                blob=blob,
+                width=width,
+                height=height,
+            )
+        )
+    return images
+
+
+def _parse_docx_simple(data: bytes) -> ParsedDocument:
+    """简化解析：只按顺序取段落和表格（结构化解析失败时的备用方案）"""
+    from docx import Document
+
+    doc = Document(io.BytesIO(data))
+    parts = [convert_paragraph_to_markdown(p) for p in doc.paragraphs if p.text.strip()]
+    parts.extend(filter(None, (extract_table_markdown(t) for t in doc.tables)))
+    return ParsedDocument(
+        markdown="\n\n".join(parts),
+        meta={"parse_method": "docx_simple", "structured_parsing": False},
+    )
+
+
+def _parse_docx(data: bytes) -> ParsedDocument:
+    """按文档顺序解析 .docx：保留标题层级、表格位置，并在图片位置插入占位符"""
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    try:
+        doc = Document(io.BytesIO(data))
+
+        # 元素到对象的映射，避免重复查找
+        paragraph_map = {p._element: p for p in doc.paragraphs}
+        table_map = {t._element: t for t in doc.tables}
+
+        content_parts: List[str] = []
+        image_rids: List[str] = []
+        image_order = 0
+        paragraph_count = 0
+        table_count = 0
+
+        for element in doc.element.body:
+            if element.tag.endswith("p"):
+                paragraph = paragraph_map.get(element)
+                if not paragraph:
+                    continue
+                if paragraph.text.strip():
+                    content_parts.append(convert_paragraph_to_markdown(paragraph))
+                    paragraph_count += 1
+
+                for drawing in element.findall(".//" + qn("w:drawing")):
+                    for blip in drawing.findall(".//a:blip", _NSMAP):
+                        image_order = append_image_placeholder(
+                            content_parts,
+                            image_rids,
+                            blip.get(f"{{{_RELATIONSHIP_NS}}}embed"),
+                            image_order,
+                        )
+                for pict in element.findall(".//" + qn("w:pict")):
+                    for imagedata in pict.findall(".//v:imagedata", _NSMAP):
+                        image_order = append_image_placeholder(
+                            content_parts,
+                            image_rids,
+                            imagedata.get(f"{{{_RELATIONSHIP_NS}}}id"),
+                            image_order,
+                        )
+
+            elif element.tag.endswith("tbl"):
+                table = table_map.get(element)
+                if table:
+                    table_content = extract_table_markdown(table)
+                    if table_content:
+                        content_parts.append(table_content)
+                        table_count += 1
+
+        markdown = "\n\n".join(content_parts)
+        if paragraph_count < len(doc.paragraphs) * 0.5:
+            logger.warning(
+                f"Word文档可能存在内容丢失！原始{len(doc.paragraphs)}段，仅提取{paragraph_count}段"
+            )
+        return ParsedDocument(
+            markdown=markdown,
+            images=_collect_docx_images(doc, image_rids),
+            meta={
+                "parse_method": "docx",
+                "structured_parsing": True,
+                "paragraph_count": paragraph_count,
+                "table_count": table_count,
+            },
+        )
+    except Exception as e:
+        logger.warning(f"Word 结构化解析失败，降级为简化解析: {e}")
+        return _parse_docx_simple(data)
+
+
+def _parse_pdf(data: bytes) -> ParsedDocument:
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(data))
+    pages = []
+    for page_num, page in enumerate(reader.pages):
+        try:
+            text = (page.extract_text() or "").strip()
+        except Exception as e:
+            logger.warning(f"提取PDF第{page_num + 1}页失败: {e}")
+            continue
+        if text:
+            pages.append((page_num, text))
+
+    markdown = "\n\n".join(f"=== 第{num + 1}页 ===\n{text}" for num, text in pages)
+    return ParsedDocument(
+        markdown=markdown,
+        pages=pages,
+        meta={"parse_method": "pdf", "page_count": len(reader.pages)},
+    )
+
+
+def _parse_excel(data: bytes) -> ParsedDocument:
+    import pandas as pd
+
+    excel_file = pd.ExcelFile(io.BytesIO(data))
+    content_parts = []
+    total_rows = 0
+    for sheet_name in excel_file.sheet_names:
+        try:
+            df = pd.read_excel(excel_file, sheet_name=sheet_name, dtype=str).fillna("")
+        except Exception as e:
+            logger.warning(f"解析工作表 '{sheet_name}' 失败: {e}")
+            continue
+        if df.empty:
+            continue
+        total_rows += len(df)
+        content_parts.append(f"## {sheet_name}")
+        content_parts.append(dataframe_to_markdown(df))
+
+    return ParsedDocument(
+        markdown="\n\n".join(content_parts),
+        meta={
+            "parse_method": "excel",
+            "structured_parsing": True,
+            "sheet_count": len(excel_file.sheet_names),
+            "total_rows": total_rows,
+        },
+    )
+
+
+def _run_libreoffice(file_path: str, out_dir: str, target: str) -> Optional[str]:
+    result = subprocess.run(
+        ["libreoffice", "--headless", "--convert-to", target, "--outdir", out_dir, file_path],
+        capture_output=True,
+        text=True,
+        timeout=1200,
+    )
+    if result.returncode != 0:
+        return None
+    output = os.path.join(
+        out_dir, os.path.splitext(os.path.basename(file_path))[0] + "." + target.split(":")[0]
+    )
+    return output if os.path.exists(output) else None
+
+
+def _extract_doc_with_com(file_path: str, styled: bool) -> str:
+    """使用 Windows COM 接口提取 .doc 内容，styled=True 时按段落样式保留标题"""
+    try:
+        import pythoncom
+        import win32com.client
+    except ImportError:
+        logger.debug("pywin32 未安装")
+        return ""
+
+    try:
+        pythoncom.CoInitialize()
+        try:
+            word = win32com.client.Dispatch("Word.Application")
+            word.Visible = False
+            word.DisplayAlerts = False
+            doc = word.Documents.Open(file_path, ReadOnly=True, AddToRecentFiles=False)
+            if not styled:
+                content = doc.Content.Text.strip()
+            else:
+                content_parts = []
+                for para in doc.Paragraphs:
+                    text = para.Range.Text.strip()
+                    if not text:
+                        continue
+                    style_name = para.Style.NameLocal if para.Style else ""
+                    for level in range(1, 7):
+                        if f"标题 {level}" in style_name or f"Heading {level}" in style_name:
+                            text = f"{'#' * level} {text}"
+                            break
+                    content_parts.append(text)
+                content = "\n\n".join(content_parts)
+            doc.Close(False)
+            word.Quit()
+            return content
+        finally:
+            pythoncom.CoUninitialize()
+    except Exception as e:
+        logger.debug(f"COM 解析 .doc 失败: {e}")
+        return ""
+
+
+def _run_text_tool(command: List[str]) -> str:
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    except FileNotFoundError:
+        logger.debug(f"{command[0]} 未安装")
+        return ""
+    except Exception as e:
+        logger.debug(f"{command[0]} 失败: {e}")
+        return ""
+    if result.returncode == 0:
+        return result.stdout.strip()
+    return ""
+
+
+def _plain_text_document(content: str, method: str) -> ParsedDocument:
+    return ParsedDocument(
+        markdown=infer_headings_from_plain_text(content),
+        meta={"parse_method": method, "structured_parsing": False},
+    )
+
+
+def _parse_doc(data: bytes) -> ParsedDocument:
+    """解析旧版 .doc：优先经 LibreOffice 转为 docx 保留样式，依次降级为 COM / antiword / catdoc / 纯文本"""
+    # ZIP 魔数表示实际是 .docx
+    if data[:4] == b"PK\x03\x04":
+        logger.info("检测到 .doc 文件实际为 .docx 格式，使用 docx 解析器")
+        return _parse_docx(data)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        doc_path = os.path.join(tmp_dir, "source.doc")
+        with open(doc_path, "wb") as f:
+            f.write(data)
+        out_dir = os.path.join(tmp_dir, "out")
+        os.makedirs(out_dir)
+
+        # 方法1: LibreOffice 转换为 docx，保留标题样式
+        try:
+            docx_path = _run_libreoffice(doc_path, out_dir, "docx")
+            if docx_path:
+                with open(docx_path, "rb") as f:
+                    parsed = _parse_docx(f.read())
+                if parsed.markdown:
+                    parsed.meta["parse_method"] = "libreoffice_docx"
+                    return parsed
+        except FileNotFoundError:
+            logger.debug("LibreOffice 未安装，尝试其他方法")
+        except Exception as e:
+            logger.debug(f"LibreOffice 转换失败: {e}")
+
+        # 方法2: Windows COM 接口
+        if platform.system() == "Windows":
+            content = _extract_doc_with_com(doc_path, styled=True)
+            if content:
+                return ParsedDocument(
+                    markdown=content, meta={"parse_method": "com_styled", "structured_parsing": True}
+                )
+            content = _extract_doc_with_com(doc_path, styled=False)
+            if content:
+                return _plain_text_document(content, "com")
+
+        # 方法3/4: antiword、catdoc（纯文本，需要推断标题）
+        for command, method in (
+            (["antiword", "-w", "0", doc_path], "antiword"),
+            (["catdoc", "-w", doc_path], "catdoc"),
+        ):
+            content = _run_text_tool(command)
+            if content:
+                return _plain_text_document(content, method)
+
+        # 方法5: LibreOffice 转纯文本
+        try:
+            txt_path = _run_libreoffice(doc_path, out_dir, "txt:Text")
+            if txt_path:
+                with open(txt_path, "r", encoding="utf-8", errors="ignore") as f:
+                    content = f.read().strip()
+                if content:
+                    return _plain_text_document(content, "libreoffice_txt")
+        except FileNotFoundError:
+            logger.debug("LibreOffice 未安装")
+        except Exception as e:
+            logger.debug(f"LibreOffice 失败: {e}")
+
+    raise DocumentParseError(_DOC_PARSE_ERROR)
+
+
+_PARSERS = {
+    "pdf": _parse_pdf,
+    "docx": _parse_docx,
+    "doc": _parse_doc,
+    "xlsx": _parse_excel,
+    "xls": _parse_excel,
+}
+
+
+def parse_bytes_in_process(data: bytes, extension: str) -> ParsedDocument:
+    """工作进程入口：解析文件字节（不使用缓存）"""
+    parser = _PARSERS.get(extension)
+    if parser is None:
+        raise DocumentParseError(f"不支持的文件格式: .{extension}")
+    return parser(data)
+
+
+def _subprocess_main():
+    """独立子进程入口：从 stdin 读取 (data, extension)，把 (是否成功, 结果或异常) 写回 stdout"""
+    # 解析过程中（含 LibreOffice 等外部命令）写到 stdout 的内容转到 stderr，stdout 只用于返回结果
+    result_fd = os.dup(1)
+    os.dup2(2, 1)
+    data, extension = pickle.load(sys.stdin.buffer)
+    try:
+        result = (True, parse_bytes_in_process(data, extension))
+    except Exception as exc:
+        result = (False, exc)
+    with os.fdopen(result_fd, "wb") as out:
+        out.write(pickle.dumps(result))
+
+
+# ============== 解析服务 ==============
+
+
+class DocumentParsingService:
+    """带内容哈希缓存与进程池的文档解析服务"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        # 各进程池上尚未完成的解析任务，回收进程池前先等待它们结束
+        self._inflight: Dict[ProcessPoolExecutor, set] = {}
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0.0
+        self._bytes_since_prune = 0
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- 配置 ----------
+
+    @staticmethod
+    def _setting(name: str, default):
+        from django.conf import settings
+
+        return getattr(settings, name, default)
+
+    @property
+    def workers(self) -> int:
+        return self._setting("DOCUMENT_PARSE_WORKERS", 2)
+
+    @property
+    def timeout(self) -> float:
+        return self._setting("DOCUMENT_PARSE_TIMEOUT", 300)
+
+    @property
+    def cache_dir(self) -> str:
+        from django.conf import settings
+
+        return self._setting(
+            "DOCUMENT_PARSE_CACHE_DIR", os.path.join(settings.MEDIA_ROOT, "parse_cache")
+        )
+
+    @property
+    def cache_max_bytes(self) -> int:
+        return self._setting("DOCUMENT_PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+
+    @property
+    def cache_prune_interval(self) -> float:
+        return self._setting("DOCUMENT_PARSE_CACHE_PRUNE_INTERVAL", 300)
+
+    # ---------- 解析 ----------
+
+    def parse(self, source, extension: str, use_cache: bool = True) -> ParsedDocument:
+        """
+        解析文件
+
+        Args:
+            source: 文件字节、文件路径或类文件对象（Django File / UploadedFile）
+            extension: 文件扩展名（不含点）
+            use_cache: 是否读写解析缓存
+        """
+        extension = extension.lower().lstrip(".")
+        if extension not in SUPPORTED_EXTENSIONS:
+            raise DocumentParseError(f"不支持的文件格式: .{extension}")
+
+        data = self._read_source(source)
+        digest = hashlib.sha256(data).hexdigest()
+
+        if use_cache:
+            cached = self._load_cached(digest, extension)
+            if cached is not None:
+                self.hits += 1
+                logger.info(f"文档解析缓存命中: {digest[:12]}.{extension}")
+                return cached
+            self.misses += 1
+
+        started = time.monotonic()
+        parsed = self._run(data, extension)
+        parsed.sha256 = digest
+        logger.info(
+            f"文档解析完成: {digest[:12]}.{extension}, 方式: {parsed.meta.get('parse_method')}, "
+            f"长度: {len(parsed.markdown)}, 图片: {len(parsed.images)}, 耗时: {time.monotonic() - started:.2f}s"
+        )
+
+        if use_cache:
+            self._store_cached(digest, extension, parsed)
+        return parsed
+
+    @staticmethod
+    def _read_source(source) -> bytes:
+        if isinstance(source, (bytes, bytearray)):
+            return bytes(source)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                return f.read()
+        if hasattr(source, "seek"):
+            source.seek(0)
+        data = source.read()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return data
+
+    def _can_use_pool(self) -> bool:
+        # Celery prefork 等 daemon 进程不允许再创建子进程
+        return self.workers > 0 and not multiprocessing.current_process().daemon
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn 避免 fork 多线程的 Django 进程带来的锁状态问题
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset_executor(self, terminate: bool = False):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if executor is not None:
+                self._inflight.pop(executor, None)
+        if executor is None:
+            return
+        if terminate:
+            self._terminate_workers(executor)
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _terminate_workers(executor: ProcessPoolExecutor):
+        for process in list(getattr(executor, "_processes", {}).values()):
+            try:
+                process.terminate()
+            except Exception:
+                pass
+
+    def _retire_executor(self, executor: ProcessPoolExecutor, timed_out):
+        """
+        回收有解析超时的进程池
+
+        超时的解析无法单独取消，也无法得知它在哪个工作进程中执行：
+        新的解析立即改用新进程池，旧进程池中其他仍在进行的解析继续执行，
+        全部结束（或再等待一个超时周期）后才终止旧进程池的工作进程。
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            pending = self._inflight.pop(executor, set()) - {timed_out}
+        timeout = self.timeout
+
+        def drain():
+            wait(pending, timeout=timeout)
+            self._terminate_workers(executor)
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        threading.Thread(target=drain, name="document-parse-retire", daemon=True).start()
+
+    def _run_in_subprocess(self, data: bytes, extension: str, timeout: float) -> ParsedDocument:
+        """在独立子进程中解析（daemon 进程不能创建进程池，但可以启动子进程），超时后终止子进程"""
+        try:
+            completed = subprocess.run(
+                [sys.executable, "-c", "from wharttest_django.document_parsing import _subprocess_main; _subprocess_main()"],
+                input=pickle.dumps((data, extension)),
+                capture_output=True,
+                timeout=timeout,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            )
+        except subprocess.TimeoutExpired:
+            raise DocumentParseError(f"文档解析超时（{timeout} 秒）")
+        if completed.returncode != 0 or not completed.stdout:
+            tail = completed.stderr.decode("utf-8", errors="replace").strip()[-500:]
+            logger.error(f"文档解析进程异常退出 (exit={completed.returncode}): {tail}")
+            raise DocumentParseError("文档解析进程异常退出")
+        ok, result = pickle.loads(completed.stdout)
+        if not ok:
+            raise result
+        return result
+
+    def _run(self, data: bytes, extension: str) -> ParsedDocument:
+        timeout = self.timeout
+        if not self._can_use_pool():
+            if self.workers > 0:
+                return self._run_in_subprocess(data, extension, timeout)
+            return parse_bytes_in_process(data, extension)
+
+        executor = self._get_executor()
+        future = executor.submit(parse_bytes_in_process, data, extension)
+        with self._lock:
+            inflight = self._inflight.setdefault(executor, set())
+            inflight.add(future)
+        future.add_done_callback(inflight.discard)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._retire_executor(executor, future)
+            raise DocumentParseError(f"文档解析超时（{timeout} 秒）")
+        except BrokenProcessPool:
+            self._reset_executor()
+            raise DocumentParseError("文档解析进程异常退出")
+
+    def shutdown(self):
+        self._reset_executor()
+
+    # ---------- 缓存 ----------
+
+    def _entry_dir(self, digest: str, extension: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.{extension}.v{PARSER_VERSION}")
+
+    def _load_cached(self, digest: str, extension: str) -> Optional[ParsedDocument]:
+        entry_dir = self._entry_dir(digest, extension)
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            images = []
+            for image in manifest.pop("images", []):
+                with open(os.path.join(entry_dir, image.pop("file")), "rb") as f:
+                    images.append(ParsedImage(blob=f.read(), **image))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取文档解析缓存失败，重新解析: {e}")
+            return None
+
+        # 记录最近使用时间，供按大小淘汰时参考
+        try:
+            os.utime(manifest_path)
+        except OSError:
+            pass
+        manifest["pages"] = [tuple(page) for page in manifest.get("pages", [])]
+        return ParsedDocument(images=images, from_cache=True, **manifest)
+
+    def _store_cached(self, digest: str, extension: str, parsed: ParsedDocument):
+        entry_dir = self._entry_dir(digest, extension)
+        tmp_dir = f"{entry_dir}.tmp{os.getpid()}_{threading.get_ident()}"
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+            manifest = asdict(parsed)
+            manifest.pop("from_cache", None)
+            manifest["images"] = []
+            for image in parsed.images:
+                filename = f"{image.image_id}.bin"
+                with open(os.path.join(tmp_dir, filename), "wb") as f:
+                    f.write(image.blob)
+                image_meta = asdict(image)
+                image_meta.pop("blob")
+                image_meta["file"] = filename
+                manifest["images"].append(image_meta)
+            with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            written = sum(f.stat().st_size for f in os.scandir(tmp_dir) if f.is_file())
+            # 先写临时目录再整体改名，避免并发读到半成品
+            if os.path.exists(entry_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return
+            os.replace(tmp_dir, entry_dir)
+        except Exception as e:
+            logger.warning(f"写入文档解析缓存失败: {e}")
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._maybe_prune_cache(written)
+
+    def _maybe_prune_cache(self, written: int):
+        """
+        节流的缓存淘汰：淘汰需要遍历整个缓存目录，
+        只在距上次淘汰超过 DOCUMENT_PARSE_CACHE_PRUNE_INTERVAL 秒
+        或期间新写入超过上限的 1/10 时执行，并且同一时间只有一个线程在淘汰
+        """
+        with self._lock:
+            self._bytes_since_prune += written
+            due = (
+                time.monotonic() - self._last_prune >= self.cache_prune_interval
+                or self._bytes_since_prune >= self.cache_max_bytes // 10
+            )
+        if not due or not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                self._last_prune = time.monotonic()
+                self._bytes_since_prune = 0
+            self._prune_cache()
+        finally:
+            self._prune_lock.release()
+
+    def _prune_cache(self):
+        """缓存总大小超过上限时，按最近使用时间淘汰最旧的条目"""
+        entries = []
+        total = 0
+        try:
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    if not entry.is_dir() or ".tmp" in entry.name:
+                        continue
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                    manifest = os.path.join(entry.path, "manifest.json")
+                    used_at = os.path.getmtime(manifest) if os.path.exists(manifest) else 0
+                    entries.append((used_at, size, entry.path))
+                    total += size
+        except FileNotFoundError:
+            return
+
+        if total <= self.cache_max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            if total <= self.cache_max_bytes:
+                break
+
+    def clear_cache(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers if self._can_use_pool() else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+document_parser = DocumentParsingService()
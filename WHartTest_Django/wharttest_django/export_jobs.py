@@ -0,0 +1,291 @@
+"""
+后台导出任务与导出文件缓存
+
+评审报告、测试用例等导出不再在 HTTP 请求中生成文件：
+
+- 任务 ID 由导出内容指纹（数据的更新时间/数量、模版及其版本、导出格式版本等）派生，
+  相同内容的重复导出直接复用已生成的文件，进行中的同一导出只会排队一次
+- 任务记录（JSON）与导出文件都保存在 EXPORT_ARTIFACT_DIR 下，Web 进程与 Celery worker 共享；
+  总大小超过 EXPORT_ARTIFACT_MAX_BYTES 时按最近使用时间淘汰
+- 进度通过进度总线推送到 ``export.<任务ID>`` 主题
+- 同步下载或 EXPORT_JOBS_ASYNC=False 时在当前进程内直接生成（无 Celery 的开发/测试环境）；
+  后台导出无法提交到队列时抛出 ExportQueueUnavailable，不在请求线程中代为执行
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+
+from .progress import ProgressReporter
+
+logger = logging.getLogger(__name__)
+
+JOB_ID_PATTERN = re.compile(r"^[a-z_]+-[0-9a-f]{32}$")
+
+STATUS_PENDING = "pending"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_RUNNING)
+
+# 对外返回的任务字段
+PUBLIC_FIELDS = (
+    "job_id",
+    "kind",
+    "status",
+    "filename",
+    "content_type",
+    "size",
+    "error",
+    "download_url",
+    "created_at",
+    "finished_at",
+)
+
+
+class ExportQueueUnavailable(Exception):
+    """后台导出任务无法提交到队列（如 broker 不可用）"""
+
+
+def make_job_id(kind: str, fingerprint) -> str:
+    digest = hashlib.sha256(
+        json.dumps(fingerprint, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return f"{kind}-{digest[:32]}"
+
+
+class ExportJobStore:
+    """导出任务记录与导出文件的文件系统存储"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def root(self) -> str:
+        return getattr(
+            settings, "EXPORT_ARTIFACT_DIR", os.path.join(settings.MEDIA_ROOT, "exports")
+        )
+
+    @property
+    def max_bytes(self) -> int:
+        return getattr(settings, "EXPORT_ARTIFACT_MAX_BYTES", 1024 * 1024 * 1024)
+
+    @property
+    def stale_seconds(self) -> int:
+        return getattr(settings, "EXPORT_JOB_STALE_SECONDS", 30 * 60)
+
+    # ---------- 任务记录 ----------
+
+    def _record_path(self, job_id: str) -> str:
+        if not JOB_ID_PATTERN.match(job_id or ""):
+            raise ValueError(f"无效的导出任务 ID: {job_id}")
+        return os.path.join(self.root, f"{job_id}.json")
+
+    def artifact_path(self, job_id: str) -> str:
+        return os.path.join(self.root, f"{job_id}.bin")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._record_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save(self, record: Dict[str, Any]):
+        record["updated_at"] = time.time()
+        path = self._record_path(record["job_id"])
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id: str, **fields) -> Dict[str, Any]:
+        with self._lock:
+            record = self.get(job_id) or {"job_id": job_id}
+            record.update(fields)
+            self.save(record)
+        return record
+
+    def has_artifact(self, record: Optional[Dict[str, Any]]) -> bool:
+        return bool(
+            record
+            and record.get("status") == STATUS_COMPLETED
+            and os.path.exists(self.artifact_path(record["job_id"]))
+        )
+
+    @staticmethod
+    def public_state(record: Dict[str, Any]) -> Dict[str, Any]:
+        state = {field: record.get(field) for field in PUBLIC_FIELDS}
+        state["progress"] = 1.0 if record.get("status") == STATUS_COMPLETED else record.get("progress", 0)
+        return state
+
+    def file_response(self, record: Dict[str, Any]):
+        """以附件形式返回已完成任务的导出文件"""
+        from django.http import FileResponse
+
+        self._touch(record["job_id"])
+        response = FileResponse(
+            open(self.artifact_path(record["job_id"]), "rb"),
+            content_type=record.get("content_type") or "application/octet-stream",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{record.get("filename")}"'
+        return response
+
+    # ---------- 提交与执行 ----------
+
+    def start(
+        self,
+        kind: str,
+        fingerprint,
+        *,
+        task,
+        builder: Callable[[Dict[str, Any], ProgressReporter], tuple],
+        project_id,
+        params: Dict[str, Any],
+        download_url: Callable[[str], str],
+        user_id=None,
+        inline: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        提交导出任务，返回任务记录（cached=True 表示直接复用了已有导出文件）
+
+        Args:
+            kind: 导出类型，同时作为任务 ID 前缀
+            fingerprint: 导出内容指纹（可 JSON 序列化）
+            task: 执行导出的 Celery 任务，参数为任务 ID
+            builder: 生成导出文件的函数（同 run），在当前进程内执行时直接调用
+            project_id: 所属项目，用于下载与进度订阅鉴权
+            params: 执行导出所需的参数，保存在任务记录中
+            download_url: 任务 ID -> 下载地址
+            inline: 在当前进程内同步执行（同步下载接口使用）
+        """
+        job_id = make_job_id(kind, fingerprint)
+        existing = self.get(job_id)
+        if self.has_artifact(existing):
+            self._touch(job_id)
+            return {**existing, "cached": True}
+        if (
+            existing
+            and existing.get("status") in ACTIVE_STATUSES
+            and time.time() - existing.get("updated_at", 0) < self.stale_seconds
+            and not inline
+        ):
+            return {**existing, "cached": False}
+
+        record = {
+            "job_id": job_id,
+            "kind": kind,
+            "status": STATUS_PENDING,
+            "project_id": project_id,
+            "user_id": user_id,
+            "params": params,
+            "download_url": download_url(job_id),
+            "created_at": time.time(),
+            "finished_at": None,
+            "error": None,
+        }
+        with self._lock:
+            self.save(record)
+
+        if inline or not getattr(settings, "EXPORT_JOBS_ASYNC", True):
+            record = self.run(job_id, builder) or self.get(job_id) or record
+            return {**record, "cached": False}
+        try:
+            task.delay(job_id)
+        except Exception as exc:
+            logger.error(f"提交导出任务失败 {job_id}: {exc}")
+            self._fail(job_id, f"提交导出任务失败: {exc}")
+            raise ExportQueueUnavailable(str(exc)) from exc
+        return {**(self.get(job_id) or record), "cached": False}
+
+    def run(self, job_id: str, builder: Callable[[Dict[str, Any], ProgressReporter], tuple]):
+        """
+        执行导出（在 Celery 任务中调用）
+
+        builder(record, reporter) 返回 (bytes, filename, content_type)，可通过 reporter.update(progress=...) 上报进度。
+        """
+        record = self.get(job_id)
+        if record is None:
+            logger.warning(f"导出任务不存在: {job_id}")
+            return None
+
+        reporter = ProgressReporter("export", job_id)
+        self._update(job_id, status=STATUS_RUNNING)
+        reporter.update(status=STATUS_RUNNING, progress=0)
+        started = time.monotonic()
+        try:
+            data, filename, content_type = builder(record, reporter)
+            path = self.artifact_path(job_id)
+            tmp_path = f"{path}.tmp{os.getpid()}_{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as exc:
+            logger.exception(f"导出任务失败 {job_id}")
+            self._fail(job_id, str(exc), reporter)
+            return None
+
+        record = self._update(
+            job_id,
+            status=STATUS_COMPLETED,
+            filename=filename,
+            content_type=content_type,
+            size=len(data),
+            finished_at=time.time(),
+            error=None,
+        )
+        logger.info(f"导出完成 {job_id}: {filename}, {len(data)} 字节, 耗时 {time.monotonic() - started:.2f}s")
+        state = self.public_state(record)
+        state.pop("status")
+        reporter.finish(STATUS_COMPLETED, **state)
+        self._prune()
+        return record
+
+    def _fail(self, job_id: str, error: str, reporter: Optional[ProgressReporter] = None):
+        record = self._update(job_id, status=STATUS_FAILED, error=error, finished_at=time.time())
+        (reporter or ProgressReporter("export", job_id)).finish(STATUS_FAILED, error=error)
+        return record
+
+    # ---------- 缓存淘汰 ----------
+
+    def _touch(self, job_id: str):
+        try:
+            os.utime(self.artifact_path(job_id))
+        except OSError:
+            pass
+
+    def _prune(self):
+        """导出文件总大小超过上限时，按最近使用时间淘汰最旧的文件及其任务记录"""
+        entries = []
+        total = 0
+        try:
+            for entry in os.scandir(self.root):
+                if entry.is_file() and entry.name.endswith(".bin"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name[: -len(".bin")]))
+                    total += stat.st_size
+        except FileNotFoundError:
+            return
+
+        if total <= self.max_bytes:
+            return
+        for _, size, job_id in sorted(entries):
+            for path in (self.artifact_path(job_id), os.path.join(self.root, f"{job_id}.json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+export_jobs = ExportJobStore()
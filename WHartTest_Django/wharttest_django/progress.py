@@ -0,0 +1,260 @@
+"""
+长任务进度事件总线
+
+需求评审、知识库入库、测试执行、导出等长任务的进度通过 Channels 通道层推送给订阅的 WebSocket 客户端，
+不再依赖前端轮询数据库：
+
+- 主题：``<类型>.<任务ID>``，如 ``review.<文档ID>``，对应通道层分组 ``progress.<主题>``
+- 合并：publish 只更新内存中的最新状态，后台线程每 PROGRESS_EVENT_MIN_INTERVAL_MS 最多推送一次，
+  终态事件（final=True）立即推送
+- 内存状态：未收到终态事件的主题（如进程被杀的任务）按 PROGRESS_STATE_TTL 秒过期，
+  并最多保留 PROGRESS_STATE_MAX_TOPICS 个主题，超出时淘汰最久未更新的
+- 检查点：ProgressReporter 只在进度跨过 PROGRESS_CHECKPOINT_MIN_DELTA、距上次落库超过
+  PROGRESS_CHECKPOINT_INTERVAL 秒或任务结束时才调用落库回调
+
+跨进程推送（Celery worker -> ASGI）需要 Redis 通道层（CHANNEL_LAYER_BACKEND=redis）；
+最新状态快照写入共享缓存（SHARED_STATE_REDIS_URL），ASGI 进程和 HTTP 查询都能读到 worker 中的进度。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+TOPIC_KINDS = ("review", "kb_ingestion", "test_execution", "export")
+
+GROUP_PREFIX = "progress."
+SNAPSHOT_KEY_PREFIX = "wharttest:progress:"
+SNAPSHOT_TTL = 3600
+
+
+def job_topic(kind: str, job_id) -> str:
+    if kind not in TOPIC_KINDS:
+        raise ValueError(f"未知的进度主题类型: {kind}")
+    return f"{kind}.{job_id}"
+
+
+def parse_topic(topic: str):
+    """返回 (类型, 任务ID)，格式不合法时返回 (None, None)"""
+    kind, _, job_id = (topic or "").partition(".")
+    if kind not in TOPIC_KINDS or not job_id:
+        return None, None
+    return kind, job_id
+
+
+def group_name(topic: str) -> str:
+    # 通道层分组名只允许 ASCII 字母数字、-、_、.，且长度小于 100
+    return f"{GROUP_PREFIX}{topic}"
+
+
+def _snapshot_store():
+    return caches[getattr(settings, "SHARED_STATE_CACHE_ALIAS", "default")]
+
+
+def get_snapshot(topic: str) -> Optional[Dict[str, Any]]:
+    """读取主题最近一次推送的状态（供新订阅者补齐当前进度）"""
+    try:
+        return _snapshot_store().get(f"{SNAPSHOT_KEY_PREFIX}{topic}")
+    except Exception as exc:
+        logger.debug(f"读取进度快照失败: {exc}")
+        return None
+
+
+class ProgressBus:
+    """进程内的进度事件合并器，由后台线程统一推送到通道层"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._urgent = False
+        # 按最近更新时间排序，最久未更新的主题在前，便于按 TTL / 数量淘汰
+        self._state: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self.sent_count = 0
+
+    @property
+    def min_interval(self) -> float:
+        return getattr(settings, "PROGRESS_EVENT_MIN_INTERVAL_MS", 200) / 1000
+
+    @property
+    def state_ttl(self) -> float:
+        return getattr(settings, "PROGRESS_STATE_TTL", SNAPSHOT_TTL)
+
+    @property
+    def max_topics(self) -> int:
+        return getattr(settings, "PROGRESS_STATE_MAX_TOPICS", 1000)
+
+    def publish(self, topic: str, data: Dict[str, Any], final: bool = False):
+        """
+        发布进度（非阻塞，可在同步/异步代码和任意线程中调用）
+
+        data 与该主题之前的状态合并，订阅者始终收到完整状态；final=True 表示任务结束，立即推送并释放内存状态。
+        """
+        with self._lock:
+            now = time.time()
+            state = self._state.setdefault(topic, {"topic": topic, "seq": 0})
+            self._state.move_to_end(topic)
+            state.update(data)
+            state["seq"] += 1
+            state["final"] = final
+            state["timestamp"] = now
+            self._pending[topic] = dict(state)
+            if final:
+                self._state.pop(topic, None)
+                self._urgent = True
+            self._evict_state(now)
+            self._ensure_thread()
+        self._wakeup.set()
+
+    def _evict_state(self, now: float):
+        """淘汰过期或超出数量上限的主题状态（调用方持有 _lock）"""
+        deadline = now - self.state_ttl
+        max_topics = self.max_topics
+        while self._state:
+            topic, state = next(iter(self._state.items()))
+            if state["timestamp"] > deadline and len(self._state) <= max_topics:
+                break
+            del self._state[topic]
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="progress-bus", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            self.flush()
+            # 推送后至少间隔 min_interval，期间到达的更新只保留最新状态；终态事件不等待
+            deadline = time.monotonic() + self.min_interval
+            while not self._urgent:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.wait(remaining)
+                self._wakeup.clear()
+            if self._pending:
+                self._wakeup.set()
+
+    def flush(self):
+        """立即推送所有待发送的状态"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._urgent = False
+        if not pending:
+            return
+
+        from channels.layers import get_channel_layer
+
+        channel_layer = get_channel_layer()
+        for topic, state in pending.items():
+            try:
+                _snapshot_store().set(f"{SNAPSHOT_KEY_PREFIX}{topic}", state, SNAPSHOT_TTL)
+            except Exception as exc:
+                logger.debug(f"写入进度快照失败: {exc}")
+            if channel_layer is None:
+                continue
+            try:
+                async_to_sync(channel_layer.group_send)(
+                    group_name(topic),
+                    {"type": "progress.event", "topic": topic, "data": state},
+                )
+                self.sent_count += 1
+            except Exception as exc:
+                logger.warning(f"推送进度事件失败 {topic}: {exc}")
+
+
+progress_bus = ProgressBus()
+
+
+def publish_progress(kind: str, job_id, data: Dict[str, Any], final: bool = False):
+    progress_bus.publish(job_topic(kind, job_id), data, final=final)
+
+
+class ProgressReporter:
+    """
+    单个任务的进度上报器：每次 update 都推送事件，落库回调只在粗粒度检查点调用
+
+    Args:
+        kind / job_id: 进度主题
+        checkpoint: 落库回调，参数为当前完整状态字典
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        job_id,
+        checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None,
+        min_delta: Optional[float] = None,
+        min_interval: Optional[float] = None,
+    ):
+        self.topic = job_topic(kind, job_id)
+        self.checkpoint = checkpoint
+        self.min_delta = (
+            min_delta
+            if min_delta is not None
+            else getattr(settings, "PROGRESS_CHECKPOINT_MIN_DELTA", 0.1)
+        )
+        self.min_interval = (
+            min_interval
+            if min_interval is not None
+            else getattr(settings, "PROGRESS_CHECKPOINT_INTERVAL", 10)
+        )
+        self.state: Dict[str, Any] = {}
+        self.checkpoint_count = 0
+        self._lock = threading.Lock()
+        self._checkpoint_progress = None
+        self._checkpoint_at = 0.0
+
+    def update(self, **fields):
+        with self._lock:
+            self.state.update(fields)
+            state = dict(self.state)
+            due = self._checkpoint_due(state.get("progress"))
+        progress_bus.publish(self.topic, fields)
+        if due:
+            self._save_checkpoint(state)
+
+    def finish(self, status: str, **fields):
+        """任务结束：推送终态并强制落库"""
+        with self._lock:
+            self.state.update(fields, status=status)
+            state = dict(self.state)
+        progress_bus.publish(self.topic, {**fields, "status": status}, final=True)
+        self._save_checkpoint(state)
+
+    def _checkpoint_due(self, progress) -> bool:
+        if self.checkpoint is None:
+            return False
+        if self._checkpoint_progress is None:
+            return True
+        if time.monotonic() - self._checkpoint_at >= self.min_interval:
+            return True
+        if isinstance(progress, (int, float)) and isinstance(
+            self._checkpoint_progress, (int, float)
+        ):
+            return progress - self._checkpoint_progress >= self.min_delta
+        return False
+
+    def _save_checkpoint(self, state: Dict[str, Any]):
+        if self.checkpoint is None:
+            return
+        with self._lock:
+            self._checkpoint_progress = state.get("progress")
+            self._checkpoint_at = time.monotonic()
+            self.checkpoint_count += 1
+        try:
+            self.checkpoint(state)
+        except Exception as exc:
+            logger.warning(f"进度检查点落库失败 {self.topic}: {exc}")
@@ -0,0 +1,191 @@
+"""
+进度订阅 WebSocket Consumer
+
+端点：/ws/progress/?token=<JWT访问令牌>
+
+客户端消息：
+- {"action": "subscribe", "topic": "review.<文档ID>"}  （类型：review / kb_ingestion / test_execution / export）
+- {"action": "unsubscribe", "topic": "review.<文档ID>"}
+
+服务端消息：
+- {"type": "subscribed", "topic": ..., "snapshot": {...}}  订阅成功，附带当前进度
+- {"type": "progress", "topic": ..., "data": {...}}        进度更新（data 为完整状态，final=True 表示任务结束）
+- {"type": "error", "topic": ..., "message": ...}
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .progress import get_snapshot, group_name, parse_topic
+
+logger = logging.getLogger(__name__)
+
+
+def _is_project_member(user, project_id) -> bool:
+    from projects.models import ProjectMember
+
+    if user.is_superuser:
+        return True
+    return ProjectMember.objects.filter(project_id=project_id, user=user).exists()
+
+
+def _review_snapshot(user, job_id) -> Optional[Dict[str, Any]]:
+    from requirements.models import RequirementDocument
+
+    document = RequirementDocument.objects.filter(id=job_id).first()
+    if not document or not _is_project_member(user, document.project_id):
+        return None
+    report = document.review_reports.order_by("-review_date").first()
+    if not report:
+        return {"status": document.status}
+    return {
+        "status": report.status,
+        "report_id": str(report.id),
+        "progress": report.progress,
+        "current_step": report.current_step,
+        "completed_steps": report.completed_steps,
+    }
+
+
+def _kb_ingestion_snapshot(user, job_id) -> Optional[Dict[str, Any]]:
+    from knowledge.models import Document
+
+    document = Document.objects.select_related("knowledge_base").filter(id=job_id).first()
+    if not document or not _is_project_member(user, document.knowledge_base.project_id):
+        return None
+    return {"status": document.status, "error_message": document.error_message}
+
+
+def _test_execution_snapshot(user, job_id) -> Optional[Dict[str, Any]]:
+    from testcases.models import TestExecution
+
+    execution = TestExecution.objects.select_related("suite").filter(id=job_id).first()
+    if not execution or not _is_project_member(user, execution.suite.project_id):
+        return None
+    return {
+        "status": execution.status,
+        "total": execution.total_count,
+        "passed": execution.passed_count,
+        "failed": execution.failed_count,
+        "skipped": execution.skipped_count,
+        "error": execution.error_count,
+    }
+
+
+def _export_snapshot(user, job_id) -> Optional[Dict[str, Any]]:
+    from .export_jobs import export_jobs
+
+    try:
+        record = export_jobs.get(job_id)
+    except ValueError:
+        return None
+    if not record or not _is_project_member(user, record.get("project_id")):
+        return None
+    return export_jobs.public_state(record)
+
+
+# 主题类型 -> (user, 任务ID) -> 数据库中的当前状态；无权限或任务不存在时返回 None
+TOPIC_SNAPSHOT_LOADERS = {
+    "review": _review_snapshot,
+    "kb_ingestion": _kb_ingestion_snapshot,
+    "test_execution": _test_execution_snapshot,
+    "export": _export_snapshot,
+}
+
+
+class ProgressConsumer(AsyncWebsocketConsumer):
+    """长任务进度订阅"""
+
+    async def connect(self):
+        self.user = await self._authenticate()
+        self.topics = set()
+        if self.user is None:
+            await self.close(code=4401)
+            return
+        await self.accept()
+
+        query = parse_qs(self.scope.get("query_string", b"").decode("utf-8"))
+        for topics in query.get("topics", []):
+            for topic in topics.split(","):
+                if topic:
+                    await self._subscribe(topic)
+
+    async def disconnect(self, close_code):
+        for topic in list(getattr(self, "topics", ())):
+            await self.channel_layer.group_discard(group_name(topic), self.channel_name)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if not text_data:
+            return
+        try:
+            message = json.loads(text_data)
+        except json.JSONDecodeError:
+            await self._send({"type": "error", "message": "消息格式错误"})
+            return
+
+        action = message.get("action")
+        topic = message.get("topic", "")
+        if action == "subscribe":
+            await self._subscribe(topic)
+        elif action == "unsubscribe":
+            if topic in self.topics:
+                self.topics.discard(topic)
+                await self.channel_layer.group_discard(group_name(topic), self.channel_name)
+            await self._send({"type": "unsubscribed", "topic": topic})
+        elif action == "ping":
+            await self._send({"type": "pong"})
+        else:
+            await self._send({"type": "error", "message": f"未知操作: {action}"})
+
+    async def progress_event(self, event):
+        """通道层分组消息（type=progress.event）"""
+        await self._send({"type": "progress", "topic": event["topic"], "data": event["data"]})
+
+    async def _subscribe(self, topic: str):
+        kind, job_id = parse_topic(topic)
+        loader = TOPIC_SNAPSHOT_LOADERS.get(kind)
+        if loader is None:
+            await self._send({"type": "error", "topic": topic, "message": "无效的进度主题"})
+            return
+
+        try:
+            db_state = await database_sync_to_async(loader)(self.user, job_id)
+        except Exception as exc:
+            logger.debug(f"加载进度快照失败 {topic}: {exc}")
+            db_state = None
+        if db_state is None:
+            await self._send({"type": "error", "topic": topic, "message": "任务不存在或无权访问"})
+            return
+
+        self.topics.add(topic)
+        await self.channel_layer.group_add(group_name(topic), self.channel_name)
+        # 推送中的最新状态优先于数据库检查点
+        snapshot = await database_sync_to_async(get_snapshot)(topic) or db_state
+        await self._send({"type": "subscribed", "topic": topic, "snapshot": snapshot})
+
+    async def _send(self, payload: Dict[str, Any]):
+        await self.send(text_data=json.dumps(payload, ensure_ascii=False, default=str))
+
+    @database_sync_to_async
+    def _authenticate(self):
+        user = self.scope.get("user")
+        if user is not None and getattr(user, "is_authenticated", False):
+            return user
+
+        query = parse_qs(self.scope.get("query_string", b"").decode("utf-8"))
+        token = (query.get("token") or [""])[0]
+        if not token:
+            return None
+        try:
+            from rest_framework_simplejwt.authentication import JWTAuthentication
+
+            auth = JWTAuthentication()
+            return auth.get_user(auth.get_validated_token(token))
+        except Exception as exc:
+            logger.debug(f"进度订阅认证失败: {exc}")
+            return None
@@ -0,0 +1,12 @@
+"""
+项目级 WebSocket 路由配置
+"""
+
+from django.urls import re_path
+
+from .progress_consumer import ProgressConsumer
+
+websocket_urlpatterns = [
+    # 长任务进度订阅
+    re_path(r"ws/progress/$", ProgressConsumer.as_asgi()),
+]
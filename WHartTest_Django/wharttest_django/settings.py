@@ -150,14 +150,45 @@ INSTALLED_APPS = [
 # 指定 ASGI 入口，支持 WebSocket。
 ASGI_APPLICATION = "wharttest_django.asgi.application"
 
-# Channels Layer 配置（使用内存后端，生产环境建议使用 Redis）
+# Channels Layer 配置（默认使用内存后端，docker-compose 部署已设置为 redis）
+# 通道层后端：memory（仅单进程可用）或 redis（Celery 任务推送的进度事件需要跨进程送达 WebSocket）。
+CHANNEL_LAYER_BACKEND = os.environ.get("CHANNEL_LAYER_BACKEND", "memory")
 # 配置 Channels 通道层后端。
-CHANNEL_LAYERS = {
-    "default": {
-        # 使用内存通道层（适合开发/单进程场景）。
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+if CHANNEL_LAYER_BACKEND == "redis":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [
+                    os.environ.get(
+                        "CHANNEL_LAYER_REDIS_URL",
+                        os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0"),
+                    )
+                ],
+            },
+        }
     }
-}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            # 使用内存通道层（适合开发/单进程场景）。
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
+    }
+
+# UI 自动化执行器调度状态（注册表、批量分片）存储；通道层为 Redis 时默认共用同一实例，多 worker 共享。
+UI_DISPATCH_REDIS_URL = os.environ.get(
+    "UI_DISPATCH_REDIS_URL",
+    CHANNEL_LAYERS["default"]["CONFIG"]["hosts"][0] if CHANNEL_LAYER_BACKEND == "redis" else "",
+)
+# 执行器心跳超时（秒），超时视为离线并将其未完成用例重新分配。
+UI_ACTUATOR_HEARTBEAT_TTL = int(os.environ.get("UI_ACTUATOR_HEARTBEAT_TTL", "45"))
+# 批量执行分片的最少/最多用例数。
+UI_BATCH_MIN_SHARD = int(os.environ.get("UI_BATCH_MIN_SHARD", "5"))
+UI_BATCH_MAX_SHARD = int(os.environ.get("UI_BATCH_MAX_SHARD", "100"))
+# UI 用例结果缓冲写入：最长缓冲时间（秒）与单次批量写入的结果数上限。
+UI_RESULT_FLUSH_INTERVAL = float(os.environ.get("UI_RESULT_FLUSH_INTERVAL", "0.5"))
+UI_RESULT_FLUSH_SIZE = int(os.environ.get("UI_RESULT_FLUSH_SIZE", "200"))
 
 # 配置请求处理中间件执行链。
 MIDDLEWARE = [
@@ -674,8 +705,11 @@ CELERY_RESULT_SERIALIZER = "json"  # 任务结果序列化格式。
 CELERY_ACCEPT_CONTENT = ["json"]  # Worker 允许接收的消息内容类型。
 
 # Celery任务路由 - task_center 使用独立队列，避免被其他 worker 误消费
+# APPUI 报告后处理（HTML 报告 + 截图）所在队列；设为独立队列并单独启动 worker 时不占用执行脚本的 worker
+APP_UI_REPORT_QUEUE = os.environ.get("APP_UI_REPORT_QUEUE", "celery")
 CELERY_TASK_ROUTES = {
     'task_center.tasks.*': {'queue': 'task_center'},
+    'app_ui_automation.tasks.render_app_ui_report': {'queue': APP_UI_REPORT_QUEUE},
 }
 
 # Celery Beat 调度器配置
@@ -696,6 +730,152 @@ CELERY_WORKER_LOG_FORMAT = "[%(asctime)s: %(levelname)s/%(processName)s] %(messa
 # Celery 任务级日志格式。
 CELERY_WORKER_TASK_LOG_FORMAT = "[%(asctime)s: %(levelname)s/%(processName)s][%(task_name)s(%(task_id)s)] %(message)s"
 
+# Agent Loop 停止信号配置
+# 多 worker 部署时通过 Redis 在进程间广播停止/取消信号，停止请求落到任意 worker 都能生效。
+# 设为空字符串则仅使用进程内存（只适合单进程开发环境）。
+STOP_SIGNAL_REDIS_URL = os.environ.get("STOP_SIGNAL_REDIS_URL", CELERY_BROKER_URL)
+
+# MCP 会话池配置
+# 每个对话会话持有独立的 MCP 客户端（含浏览器等有状态会话），以有界池管理。
+# 会话池上限，超出时淘汰最久未使用的会话。
+MCP_SESSION_POOL_MAX_SIZE = int(os.environ.get("MCP_SESSION_POOL_MAX_SIZE", "50"))
+# 会话空闲超时（秒），超时后在下次访问会话池时关闭。
+MCP_SESSION_IDLE_TTL = int(os.environ.get("MCP_SESSION_IDLE_TTL", "1800"))
+
+# Agent 装配缓存配置
+# 缓存每轮 Agent Loop 装配所需的系统提示词、MCP/HITL 配置、审批偏好和内置工具，模型变更时通过信号失效。
+# 条目兜底过期时间（秒）。
+AGENT_ASSEMBLY_CACHE_TTL = int(os.environ.get("AGENT_ASSEMBLY_CACHE_TTL", "300"))
+# 进程内最多缓存的条目数。
+AGENT_ASSEMBLY_CACHE_MAX_ENTRIES = int(os.environ.get("AGENT_ASSEMBLY_CACHE_MAX_ENTRIES", "512"))
+# 跨进程共享的轻量状态（装配缓存版本号、长任务进度快照），默认复用 Celery Broker 的 Redis。
+# 设为空字符串则仅使用进程内存（只适合单进程开发环境）。
+SHARED_STATE_REDIS_URL = os.environ.get("SHARED_STATE_REDIS_URL", CELERY_BROKER_URL)
+SHARED_STATE_CACHE_ALIAS = "shared_state"
+# 是否启用装配缓存；版本号必须跨进程共享才能及时失效，未配置共享 Redis 时默认关闭。
+AGENT_ASSEMBLY_CACHE_ENABLED = os.environ.get(
+    "AGENT_ASSEMBLY_CACHE_ENABLED", str(bool(SHARED_STATE_REDIS_URL))
+).lower() == "true"
+
+# SSE 流式输出配置
+# 逐 token 事件在时间/大小窗口内合并为一帧发送，减少 JSON 编码与 socket 写次数。
+# 合并窗口（毫秒）。
+SSE_COALESCE_WINDOW_MS = int(os.environ.get("SSE_COALESCE_WINDOW_MS", "30"))
+# 缓冲的 token 文本达到该字节数时立即发送。
+SSE_COALESCE_MAX_BYTES = int(os.environ.get("SSE_COALESCE_MAX_BYTES", "512"))
+# 上游事件队列容量，客户端读取慢时队列满即暂停 Agent 流（背压）。
+SSE_STREAM_QUEUE_SIZE = int(os.environ.get("SSE_STREAM_QUEUE_SIZE", "64"))
+
+# 需求模块评审配置
+# 全面评审时按模块并发分析（map），每个模块完成即落库；跨模块一致性（reduce）只读取模块摘要。
+# 是否在全面评审中执行模块级评审（文档已拆分模块时生效）。
+REQUIREMENT_MODULE_REVIEW_ENABLED = os.environ.get("REQUIREMENT_MODULE_REVIEW_ENABLED", "False").lower() == "true"
+# 同时进行中的模块分析请求数上限。
+REQUIREMENT_MODULE_REVIEW_CONCURRENCY = int(os.environ.get("REQUIREMENT_MODULE_REVIEW_CONCURRENCY", "4"))
+# 评审中的报告超过该秒数未更新视为执行进程已退出，可由新的评审任务接管续评。
+REQUIREMENT_REVIEW_STALE_SECONDS = int(os.environ.get("REQUIREMENT_REVIEW_STALE_SECONDS", "1800"))
+# 增量评审：变化章节（按篇幅）占比不超过该值时，专项分析只分析变化章节并与上次结果合并，否则完整重评。
+REQUIREMENT_REVIEW_PARTIAL_MAX_RATIO = float(os.environ.get("REQUIREMENT_REVIEW_PARTIAL_MAX_RATIO", "0.5"))
+# 专项分析前缀缓存预热：首个专项分析先行的秒数，其余分析在服务端写入文档前缀缓存后再提交，0 表示同时提交。
+REQUIREMENT_REVIEW_PREFIX_WARMUP_SECONDS = float(os.environ.get("REQUIREMENT_REVIEW_PREFIX_WARMUP_SECONDS", "3"))
+# 流式评审：专项分析/直接评审以流式调用 LLM，每解析出一个问题即落库并推送给进度订阅者。
+REQUIREMENT_REVIEW_STREAMING = os.environ.get("REQUIREMENT_REVIEW_STREAMING", "True").lower() == "true"
+
+# LLM 响应缓存配置
+# 低温度、提示词确定的调用（需求评审、模块拆分）按 模型+地址+温度+消息+工具 缓存响应，默认关闭。
+LLM_RESPONSE_CACHE_ENABLED = os.environ.get("LLM_RESPONSE_CACHE_ENABLED", "False").lower() == "true"
+# 缓存后端：locmem（进程内）、redis（LLM_RESPONSE_CACHE_URL，默认复用 Celery Broker）或 db（需执行 createcachetable）。
+LLM_RESPONSE_CACHE_BACKEND = os.environ.get("LLM_RESPONSE_CACHE_BACKEND", "locmem")
+# 缓存过期时间（秒）。
+LLM_RESPONSE_CACHE_TTL = int(os.environ.get("LLM_RESPONSE_CACHE_TTL", "86400"))
+# 最多缓存的条目数（locmem/db 后端生效，redis 后端由 maxmemory 策略淘汰）。
+LLM_RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+# 单条响应超过该字节数时不缓存。
+LLM_RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("LLM_RESPONSE_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+# 温度高于该值的调用不缓存。
+LLM_RESPONSE_CACHE_MAX_TEMPERATURE = float(os.environ.get("LLM_RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+LLM_RESPONSE_CACHE_ALIAS = "llm_responses"
+
+_LLM_RESPONSE_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "wharttest-llm-responses",
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("LLM_RESPONSE_CACHE_URL", CELERY_BROKER_URL),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "llm_response_cache",
+    },
+}
+
+CACHES = {
+    # 与 Django 未配置 CACHES 时的默认值一致
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    LLM_RESPONSE_CACHE_ALIAS: {
+        **_LLM_RESPONSE_CACHE_BACKENDS.get(
+            LLM_RESPONSE_CACHE_BACKEND, _LLM_RESPONSE_CACHE_BACKENDS["locmem"]
+        ),
+        "TIMEOUT": LLM_RESPONSE_CACHE_TTL,
+        "OPTIONS": (
+            {}
+            if LLM_RESPONSE_CACHE_BACKEND == "redis"
+            else {"MAX_ENTRIES": LLM_RESPONSE_CACHE_MAX_ENTRIES}
+        ),
+    },
+    SHARED_STATE_CACHE_ALIAS: (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": SHARED_STATE_REDIS_URL,
+        }
+        if SHARED_STATE_REDIS_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "wharttest-shared-state",
+        }
+    ),
+}
+
+# 长任务进度推送配置
+# 进度事件通过通道层推送给 /ws/progress/ 订阅者；评审进度只在粗粒度检查点落库。
+# 同一主题两次推送的最小间隔（毫秒），期间的更新合并为最新状态。
+PROGRESS_EVENT_MIN_INTERVAL_MS = int(os.environ.get("PROGRESS_EVENT_MIN_INTERVAL_MS", "200"))
+# 距上次落库超过该秒数时写入进度检查点。
+PROGRESS_CHECKPOINT_INTERVAL = float(os.environ.get("PROGRESS_CHECKPOINT_INTERVAL", "10"))
+# 进度较上次落库增加该值（0-1）时写入进度检查点。
+PROGRESS_CHECKPOINT_MIN_DELTA = float(os.environ.get("PROGRESS_CHECKPOINT_MIN_DELTA", "0.1"))
+# 进程内主题状态的过期秒数，未收到终态事件（如任务进程被杀）的主题到期后释放。
+PROGRESS_STATE_TTL = float(os.environ.get("PROGRESS_STATE_TTL", "3600"))
+# 进程内最多保留的主题状态数，超出时淘汰最久未更新的主题。
+PROGRESS_STATE_MAX_TOPICS = int(os.environ.get("PROGRESS_STATE_MAX_TOPICS", "1000"))
+
+# 文档解析配置
+# 需求文档与知识库共用同一解析服务：在进程池中解析 PDF/Word/Excel，结果按文件 SHA-256 缓存到磁盘。
+# 解析进程数，0 表示在当前进程中解析（Celery prefork 子进程中始终在当前进程解析）。
+DOCUMENT_PARSE_WORKERS = int(os.environ.get("DOCUMENT_PARSE_WORKERS", "2"))
+# 单个文档解析超时时间（秒），超时后改用新进程池，旧进程池中其他解析结束后再终止其工作进程。
+DOCUMENT_PARSE_TIMEOUT = int(os.environ.get("DOCUMENT_PARSE_TIMEOUT", "300"))
+# 解析结果缓存目录。
+DOCUMENT_PARSE_CACHE_DIR = os.environ.get("DOCUMENT_PARSE_CACHE_DIR", os.path.join(MEDIA_ROOT, "parse_cache"))
+# 解析缓存总大小上限（字节），超出时淘汰最久未使用的条目。
+DOCUMENT_PARSE_CACHE_MAX_BYTES = int(os.environ.get("DOCUMENT_PARSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 两次缓存淘汰（遍历缓存目录统计大小）之间的最小间隔（秒）；新写入超过上限的 1/10 时提前淘汰。
+DOCUMENT_PARSE_CACHE_PRUNE_INTERVAL = int(os.environ.get("DOCUMENT_PARSE_CACHE_PRUNE_INTERVAL", "300"))
+
+# 导出任务配置
+# 是否通过 Celery 异步执行导出任务（关闭时在提交请求的进程内执行）。
+EXPORT_JOBS_ASYNC = os.environ.get("EXPORT_JOBS_ASYNC", "true").lower() == "true"
+# 导出文件与任务记录目录（Web 进程与 Celery worker 需共享）。
+EXPORT_ARTIFACT_DIR = os.environ.get("EXPORT_ARTIFACT_DIR", os.path.join(MEDIA_ROOT, "exports"))
+# 导出文件总大小上限（字节），超出时淘汰最久未使用的文件。
+EXPORT_ARTIFACT_MAX_BYTES = int(os.environ.get("EXPORT_ARTIFACT_MAX_BYTES", str(1024 * 1024 * 1024)))
+# 排队/执行中的导出任务超过该秒数未更新时视为失效，允许重新提交。
+EXPORT_JOB_STALE_SECONDS = int(os.environ.get("EXPORT_JOB_STALE_SECONDS", "1800"))
+
 # 内部API基础URL配置 - 用于Celery任务等内部服务调用
 # 在Docker环境中应设置为 http://backend:8000
 # 在本地开发环境中可以使用 http://localhost:8000
@@ -749,6 +929,19 @@ AIRTEST_REPORT_TEMPLATE = os.path.join(
     BASE_DIR, 'testcases', 'appuitest', 'log_template.html'
 )
 
+# APPUI 设备池：批量执行时在同项目、同平台的所有空闲设备上并行执行（False 时只使用指定设备）
+APP_UI_DEVICE_FARM = os.environ.get('APP_UI_DEVICE_FARM', 'true').lower() in ('1', 'true', 'yes')
+# 设备租约时长（秒），批量执行期间定期续期，执行进程异常退出后到期自动释放
+APP_UI_DEVICE_LEASE_TTL = int(os.environ.get('APP_UI_DEVICE_LEASE_TTL', '600'))
+# 设备全部被占用时等待空闲设备的最长时间（秒）
+APP_UI_DEVICE_LEASE_WAIT = int(os.environ.get('APP_UI_DEVICE_LEASE_WAIT', '300'))
+# 脚本遇到设备级失败（连接失败、执行进程异常退出）时的最多执行次数，重试会换一台设备
+APP_UI_SCRIPT_MAX_ATTEMPTS = int(os.environ.get('APP_UI_SCRIPT_MAX_ATTEMPTS', '2'))
+# 单个脚本执行进程的超时时间（秒）
+APP_UI_SCRIPT_TIMEOUT = int(os.environ.get('APP_UI_SCRIPT_TIMEOUT', '3600'))
+# 定时任务通知由批次最后一份报告生成后发送；报告超过该时间（秒）仍未生成完时不再等待，直接发送通知
+APP_UI_REPORT_WAIT = int(os.environ.get('APP_UI_REPORT_WAIT', '300'))
+
 # ============================== 飞书开放平台配置 ==============================
 # 用于图片上传（报告截图嵌入飞书消息卡片）
 # 不配置时跳过截图，仅发送文本通知
@@ -0,0 +1,37 @@
+import { onUnmounted } from 'vue';
+import {
+  subscribeProgress,
+  type ProgressState,
+  type ProgressTopic,
+} from '@/services/progressService';
+
+/**
+ * 维护一组进度订阅：sync 时补齐缺少的主题、取消不再需要的主题，组件卸载时全部取消
+ */
+export const useProgressSubscriptions = () => {
+  const subscriptions = new Map<string, () => void>();
+
+  const sync = (topics: ProgressTopic[], listener: (state: ProgressState) => void) => {
+    const wanted = new Set<string>(topics);
+    subscriptions.forEach((unsubscribe, topic) => {
+      if (!wanted.has(topic)) {
+        unsubscribe();
+        subscriptions.delete(topic);
+      }
+    });
+    topics.forEach((topic) => {
+      if (!subscriptions.has(topic)) {
+        subscriptions.set(topic, subscribeProgress(topic, listener));
+      }
+    });
+  };
+
+  const clear = () => {
+    subscriptions.forEach(unsubscribe => unsubscribe());
+    subscriptions.clear();
+  };
+
+  onUnmounted(clear);
+
+  return { sync, clear };
+};
@@ -123,6 +123,7 @@ export interface AppUiExecutionRecord {
   passed_steps: number
   failed_steps: number
   report_path: string
+  report_status: '' | 'pending' | 'rendering' | 'ready' | 'failed'
   log_dir: string
   execution_log: string | null
   error_message: string | null
@@ -8,6 +8,7 @@ import type {
   UiPage,
   UiPageDetail,
   UiElement,
+  UiElementLocatorStat,
   UiPageSteps,
   UiPageStepsDetail,
   UiPageStepsDetailed,
@@ -77,6 +78,10 @@ export const elementApi = {
     request.patch<UiElement>(`${BASE_URL}/elements/${id}/`, data),
 
   delete: (id: number) => request.delete(`${BASE_URL}/elements/${id}/`),
+
+  /** 元素定位解析统计（按平均解析耗时倒序，用于查找慢定位） */
+  locatorStats: (params: { project?: number; page?: number; ordering?: string; limit?: number }) =>
+    request.get<UiElementLocatorStat[]>(`${BASE_URL}/elements/locator-stats/`, { params }),
 }
 
 // ==================== 页面步骤管理 ====================
@@ -64,6 +64,29 @@ export interface UiElement extends TimeStampFields {
   creator_name?: string
 }
 
+/** 元素定位解析统计（1 = 主定位, 2/3 = 备用定位） */
+export interface UiElementLocatorStat {
+  id: number
+  element: number
+  element_name: string
+  page: number
+  page_name: string
+  variant: 1 | 2 | 3
+  variant_display: string
+  locator_type: string
+  locator_value: string
+  success_count: number
+  failure_count: number
+  consecutive_failures: number
+  success_rate: number
+  avg_ms: number
+  last_ms: number
+  max_ms: number
+  last_success_at: string | null
+  last_failure_at: string | null
+  updated_at: string
+}
+
 /** 执行状态 */
 export type ExecutionStatus = 0 | 1 | 2 | 3  // 未执行 | 执行中 | 成功 | 失败
 
@@ -265,6 +288,9 @@ export interface TraceNetworkRequest {
   response_size: number
   request_body?: string
   response_body?: string
+  /** 请求/响应体按需读取地址（Trace 索引只记录引用） */
+  request_body_url?: string
+  response_body_url?: string
 }
 
 /** Trace 控制台消息 */
@@ -0,0 +1,131 @@
+/**
+ * 长任务进度订阅服务
+ * 通过 /ws/progress/ 接收需求评审、知识库入库、测试执行、导出等任务的实时进度，
+ * 同一页面的所有订阅共用一个 WebSocket 连接，断线后自动重连并重新订阅
+ */
+
+import { useAuthStore } from '@/store/authStore';
+
+/** 进度主题，如 review.<文档ID> */
+export type ProgressTopic = `${'review' | 'kb_ingestion' | 'test_execution' | 'export'}.${string}`;
+
+/** 任务的完整进度状态，final 为 true 表示任务结束 */
+export interface ProgressState {
+  topic: string;
+  status?: string;
+  progress?: number;
+  current_step?: string;
+  completed_steps?: string[];
+  report_id?: string;
+  final?: boolean;
+  [key: string]: any;
+}
+
+type ProgressListener = (state: ProgressState) => void;
+
+const RECONNECT_DELAY = 3000;
+
+class ProgressSocket {
+  private ws: WebSocket | null = null;
+  private listeners: Map<string, Set<ProgressListener>> = new Map();
+  private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+
+  /** 订阅主题，返回取消订阅函数 */
+  subscribe(topic: ProgressTopic, listener: ProgressListener): () => void {
+    let topicListeners = this.listeners.get(topic);
+    if (!topicListeners) {
+      topicListeners = new Set();
+      this.listeners.set(topic, topicListeners);
+      this.send({ action: 'subscribe', topic });
+    }
+    topicListeners.add(listener);
+    this.connect();
+
+    return () => {
+      const current = this.listeners.get(topic);
+      if (!current) return;
+      current.delete(listener);
+      if (current.size === 0) {
+        this.listeners.delete(topic);
+        this.send({ action: 'unsubscribe', topic });
+      }
+      if (this.listeners.size === 0) {
+        this.close();
+      }
+    };
+  }
+
+  private getWsUrl(token: string): string {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const host = import.meta.env.VITE_WS_HOST || window.location.host;
+    const url = new URL(`${protocol}//${host}/ws/progress/`);
+    url.searchParams.set('token', token);
+    return url.toString();
+  }
+
+  private connect() {
+    if (this.ws || this.reconnectTimer) return;
+    const token = useAuthStore().getAccessToken;
+    if (!token) return;
+
+    const ws = new WebSocket(this.getWsUrl(token));
+    this.ws = ws;
+    ws.onopen = () => {
+      this.listeners.forEach((_, topic) => this.send({ action: 'subscribe', topic }));
+    };
+    ws.onmessage = (event) => this.handleMessage(event.data);
+    ws.onclose = () => {
+      if (this.ws !== ws) return;
+      this.ws = null;
+      if (this.listeners.size > 0) {
+        this.reconnectTimer = setTimeout(() => {
+          this.reconnectTimer = null;
+          this.connect();
+        }, RECONNECT_DELAY);
+      }
+    };
+  }
+
+  private close() {
+    if (this.reconnectTimer) {
+      clearTimeout(this.reconnectTimer);
+      this.reconnectTimer = null;
+    }
+    const ws = this.ws;
+    this.ws = null;
+    ws?.close();
+  }
+
+  private send(payload: Record<string, any>) {
+    if (this.ws?.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify(payload));
+    }
+  }
+
+  private handleMessage(rawData: string) {
+    let message: any;
+    try {
+      message = JSON.parse(rawData);
+    } catch (e) {
+      console.error('[Progress] Failed to parse message:', e);
+      return;
+    }
+
+    let state: ProgressState | null = null;
+    if (message.type === 'progress') {
+      state = { ...message.data, topic: message.topic };
+    } else if (message.type === 'subscribed' && message.snapshot) {
+      state = { ...message.snapshot, topic: message.topic };
+    } else if (message.type === 'error') {
+      console.warn('[Progress] Subscription error:', message.topic, message.message);
+    }
+    if (!state) return;
+    this.listeners.get(message.topic)?.forEach(listener => listener(state as ProgressState));
+  }
+}
+
+const progressSocket = new ProgressSocket();
+
+/** 订阅长任务进度，返回取消订阅函数 */
+export const subscribeProgress = (topic: ProgressTopic, listener: ProgressListener) =>
+  progressSocket.subscribe(topic, listener);